@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Benchmark the time blocking the training to save the checkpoint.
+
+The epoch-end files of `Trainer.run`, i.e. "checkpoint.pth" having
+the model, the Adam states and the reporter, and "{epoch}epoch.pth" having
+the model, are saved by `CheckpointWriter` with `asynchronous=False`
+(the default `--async_checkpoint false`) and `asynchronous=True`.
+The time until `save()` returns, which the GPUs sit idle for,
+and the time until the files are written are printed.
+
+Example:
+    python pyscripts/utils/benchmark_checkpoint_writer.py \
+        --device cuda --hidden 4096 --layers 16 --outdir /tmp/ckpt_bench
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import torch
+
+from espnet2.train.checkpoint_writer import CheckpointWriter
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="benchmark the blocking time of saving the checkpoint"
+    )
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--hidden", type=int, default=1024)
+    parser.add_argument("--layers", type=int, default=8)
+    parser.add_argument("--num_repeats", type=int, default=3)
+    parser.add_argument(
+        "--outdir", type=str, default=None, help="A temporary directory if not given"
+    )
+    return parser
+
+
+def synchronize(device: torch.device):
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+def build_states(args, device):
+    layers = [torch.nn.Linear(args.hidden, args.hidden) for _ in range(args.layers)]
+    model = torch.nn.Sequential(*layers).to(device)
+    optimizer = torch.optim.Adam(model.parameters())
+    model(torch.randn(2, args.hidden, device=device)).sum().backward()
+    optimizer.step()
+    return model, optimizer
+
+
+def run(writer, model, optimizer, outdir: Path, device):
+    synchronize(device)
+    start = time.perf_counter()
+    model_state = model.state_dict()
+    writer.save(
+        {
+            outdir
+            / "checkpoint.pth": {
+                "model": model_state,
+                "optimizers": [optimizer.state_dict()],
+            },
+            outdir / "1epoch.pth": model_state,
+        }
+    )
+    blocking = time.perf_counter() - start
+    writer.wait()
+    return blocking, time.perf_counter() - start
+
+
+def main():
+    args = get_parser().parse_args()
+    device = torch.device(args.device)
+    model, optimizer = build_states(args, device)
+    nbytes = sum(v.numel() * v.element_size() for v in model.state_dict().values())
+    print(f"model: {nbytes / 2**20:.1f} MB")
+
+    with tempfile.TemporaryDirectory() as d:
+        outdir = Path(args.outdir if args.outdir is not None else d)
+        outdir.mkdir(parents=True, exist_ok=True)
+        print(f"{'mode':>6} {'blocking sec':>13} {'total sec':>10}")
+        for asynchronous in [False, True]:
+            writer = CheckpointWriter(asynchronous=asynchronous)
+            # The first run allocates the pinned buffers
+            run(writer, model, optimizer, outdir, device)
+            for _ in range(args.num_repeats):
+                blocking, total = run(writer, model, optimizer, outdir, device)
+                mode = "async" if asynchronous else "sync"
+                print(f"{mode:>6} {blocking:>13.3f} {total:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
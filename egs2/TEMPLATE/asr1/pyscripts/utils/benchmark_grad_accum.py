@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Benchmark the gradient communication of DDP with gradient accumulation.
+
+For each accum_grad, the optimizer steps of a MLP wrapped by
+DistributedDataParallel are run with the gradients all-reduced for every
+micro-batch and with `no_sync()` for the micro-batches except the last one,
+as `Trainer.train_one_epoch` does. The all-reduced bytes are counted by a
+communication hook and reported per optimizer step.
+The time of the gradient norm by `torch.nn.utils.clip_grad_norm_` and
+`espnet2.torch_utils.clip_grad_norm` is also reported.
+
+Example:
+    python pyscripts/utils/benchmark_grad_accum.py \
+        --world_size 2 --accum_grad 1 2 4 8 --hidden 2048 --layers 8
+"""
+
+import argparse
+import math
+import tempfile
+import time
+from contextlib import ExitStack
+
+import torch
+import torch.multiprocessing as mp
+from torch.distributed.algorithms.ddp_comm_hooks import default_hooks
+
+from espnet2.torch_utils.clip_grad_norm import clip_grad_norm
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="benchmark the gradient communication with accum_grad"
+    )
+    parser.add_argument("--world_size", type=int, default=2)
+    parser.add_argument("--backend", type=str, default="gloo")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--accum_grad", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--num_steps", type=int, default=5, help="optimizer steps")
+    parser.add_argument("--hidden", type=int, default=1024)
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--batch_size", type=int, default=8)
+    return parser
+
+
+def synchronize(device: torch.device):
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+def count_hook(state, bucket):
+    state["calls"] += 1
+    state["bytes"] += bucket.buffer().numel() * bucket.buffer().element_size()
+    return default_hooks.allreduce_hook(None, bucket)
+
+
+def build_model(args, device):
+    torch.manual_seed(0)
+    layers = []
+    for _ in range(args.layers):
+        layers += [torch.nn.Linear(args.hidden, args.hidden), torch.nn.ReLU()]
+    return torch.nn.Sequential(*layers).to(device)
+
+
+def run(model, x, accum_grad, num_steps, use_no_sync):
+    state = dict(calls=0, bytes=0)
+    model.register_comm_hook(state, count_hook)
+    optimizer = torch.optim.SGD(model.parameters(), lr=1e-6)
+
+    synchronize(x.device)
+    start = time.perf_counter()
+    for iiter in range(1, accum_grad * num_steps + 1):
+        sync_context = ExitStack()
+        if use_no_sync and iiter % accum_grad != 0:
+            sync_context.enter_context(model.no_sync())
+        model(x).pow(2).mean().backward()
+        sync_context.close()
+        if iiter % accum_grad == 0:
+            optimizer.step()
+            optimizer.zero_grad()
+    synchronize(x.device)
+    elapsed = time.perf_counter() - start
+    return state["calls"] / num_steps, state["bytes"] / num_steps, elapsed / num_steps
+
+
+def time_grad_norm(model, num_repeats=20):
+    params = list(model.parameters())
+    for p in params:
+        p.grad = torch.randn_like(p)
+    results = []
+    for fn in [torch.nn.utils.clip_grad_norm_, clip_grad_norm]:
+        fn(params, math.inf)
+        synchronize(params[0].device)
+        start = time.perf_counter()
+        for _ in range(num_repeats):
+            fn(params, math.inf)
+        synchronize(params[0].device)
+        results.append((time.perf_counter() - start) / num_repeats)
+    return results
+
+
+def worker(rank, args, init_method):
+    torch.distributed.init_process_group(
+        args.backend, init_method=init_method, rank=rank, world_size=args.world_size
+    )
+    device = torch.device(args.device)
+    if device.type == "cuda":
+        device = torch.device("cuda", rank)
+    x = torch.randn(args.batch_size, args.hidden, device=device)
+
+    if rank == 0:
+        print(
+            f"{'accum_grad':>10} {'mode':>8} {'calls/step':>11} "
+            f"{'MB/step':>9} {'sec/step':>9}"
+        )
+    for accum_grad in args.accum_grad:
+        for use_no_sync in [False, True]:
+            model = torch.nn.parallel.DistributedDataParallel(
+                build_model(args, device),
+                device_ids=[device.index] if device.type == "cuda" else None,
+            )
+            calls, nbytes, sec = run(model, x, accum_grad, args.num_steps, use_no_sync)
+            if rank == 0:
+                mode = "no_sync" if use_no_sync else "every"
+                print(
+                    f"{accum_grad:>10} {mode:>8} {calls:>11.1f} "
+                    f"{nbytes / 2**20:>9.1f} {sec:>9.4f}"
+                )
+
+    if rank == 0:
+        t_torch, t_foreach = time_grad_norm(build_model(args, device))
+        print(
+            f"grad norm (max_norm=inf): clip_grad_norm_ {t_torch * 1e3:.3f} ms, "
+            f"foreach {t_foreach * 1e3:.3f} ms"
+        )
+    torch.distributed.barrier()
+
+
+def main():
+    args = get_parser().parse_args()
+    with tempfile.TemporaryDirectory() as d:
+        mp.spawn(worker, args=(args, f"file://{d}/init"), nprocs=args.world_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Benchmark the n-gram scorers in the batch beam search.
+
+The scores of all tokens for the hypotheses are computed by
+`NgramFullScorer.batch_score`, which caches the scores for each context,
+and by the loop of `kenlm.LanguageModel.BaseScore` over the hypotheses
+and the tokens, which is the previous implementation.
+The hypotheses are extended with random tokens, and
+`--num_prefixes` limits the distinct prefixes as the beam search does.
+
+Example:
+    python pyscripts/utils/benchmark_ngram_scorer.py \
+        --ngram_file exp/ngram/3gram.bin \
+        --token_list data/token_list/bpe_unigram5000/tokens.txt
+"""
+
+import argparse
+import time
+
+import kenlm
+import torch
+
+from espnet.nets.scorers.ngram import NgramFullScorer
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="benchmark the n-gram scorers")
+    parser.add_argument("--ngram_file", type=str, required=True)
+    parser.add_argument("--token_list", type=str, required=True)
+    parser.add_argument("--beam_size", type=int, default=10)
+    parser.add_argument("--num_prefixes", type=int, default=3)
+    parser.add_argument("--num_steps", type=int, default=20)
+    return parser
+
+
+def loop_score(scorer, ys, states):
+    # The previous implementation: BaseScore for each hypothesis and token
+    scores, out_states = [], []
+    for y, state in zip(ys, states):
+        out_state = scorer.next_state(y, state)
+        tmp = kenlm.State()
+        scores.append(
+            torch.tensor(
+                [scorer.lm.BaseScore(out_state, c, tmp) for c in scorer.chardict]
+            )
+        )
+        out_states.append(out_state)
+    return torch.stack(scores), out_states
+
+
+def run(scorer, fn, args):
+    g = torch.Generator().manual_seed(0)
+    ys = torch.full((args.beam_size, 1), len(scorer.chardict) - 1)
+    states = [scorer.init_state(None)] * args.beam_size
+    start = time.perf_counter()
+    for _ in range(args.num_steps):
+        scores, states = fn(ys, states)
+        # Extend the hypotheses sharing num_prefixes distinct prefixes
+        src = torch.randint(args.num_prefixes, (args.beam_size,), generator=g)
+        new = torch.randint(2, len(scorer.chardict) - 1, (args.num_prefixes,))
+        ys = torch.cat([ys[src], new[src, None]], dim=1)
+        states = [states[i] for i in src.tolist()]
+    return time.perf_counter() - start
+
+
+def main():
+    args = get_parser().parse_args()
+    with open(args.token_list, encoding="utf-8") as f:
+        token_list = [line.rstrip() for line in f]
+    scorer = NgramFullScorer(args.ngram_file, token_list)
+    xs = torch.zeros(args.beam_size, 1, 1)
+
+    loop = run(scorer, lambda y, s: loop_score(scorer, y, s), args)
+    batch = run(scorer, lambda y, s: scorer.batch_score(y, s, xs), args)
+    print(f"vocab: {len(token_list)}, beam: {args.beam_size}")
+    print(f"loop: {loop / args.num_steps * 1000:.2f} msec/step")
+    print(f"batch_score: {batch / args.num_steps * 1000:.2f} msec/step")
+
+
+if __name__ == "__main__":
+    main()
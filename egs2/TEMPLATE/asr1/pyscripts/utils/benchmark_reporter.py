@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Benchmark the per-iteration overhead of the stats reporting.
+
+A training-like loop (a few matmuls producing scalar stats on the device) is
+run with the default `SubReporter`, which converts each stat by `.item()`,
+and the deferred one (`--deferred_report true`), which keeps the stats on
+the device until `log_message()` at every log_interval.
+The time per iteration and the overhead compared to the loop without
+reporting are printed.
+
+Example:
+    python pyscripts/utils/benchmark_reporter.py \
+        --device cuda --num_stats 8 --log_interval 100
+
+Measured overhead (the median of 11 alternating runs):
+    Setup: 1 vCPU of Intel Xeon, no GPU, torch 2.1.2, --device cpu
+    --num_iters 3000 --num_stats 12 --log_interval 100 --dim 256.
+    "before" is the same loop on the reporter without the deferred mode.
+    All modes compute the stats, so only the reporting calls differ.
+
+               us/iter  overhead us/iter
+    none         234.2                 -
+    before      1612.3            1378.1
+    eager       1615.0            1380.8
+    deferred    1192.7             958.5
+
+    The deferred mode has 31% less overhead than eager (30% than before).
+    The machine is noisy: two runs of 7 gave only a 7% and a 12% reduction.
+    On CPU, .item() doesn't wait for a device, so the gain comes from skipping
+    the per-stat conversion. No CUDA device was available for this
+    measurement, so the syncs saved on GPU are not included.
+"""
+
+import argparse
+import time
+
+import torch
+
+from espnet2.train.reporter import Reporter
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="benchmark the per-iteration overhead of the reporter"
+    )
+    parser.add_argument("--num_iters", type=int, default=1000)
+    parser.add_argument("--num_stats", type=int, default=8, help="stats per step")
+    parser.add_argument("--log_interval", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=1024, help="size of the matmul")
+    parser.add_argument("--device", type=str, default="cpu")
+    return parser
+
+
+def synchronize(device: torch.device):
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+def run(x, w, args, mode):
+    reporter = Reporter()
+    start = time.perf_counter()
+    with reporter.observe("train", 1, deferred=mode == "deferred") as sub:
+        for iiter in range(1, args.num_iters + 1):
+            h = x
+            for _ in range(4):
+                h = torch.tanh(h @ w)
+            stats = {f"stat{i}": h[i].mean() for i in range(args.num_stats)}
+            weight = torch.tensor(x.size(0), device=x.device)
+            if mode == "none":
+                continue
+            sub.register(stats, weight=weight)
+            sub.next()
+            if iiter % args.log_interval == 0:
+                sub.log_message(-args.log_interval)
+    synchronize(x.device)
+    return (time.perf_counter() - start) / args.num_iters
+
+
+def main():
+    args = get_parser().parse_args()
+    device = torch.device(args.device)
+    x = torch.randn(max(args.num_stats, 1), args.dim, device=device)
+    w = torch.randn(args.dim, args.dim, device=device) / args.dim**0.5
+
+    modes = ["none", "eager", "deferred"]
+    for mode in modes:
+        run(x, w, argparse.Namespace(**{**vars(args), "num_iters": 10}), mode)
+    times = {mode: run(x, w, args, mode) for mode in modes}
+
+    print(f"{'mode':>10} {'us/iter':>10} {'overhead us/iter':>18}")
+    for mode in modes:
+        overhead = times[mode] - times["none"]
+        print(f"{mode:>10} {times[mode] * 1e6:>10.1f} {overhead * 1e6:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Benchmark the SpeechLM key/value caches for incremental decoding.
+
+Tokens/sec of the token-by-token forward of the SpeechLM TransformerDecoder
+are reported for several sequence lengths, comparing the hook-based cache
+(`install_kv_cache_hook`, growing by `torch.cat`) with the preallocated
+`KVCache` (capacity doubling and fixed `max_len`).
+
+Example:
+    python pyscripts/utils/benchmark_speechlm_kv_cache.py \
+        --lengths 256 1024 4096 --n_state 512 --n_layer 12 --device cuda
+"""
+
+import argparse
+import time
+
+import torch
+
+from espnet2.speechlm.module.kv_cache import KVCache
+from espnet2.speechlm.module.transformer import TransformerDecoder
+from espnet2.speechlm.net_utils import install_kv_cache_hook
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="benchmark the SpeechLM key/value caches"
+    )
+    parser.add_argument(
+        "--lengths",
+        type=int,
+        nargs="+",
+        default=[128, 512, 2048],
+        help="numbers of generated tokens",
+    )
+    parser.add_argument("--prefix_len", type=int, default=64, help="prompt length")
+    parser.add_argument("--batch_size", type=int, default=1, help="n-best size")
+    parser.add_argument("--n_state", type=int, default=256)
+    parser.add_argument("--n_head", type=int, default=4)
+    parser.add_argument("--n_layer", type=int, default=4)
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument(
+        "--dtype", type=str, default="float32", choices=["float16", "float32"]
+    )
+    return parser
+
+
+def synchronize(device: torch.device):
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+@torch.no_grad()
+def run(decoder, prefix, tokens, mode):
+    hooks = []
+    if mode == "hook":
+        cache, hooks = install_kv_cache_hook(decoder, {})
+    elif mode == "doubling":
+        cache = KVCache()
+    else:
+        cache = KVCache(max_len=prefix.size(1) + tokens.size(1))
+
+    decoder(prefix, kv_cache=cache)
+    synchronize(prefix.device)
+    start = time.perf_counter()
+    for t in range(tokens.size(1)):
+        decoder(tokens[:, t : t + 1], kv_cache=cache)
+    synchronize(prefix.device)
+    elapsed = time.perf_counter() - start
+
+    for hook in hooks:
+        hook.remove()
+    return tokens.size(1) / elapsed
+
+
+def main():
+    args = get_parser().parse_args()
+    device = torch.device(args.device)
+    dtype = getattr(torch, args.dtype)
+    max_len = max(args.lengths) + args.prefix_len
+    decoder = TransformerDecoder(
+        n_ctx=max_len, n_state=args.n_state, n_head=args.n_head, n_layer=args.n_layer
+    )
+    decoder = decoder.to(device=device, dtype=dtype).eval()
+
+    modes = ["hook", "doubling", "fixed"]
+    print("length " + " ".join(f"{m + ' tok/s':>16}" for m in modes) + "  speedup")
+    for length in args.lengths:
+        prefix = torch.randn(
+            args.batch_size, args.prefix_len, args.n_state, device=device, dtype=dtype
+        )
+        tokens = torch.randn(
+            args.batch_size, length, args.n_state, device=device, dtype=dtype
+        )
+        run(decoder, prefix, tokens[:, :8], "hook")  # warm-up
+        speeds = [run(decoder, prefix, tokens, mode) for mode in modes]
+        print(
+            f"{length:>6} "
+            + " ".join(f"{s:>16.1f}" for s in speeds)
+            + f"  {max(speeds[1:]) / speeds[0]:>6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -27,18 +27,16 @@ def main(args):
 
     # calculate statistics in target and nontarget classes.
     n_trials = len(scores)
-    scores_trg = []
-    scores_nontrg = []
-    for _s, _l in zip(scores, labels):
-        if _l == 1:
-            scores_trg.append(_s)
-        elif _l == 0:
-            scores_nontrg.append(_s)
-        else:
-            raise ValueError(f"{_l}, {type(_l)}")
+    scores, labels = np.asarray(scores), np.asarray(labels)
+    invalid = (labels != 1) & (labels != 0)
+    if invalid.any():
+        _l = labels[invalid][0]
+        raise ValueError(f"{_l}, {type(_l)}")
+    scores_trg = scores[labels == 1]
+    scores_nontrg = scores[labels == 0]
     trg_mean = float(np.mean(scores_trg))
     trg_std = float(np.std(scores_trg))
-    nontrg_mean = float(np.std(scores_nontrg))
+    nontrg_mean = float(np.mean(scores_nontrg))
     nontrg_std = float(np.std(scores_nontrg))
 
     # predictions, ground truth, and the false acceptance rates to calculate
@@ -53,19 +53,22 @@ class BatchBeamSearch(BeamSearch):
             hs=hs,
         )
 
-    def _batch_select(self, hyps: BatchHypothesis, ids: List[int]) -> BatchHypothesis:
+    def _batch_select(
+        self, hyps: BatchHypothesis, ids: torch.Tensor
+    ) -> BatchHypothesis:
+        ids = torch.as_tensor(ids, dtype=torch.int64)
         if self.return_hs:
-            hs = [hyps.hs[i] for i in ids]
+            hs = [hyps.hs[i] for i in ids.tolist()]
         else:
             hs = []
 
         return BatchHypothesis(
-            yseq=hyps.yseq[ids],
-            score=hyps.score[ids],
-            length=hyps.length[ids],
-            scores={k: v[ids] for k, v in hyps.scores.items()},
+            yseq=hyps.yseq[ids.to(hyps.yseq.device)],
+            score=hyps.score[ids.to(hyps.score.device)],
+            length=hyps.length[ids.to(hyps.length.device)],
+            scores={k: v[ids.to(v.device)] for k, v in hyps.scores.items()},
             states={
-                k: [self.scorers[k].select_state(v, i) for i in ids]
+                k: self.scorers[k].batch_select_state(v, ids)
                 for k, v in hyps.states.items()
             },
             hs=hs,
@@ -256,6 +259,94 @@ class BatchBeamSearch(BeamSearch):
             new_states[k] = v
         return new_states
 
+    def _batch_update(
+        self,
+        running_hyps: BatchHypothesis,
+        weighted_scores: torch.Tensor,
+        full_prev_hyp_ids: torch.Tensor,
+        full_new_token_ids: torch.Tensor,
+        scores: Dict[str, torch.Tensor],
+        states: Dict[str, Any],
+        part_prev_hyp_ids: torch.Tensor,
+        part_new_token_ids: torch.Tensor,
+        part_scores: Dict[str, torch.Tensor],
+        part_states: Dict[str, Any],
+        hs: torch.Tensor = None,
+    ) -> BatchHypothesis:
+        """Build the new hypotheses by gathering with the topk ids.
+
+        Args:
+            running_hyps (BatchHypothesis): Running hypotheses on beam
+            weighted_scores (torch.Tensor): The accumulated weighted scores
+                of shape `(n_batch, self.n_vocab)`
+            full_prev_hyp_ids (torch.Tensor): Previous hyp ids for full scorers
+            full_new_token_ids (torch.Tensor): New token ids for full scorers
+            scores (Dict[str, torch.Tensor]): Scores of `self.full_scorers`
+            states (Dict[str, Any]): Batchfied states of `self.full_scorers`
+            part_prev_hyp_ids (torch.Tensor): Previous hyp ids for partial scorers
+            part_new_token_ids (torch.Tensor): New token ids for partial scorers
+            part_scores (Dict[str, torch.Tensor]): Scores of `self.part_scorers`
+            part_states (Dict[str, Any]): Batchfied states of `self.part_scorers`
+            hs (torch.Tensor): Decoder hidden states if `self.return_hs`
+
+        Returns:
+            BatchHypothesis: The new hypotheses in the order of the given ids
+
+        """
+        n_best = len(full_prev_hyp_ids)
+        prev_ids = full_prev_hyp_ids.cpu()
+        length = running_hyps.length[prev_ids]
+        yseq = torch.cat(
+            (
+                running_hyps.yseq[full_prev_hyp_ids.to(running_hyps.yseq.device)],
+                running_hyps.yseq.new_full((n_best, 1), self.eos),
+            ),
+            dim=1,
+        )[:, : int(length.max()) + 1]
+        yseq[torch.arange(n_best, device=yseq.device), length.to(yseq.device)] = (
+            full_new_token_ids.to(yseq.device)
+        )
+
+        new_scores = dict()
+        for k, v in scores.items():
+            new_scores[k] = (
+                running_hyps.scores[k].to(v.device)[full_prev_hyp_ids]
+                + v[full_prev_hyp_ids, full_new_token_ids]
+            )
+        for k, v in part_scores.items():
+            new_scores[k] = (
+                running_hyps.scores[k].to(v.device)[part_prev_hyp_ids]
+                + v[part_prev_hyp_ids, part_new_token_ids]
+            )
+
+        if hs is not None:
+            new_hs = [
+                running_hyps.hs[i] + [hs[i].squeeze(0)] for i in prev_ids.tolist()
+            ]
+        else:
+            new_hs = []
+
+        return BatchHypothesis(
+            yseq=yseq,
+            score=weighted_scores[full_prev_hyp_ids, full_new_token_ids],
+            length=length + 1,
+            scores=new_scores,
+            states=self.merge_states(
+                {
+                    k: self.full_scorers[k].batch_select_state(v, full_prev_hyp_ids)
+                    for k, v in states.items()
+                },
+                {
+                    k: self.part_scorers[k].batch_select_state(
+                        v, part_prev_hyp_ids, part_new_token_ids
+                    )
+                    for k, v in part_states.items()
+                },
+                part_new_token_ids,
+            ),
+            hs=new_hs,
+        )
+
     def search(
         self,
         running_hyps: BatchHypothesis,
@@ -317,50 +408,23 @@ class BatchBeamSearch(BeamSearch):
             dtype=x.dtype, device=x.device
         ).unsqueeze(1)
 
-        # TODO(karita): do not use list. use batch instead
-        # see also https://github.com/espnet/espnet/pull/1402#discussion_r354561029
         # update hyps
-        best_hyps = []
-        prev_hyps = self.unbatchfy(running_hyps)
-        for (
-            full_prev_hyp_id,
-            full_new_token_id,
-            part_prev_hyp_id,
-            part_new_token_id,
-        ) in zip(*self.batch_beam(weighted_scores, part_ids)):
-            prev_hyp = prev_hyps[full_prev_hyp_id]
-            if self.return_hs:
-                new_hs = prev_hyp.hs + [hs[full_prev_hyp_id].squeeze(0)]
-            else:
-                new_hs = []
-            best_hyps.append(
-                Hypothesis(
-                    score=weighted_scores[full_prev_hyp_id, full_new_token_id],
-                    yseq=self.append_token(prev_hyp.yseq, full_new_token_id),
-                    scores=self.merge_scores(
-                        prev_hyp.scores,
-                        {k: v[full_prev_hyp_id] for k, v in scores.items()},
-                        full_new_token_id,
-                        {k: v[part_prev_hyp_id] for k, v in part_scores.items()},
-                        part_new_token_id,
-                    ),
-                    states=self.merge_states(
-                        {
-                            k: self.full_scorers[k].select_state(v, full_prev_hyp_id)
-                            for k, v in states.items()
-                        },
-                        {
-                            k: self.part_scorers[k].select_state(
-                                v, part_prev_hyp_id, part_new_token_id
-                            )
-                            for k, v in part_states.items()
-                        },
-                        part_new_token_id,
-                    ),
-                    hs=new_hs,
-                )
-            )
-        return self.batchfy(best_hyps)
+        full_prev_hyp_ids, full_new_token_ids, part_prev_hyp_ids, part_new_token_ids = (
+            self.batch_beam(weighted_scores, part_ids)
+        )
+        return self._batch_update(
+            running_hyps,
+            weighted_scores,
+            full_prev_hyp_ids,
+            full_new_token_ids,
+            scores,
+            states,
+            part_prev_hyp_ids,
+            part_new_token_ids,
+            part_scores,
+            part_states,
+            hs if self.return_hs else None,
+        )
 
     def post_process(
         self,
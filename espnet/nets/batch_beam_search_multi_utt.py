@@ -0,0 +1,395 @@
+"""Parallel beam search module across multiple utterances."""
+
+import inspect
+import logging
+from itertools import chain
+from typing import List, Union
+
+import torch
+
+from espnet.nets.batch_beam_search import (
+    BatchBeamSearch,
+    BatchHypothesis,
+    is_torch_1_9_plus,
+)
+from espnet.nets.beam_search import Hypothesis
+from espnet.nets.e2e_asr_common import end_detect
+from espnet.nets.scorer_interface import (
+    BatchPartialScorerInterface,
+    BatchScorerInterface,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _accepts_xlens(func) -> bool:
+    return "xlens" in inspect.signature(func).parameters
+
+
+def _accepts_utt_ids(func) -> bool:
+    return "utt_ids" in inspect.signature(func).parameters
+
+
+def _accepts_ylens(func) -> bool:
+    return "ylens" in inspect.signature(func).parameters
+
+
+class BatchBeamSearchMultiUtt(BatchBeamSearch):
+    """Batch beam search implementation across utterances.
+
+    The hypotheses of `B` utterances are flattened into a single
+    `(B * beam_size)` scoring batch, so that every scorer is called once per
+    output step for the whole minibatch. Each utterance owns exactly
+    `beam_size` consecutive slots. Ended hypotheses are collected per utterance
+    and their slots are disabled by setting the running score to `-inf`,
+    which keeps the fixed `(utterance, beam)` layout expected by
+    :class:`espnet.nets.ctc_prefix_score.CTCPrefixScoreTH`.
+
+    Scorers whose `batch_score` (or `batch_init_state`) accepts `xlens`
+    receive the encoder lengths so that the padded frames are ignored.
+    Scorers whose `batch_score` accepts `utt_ids` receive the utterance index
+    of each slot, so that they can share per-utterance computation,
+    e.g. the source-attention keys/values of the decoder, among the beams.
+    Scorers whose `batch_score` (or `batch_score_partial`) accepts `ylens`
+    receive the prefix lengths, so that the running hypotheses may have
+    prefixes of different lengths right-padded with `eos`,
+    e.g. when the streams of the online beam search are decoded at once.
+
+    When `xlens` is not given, this class behaves as :class:`BatchBeamSearch`.
+
+    """
+
+    def unbatchable_scorers(self) -> List[str]:
+        """Return the names of scorers that cannot be batched across utterances.
+
+        Decoders must accept the encoder lengths (`xlens`) in `batch_score`,
+        because the encoder outputs of different utterances are zero-padded.
+
+        """
+        ret = []
+        for k, d in self.full_scorers.items():
+            if not isinstance(d, BatchScorerInterface):
+                ret.append(k)
+            elif "decoder" in k and not _accepts_xlens(d.batch_score):
+                ret.append(k)
+        for k, d in self.part_scorers.items():
+            if not isinstance(d, BatchPartialScorerInterface):
+                ret.append(k)
+        return ret
+
+    @staticmethod
+    def _disable(hyps: BatchHypothesis, mask: torch.Tensor) -> BatchHypothesis:
+        # NOTE: BatchHypothesis._replace() does not work as __len__ is overridden
+        return BatchHypothesis(
+            yseq=hyps.yseq,
+            score=hyps.score.masked_fill(mask.to(hyps.score.device), float("-inf")),
+            length=hyps.length,
+            scores=hyps.scores,
+            states=hyps.states,
+            hs=hyps.hs,
+        )
+
+    def multi_utt_init_hyp(
+        self, xs: torch.Tensor, xlens: torch.Tensor
+    ) -> BatchHypothesis:
+        """Get initial hypotheses for all the utterances.
+
+        Args:
+            xs (torch.Tensor): The padded encoder output feature (B, T, D)
+            xlens (torch.Tensor): The encoder output lengths (B,)
+
+        Returns:
+            BatchHypothesis: The initial hypotheses of shape `(B * beam_size)`.
+                Only the first slot of each utterance is active.
+
+        """
+        n_batch = xs.size(0)
+        n_bb = n_batch * self.beam_size
+
+        init_states = dict()
+        for k, d in self.scorers.items():
+            if _accepts_xlens(d.batch_init_state):
+                init_states[k] = [d.batch_init_state(xs, xlens=xlens)] * n_bb
+            else:
+                init_states[k] = [
+                    d.batch_init_state(xs[b, : xlens[b]])
+                    for b in range(n_batch)
+                    for _ in range(self.beam_size)
+                ]
+
+        # NOTE (Shih-Lun): added for OpenAI Whisper ASR
+        primer = [self.sos] if self.hyp_primer is None else self.hyp_primer
+
+        score = torch.full(
+            (n_batch, self.beam_size), float("-inf"), dtype=xs.dtype, device=xs.device
+        )
+        score[:, 0] = 0.0
+        return BatchHypothesis(
+            yseq=torch.tensor(primer, device=xs.device).repeat(n_bb, 1),
+            score=score.view(-1),
+            length=torch.full((n_bb,), len(primer), dtype=torch.int64),
+            scores={
+                k: torch.zeros(n_bb, dtype=xs.dtype, device=xs.device)
+                for k in self.scorers
+            },
+            states=init_states,
+            hs=[],
+        )
+
+    def multi_utt_search(
+        self,
+        running_hyps: BatchHypothesis,
+        xs: torch.Tensor,
+        xlens: torch.Tensor,
+    ) -> BatchHypothesis:
+        """Search new tokens for the running hypotheses of all the utterances.
+
+        Args:
+            running_hyps (BatchHypothesis): Running hypotheses `(B * beam_size)`
+            xs (torch.Tensor): Encoded speech feature repeated for each slot
+                `(B * beam_size, T, D)`
+            xlens (torch.Tensor): Encoded speech lengths `(B * beam_size,)`
+
+        Returns:
+            BatchHypothesis: Best sorted hypotheses `(B * beam_size)`
+
+        """
+        n_bb = len(running_hyps)
+        n_batch = n_bb // self.beam_size
+        part_ids = None  # no pre-beam
+
+        # batch scoring
+        weighted_scores = torch.zeros(
+            n_bb, self.n_vocab, dtype=xs.dtype, device=xs.device
+        )
+        scores = dict()
+        states = dict()
+        utt_ids = torch.arange(n_batch, device=xs.device).repeat_interleave(
+            self.beam_size
+        )
+        ylens = running_hyps.length.to(xs.device)
+        for k, d in self.full_scorers.items():
+            kwargs = dict()
+            if _accepts_xlens(d.batch_score):
+                kwargs["xlens"] = xlens
+            if _accepts_utt_ids(d.batch_score):
+                kwargs["utt_ids"] = utt_ids
+            if _accepts_ylens(d.batch_score):
+                kwargs["ylens"] = ylens
+            scores[k], states[k] = d.batch_score(
+                running_hyps.yseq, running_hyps.states[k], xs, **kwargs
+            )
+            weighted_scores += self.weights[k] * scores[k]
+
+        # partial scoring
+        if self.do_pre_beam:
+            pre_beam_scores = (
+                weighted_scores
+                if self.pre_beam_score_key == "full"
+                else scores[self.pre_beam_score_key]
+            )
+            part_ids = torch.topk(pre_beam_scores, self.pre_beam_size, dim=-1)[1]
+        part_scores = dict()
+        part_states = dict()
+        for k, d in self.part_scorers.items():
+            kwargs = dict()
+            if _accepts_ylens(d.batch_score_partial):
+                kwargs["ylens"] = ylens
+            part_scores[k], part_states[k] = d.batch_score_partial(
+                running_hyps.yseq, part_ids, running_hyps.states[k], xs, **kwargs
+            )
+        for k in self.part_scorers:
+            weighted_scores += self.weights[k] * part_scores[k]
+        # add previous hyp scores (-inf for disabled slots)
+        weighted_scores += running_hyps.score.to(
+            dtype=xs.dtype, device=xs.device
+        ).unsqueeze(1)
+
+        # topk over (beam_size * n_vocab) candidates for each utterance
+        top_ids = weighted_scores.view(n_batch, -1).topk(self.beam_size, dim=-1)[1]
+        if is_torch_1_9_plus:
+            prev_ids = torch.div(top_ids, self.n_vocab, rounding_mode="trunc")
+        else:
+            prev_ids = top_ids // self.n_vocab
+        offsets = torch.arange(n_batch, device=prev_ids.device) * self.beam_size
+        prev_ids = (prev_ids + offsets.unsqueeze(1)).view(-1)
+        new_ids = (top_ids % self.n_vocab).view(-1)
+
+        return self._batch_update(
+            running_hyps,
+            weighted_scores,
+            prev_ids,
+            new_ids,
+            scores,
+            states,
+            prev_ids,
+            new_ids,
+            part_scores,
+            part_states,
+        )
+
+    def multi_utt_post_process(
+        self,
+        i: int,
+        maxlens: List[int],
+        minlens: List[int],
+        running_hyps: BatchHypothesis,
+        ended_hyps: List[List[Hypothesis]],
+    ) -> BatchHypothesis:
+        """Move ended hypotheses of each utterance to `ended_hyps`.
+
+        Args:
+            i (int): The length of hypothesis tokens.
+            maxlens (List[int]): The maximum output length of each utterance.
+            minlens (List[int]): The minimum output length of each utterance.
+            running_hyps (BatchHypothesis): The running hypotheses in beam search.
+            ended_hyps (List[List[Hypothesis]]): The ended hypotheses of each
+                utterance in beam search.
+
+        Returns:
+            BatchHypothesis: The running hypotheses, where the slots of the
+                ended hypotheses are disabled.
+
+        """
+        is_alive = running_hyps.score != float("-inf")
+        is_eos = running_hyps.yseq[:, -1] == self.eos
+        # add eos in the final loop to avoid that there are no ended hyps
+        is_last = torch.tensor(
+            [i == maxlen - 1 for maxlen in maxlens for _ in range(self.beam_size)],
+            device=is_eos.device,
+        )
+        is_ended = is_alive & (is_eos | is_last)
+        for r in torch.nonzero(is_ended, as_tuple=False).view(-1).tolist():
+            b = r // self.beam_size
+            if i < minlens[b]:
+                continue
+            hyp = self._select(running_hyps, r)
+            if i == maxlens[b] - 1:
+                logger.info(f"adding <eos> in the last position of utterance {b}")
+                hyp = hyp._replace(yseq=self.append_token(hyp.yseq, self.eos))
+            # e.g., Word LM needs to add final <eos> score
+            for k, d in chain(self.full_scorers.items(), self.part_scorers.items()):
+                s = d.final_score(hyp.states[k])
+                # NOTE: not in-place, hyp.scores[k] is a view of running_hyps
+                hyp.scores[k] = hyp.scores[k] + s
+                hyp = hyp._replace(score=hyp.score + self.weights[k] * s)
+            ended_hyps[b].append(hyp)
+        return self._disable(running_hyps, is_ended)
+
+    def forward(
+        self,
+        x: torch.Tensor,
+        maxlenratio: float = 0.0,
+        minlenratio: float = 0.0,
+        pre_x: torch.Tensor = None,
+        xlens: torch.Tensor = None,
+    ) -> Union[List[Hypothesis], List[List[Hypothesis]]]:
+        """Perform beam search.
+
+        Args:
+            x (torch.Tensor): Encoded speech feature.
+                (T, D) for a single utterance or
+                (B, T, D) zero-padded features if `xlens` is given.
+            maxlenratio (float): Input length ratio to obtain max output length.
+                If maxlenratio=0.0 (default), it uses a end-detect function
+                to automatically find maximum hypothesis lengths
+                If maxlenratio<0.0, its absolute value is interpreted
+                as a constant max output length.
+            minlenratio (float): Input length ratio to obtain min output length.
+                If minlenratio<0.0, its absolute value is interpreted
+                as a constant min output length.
+            pre_x (torch.Tensor): Encoded speech feature for sequential attn (T, D)
+                Only supported for a single utterance.
+            xlens (torch.Tensor): Lengths of `x` (B,)
+
+        Returns:
+            list[Hypothesis]: N-best decoding results if `xlens` is None,
+                otherwise the list of N-best results of each utterance.
+
+        """
+        if xlens is None:
+            return super().forward(x, maxlenratio, minlenratio, pre_x=pre_x)
+        assert pre_x is None, "sequential attention is not supported"
+        assert not self.return_hs, "return_hs is not supported"
+
+        # set length bounds of each utterance
+        n_batch = x.size(0)
+        xlens_list = xlens.tolist()
+        if maxlenratio == 0:
+            maxlens = list(xlens_list)
+        elif maxlenratio < 0:
+            maxlens = [-1 * int(maxlenratio)] * n_batch
+        else:
+            maxlens = [max(1, int(maxlenratio * xlen)) for xlen in xlens_list]
+        if minlenratio < 0:
+            minlens = [-1 * int(minlenratio)] * n_batch
+        else:
+            minlens = [int(minlenratio * xlen) for xlen in xlens_list]
+        logger.info(f"decoder input lengths: {xlens_list}")
+        logger.info(f"max output lengths: {maxlens}")
+        logger.info(f"min output lengths: {minlens}")
+
+        # main loop of prefix search
+        running_hyps = self.multi_utt_init_hyp(x, xlens)
+        xs = x.repeat_interleave(self.beam_size, dim=0)
+        xlens = xlens.to(x.device).repeat_interleave(self.beam_size, dim=0)
+        ended_hyps = [[] for _ in range(n_batch)]
+        is_finished = torch.zeros(n_batch, dtype=torch.bool)
+        for i in range(max(maxlens)):
+            logger.debug("position " + str(i))
+            best = self.multi_utt_search(running_hyps, xs, xlens)
+            running_hyps = self.multi_utt_post_process(
+                i, maxlens, minlens, best, ended_hyps
+            )
+            # end detection
+            is_alive = (running_hyps.score != float("-inf")).view(n_batch, -1)
+            for b in torch.nonzero(~is_finished, as_tuple=False).view(-1).tolist():
+                if maxlenratio == 0.0 and end_detect(
+                    [h.asdict() for h in ended_hyps[b]], i
+                ):
+                    logger.info(f"end detected at {i} for utterance {b}")
+                    is_finished[b] = True
+                elif not is_alive[b].any():
+                    logger.debug(f"no hypothesis for utterance {b}")
+                    is_finished[b] = True
+            if is_finished.all():
+                logger.info("no hypothesis. Finish decoding.")
+                break
+            running_hyps = self._disable(
+                running_hyps, is_finished.repeat_interleave(self.beam_size)
+            )
+
+        results = []
+        for b in range(n_batch):
+            if self.normalize_length:
+                nbest_hyps = sorted(
+                    ended_hyps[b],
+                    key=lambda x: x.score / (len(x.yseq) - 1),
+                    reverse=True,
+                )
+            else:
+                nbest_hyps = sorted(ended_hyps[b], key=lambda x: x.score, reverse=True)
+
+            # check the number of hypotheses reaching to eos
+            if len(nbest_hyps) == 0:
+                logger.warning(
+                    f"there is no N-best results for utterance {b}, perform "
+                    "recognition again with smaller minlenratio."
+                )
+                nbest_hyps = (
+                    []
+                    if minlenratio < 0.1
+                    else super().forward(
+                        x[b, : xlens_list[b]],
+                        maxlenratio,
+                        max(0.0, minlenratio - 0.1),
+                    )
+                )
+            elif self.token_list is not None:
+                best = nbest_hyps[0]
+                logger.info(
+                    f"best hypo of utterance {b}: "
+                    + "".join([self.token_list[x] for x in best.yseq[1:-1]])
+                )
+            results.append(nbest_hyps)
+        return results
@@ -3,22 +3,29 @@
 import logging
 from typing import Any  # noqa: H301
 from typing import Dict  # noqa: H301
+from typing import Generator  # noqa: H301
 from typing import List  # noqa: H301
+from typing import Optional  # noqa: H301
 from typing import Tuple  # noqa: H301
 
 import torch
+import torch.nn.functional as F
 
 from espnet2.asr.transducer.beam_search_transducer_streaming import (
     BeamSearchTransducerStreaming,
 )
-from espnet.nets.batch_beam_search import BatchBeamSearch  # noqa: H301
 from espnet.nets.batch_beam_search import BatchHypothesis  # noqa: H301
+from espnet.nets.batch_beam_search_multi_utt import (
+    BatchBeamSearchMultiUtt,
+    _accepts_ylens,
+)
 from espnet.nets.beam_search import Hypothesis
 from espnet.nets.beam_search_timesync_streaming import BeamSearchTimeSyncStreaming
 from espnet.nets.e2e_asr_common import end_detect
+from espnet.nets.pytorch_backend.nets_utils import pad_list
 
 
-class BatchBeamSearchOnline(BatchBeamSearch):
+class BatchBeamSearchOnline(BatchBeamSearchMultiUtt):
     """Online beam search implementation.
 
     This simulates streaming decoding.
@@ -28,8 +35,24 @@ class BatchBeamSearchOnline(BatchBeamSearch):
     This is based on Tsunoo et al, "STREAMING TRANSFORMER ASR
     WITH BLOCKWISE SYNCHRONOUS BEAM SEARCH"
     (https://arxiv.org/abs/2006.14941).
+
+    With `batch_forward()`, the blocks of multiple streams are searched at
+    once, where the search steps of the streams are scored together by
+    :meth:`BatchBeamSearchMultiUtt.multi_utt_search`.
     """
 
+    # The attributes reset for each utterance
+    _search_state_keys = (
+        "encbuffer",
+        "running_hyps",
+        "prev_hyps",
+        "ended_hyps",
+        "processed_block",
+        "process_idx",
+        "prev_output",
+        "prev_incremental",
+    )
+
     def __init__(
         self,
         *args,
@@ -59,6 +82,8 @@ class BatchBeamSearchOnline(BatchBeamSearch):
         self.time_sync = time_sync
         self.ctc = ctc
         self.hold_n = hold_n
+        # The padded encoder outputs of the streams searched at once
+        self._stream_xs = None
 
         if time_sync:
             if transducer_conf is not None:
@@ -98,6 +123,30 @@ class BatchBeamSearchOnline(BatchBeamSearch):
         self.prev_output = None
         self.prev_incremental = None
 
+    def get_search_state(self) -> Dict[str, Any]:
+        """Get the decoding state of the current stream.
+
+        The state includes the states of the scorers holding the encoded
+        features, e.g. CTCPrefixScorer. With `set_search_state()`,
+        a single instance can decode multiple streams alternately.
+
+        Returns:
+            Dict[str, Any]: The decoding state
+
+        """
+        state = {k: getattr(self, k) for k in self._search_state_keys}
+        state["scorers"] = {
+            k: d.impl for k, d in self.scorers.items() if hasattr(d, "impl")
+        }
+        return state
+
+    def set_search_state(self, state: Dict[str, Any]):
+        """Restore the decoding state got by `get_search_state()`."""
+        for k in self._search_state_keys:
+            setattr(self, k, state[k])
+        for k, impl in state["scorers"].items():
+            self.scorers[k].impl = impl
+
     def score_full(
         self,
         hyp: BatchHypothesis,
@@ -170,6 +219,238 @@ class BatchBeamSearchOnline(BatchBeamSearch):
         Returns:
             list[Hypothesis]: N-best decoding results
 
+        """
+        return self._run_steps(
+            self._forward_steps(x, maxlenratio, minlenratio, is_final)
+        )
+
+    def _run_steps(self, steps: Generator) -> Any:
+        """Run the search steps yielded by `steps` one by one."""
+        try:
+            request = next(steps)
+            while True:
+                request = steps.send(self.search(*request))
+        except StopIteration as e:
+            return e.value
+
+    def batch_forward(
+        self,
+        xs: List[torch.Tensor],
+        search_states: List[Optional[Dict[str, Any]]],
+        maxlenratio: float = 0.0,
+        minlenratio: float = 0.0,
+        is_final: Optional[List[bool]] = None,
+    ) -> Tuple[List[List[Hypothesis]], List[Dict[str, Any]]]:
+        """Perform beam search of multiple streams at once.
+
+        Each stream is searched as forward() with its own decoding state,
+        while the search steps of the streams are scored at once by
+        `multi_utt_search()`, where each stream takes `beam_size` slots.
+        If a scorer does not accept the prefix lengths (`ylens`),
+        only the streams whose running hypotheses have the same length
+        are scored together.
+        The decoding state of the current stream is kept.
+
+        Args:
+            xs (List[torch.Tensor]): Encoded speech feature of each stream (T, D)
+            search_states (List[Optional[Dict[str, Any]]]): The decoding state
+                of each stream got by `get_search_state()`, or None for a new one
+            maxlenratio (float): Input length ratio to obtain max output length.
+            minlenratio (float): Input length ratio to obtain min output length.
+            is_final (List[bool]): Whether `xs` are the last chunks of the streams
+
+        Returns:
+            Tuple[List[List[Hypothesis]], List[Dict[str, Any]]]: The N-best
+                decoding results and the next decoding state of each stream
+
+        """
+        if is_final is None:
+            is_final = [True] * len(xs)
+        own_state = self.get_search_state()
+        states = list(search_states)
+        steps = [None] * len(xs)
+        requests = [None] * len(xs)
+        rets = [None] * len(xs)
+
+        def resume(i, best):
+            self.set_search_state(states[i])
+            try:
+                requests[i] = next(steps[i]) if best is None else steps[i].send(best)
+            except StopIteration as e:
+                requests[i] = None
+                rets[i] = e.value
+            states[i] = self.get_search_state()
+
+        try:
+            for i, x in enumerate(xs):
+                if states[i] is None:
+                    self.reset()
+                    states[i] = self.get_search_state()
+                steps[i] = self._forward_steps(x, maxlenratio, minlenratio, is_final[i])
+                resume(i, None)
+            while any(request is not None for request in requests):
+                pending = [
+                    i for i, request in enumerate(requests) if request is not None
+                ]
+                bests = self._batch_search_streams(
+                    [requests[i] for i in pending], [states[i] for i in pending]
+                )
+                for i, best in zip(pending, bests):
+                    resume(i, best)
+        finally:
+            self.set_search_state(own_state)
+        return rets, states
+
+    def _batch_search_streams(
+        self,
+        requests: List[Tuple[BatchHypothesis, torch.Tensor]],
+        search_states: List[Dict[str, Any]],
+    ) -> List[BatchHypothesis]:
+        """Search new tokens for the running hypotheses of multiple streams."""
+        batchable = (
+            not self.return_hs
+            and self.decoder_text_length_limit == 0
+            and len(self.unbatchable_scorers()) == 0
+            and all(
+                hasattr(d, "batch_streams")
+                for d in self.scorers.values()
+                if hasattr(d, "impl")
+            )
+        )
+        # the streams with prefixes of different lengths are searched at once
+        # if all the scorers accept the prefix lengths
+        mixable = all(
+            _accepts_ylens(d.batch_score) for d in self.full_scorers.values()
+        ) and all(
+            _accepts_ylens(d.batch_score_partial) for d in self.part_scorers.values()
+        )
+        groups = dict()
+        for j, (running_hyps, x) in enumerate(requests):
+            if batchable and 0 < len(running_hyps) <= self.beam_size:
+                key = 0 if mixable else running_hyps.yseq.size(1)
+                groups.setdefault(key, []).append(j)
+            else:
+                groups[-1 - j] = [j]
+
+        bests = [None] * len(requests)
+        for group in groups.values():
+            if len(group) == 1:
+                self.set_search_state(search_states[group[0]])
+                bests[group[0]] = self.search(*requests[group[0]])
+                continue
+            group_bests = self._multi_stream_search(
+                [requests[j] for j in group], [search_states[j] for j in group]
+            )
+            for j, best in zip(group, group_bests):
+                bests[j] = best
+        return bests
+
+    def _multi_stream_search(
+        self,
+        requests: List[Tuple[BatchHypothesis, torch.Tensor]],
+        search_states: List[Dict[str, Any]],
+    ) -> List[BatchHypothesis]:
+        """Search new tokens for the running hypotheses of multiple streams.
+
+        The hypotheses of each stream are padded to `beam_size` slots
+        with disabled ones, so that `multi_utt_search()` scores them at once.
+        The prefixes of different lengths are right-padded with `eos`.
+
+        """
+        running = [
+            self._batch_select(
+                hyps, list(range(len(hyps))) + [0] * (self.beam_size - len(hyps))
+            )
+            for hyps, _ in requests
+        ]
+        maxlen = max(hyps.yseq.size(1) for hyps in running)
+        running_hyps = self._disable(
+            BatchHypothesis(
+                yseq=torch.cat(
+                    [
+                        F.pad(
+                            hyps.yseq, (0, maxlen - hyps.yseq.size(1)), value=self.eos
+                        )
+                        for hyps in running
+                    ]
+                ),
+                score=torch.cat([hyps.score for hyps in running]),
+                length=torch.cat([hyps.length for hyps in running]),
+                scores={
+                    k: torch.cat([hyps.scores[k] for hyps in running])
+                    for k in running[0].scores
+                },
+                states={
+                    k: [s for hyps in running for s in hyps.states[k]]
+                    for k in running[0].states
+                },
+                hs=[],
+            ),
+            torch.tensor(
+                [i >= len(hyps) for hyps, _ in requests for i in range(self.beam_size)]
+            ),
+        )
+        for k, d in self.scorers.items():
+            if hasattr(d, "impl"):
+                running_hyps.states[k] = d.batch_streams(
+                    [state["scorers"][k] for state in search_states],
+                    running_hyps.states[k],
+                )
+
+        # the encoder output of each stream is unchanged in a block
+        hs = [x for _, x in requests]
+        if (
+            self._stream_xs is None
+            or len(self._stream_xs[0]) != len(hs)
+            or any(a is not b for a, b in zip(self._stream_xs[0], hs))
+        ):
+            xlens = torch.tensor([len(x) for x in hs], device=hs[0].device)
+            self._stream_xs = (
+                hs,
+                pad_list(hs, 0.0).repeat_interleave(self.beam_size, dim=0),
+                xlens.repeat_interleave(self.beam_size),
+            )
+        best = self.multi_utt_search(running_hyps, *self._stream_xs[1:])
+
+        bests = []
+        is_alive = (best.score != float("-inf")).cpu()
+        for j, state in enumerate(search_states):
+            ids = [
+                i
+                for i in range(j * self.beam_size, (j + 1) * self.beam_size)
+                if is_alive[i]
+            ]
+            stream_best = self._batch_select(best, ids)
+            if len(ids) > 0:
+                # NOTE: BatchHypothesis._replace() does not work
+                stream_best = BatchHypothesis(
+                    yseq=stream_best.yseq[:, : int(stream_best.length.max())],
+                    score=stream_best.score,
+                    length=stream_best.length,
+                    scores=stream_best.scores,
+                    states=stream_best.states,
+                    hs=stream_best.hs,
+                )
+            for k, d in self.scorers.items():
+                if hasattr(d, "impl"):
+                    stream_best.states[k] = d.select_stream_state(
+                        stream_best.states[k], state["scorers"][k]
+                    )
+            bests.append(stream_best)
+        return bests
+
+    def _forward_steps(
+        self,
+        x: torch.Tensor,
+        maxlenratio: float,
+        minlenratio: float,
+        is_final: bool,
+    ) -> Generator[Tuple[BatchHypothesis, torch.Tensor], BatchHypothesis, Any]:
+        """Perform beam search as forward().
+
+        This yields `(running_hyps, x)` for each search step,
+        and is sent the best hypotheses searched from them.
+
         """
         if self.encbuffer is None or self.block_size == 0:
             self.encbuffer = x
@@ -227,7 +508,7 @@ class BatchBeamSearchOnline(BatchBeamSearch):
                     h, block_is_final, maxlen, maxlenratio
                 )
             else:
-                ret = self.process_one_block(
+                ret = yield from self._process_one_block_steps(
                     h, block_is_final, maxlen - self.process_idx, maxlenratio
                 )
             logging.debug("Finished processing chunk: %d", self.processed_block)
@@ -341,7 +622,7 @@ class BatchBeamSearchOnline(BatchBeamSearch):
                         h, block_is_final, maxlen, maxlenratio
                     )
                 else:
-                    ret = self.process_one_block(
+                    ret = yield from self._process_one_block_steps(
                         h, block_is_final, maxlen, minlen, maxlenratio
                     )
                 logging.debug("Finished processing block: %d", self.processed_block)
@@ -390,11 +671,17 @@ class BatchBeamSearchOnline(BatchBeamSearch):
 
     def process_one_block(self, h, is_final, maxlen, minlen, maxlenratio):
         """Recognize one block."""
+        return self._run_steps(
+            self._process_one_block_steps(h, is_final, maxlen, minlen, maxlenratio)
+        )
+
+    def _process_one_block_steps(self, h, is_final, maxlen, minlen, maxlenratio):
+        """Recognize one block, yielding each search step as _forward_steps()."""
         # extend states for ctc
         self.extend(h, self.running_hyps)
         while self.process_idx < maxlen:
             logging.debug("position " + str(self.process_idx))
-            best = self.search(self.running_hyps, h)
+            best = yield self.running_hyps, h
 
             if self.process_idx == maxlen - 1:
                 # end decoding
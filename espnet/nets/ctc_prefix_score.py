@@ -64,17 +64,28 @@ class CTCPrefixScoreTH(object):
         self.idx_b = torch.arange(self.batch, device=self.device)
         self.idx_bo = (self.idx_b * self.odim).unsqueeze(1)
 
-    def __call__(self, y, state, scoring_ids=None, att_w=None):
+    def __call__(self, y, state, scoring_ids=None, att_w=None, ylens=None):
         """Compute CTC prefix scores for next labels
 
         :param list y: prefix label sequences
         :param tuple state: previous CTC state
         :param torch.Tensor pre_scores: scores for pre-selection of hypotheses (BW, O)
         :param torch.Tensor att_w: attention weights to decide CTC window
+        :param torch.Tensor ylens: lengths of the right-padded prefixes (BW,)
+            if they have different lengths (not supported with att_w)
         :return new_state, ctc_local_scores (BW, O)
         """
-        output_length = len(y[0]) - 1  # ignore sos
-        last_ids = [yi[-1] for yi in y]  # last output label ids
+        if ylens is None:
+            output_length = len(y[0]) - 1  # ignore sos
+            last_ids = [yi[-1] for yi in y]  # last output label ids
+        else:
+            assert att_w is None, "CTC windowing is not supported with ylens"
+            output_lengths = ylens.to(self.device) - 1
+            output_length = int(output_lengths.min())
+            last_ids = [yi[ylen - 1] for yi, ylen in zip(y, ylens.tolist())]
+            # the first frame to compute the forward probabilities of each prefix
+            row_starts = output_lengths.clamp(min=1)
+            max_start = int(row_starts.max())
         n_bh = len(last_ids)  # batch * hyps
         n_hyps = n_bh // self.batch  # assuming each utterance has the same # of hyps
         self.scoring_num = scoring_ids.size(-1) if scoring_ids is not None else 0
@@ -125,7 +136,9 @@ class CTCPrefixScoreTH(object):
             dtype=self.dtype,
             device=self.device,
         )
-        if output_length == 0:
+        if ylens is not None:
+            r[0, 0] = torch.where((output_lengths == 0).unsqueeze(1), x_[0, 0], r[0, 0])
+        elif output_length == 0:
             r[0, 0] = x_[0, 0]
 
         r_sum = torch.logsumexp(r_prev, 1)
@@ -158,22 +171,33 @@ class CTCPrefixScoreTH(object):
                 2, 2, n_bh, snum
             )
             r[t] = torch.logsumexp(rr, 1) + x_[:, t]
+            if ylens is not None and t < max_start:
+                # the prefix cannot be emitted until its first frame
+                r[t].masked_fill_((row_starts > t).view(1, -1, 1), self.logzero)
 
         # compute log prefix probabilities log(psi)
         log_phi_x = torch.cat((log_phi[0].unsqueeze(0), log_phi[:-1]), dim=0) + x_[0]
+        if ylens is not None:
+            frame_ids = torch.arange(self.input_length, device=self.device)
+            log_phi_x = log_phi_x.masked_fill(
+                frame_ids.view(-1, 1, 1) < row_starts.view(1, -1, 1), self.logzero
+            )
+            r_start = r[row_starts - 1, 0, torch.arange(n_bh, device=self.device)]
+        else:
+            r_start = r[start - 1, 0]
         if scoring_ids is not None:
             log_psi = torch.full(
                 (n_bh, self.odim), self.logzero, dtype=self.dtype, device=self.device
             )
             log_psi_ = torch.logsumexp(
-                torch.cat((log_phi_x[start:end], r[start - 1, 0].unsqueeze(0)), dim=0),
+                torch.cat((log_phi_x[start:end], r_start.unsqueeze(0)), dim=0),
                 dim=0,
             )
             for si in range(n_bh):
                 log_psi[si, scoring_ids[si]] = log_psi_[si]
         else:
             log_psi = torch.logsumexp(
-                torch.cat((log_phi_x[start:end], r[start - 1, 0].unsqueeze(0)), dim=0),
+                torch.cat((log_phi_x[start:end], r_start.unsqueeze(0)), dim=0),
                 dim=0,
             )
 
@@ -48,20 +48,40 @@ class LengthRegulator(torch.nn.Module):
         Returns:
             Tensor: replicated input tensor based on durations (B, T*, D).
 
+        """
+        ds = self.scale_durations(ds, alpha)
+        repeat = [torch.repeat_interleave(x, d, dim=0) for x, d in zip(xs, ds)]
+        return pad_list(repeat, self.pad_value)
+
+    def scale_durations(self, ds, alpha=1.0, masks=None):
+        """Scale the durations to the numbers of frames to be replicated.
+
+        Args:
+            ds (LongTensor): Batch of durations of each frame (B, T).
+            alpha (float, optional): Alpha value to control speed of speech.
+            masks (BoolTensor, optional): Batch of masks indicating padded part
+                (B, T), which is kept 0 when filling all 0 sequences.
+
+        Returns:
+            LongTensor: Batch of scaled durations (B, T).
+
         """
         if alpha != 1.0:
             assert alpha > 0
             ds = torch.round(ds.float() * alpha).long()
 
-        if ds.sum() == 0:
+        all_zeros = ds.sum(dim=1).eq(0)
+        if all_zeros.any():
             logging.warning(
                 "predicted durations includes all 0 sequences. "
                 "fill the first element with 1."
             )
             # NOTE(kan-bayashi): This case must not be happened in teacher forcing.
             #   It will be happened in inference with a bad duration predictor.
-            #   So we do not need to care the padded sequence case here.
-            ds[ds.sum(dim=1).eq(0)] = 1
+            #   The padded part is kept 0 if the masks are given for batch inference.
+            fill_masks = all_zeros.unsqueeze(1).expand_as(ds)
+            if masks is not None:
+                fill_masks = fill_masks & ~masks
+            ds[fill_masks] = 1
 
-        repeat = [torch.repeat_interleave(x, d, dim=0) for x, d in zip(xs, ds)]
-        return pad_list(repeat, self.pad_value)
+        return ds
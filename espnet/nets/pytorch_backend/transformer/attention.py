@@ -238,6 +238,65 @@ class MultiHeadedAttention(nn.Module):
         scores = torch.matmul(q, k.transpose(-2, -1)) / math.sqrt(self.d_k)
         return self.forward_attention(v, scores, mask)
 
+    def forward_kv(self, key, value):
+        """Transform key and value to be cached for incremental decoding.
+
+        Args:
+            key (torch.Tensor): Key tensor (#batch, time2, size).
+            value (torch.Tensor): Value tensor (#batch, time2, size).
+
+        Returns:
+            torch.Tensor: Transformed key tensor (#batch, n_head, time2, d_k).
+            torch.Tensor: Transformed value tensor (#batch, n_head, time2, d_k).
+
+        """
+        n_batch = key.size(0)
+        k = self.linear_k(key).view(n_batch, -1, self.h, self.d_k).transpose(1, 2)
+        v = self.linear_v(value).view(n_batch, -1, self.h, self.d_k).transpose(1, 2)
+        return self.k_norm(k), v
+
+    def forward_cached(self, query, k, v, mask):
+        """Compute scaled dot product attention with transformed key and value.
+
+        The key and value may have fewer rows than the query, e.g. when they are
+        shared by the hypotheses of an utterance in beam search. Then the query
+        rows are split into ``k.size(0)`` groups of consecutive rows, and each
+        group attends its own key and value without expanding them.
+
+        Args:
+            query (torch.Tensor): Query tensor (#batch, time1, size).
+            k (torch.Tensor): Transformed key tensor (#kv_batch, n_head, time2, d_k).
+            v (torch.Tensor): Transformed value tensor
+                (#kv_batch, n_head, time2, d_k).
+            mask (torch.Tensor): Mask tensor (#batch, 1, time2) or
+                (#batch, time1, time2).
+
+        Returns:
+            torch.Tensor: Output tensor (#batch, time1, d_model).
+
+        """
+        n_batch = query.size(0)
+        q = self.linear_q(query).view(n_batch, -1, self.h, self.d_k).transpose(1, 2)
+        q = self.q_norm(q)
+        n_kv = k.size(0)
+        if n_kv == n_batch:
+            scores = torch.matmul(q, k.transpose(-2, -1)) / math.sqrt(self.d_k)
+            return self.forward_attention(v, scores, mask)
+
+        assert n_batch % n_kv == 0, (n_batch, n_kv)
+        n_group, time1 = n_batch // n_kv, q.size(2)
+        # (#kv_batch, n_head, n_group * time1, d_k)
+        q = (
+            q.view(n_kv, n_group, self.h, time1, self.d_k)
+            .transpose(1, 2)
+            .reshape(n_kv, self.h, n_group * time1, self.d_k)
+        )
+        if mask is not None and mask.size(0) != 1:
+            assert mask.size(1) == 1, "the mask must be shared by time1"
+            mask = mask[::n_group]
+        scores = torch.matmul(q, k.transpose(-2, -1)) / math.sqrt(self.d_k)
+        return self.forward_attention(v, scores, mask).view(n_batch, time1, -1)
+
 
 class LegacyRelPositionMultiHeadedAttention(MultiHeadedAttention):
     """Multi-Head Attention layer with relative position encoding (old version).
@@ -178,6 +178,84 @@ class DecoderLayer(nn.Module):
             return x, tgt_mask, memory, memory_mask, None, pre_memory, pre_memory_mask
         return x, tgt_mask, memory, memory_mask
 
+    def forward_kv_cache(
+        self, tgt, tgt_mask, memory, memory_mask, cache=None, memory_cache=None
+    ):
+        """Compute decoded features of new positions with key/value caches.
+
+        Unlike `forward`, which caches the layer outputs and re-projects the keys
+        and values of the whole prefix at every step, this method only projects
+        the new positions and appends them to the cached self-attention keys and
+        values. The source-attention keys and values are projected once and
+        reused as long as `memory_cache` is given.
+
+        Args:
+            tgt (torch.Tensor): Input tensor of new positions (#batch, L, size).
+            tgt_mask (torch.Tensor): Mask for the new positions
+                (#batch, L, maxlen_out) or None to attend the whole prefix.
+            memory (torch.Tensor): Encoded memory, float32 (#batch, maxlen_in, size).
+            memory_mask (torch.Tensor): Encoded memory mask (#batch, 1, maxlen_in).
+            cache (Tuple[torch.Tensor, torch.Tensor]): Self-attention key and value
+                of the previous positions (#batch, n_head, maxlen_out - L, d_k).
+            memory_cache (Tuple[torch.Tensor, torch.Tensor]): Source-attention key
+                and value (#batch / n_group, n_head, maxlen_in, d_k), where each
+                group of n_group consecutive rows of tgt shares a key and value.
+
+        Returns:
+            torch.Tensor: Output tensor (#batch, L, size).
+            Tuple[torch.Tensor, torch.Tensor]: Self-attention key and value
+                (#batch, n_head, maxlen_out, d_k).
+            Tuple[torch.Tensor, torch.Tensor]: Source-attention key and value.
+
+        """
+        assert self.sequential_attn is None, "sequential_attn is not supported"
+        residual = tgt
+        if self.normalize_before:
+            tgt = self.norm1(tgt)
+
+        k, v = self.self_attn.forward_kv(tgt, tgt)
+        if cache is not None:
+            k = torch.cat([cache[0], k], dim=2)
+            v = torch.cat([cache[1], v], dim=2)
+        if self.concat_after:
+            tgt_concat = torch.cat(
+                (tgt, self.self_attn.forward_cached(tgt, k, v, tgt_mask)), dim=-1
+            )
+            x = residual + self.concat_linear1(tgt_concat)
+        else:
+            x = residual + self.dropout(
+                self.self_attn.forward_cached(tgt, k, v, tgt_mask)
+            )
+        if not self.normalize_before:
+            x = self.norm1(x)
+
+        if memory_cache is None:
+            memory_cache = self.src_attn.forward_kv(memory, memory)
+        mk, mv = memory_cache
+        residual = x
+        if self.normalize_before:
+            x = self.norm2(x)
+        if self.concat_after:
+            x_concat = torch.cat(
+                (x, self.src_attn.forward_cached(x, mk, mv, memory_mask)), dim=-1
+            )
+            x = residual + self.concat_linear2(x_concat)
+        else:
+            x = residual + self.dropout(
+                self.src_attn.forward_cached(x, mk, mv, memory_mask)
+            )
+        if not self.normalize_before:
+            x = self.norm2(x)
+
+        residual = x
+        if self.normalize_before:
+            x = self.norm3(x)
+        x = residual + self.dropout(self.feed_forward(x))
+        if not self.normalize_before:
+            x = self.norm3(x)
+
+        return x, (k, v), memory_cache
+
     def forward_partially_AR(
         self, tgt, tgt_mask, tgt_lengths, memory, memory_mask, cache=None
     ):
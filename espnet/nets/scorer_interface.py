@@ -125,6 +125,33 @@ class BatchScorerInterface(ScorerInterface):
         scores = torch.cat(scores, 0).view(ys.shape[0], -1)
         return scores, outstates
 
+    def batch_select_state(
+        self, states: Any, ids: torch.Tensor, new_ids: torch.Tensor = None
+    ) -> List[Any]:
+        """Select states of many hypotheses at once in the batch beam search.
+
+        The default implementation calls `select_state` for each index.
+        Scorers keeping tensor states should override it with a vectorized gather.
+
+        Args:
+            states: Batchfied scorer states returned by `batch_score`
+                or `batch_score_partial`
+            ids (torch.Tensor): torch.int64 indices of the source hypotheses
+                to select (n_select,)
+            new_ids (torch.Tensor): torch.int64 new label indices (n_select,)
+                to select the states if necessary
+
+        Returns:
+            List[Any]: The selected state list of length `n_select`
+
+        """
+        if new_ids is None:
+            return [self.select_state(states, i) for i in ids.tolist()]
+        return [
+            self.select_state(states, i, j)
+            for i, j in zip(ids.tolist(), new_ids.tolist())
+        ]
+
 
 class PartialScorerInterface(ScorerInterface):
     """Partial scorer interface for beam search.
@@ -22,6 +22,8 @@ class CTCPrefixScorer(BatchPartialScorerInterface):
         self.ctc = ctc
         self.eos = eos
         self.impl = None
+        # The streams merged by batch_streams() and the merged implementation
+        self._streams = None
 
     def init_state(self, x: torch.Tensor):
         """Get an initial state for decoding.
@@ -62,6 +64,28 @@ class CTCPrefixScorer(BatchPartialScorerInterface):
                     return r[:, :, i, new_id], s, f_min, f_max
         return None if state is None else state[i]
 
+    def batch_select_state(self, states, ids, new_ids=None):
+        """Select states of many hypotheses at once in the batch beam search.
+
+        Args:
+            states: Decoder states for prefix tokens
+            ids (torch.Tensor): Indices to select states in the main beam search
+            new_ids (torch.Tensor): New label ids to select states if necessary
+
+        Returns:
+            list: pruned states
+
+        """
+        if type(states) is tuple and len(states) == 5:  # for CTCPrefixScoreTH
+            r, log_psi, f_min, f_max, scoring_idmap = states
+            ids = ids.to(log_psi.device)
+            new_ids = new_ids.to(log_psi.device)
+            r_ids = new_ids if scoring_idmap is None else scoring_idmap[ids, new_ids]
+            r_sel = r[:, :, ids, r_ids].unbind(2)
+            s_sel = log_psi[ids, new_ids].unsqueeze(1).expand(-1, log_psi.size(1))
+            return [(ri, si, f_min, f_max) for ri, si in zip(r_sel, s_sel.unbind(0))]
+        return super().batch_select_state(states, ids, new_ids)
+
     def score_partial(self, y, ids, state, x):
         """Score new token.
 
@@ -84,21 +108,26 @@ class CTCPrefixScorer(BatchPartialScorerInterface):
         )
         return tscore, (presub_score, new_st)
 
-    def batch_init_state(self, x: torch.Tensor):
+    def batch_init_state(self, x: torch.Tensor, xlens: torch.Tensor = None):
         """Get an initial state for decoding.
 
         Args:
-            x (torch.Tensor): The encoded feature tensor
+            x (torch.Tensor): The encoded feature tensor (T, D),
+                or the padded encoded feature tensors (B, T, D) if `xlens` is given
+            xlens (torch.Tensor): The lengths of the encoded features (B,)
 
         Returns: initial state
 
         """
-        logp = self.ctc.log_softmax(x.unsqueeze(0))  # assuming batch_size = 1
-        xlen = torch.tensor([logp.size(1)])
-        self.impl = CTCPrefixScoreTH(logp, xlen, 0, self.eos)
+        if xlens is None:
+            logp = self.ctc.log_softmax(x.unsqueeze(0))  # assuming batch_size = 1
+            xlens = torch.tensor([logp.size(1)])
+        else:
+            logp = self.ctc.log_softmax(x)
+        self.impl = CTCPrefixScoreTH(logp, xlens, 0, self.eos)
         return None
 
-    def batch_score_partial(self, y, ids, state, x):
+    def batch_score_partial(self, y, ids, state, x, ylens=None):
         """Score new token.
 
         Args:
@@ -106,6 +135,8 @@ class CTCPrefixScorer(BatchPartialScorerInterface):
             ids (torch.Tensor): torch.int64 next token to score
             state: decoder state for prefix tokens
             x (torch.Tensor): 2D encoder feature that generates ys
+            ylens (torch.Tensor): The lengths of y if the prefixes have
+                different lengths, where y is right-padded
 
         Returns:
             tuple[torch.Tensor, Any]:
@@ -113,6 +144,8 @@ class CTCPrefixScorer(BatchPartialScorerInterface):
                 and next state for ys
 
         """
+        if any(s is None for s in state) and any(s is not None for s in state):
+            state = self._fill_initial_states(state)
         batch_state = (
             (
                 torch.stack([s[0] for s in state], dim=2),
@@ -123,7 +156,39 @@ class CTCPrefixScorer(BatchPartialScorerInterface):
             if state[0] is not None
             else None
         )
-        return self.impl(y, batch_state, ids)
+        if ylens is not None and bool((ylens == y.size(1)).all()):
+            ylens = None
+        return self.impl(y, batch_state, ids, ylens=ylens)
+
+    def _fill_initial_states(self, state):
+        """Replace the missing states with the initial states of the prefix <sos>.
+
+        The states are missing for the hypotheses of the streams
+        starting a new block, when they are scored with the other streams.
+
+        """
+        impl = self.impl
+        n_hyps = len(state) // impl.batch
+        odim = impl.odim
+        s_ref = next(s for s in state if s is not None)
+        new_state = []
+        for i, s in enumerate(state):
+            if s is None:
+                r = torch.full(
+                    (impl.input_length, 2),
+                    impl.logzero,
+                    dtype=impl.dtype,
+                    device=impl.device,
+                )
+                r[:, 1] = torch.cumsum(impl.x[0, :, i // n_hyps, impl.blank], 0)
+                s = (
+                    r,
+                    torch.zeros(odim, dtype=impl.dtype, device=impl.device),
+                    s_ref[2],
+                    s_ref[3],
+                )
+            new_state.append(s)
+        return new_state
 
     def extend_prob(self, x: torch.Tensor):
         """Extend probs for decoding.
@@ -155,3 +220,61 @@ class CTCPrefixScorer(BatchPartialScorerInterface):
             new_state.append(self.impl.extend_state(s))
 
         return new_state
+
+    def batch_streams(self, impls, state):
+        """Merge the implementations of multiple streams into one.
+
+        This enables to score the hypotheses of the streams decoded by
+        the online beam search at once, where each stream has its own
+        CTCPrefixScoreTH extended by `extend_prob()`.
+        The posteriors of the streams are padded to the longest one.
+
+        Args:
+            impls (List[CTCPrefixScoreTH]): The implementation of each stream
+            state: The states of the hypotheses of all the streams
+
+        Returns:
+            list: The states padded to the longest stream
+
+        """
+        lengths = [impl.input_length for impl in impls]
+        if (
+            self._streams is None
+            or len(self._streams[0]) != len(impls)
+            or any(a is not b for a, b in zip(self._streams[0], impls))
+            or self._streams[1] != lengths
+        ):
+            impl = impls[0]
+            logp = impl.x.new_full((len(impls), max(lengths), impl.odim), impl.logzero)
+            for b, impl in enumerate(impls):
+                logp[b, : impl.input_length] = impl.x[0, :, 0]
+            merged = CTCPrefixScoreTH(logp, lengths, impl.blank, impl.eos, impl.margin)
+            self._streams = (impls, lengths, merged)
+        self.impl = self._streams[2]
+
+        new_state = []
+        for st in state:
+            if st is not None:
+                r, s, f_min, f_max = st
+                pad = r.new_full(
+                    (self.impl.input_length - r.size(0), 2), self.impl.logzero
+                )
+                st = (torch.cat([r, pad]), s, f_min, f_max)
+            new_state.append(st)
+        return new_state
+
+    def select_stream_state(self, state, impl):
+        """Trim the states merged by `batch_streams()` to the length of a stream.
+
+        Args:
+            state: The states of the hypotheses of the stream
+            impl (CTCPrefixScoreTH): The implementation of the stream
+
+        Returns:
+            list: The states of the stream
+
+        """
+        return [
+            s if s is None else (s[0][: impl.input_length],) + tuple(s[1:])
+            for s in state
+        ]
@@ -36,7 +36,11 @@ class LengthBonus(BatchScorerInterface):
         return torch.tensor([1.0], device=x.device, dtype=x.dtype).expand(self.n), None
 
     def batch_score(
-        self, ys: torch.Tensor, states: List[Any], xs: torch.Tensor
+        self,
+        ys: torch.Tensor,
+        states: List[Any],
+        xs: torch.Tensor,
+        ylens: torch.Tensor = None,
     ) -> Tuple[torch.Tensor, List[Any]]:
         """Score new token batch.
 
@@ -45,6 +49,8 @@ class LengthBonus(BatchScorerInterface):
             states (List[Any]): Scorer states for prefix tokens.
             xs (torch.Tensor):
                 The encoder feature that generates ys (n_batch, xlen, n_feat).
+            ylens (torch.Tensor): The lengths of ys, which are not used
+                as the bonus does not depend on the prefix.
 
         Returns:
             tuple[torch.Tensor, List[Any]]: Tuple of
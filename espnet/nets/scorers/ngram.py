@@ -1,28 +1,39 @@
 """Ngram lm implement."""
 
 from abc import ABC
+from collections import OrderedDict
+from typing import Any, List, Optional, Sequence, Tuple
 
 import kenlm
 import torch
 
-from espnet.nets.scorer_interface import BatchScorerInterface, PartialScorerInterface
+from espnet.nets.scorer_interface import (
+    BatchPartialScorerInterface,
+    BatchScorerInterface,
+)
 
 
 class Ngrambase(ABC):
     """Ngram base implemented through ScorerInterface."""
 
-    def __init__(self, ngram_model, token_list):
+    def __init__(self, ngram_model, token_list, cache_size: int = 1024):
         """Initialize Ngrambase.
 
         Args:
             ngram_model: ngram model path
             token_list: token list from dict or model.json
+            cache_size: The number of contexts to cache the token scores
 
         """
         self.chardict = [x if x != "<eos>" else "</s>" for x in token_list]
         self.charlen = len(self.chardict)
         self.lm = kenlm.LanguageModel(ngram_model)
         self.tmpkenlmstate = kenlm.State()
+        # LRU cache of the token scores for each context, i.e. kenlm.State.
+        # The tokens not scored yet are NaN.
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.logzero = -10000000000.0
 
     def init_state(self, x):
         """Initialize tmp state."""
@@ -30,6 +41,50 @@ class Ngrambase(ABC):
         self.lm.NullContextWrite(state)
         return state
 
+    def next_state(self, y, state):
+        """Get the context state including the last token of y."""
+        out_state = kenlm.State()
+        ys = self.chardict[int(y[-1])] if y.shape[0] > 1 else "<s>"
+        self.lm.BaseScore(state, ys, out_state)
+        return out_state
+
+    def token_scores(
+        self, state, next_token: Optional[Sequence[int]] = None
+    ) -> torch.Tensor:
+        """Get the scores of the tokens in the context using the cache.
+
+        Args:
+            state: context state
+            next_token: tokens to be scored. All tokens are scored if None
+
+        Returns:
+            torch.Tensor: The float32 scores with shape of `(n_vocab,)`,
+                which are NaN for the tokens not in next_token.
+
+        """
+        scores = self.cache.get(state)
+        if scores is None:
+            scores = torch.full((self.charlen,), float("nan"))
+            self.cache[state] = scores
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(state)
+
+        if next_token is None:
+            missing = scores.isnan().nonzero().squeeze(1).tolist()
+        else:
+            next_token = torch.as_tensor(next_token, dtype=torch.long)
+            missing = next_token[scores[next_token].isnan()].tolist()
+        if len(missing) > 0:
+            scores[missing] = torch.tensor(
+                [
+                    self.lm.BaseScore(state, self.chardict[j], self.tmpkenlmstate)
+                    for j in missing
+                ]
+            )
+        return scores
+
     def score_partial_(self, y, next_token, state, x):
         """Score interface for both full and partial scorer.
 
@@ -45,15 +100,45 @@ class Ngrambase(ABC):
                 and next state list for ys.
 
         """
-        out_state = kenlm.State()
-        ys = self.chardict[y[-1]] if y.shape[0] > 1 else "<s>"
-        self.lm.BaseScore(state, ys, out_state)
-        scores = torch.empty_like(next_token, dtype=x.dtype, device=y.device)
-        for i, j in enumerate(next_token):
-            scores[i] = self.lm.BaseScore(
-                out_state, self.chardict[j], self.tmpkenlmstate
+        out_state = self.next_state(y, state)
+        scores = self.token_scores(out_state, next_token.tolist())[next_token]
+        return scores.to(device=y.device, dtype=x.dtype), out_state
+
+    def batch_score_partial_(
+        self,
+        ys: torch.Tensor,
+        next_tokens: Optional[torch.Tensor],
+        states: List[Any],
+        xs: torch.Tensor,
+    ) -> Tuple[torch.Tensor, List[Any]]:
+        """Batch score interface for both full and partial scorer.
+
+        Args:
+            ys (torch.Tensor): torch.int64 prefix tokens (n_batch, ylen).
+            next_tokens (torch.Tensor): torch.int64 tokens to score (n_batch, n_token)
+                or None to score all tokens.
+            states (List[Any]): Scorer states for prefix tokens.
+            xs (torch.Tensor):
+                The encoder feature that generates ys (n_batch, xlen, n_feat).
+
+        Returns:
+            tuple[torch.Tensor, List[Any]]: Tuple of
+                batchfied scores for next token with shape of `(n_batch, n_vocab)`
+                and next state list for ys.
+                The scores of the tokens not in next_tokens are logzero.
+
+        """
+        out_states = [self.next_state(y, state) for y, state in zip(ys, states)]
+        ids = [None] * len(ys) if next_tokens is None else next_tokens.tolist()
+        scores = torch.stack(
+            [self.token_scores(s, i) for s, i in zip(out_states, ids)]
+        ).to(device=xs.device, dtype=xs.dtype)
+        if next_tokens is not None:
+            next_tokens = next_tokens.to(xs.device)
+            scores = torch.full_like(scores, self.logzero).scatter_(
+                1, next_tokens, scores.gather(1, next_tokens)
             )
-        return scores, out_state
+        return scores, out_states
 
 
 class NgramFullScorer(Ngrambase, BatchScorerInterface):
@@ -75,8 +160,27 @@ class NgramFullScorer(Ngrambase, BatchScorerInterface):
         """
         return self.score_partial_(y, torch.tensor(range(self.charlen)), state, x)
 
+    def batch_score(
+        self, ys: torch.Tensor, states: List[Any], xs: torch.Tensor
+    ) -> Tuple[torch.Tensor, List[Any]]:
+        """Score new token batch.
 
-class NgramPartScorer(Ngrambase, PartialScorerInterface):
+        Args:
+            ys (torch.Tensor): torch.int64 prefix tokens (n_batch, ylen).
+            states (List[Any]): Scorer states for prefix tokens.
+            xs (torch.Tensor):
+                The encoder feature that generates ys (n_batch, xlen, n_feat).
+
+        Returns:
+            tuple[torch.Tensor, List[Any]]: Tuple of
+                batchfied scores for next token with shape of `(n_batch, n_vocab)`
+                and next state list for ys.
+
+        """
+        return self.batch_score_partial_(ys, None, states, xs)
+
+
+class NgramPartScorer(Ngrambase, BatchPartialScorerInterface):
     """Partialscorer for ngram."""
 
     def score_partial(self, y, next_token, state, x):
@@ -96,6 +200,39 @@ class NgramPartScorer(Ngrambase, PartialScorerInterface):
         """
         return self.score_partial_(y, next_token, state, x)
 
-    def select_state(self, state, i):
+    def batch_score_partial(
+        self,
+        ys: torch.Tensor,
+        next_tokens: torch.Tensor,
+        states: List[Any],
+        xs: torch.Tensor,
+    ) -> Tuple[torch.Tensor, List[Any]]:
+        """Score new token batch.
+
+        Args:
+            ys (torch.Tensor): torch.int64 prefix tokens (n_batch, ylen).
+            next_tokens (torch.Tensor): torch.int64 tokens to score (n_batch, n_token).
+            states (List[Any]): Scorer states for prefix tokens.
+            xs (torch.Tensor):
+                The encoder feature that generates ys (n_batch, xlen, n_feat).
+
+        Returns:
+            tuple[torch.Tensor, List[Any]]: Tuple of
+                batchfied scores for next token with shape of `(n_batch, n_vocab)`
+                and next state list for ys.
+
+        """
+        return self.batch_score_partial_(ys, next_tokens, states, xs)
+
+    def select_state(self, state, i, new_id=None):
         """Empty select state for scorer interface."""
+        if isinstance(state, list):
+            # The batchfied states of BatchBeamSearch
+            return state[i]
         return state
+
+    def batch_select_state(
+        self, states: List[Any], ids: torch.Tensor, new_ids: torch.Tensor = None
+    ) -> List[Any]:
+        """Select the states of the hypotheses, which don't depend on new_ids."""
+        return [states[i] for i in ids.tolist()]
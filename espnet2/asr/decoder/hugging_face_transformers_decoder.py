@@ -242,10 +242,10 @@ class HuggingFaceTransformersDecoder(AbsDecoder, BatchScorerInterface):
             ),
         }
         # TODO(brian): caching
-        model_inputs = self.***REMOVED***generate.prepare_inputs_for_generation(
+        model_inputs = self.hf_generate.prepare_inputs_for_generation(
             ys.unsqueeze(0), **model_kwargs
         )
-        outputs = self.***REMOVED***generate(
+        outputs = self.hf_generate(
             **model_inputs,
             return_dict=True,
             output_attentions=False,
@@ -268,10 +268,10 @@ class HuggingFaceTransformersDecoder(AbsDecoder, BatchScorerInterface):
         model_kwargs = {
             "encoder_outputs": ModelOutput(last_hidden_state=self.linear_in(xs)),
         }
-        model_inputs = self.***REMOVED***generate.prepare_inputs_for_generation(
+        model_inputs = self.hf_generate.prepare_inputs_for_generation(
             ys, **model_kwargs
         )
-        outputs = self.***REMOVED***generate(
+        outputs = self.hf_generate(
             **model_inputs,
             return_dict=True,
             output_attentions=False,
@@ -2,9 +2,10 @@
 #  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
 
 """Decoder definition."""
-from typing import Any, List, Sequence, Tuple
+from typing import Any, List, Optional, Sequence, Tuple
 
 import torch
+import torch.nn.functional as F
 from typeguard import typechecked
 
 from espnet2.asr.decoder.abs_decoder import AbsDecoder
@@ -215,8 +216,99 @@ class BaseTransformerDecoder(
             return (y, hidden), new_cache
         return y, new_cache
 
+    def forward_one_step_kv(
+        self,
+        tgt: torch.Tensor,
+        memory: torch.Tensor,
+        memory_mask: torch.Tensor = None,
+        *,
+        cache: List[Tuple[torch.Tensor, torch.Tensor]] = None,
+        memory_cache: List[Tuple[torch.Tensor, torch.Tensor]] = None,
+        return_hs: bool = False,
+        ylens: torch.Tensor = None,
+    ) -> Tuple[torch.Tensor, List[Any], List[Any]]:
+        """Forward one step with the per-layer key/value caches.
+
+        Args:
+            tgt: input token ids, int64 (batch, maxlen_out)
+            memory: encoded memory, float32  (batch, maxlen_in, feat)
+            memory_mask: encoded memory mask (batch, 1, maxlen_in)
+            cache: self-attention (key, value) list per `self.decoders`
+                of shape (batch, n_head, cached_len, d_k)
+            memory_cache: source-attention (key, value) list per `self.decoders`
+                of shape (n_utt, n_head, maxlen_in, d_k),
+                which is shared by each group of batch / n_utt consecutive rows
+            return_hs: dec hidden state corresponding to ys,
+                used for searchable hidden ints
+            ylens: the lengths of right-padded tgt (batch,). If given, only the last
+                token of each row is new, and the cached keys/values of the prefix
+                of each row are left-padded to the same length.
+        Returns:
+            y, cache, memory_cache: NN output value and caches per `self.decoders`.
+            y.shape` is (batch, token)
+        """
+        maxlen_out = tgt.size(1)
+        n_cached = 0 if cache is None else cache[0][0].size(2)
+        if cache is None:
+            cache = [None] * len(self.decoders)
+        if memory_cache is None:
+            memory_cache = [None] * len(self.decoders)
+        if ylens is None:
+            n_new = maxlen_out - n_cached
+            x = self.embed(tgt)[:, -n_new:]
+            tgt_mask = subsequent_mask(maxlen_out, device=tgt.device)[-n_new:]
+            tgt_mask = tgt_mask.unsqueeze(0)
+        else:
+            batch_idx = torch.arange(tgt.size(0), device=tgt.device)
+            x = self.embed(tgt)[batch_idx, ylens - 1].unsqueeze(1)
+            # mask out the left padding of the cached prefix
+            tgt_mask = torch.arange(n_cached + 1, device=tgt.device) >= (
+                n_cached + 1 - ylens.unsqueeze(1)
+            )
+            tgt_mask = tgt_mask.unsqueeze(1)
+        new_cache = []
+        new_memory_cache = []
+        for c, mc, decoder in zip(cache, memory_cache, self.decoders):
+            x, c, mc = decoder.forward_kv_cache(
+                x, tgt_mask, memory, memory_mask, cache=c, memory_cache=mc
+            )
+            new_cache.append(c)
+            new_memory_cache.append(mc)
+
+        if self.normalize_before:
+            y = self.after_norm(x[:, -1])
+        else:
+            y = x[:, -1]
+        if return_hs:
+            hidden = y
+        if self.output_layer is not None:
+            y = torch.log_softmax(self.output_layer(y), dim=-1)
+
+        if return_hs:
+            return (y, hidden), new_cache, new_memory_cache
+        return y, new_cache, new_memory_cache
+
+    def use_kv_cache(self) -> bool:
+        """Whether `score` and `batch_score` can use the key/value caches."""
+        return all(
+            isinstance(d, DecoderLayer)
+            and d.sequential_attn is None
+            and isinstance(d.self_attn, MultiHeadedAttention)
+            and isinstance(d.src_attn, MultiHeadedAttention)
+            for d in self.decoders
+        )
+
     def score(self, ys, state, x, return_hs=False):
         """Score."""
+        if self.use_kv_cache():
+            logp, states = self.batch_score(
+                ys.unsqueeze(0), [state], x.unsqueeze(0), return_hs=return_hs
+            )
+            if return_hs:
+                logp, hs = logp
+                return logp.squeeze(0), hs, states[0]
+            return logp.squeeze(0), states[0]
+
         ys_mask = subsequent_mask(len(ys), device=x.device).unsqueeze(0)
         if return_hs:
             (logp, hs), state = self.forward_one_step(
@@ -243,14 +335,33 @@ class BaseTransformerDecoder(
         states: List[Any],
         xs: torch.Tensor,
         return_hs: bool = False,
+        xlens: torch.Tensor = None,
+        utt_ids: torch.Tensor = None,
+        ylens: torch.Tensor = None,
     ) -> Tuple[torch.Tensor, List[Any]]:
         """Score new token batch.
 
+        If `use_kv_cache()` holds, the state of each hypothesis is a tuple of
+        the self-attention (key, value) list of its prefix and a tuple of
+        the source-attention (key, value) list of all the utterances,
+        the index of its utterance in the list and the length of its encoder
+        output.
+        The source-attention keys/values are projected only once per utterance
+        and shared by all the hypotheses of the utterance.
+
         Args:
             ys (torch.Tensor): torch.int64 prefix tokens (n_batch, ylen).
             states (List[Any]): Scorer states for prefix tokens.
             xs (torch.Tensor):
                 The encoder feature that generates ys (n_batch, xlen, n_feat).
+            xlens (torch.Tensor): The lengths of xs (n_batch,).
+                If given, the padded frames of xs are masked out.
+            utt_ids (torch.Tensor): The utterance index of each hypothesis
+                (n_batch,), where the rows of xs of an utterance are identical.
+                If not given, the rows of xs sharing the storage,
+                e.g. expanded from one encoder output, are one utterance.
+            ylens (torch.Tensor): The lengths of ys (n_batch,) if the prefixes
+                have different lengths, where ys is right-padded.
 
 
         Returns:
@@ -259,6 +370,38 @@ class BaseTransformerDecoder(
                 and next state list for ys.
 
         """
+        if xlens is not None:
+            xs_mask = (~make_pad_mask(xlens, maxlen=xs.size(1)))[:, None, :].to(
+                xs.device
+            )
+        else:
+            xs_mask = None
+        if ylens is not None and bool((ylens == ys.size(1)).all()):
+            ylens = None
+        if self.use_kv_cache():
+            return self._batch_score_kv(
+                ys, states, xs, xs_mask, return_hs, xlens, utt_ids, ylens
+            )
+        if ylens is not None:
+            # score the prefixes of each length separately
+            assert not return_hs, "return_hs is not supported with ylens"
+            logp = None
+            state_list = [None] * ys.size(0)
+            for ylen in ylens.unique().tolist():
+                idx = torch.nonzero(ylens == ylen, as_tuple=False).view(-1)
+                group_logp, group_states = self.batch_score(
+                    ys[idx, :ylen],
+                    [states[i] for i in idx.tolist()],
+                    xs[idx],
+                    xlens=None if xlens is None else xlens[idx],
+                )
+                if logp is None:
+                    logp = group_logp.new_zeros(ys.size(0), group_logp.size(1))
+                logp[idx] = group_logp
+                for i, state in zip(idx.tolist(), group_states):
+                    state_list[i] = state
+            return logp, state_list
+
         # merge states
         n_batch = len(ys)
         n_layers = len(self.decoders)
@@ -275,11 +418,11 @@ class BaseTransformerDecoder(
         ys_mask = subsequent_mask(ys.size(-1), device=xs.device).unsqueeze(0)
         if return_hs:
             (logp, hs), states = self.forward_one_step(
-                ys, ys_mask, xs, cache=batch_state, return_hs=return_hs
+                ys, ys_mask, xs, xs_mask, cache=batch_state, return_hs=return_hs
             )
         else:
             logp, states = self.forward_one_step(
-                ys, ys_mask, xs, cache=batch_state, return_hs=return_hs
+                ys, ys_mask, xs, xs_mask, cache=batch_state, return_hs=return_hs
             )
 
         # transpose state of [layer, batch] into [batch, layer]
@@ -288,6 +431,163 @@ class BaseTransformerDecoder(
             return (logp, hs), state_list
         return logp, state_list
 
+    def _batch_score_kv(
+        self,
+        ys: torch.Tensor,
+        states: List[Any],
+        xs: torch.Tensor,
+        xs_mask: torch.Tensor,
+        return_hs: bool,
+        xlens: torch.Tensor = None,
+        utt_ids: torch.Tensor = None,
+        ylens: torch.Tensor = None,
+    ) -> Tuple[torch.Tensor, List[Any]]:
+        n_batch = len(ys)
+        n_layers = len(self.decoders)
+        memories = [None if s is None else s[1] for s in states]
+        if ylens is not None:
+            # each hypothesis has the cache of its prefix but the last token,
+            # which is left-padded to the longest one
+            n_cached = (ylens - 1).tolist()
+            assert all(n == 0 for s, n in zip(states, n_cached) if s is None)
+            max_cached = max(n_cached)
+            ref = next(s[0] for s in states if s is not None)
+            batch_cache = []
+            for i in range(n_layers):
+                kv = []
+                for j in range(2):
+                    empty = ref[i][j].new_zeros(ref[i][j].size(0), 0, ref[i][j].size(2))
+                    kv.append(
+                        torch.stack(
+                            [
+                                F.pad(
+                                    empty if s is None else s[0][i][j],
+                                    (0, 0, max_cached - n, 0),
+                                )
+                                for s, n in zip(states, n_cached)
+                            ]
+                        )
+                    )
+                batch_cache.append(tuple(kv))
+        elif states[0] is None:
+            batch_cache = None
+        else:
+            # transpose state of [batch, layer] into [layer, batch]
+            batch_cache = [
+                tuple(torch.stack([s[0][i][j] for s in states]) for j in range(2))
+                for i in range(n_layers)
+            ]
+        lengths = xlens.tolist() if xlens is not None else [xs.size(1)] * n_batch
+        memory_cache, utt_list = self._memory_cache(memories, xs, lengths, utt_ids)
+
+        n_utt = memory_cache[0][0].size(0)
+        n_group = n_batch // n_utt
+        if n_group * n_utt == n_batch and utt_list == [
+            b // n_group for b in range(n_batch)
+        ]:
+            # the hypotheses of each utterance are consecutive,
+            # so that they attend the shared key/value without copying it
+            batch_memory_cache = memory_cache
+        else:
+            index = torch.tensor(utt_list, device=xs.device)
+            batch_memory_cache = [
+                tuple(c.index_select(0, index) for c in kv) for kv in memory_cache
+            ]
+
+        logp, cache, _ = self.forward_one_step_kv(
+            ys,
+            xs,
+            xs_mask,
+            cache=batch_cache,
+            memory_cache=batch_memory_cache,
+            return_hs=return_hs,
+            ylens=None if ylens is None else ylens.to(ys.device),
+        )
+
+        # transpose state of [layer, batch] into [batch, layer]
+        if ylens is None:
+            starts = [0] * n_batch
+        else:
+            # remove the left padding
+            starts = [max_cached - n for n in n_cached]
+        state_list = [
+            (
+                [(k[b, :, starts[b] :], v[b, :, starts[b] :]) for k, v in cache],
+                (memory_cache, utt_list[b], lengths[b]),
+            )
+            for b in range(n_batch)
+        ]
+        return logp, state_list
+
+    def _memory_cache(
+        self,
+        memories: List[Any],
+        xs: torch.Tensor,
+        lengths: List[int],
+        utt_ids: Optional[torch.Tensor],
+    ) -> Tuple[List[Tuple[torch.Tensor, torch.Tensor]], List[int]]:
+        """Get the source-attention keys/values of each utterance.
+
+        The keys/values in the states are reused as long as the length of
+        the encoder output is unchanged, and the others are projected once
+        per utterance. When the hypotheses come from different caches,
+        e.g. from different streams, their rows are gathered into a new cache,
+        which the next states share.
+
+        """
+        xlen = xs.size(1)
+        if all(m is not None and m[2] == n for m, n in zip(memories, lengths)):
+            memory_cache = memories[0][0]
+            if memory_cache[0][0].size(2) == xlen and all(
+                m[0] is memory_cache for m in memories
+            ):
+                return memory_cache, [m[1] for m in memories]
+
+        if utt_ids is None:
+            # the rows of `xs` expanded from the same encoder output share the storage
+            utt_ids = [xs[b].data_ptr() for b in range(xs.size(0))]
+        else:
+            utt_ids = utt_ids.tolist()
+        # find the cached row or the row of `xs` to project of each utterance,
+        # and number the utterances in the order of their first hypotheses
+        sources = dict()
+        keys = []
+        for b, (m, n) in enumerate(zip(memories, lengths)):
+            if m is not None and m[2] == n:
+                key = (id(m[0]), m[1])
+                sources.setdefault(key, m)
+            else:
+                key = utt_ids[b]
+                sources.setdefault(key, b)
+            keys.append(key)
+        slots = {key: i for i, key in enumerate(sources)}
+        utt_list = [slots[key] for key in keys]
+
+        new_rows = [src for src in sources.values() if isinstance(src, int)]
+        if len(new_rows) > 0:
+            memory = xs[new_rows]
+            projected = [d.src_attn.forward_kv(memory, memory) for d in self.decoders]
+            if len(new_rows) == len(sources):
+                return projected, utt_list
+
+        memory_cache = []
+        for i in range(len(self.decoders)):
+            kv = []
+            for j in range(2):
+                rows = []
+                n_new = 0
+                for src in sources.values():
+                    if isinstance(src, int):
+                        rows.append(projected[i][j][n_new])
+                        n_new += 1
+                    else:
+                        # (head, time, d_k) padded or truncated to the length of xs
+                        c = src[0][i][j][src[1], :, :xlen]
+                        rows.append(F.pad(c, (0, 0, 0, xlen - c.size(1))))
+                kv.append(torch.stack(rows))
+            memory_cache.append(tuple(kv))
+        return memory_cache, utt_list
+
     def forward_partially_AR(
         self,
         tgt: torch.Tensor,
@@ -6,12 +6,15 @@ Created on Sat Aug 21 17:27:16 2021.
 """
 
 import math
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 import torch
 from typeguard import typechecked
 
 from espnet2.asr.encoder.abs_encoder import AbsEncoder
+from espnet2.asr.encoder.contextual_block_transformer_encoder import (
+    batch_forward_infer,
+)
 from espnet.nets.pytorch_backend.conformer.contextual_block_encoder_layer import (
     ContextualBlockEncoderLayer,
 )
@@ -594,3 +597,23 @@ class ContextualBlockConformerEncoder(AbsEncoder):
             next_states,
         )
         # return ys_pad, None, next_states
+
+    def batch_forward_infer(
+        self,
+        xs_list: List[torch.Tensor],
+        prev_states: List[Optional[dict]],
+        is_final: List[bool],
+    ) -> List[Tuple[torch.Tensor, torch.Tensor, Optional[dict]]]:
+        """Apply forward_infer() to the chunks of multiple streams at once.
+
+        See espnet2.asr.encoder.contextual_block_transformer_encoder.
+        batch_forward_infer() for details.
+
+        Args:
+            xs_list: The input chunk of each stream [(1, L, D), ...]
+            prev_states: The encoder states of each stream
+            is_final: Whether the chunk is the last one of each stream
+        Returns:
+            [(output tensor (1, T, D), output length (1,), next states), ...]
+        """
+        return batch_forward_infer(self, xs_list, prev_states, is_final)
@@ -3,13 +3,13 @@
 
 """Encoder definition."""
 import math
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 import torch
 from typeguard import typechecked
 
 from espnet2.asr.encoder.abs_encoder import AbsEncoder
-from espnet.nets.pytorch_backend.nets_utils import make_pad_mask
+from espnet.nets.pytorch_backend.nets_utils import make_pad_mask, pad_list
 from espnet.nets.pytorch_backend.transformer.attention import MultiHeadedAttention
 from espnet.nets.pytorch_backend.transformer.contextual_block_encoder_layer import (
     ContextualBlockEncoderLayer,
@@ -569,3 +569,273 @@ class ContextualBlockTransformerEncoder(AbsEncoder):
             }
 
         return ys_pad, None, next_states
+
+    def batch_forward_infer(
+        self,
+        xs_list: List[torch.Tensor],
+        prev_states: List[Optional[dict]],
+        is_final: List[bool],
+    ) -> List[Tuple[torch.Tensor, torch.Tensor, Optional[dict]]]:
+        """Apply forward_infer() to the chunks of multiple streams at once.
+
+        See batch_forward_infer() for details.
+
+        Args:
+            xs_list: The input chunk of each stream [(1, L, D), ...]
+            prev_states: The encoder states of each stream
+            is_final: Whether the chunk is the last one of each stream
+        Returns:
+            [(output tensor (1, T, D), output length (1,), next states), ...]
+        """
+        return batch_forward_infer(self, xs_list, prev_states, is_final)
+
+
+def _subsampled_length(embed: Optional[torch.nn.Module], length: int) -> int:
+    if isinstance(embed, Conv2dSubsamplingWOPosEnc):
+        for k, s in zip(embed.kernels, embed.strides):
+            length = (length - k) // s + 1
+    return length
+
+
+def batch_forward_infer(
+    encoder: AbsEncoder,
+    xs_list: List[torch.Tensor],
+    prev_states: List[Optional[dict]],
+    is_final: List[bool],
+) -> List[Tuple[torch.Tensor, torch.Tensor, Optional[dict]]]:
+    """Apply forward_infer() of a contextual block encoder to multiple streams.
+
+    The chunks of the streams are subsampled as a zero-padded batch, and the
+    blocks of all the streams are stacked into `(#streams, #blocks, ...)`,
+    so that each encoder layer runs once per call. The context vectors are
+    propagated within each stream from its own states.
+    The streams waiting for more frames and the short utterances fitting in
+    a single block are processed by forward_infer() one by one.
+
+    Args:
+        encoder: ContextualBlockTransformerEncoder or
+            ContextualBlockConformerEncoder in the eval mode
+        xs_list: The input chunk of each stream [(1, L, D), ...]
+        prev_states: The encoder states of each stream
+        is_final: Whether the chunk is the last one of each stream
+    Returns:
+        [(output tensor (1, T, D), output length (1,), next states), ...]
+    """
+    rets = [None] * len(xs_list)
+    past_size = encoder.block_size - encoder.hop_size - encoder.look_ahead
+    overlap_size = encoder.block_size - encoder.hop_size
+
+    # 1. Split the buffers and find the number of blocks of each stream
+    streams = []
+    for i, (xs_pad, states, final) in enumerate(zip(xs_list, prev_states, is_final)):
+        if states is None:
+            states = {
+                "prev_addin": None,
+                "buffer_before_downsampling": None,
+                "buffer_after_downsampling": None,
+                "n_processed_blocks": 0,
+                "past_encoder_ctx": None,
+            }
+        else:
+            xs_pad = torch.cat([states["buffer_before_downsampling"], xs_pad], dim=1)
+        stream = dict(states, index=i, is_final=final)
+
+        if final:
+            stream["buffer_before_downsampling"] = None
+        else:
+            n_samples = xs_pad.size(1) // encoder.subsample - 1
+            if n_samples < 2:
+                streams.append(None)
+                continue
+            n_res_samples = xs_pad.size(1) % encoder.subsample + encoder.subsample * 2
+            stream["buffer_before_downsampling"] = xs_pad.narrow(
+                1, xs_pad.size(1) - n_res_samples, n_res_samples
+            )
+            stream["ilens_buffer"] = torch.tensor([n_res_samples], device=xs_pad.device)
+            xs_pad = xs_pad.narrow(1, 0, n_samples * encoder.subsample)
+        stream["xs"] = xs_pad
+
+        total_frame_num = _subsampled_length(encoder.embed, xs_pad.size(1))
+        if stream["buffer_after_downsampling"] is not None:
+            total_frame_num += stream["buffer_after_downsampling"].size(1)
+        if final:
+            block_num = math.ceil(
+                float(total_frame_num - past_size - encoder.look_ahead)
+                / float(encoder.hop_size)
+            )
+            if stream["n_processed_blocks"] == 0 and (
+                total_frame_num <= encoder.block_size
+            ):
+                # a short utterance
+                block_num = 0
+        elif total_frame_num <= encoder.block_size:
+            block_num = 0
+        else:
+            block_num = (total_frame_num - overlap_size) // encoder.hop_size
+        stream["total_frame_num"] = total_frame_num
+        stream["block_num"] = block_num
+        streams.append(stream if block_num > 0 else None)
+
+    for i, stream in enumerate(streams):
+        if stream is None:
+            xs_pad = xs_list[i]
+            ys_pad, _, next_states = encoder.forward_infer(
+                xs_pad,
+                xs_pad.new_full([1], xs_pad.size(1), dtype=torch.long),
+                prev_states[i],
+                is_final[i],
+            )
+            olens = torch.tensor([ys_pad.size(1)], device=ys_pad.device)
+            rets[i] = (ys_pad, olens, next_states)
+    streams = [stream for stream in streams if stream is not None]
+    if len(streams) == 0:
+        return rets
+
+    # 2. Subsample the chunks as a batch
+    xs_pad = pad_list([stream["xs"][0] for stream in streams], 0.0)
+    if isinstance(encoder.embed, Conv2dSubsamplingWOPosEnc):
+        xs_pad, _ = encoder.embed(xs_pad, None)
+    elif encoder.embed is not None:
+        xs_pad = encoder.embed(xs_pad)
+
+    # 3. Stack the blocks of all the streams
+    n_batch = len(streams)
+    max_block_num = max(stream["block_num"] for stream in streams)
+    xs_chunk = xs_pad.new_zeros(
+        n_batch, max_block_num, encoder.block_size + 2, xs_pad.size(-1)
+    )
+    for b, stream in enumerate(streams):
+        x = xs_pad[b : b + 1, : _subsampled_length(encoder.embed, stream["xs"].size(1))]
+        if stream["buffer_after_downsampling"] is not None:
+            x = torch.cat([stream["buffer_after_downsampling"], x], dim=1)
+        total_frame_num = stream["total_frame_num"]
+        block_num = stream["block_num"]
+        if stream["is_final"]:
+            stream["buffer_after_downsampling"] = None
+        else:
+            res_frame_num = x.size(1) - encoder.hop_size * block_num
+            stream["buffer_after_downsampling"] = x.narrow(
+                1, x.size(1) - res_frame_num, res_frame_num
+            )
+            x = x.narrow(1, 0, block_num * encoder.hop_size + overlap_size)
+        stream["frame_num"] = x.size(1)
+
+        prev_addin = stream["prev_addin"]
+        n_processed_blocks = stream["n_processed_blocks"]
+        for i in range(block_num):
+            cur_hop = i * encoder.hop_size
+            chunk_length = min(encoder.block_size, total_frame_num - cur_hop)
+            addin = x.narrow(1, cur_hop, chunk_length)
+            if encoder.init_average:
+                addin = addin.mean(1, keepdim=True)
+            else:
+                addin = addin.max(1, keepdim=True)
+            if encoder.ctx_pos_enc:
+                addin = encoder.pos_enc(addin, i + n_processed_blocks)
+
+            if prev_addin is None:
+                prev_addin = addin
+            xs_chunk[b : b + 1, i, 0] = prev_addin
+            xs_chunk[b : b + 1, i, -1] = addin
+
+            chunk = encoder.pos_enc(
+                x.narrow(1, cur_hop, chunk_length),
+                cur_hop + encoder.hop_size * n_processed_blocks,
+            )
+            xs_chunk[b : b + 1, i, 1 : chunk_length + 1] = chunk
+
+            prev_addin = addin
+        stream["prev_addin"] = prev_addin
+
+    # mask setup, it should be the same to that of forward_train
+    mask_online = xs_chunk.new_zeros(
+        n_batch, max_block_num, encoder.block_size + 2, encoder.block_size + 2
+    )
+    mask_online.narrow(2, 1, encoder.block_size + 1).narrow(
+        3, 0, encoder.block_size + 1
+    ).fill_(1)
+
+    # 4. Apply the layers, where the first block of a new stream takes the context
+    # of its own, and the next context of a stream is the one of its last block
+    is_new = [stream["past_encoder_ctx"] is None for stream in streams]
+    if all(is_new):
+        past_encoder_ctx = None
+    else:
+        past_encoder_ctx = torch.cat(
+            [
+                (
+                    xs_chunk.new_zeros(1, len(encoder.encoders), xs_chunk.size(-1))
+                    if new
+                    else stream["past_encoder_ctx"]
+                )
+                for stream, new in zip(streams, is_new)
+            ]
+        )
+    last_blocks = torch.tensor([stream["block_num"] - 1 for stream in streams])
+    batch_idx = torch.arange(n_batch)
+    ys_chunk, next_encoder_ctx = xs_chunk, None
+    for layer_idx, layer in enumerate(encoder.encoders):
+        ys_chunk, mask_online, _, _, next_encoder_ctx, _, _ = layer(
+            ys_chunk,
+            mask_online,
+            True,
+            past_encoder_ctx,
+            next_encoder_ctx,
+            False,
+            layer_idx,
+        )
+        if past_encoder_ctx is not None:
+            for b in [b for b, new in enumerate(is_new) if new]:
+                ys_chunk[b, 0, 0] = ys_chunk[b, 0, -1]
+        next_encoder_ctx[:, layer_idx] = ys_chunk[batch_idx, last_blocks, -1]
+
+    # remove addin
+    ys_chunk = ys_chunk.narrow(2, 1, encoder.block_size)
+    if encoder.normalize_before:
+        ys_chunk = encoder.after_norm(ys_chunk)
+
+    # 5. Assemble the outputs of each stream
+    offset = encoder.block_size - encoder.look_ahead - encoder.hop_size
+    for b, stream in enumerate(streams):
+        n_processed_blocks = stream["n_processed_blocks"]
+        block_num = stream["block_num"]
+        if stream["is_final"]:
+            if n_processed_blocks == 0:
+                y_length = stream["frame_num"]
+            else:
+                y_length = stream["frame_num"] - offset
+        else:
+            y_length = block_num * encoder.hop_size
+            if n_processed_blocks == 0:
+                y_length += offset
+        ys_pad = ys_chunk.new_zeros((1, y_length, ys_chunk.size(-1)))
+        if n_processed_blocks == 0:
+            ys_pad[:, 0:offset] = ys_chunk[b : b + 1, 0, 0:offset]
+        for i in range(block_num):
+            cur_hop = i * encoder.hop_size
+            if n_processed_blocks == 0:
+                cur_hop += offset
+            if i == block_num - 1 and stream["is_final"]:
+                chunk_length = min(
+                    encoder.block_size - offset, ys_pad.size(1) - cur_hop
+                )
+            else:
+                chunk_length = encoder.hop_size
+            ys_pad[:, cur_hop : cur_hop + chunk_length] = ys_chunk[
+                b : b + 1, i, offset : offset + chunk_length
+            ]
+
+        if stream["is_final"]:
+            next_states = None
+        else:
+            next_states = {
+                "prev_addin": stream["prev_addin"],
+                "buffer_before_downsampling": stream["buffer_before_downsampling"],
+                "ilens_buffer": stream["ilens_buffer"],
+                "buffer_after_downsampling": stream["buffer_after_downsampling"],
+                "n_processed_blocks": n_processed_blocks + block_num,
+                "past_encoder_ctx": next_encoder_ctx[b : b + 1],
+            }
+        olens = torch.tensor([y_length], device=ys_pad.device)
+        rets[stream["index"]] = (ys_pad, olens, next_states)
+    return rets
@@ -1,5 +1,5 @@
 import copy
-from typing import Optional, Tuple, Union
+from typing import Any, Dict, Optional, Tuple, Union
 
 import humanfriendly
 import numpy as np
@@ -116,6 +116,36 @@ class DefaultFrontend(AbsFrontend):
 
         return input_feats, feats_lens
 
+    def forward_streaming(
+        self,
+        input: torch.Tensor,
+        states: Optional[Dict[str, Any]] = None,
+        is_final: bool = False,
+    ) -> Tuple[torch.Tensor, torch.Tensor, Dict[str, Any]]:
+        """Extract the features of a stream incrementally.
+
+        Only the frames not emitted before are computed for each chunk,
+        which are the same as forward() of the entire stream.
+
+        Args:
+            input: The new single-channel samples of the stream: (Batch, Nsamples)
+            states: The states returned by the previous chunk or None
+            is_final: Whether the chunk is the last one of the stream
+        Returns:
+            input_feats: (Batch, Frames, Dim) of the new frames
+            feats_lens: (Batch,)
+            next_states: The states for the next chunk
+
+        """
+        # The WPE/beamformer frontend passes single-channel inputs through
+        if self.stft is None:
+            raise NotImplementedError("forward_streaming requires apply_stft=True")
+        input_stft, next_states = self.stft.forward_streaming(input, states, is_final)
+        input_power = input_stft[..., 0] ** 2 + input_stft[..., 1] ** 2
+        # All the frames are valid, so no padding mask is needed
+        input_feats, feats_lens = self.logmel(input_power)
+        return input_feats, feats_lens, next_states
+
     def _compute_stft(
         self, input: torch.Tensor, input_lengths: torch.Tensor
     ) -> torch.Tensor:
@@ -53,7 +53,8 @@ class BeamSearchTransducer:
         lm: LM module.
         lm_weight: LM weight for soft fusion.
         search_type: Search algorithm to use during inference.
-        max_sym_exp: Number of maximum symbol expansions at each time step. (TSD)
+        max_sym_exp:
+            Number of maximum symbol expansions at each time step. (TSD, greedy)
         u_max: Maximum expected target sequence length. (ALSD)
         nstep: Number of maximum expansion steps at each time step. (mAES)
         expansion_gamma: Allowed logp difference for prune-by-value method. (mAES)
@@ -99,8 +100,18 @@ class BeamSearchTransducer:
         )
         self.beam_size = beam_size
 
+        self.batch_search_algorithm = None
+
         if search_type == "default":
             self.search_algorithm = self.default_beam_search
+        elif search_type == "greedy":
+            assert max_sym_exp > 0, "max_sym_exp (%d) should be greater than zero." % (
+                max_sym_exp
+            )
+            self.max_sym_exp = max_sym_exp
+
+            self.search_algorithm = self.greedy_search
+            self.batch_search_algorithm = self.batch_greedy_search
         elif search_type == "tsd":
             assert max_sym_exp > 1, "max_sym_exp (%d) should be greater than one." % (
                 max_sym_exp
@@ -115,6 +126,7 @@ class BeamSearchTransducer:
             self.u_max = u_max
 
             self.search_algorithm = self.align_length_sync_decoding
+            self.batch_search_algorithm = self.batch_align_length_sync_decoding
         elif search_type == "maes":
             assert self.vocab_size >= beam_size + expansion_beta, (
                 "beam_size (%d) + expansion_beta (%d) "
@@ -127,6 +139,7 @@ class BeamSearchTransducer:
             self.expansion_gamma = expansion_gamma
 
             self.search_algorithm = self.modified_adaptive_expansion_search
+            self.batch_search_algorithm = self.batch_modified_adaptive_expansion_search
         else:
             raise NotImplementedError(
                 "Specified search type (%s) is not supported." % search_type
@@ -175,6 +188,41 @@ class BeamSearchTransducer:
 
         return hyps
 
+    def batch_decode(
+        self,
+        enc_out: torch.Tensor,
+        enc_out_lens: torch.Tensor,
+    ) -> List[List[Hypothesis]]:
+        """Perform beam search on a batch of utterances.
+
+        The utterances are decoded in lockstep if the search algorithm has a batched
+        implementation (greedy, ALSD and mAES), else one by one.
+
+        Args:
+            enc_out: Encoder output sequences. (B, T, D_enc)
+            enc_out_lens: Encoder output sequences lengths. (B,)
+
+        Returns:
+            batch_nbest_hyps: N-best decoding results for each utterance.
+
+        """
+        self.decoder.set_device(enc_out.device)
+        self.reset_cache()
+
+        if self.batch_search_algorithm is not None:
+            batch_hyps = self.batch_search_algorithm(enc_out, enc_out_lens)
+        else:
+            batch_hyps = []
+
+            for enc_out_b, enc_out_len in zip(enc_out, enc_out_lens.tolist()):
+                batch_hyps.append(self.search_algorithm(enc_out_b[:enc_out_len]))
+
+                self.reset_cache()
+
+        self.reset_cache()
+
+        return [self.sort_nbest(hyps) for hyps in batch_hyps]
+
     def reset_cache(self) -> None:
         """Reset cache for streaming decoding."""
         self.decoder.score_cache = {}
@@ -277,6 +325,131 @@ class BeamSearchTransducer:
             device=self.decoder.device,
         )
 
+    def init_batch_hyps(self, batch_size: int) -> List[ExtendedHypothesis]:
+        """Create the initial hypothesis of each utterance in a batch.
+
+        Args:
+            batch_size: Number of utterances.
+
+        Returns:
+            hyps: Initial hypotheses with their decoder outputs (and LM scores).
+
+        """
+        hyps = [
+            ExtendedHypothesis(
+                yseq=[0],
+                score=0.0,
+                dec_state=self.decoder.init_state(1),
+            )
+            for _ in range(batch_size)
+        ]
+
+        self.update_hyps(hyps)
+
+        return hyps
+
+    def update_hyps(self, hyps: List[ExtendedHypothesis]) -> None:
+        """Compute in-place the decoder outputs (and LM scores) of the last labels.
+
+        Args:
+            hyps: Hypotheses.
+
+        """
+        beam_dec_out, beam_state = self.decoder.batch_score(hyps)
+
+        if self.use_lm:
+            beam_lm_scores, beam_lm_states = self.lm.batch_score(
+                self.create_lm_batch_inputs([h.yseq for h in hyps]),
+                [h.lm_state for h in hyps],
+                None,
+            )
+
+        for i, hyp in enumerate(hyps):
+            hyp.dec_out = beam_dec_out[i]
+            hyp.dec_state = self.decoder.select_state(beam_state, i)
+
+            if self.use_lm:
+                hyp.lm_state = beam_lm_states[i]
+                hyp.lm_score = beam_lm_scores[i]
+
+    def greedy_search(self, enc_out: torch.Tensor) -> List[ExtendedHypothesis]:
+        """Greedy search implementation.
+
+        Args:
+            enc_out: Encoder output sequence. (T, D_enc)
+
+        Returns:
+            hyp: 1-best hypothesis.
+
+        """
+        return self.batch_greedy_search(
+            enc_out.unsqueeze(0),
+            torch.tensor([enc_out.size(0)]),
+            hyps=self.search_cache,
+        )[0]
+
+    def batch_greedy_search(
+        self,
+        enc_out: torch.Tensor,
+        enc_out_lens: torch.Tensor,
+        hyps: Optional[List[ExtendedHypothesis]] = None,
+    ) -> List[List[ExtendedHypothesis]]:
+        """Batched greedy search implementation.
+
+        At each time step, the joint network is computed for all the utterances not
+        ended yet, and the decoder is only computed for the ones emitting a label.
+
+        Args:
+            enc_out: Encoder output sequences. (B, T, D_enc)
+            enc_out_lens: Encoder output sequences lengths. (B,)
+            hyps: Current hypothesis of each utterance, if any.
+
+        Returns:
+            batch_hyps: 1-best hypothesis for each utterance.
+
+        """
+        enc_out_lens = enc_out_lens.tolist()
+
+        if hyps is None:
+            hyps = self.init_batch_hyps(len(enc_out_lens))
+
+        for t in range(max(enc_out_lens, default=0)):
+            active = [
+                b for b, enc_out_len in enumerate(enc_out_lens) if t < enc_out_len
+            ]
+
+            for _ in range(self.max_sym_exp):
+                beam_logp = torch.log_softmax(
+                    self.joint_network(
+                        enc_out[active, t],
+                        torch.stack([hyps[b].dec_out for b in active]),
+                    ),
+                    dim=-1,
+                )
+
+                if self.use_lm:
+                    beam_logp[:, 1:] += self.lm_weight * torch.stack(
+                        [hyps[b].lm_score[1:] for b in active]
+                    )
+
+                best_logp, best_k = beam_logp.max(dim=-1)
+
+                emitting = []
+                for i, b in enumerate(active):
+                    hyps[b].score += float(best_logp[i])
+
+                    if int(best_k[i]) != 0:
+                        hyps[b].yseq.append(int(best_k[i]))
+                        emitting.append(b)
+
+                if not emitting:
+                    break
+
+                self.update_hyps([hyps[b] for b in emitting])
+                active = emitting
+
+        return [[hyp] for hyp in hyps]
+
     def default_beam_search(self, enc_out: torch.Tensor) -> List[Hypothesis]:
         """Beam search implementation without prefix search.
 
@@ -461,6 +634,112 @@ class BeamSearchTransducer:
 
         return B
 
+    def batch_align_length_sync_decoding(
+        self,
+        enc_out: torch.Tensor,
+        enc_out_lens: torch.Tensor,
+    ) -> List[List[Hypothesis]]:
+        """Batched alignment-length synchronous beam search implementation.
+
+        The hypotheses of all the utterances are scored together at each step, and
+        each utterance ends after its own number of steps.
+
+        Args:
+            enc_out: Encoder output sequences. (B, T, D_enc)
+            enc_out_lens: Encoder output sequences lengths. (B,)
+
+        Returns:
+            batch_nbest_hyps: N-best hypothesis for each utterance.
+
+        """
+        t_maxes = enc_out_lens.tolist()
+        u_maxes = [min(self.u_max, (t_max - 1)) for t_max in t_maxes]
+
+        batch_B = []
+        for _ in t_maxes:
+            B = [Hypothesis(yseq=[0], score=0.0, dec_state=self.decoder.init_state(1))]
+
+            if self.use_lm:
+                B[0].lm_state = self.lm.zero_state()
+
+            batch_B.append(B)
+        batch_final = [[] for _ in t_maxes]
+
+        num_steps = [t_max + u_max for t_max, u_max in zip(t_maxes, u_maxes)]
+
+        for i in range(max(num_steps, default=0)):
+            B_ = []
+            B_utt = []
+            B_t = []
+
+            for b, B in enumerate(batch_B):
+                if i >= num_steps[b]:
+                    continue
+
+                for hyp in B:
+                    t = i - (len(hyp.yseq) - 1)
+
+                    if t > (t_maxes[b] - 1):
+                        continue
+
+                    B_.append(hyp)
+                    B_utt.append(b)
+                    B_t.append(t)
+
+            if not B_:
+                continue
+
+            beam_enc_out = enc_out[B_utt, B_t]
+            beam_dec_out, beam_state = self.decoder.batch_score(B_)
+
+            beam_logp = torch.log_softmax(
+                self.joint_network(beam_enc_out, beam_dec_out),
+                dim=-1,
+            )
+            beam_topk = beam_logp[:, 1:].topk(self.beam_size, dim=-1)
+
+            if self.use_lm:
+                beam_lm_scores, beam_lm_states = self.lm.batch_score(
+                    self.create_lm_batch_inputs([b.yseq for b in B_]),
+                    [b.lm_state for b in B_],
+                    None,
+                )
+
+            batch_A = {b: [] for b in B_utt}
+
+            for j, (b, t, hyp) in enumerate(zip(B_utt, B_t, B_)):
+                new_hyp = Hypothesis(
+                    score=(hyp.score + float(beam_logp[j, 0])),
+                    yseq=hyp.yseq[:],
+                    dec_state=hyp.dec_state,
+                    lm_state=hyp.lm_state,
+                )
+
+                batch_A[b].append(new_hyp)
+
+                if t == (t_maxes[b] - 1):
+                    batch_final[b].append(new_hyp)
+
+                for logp, k in zip(beam_topk[0][j], beam_topk[1][j] + 1):
+                    new_hyp = Hypothesis(
+                        score=(hyp.score + float(logp)),
+                        yseq=(hyp.yseq[:] + [int(k)]),
+                        dec_state=self.decoder.select_state(beam_state, j),
+                        lm_state=hyp.lm_state,
+                    )
+
+                    if self.use_lm:
+                        new_hyp.score += self.lm_weight * beam_lm_scores[j, k]
+                        new_hyp.lm_state = beam_lm_states[j]
+
+                    batch_A[b].append(new_hyp)
+
+            for b, A in batch_A.items():
+                B = sorted(A, key=lambda x: x.score, reverse=True)[: self.beam_size]
+                batch_B[b] = self.recombine_hyps(B)
+
+        return [final if final else B for final, B in zip(batch_final, batch_B)]
+
     def time_sync_decoding(self, enc_out: torch.Tensor) -> List[Hypothesis]:
         """Time synchronous beam search implementation.
 
@@ -697,3 +976,109 @@ class BeamSearchTransducer:
                         )[: self.beam_size]
 
         return kept_hyps
+
+    def batch_modified_adaptive_expansion_search(
+        self,
+        enc_out: torch.Tensor,
+        enc_out_lens: torch.Tensor,
+    ) -> List[List[ExtendedHypothesis]]:
+        """Batched modified version of Adaptive Expansion Search (mAES).
+
+        The hypotheses of all the utterances are expanded together at each step, and
+        each utterance leaves the current time step once it has no more expansions.
+
+        Args:
+            enc_out: Encoder output sequences. (B, T, D_enc)
+            enc_out_lens: Encoder output sequences lengths. (B,)
+
+        Returns:
+            batch_nbest_hyps: N-best hypothesis for each utterance.
+
+        """
+        enc_out_lens = enc_out_lens.tolist()
+
+        batch_kept_hyps = [[hyp] for hyp in self.init_batch_hyps(len(enc_out_lens))]
+
+        for t in range(max(enc_out_lens, default=0)):
+            batch_hyps = {
+                b: batch_kept_hyps[b]
+                for b, enc_out_len in enumerate(enc_out_lens)
+                if t < enc_out_len
+            }
+            batch_list_b = {b: [] for b in batch_hyps}
+
+            for n in range(self.nstep):
+                hyps = [hyp for b_hyps in batch_hyps.values() for hyp in b_hyps]
+                hyps_utt = [b for b, b_hyps in batch_hyps.items() for _ in b_hyps]
+
+                beam_dec_out = torch.stack([h.dec_out for h in hyps])
+
+                beam_logp, beam_idx = torch.log_softmax(
+                    self.joint_network(enc_out[hyps_utt, t], beam_dec_out),
+                    dim=-1,
+                ).topk(self.max_candidates, dim=-1)
+
+                k_expansions = self.select_k_expansions(hyps, beam_idx, beam_logp)
+
+                batch_list_exp = {b: [] for b in batch_hyps}
+                for i, (b, hyp) in enumerate(zip(hyps_utt, hyps)):
+                    for k, new_score in k_expansions[i]:
+                        new_hyp = ExtendedHypothesis(
+                            yseq=hyp.yseq[:],
+                            score=new_score,
+                            dec_out=hyp.dec_out,
+                            dec_state=hyp.dec_state,
+                            lm_state=hyp.lm_state,
+                            lm_score=hyp.lm_score,
+                        )
+
+                        if k == 0:
+                            batch_list_b[b].append(new_hyp)
+                        else:
+                            new_hyp.yseq.append(int(k))
+
+                            if self.use_lm:
+                                new_hyp.score += self.lm_weight * float(hyp.lm_score[k])
+
+                            batch_list_exp[b].append(new_hyp)
+
+                for b, list_exp in batch_list_exp.items():
+                    if not list_exp:
+                        batch_kept_hyps[b] = sorted(
+                            self.recombine_hyps(batch_list_b[b]),
+                            key=lambda x: x.score,
+                            reverse=True,
+                        )[: self.beam_size]
+
+                batch_list_exp = {b: exp for b, exp in batch_list_exp.items() if exp}
+
+                if not batch_list_exp:
+                    break
+
+                list_exp = [hyp for exp in batch_list_exp.values() for hyp in exp]
+                self.update_hyps(list_exp)
+
+                if n < (self.nstep - 1):
+                    batch_hyps = batch_list_exp
+                else:
+                    exp_utt = [b for b, exp in batch_list_exp.items() for _ in exp]
+
+                    beam_logp = torch.log_softmax(
+                        self.joint_network(
+                            enc_out[exp_utt, t],
+                            torch.stack([h.dec_out for h in list_exp]),
+                        ),
+                        dim=-1,
+                    )
+
+                    for i, hyp in enumerate(list_exp):
+                        hyp.score += float(beam_logp[i, 0])
+
+                    for b, exp in batch_list_exp.items():
+                        batch_kept_hyps[b] = sorted(
+                            self.recombine_hyps(batch_list_b[b] + exp),
+                            key=lambda x: x.score,
+                            reverse=True,
+                        )[: self.beam_size]
+
+        return batch_kept_hyps
@@ -87,11 +87,11 @@ class ConvInput(torch.nn.Module):
 
         Args:
             x: ConvInput input sequences. (B, T, D_feats)
-            mask: Mask of input sequences. (B, 1, T)
+            mask: Mask of input sequences. (B, T)
 
         Returns:
             x: ConvInput output sequences. (B, sub(T), D_out)
-            mask: Mask of output sequences. (B, 1, sub(T))
+            mask: Mask of output sequences. (B, sub(T))
 
         """
         x = self.conv(x.unsqueeze(1))
@@ -103,6 +103,47 @@ class ConvInput(torch.nn.Module):
             x = self.output(x)
 
         if mask is not None:
-            mask = mask[:, : x.size(1)]
+            mask = self.create_new_mask(mask, x.size(1))
 
         return x, mask
+
+    def create_new_mask(self, mask: torch.Tensor, size: int) -> torch.Tensor:
+        """Create the mask of the subsampled sequences.
+
+        Args:
+            mask: Mask of input sequences. (B, T)
+            size: Length of the output sequences.
+
+        Returns:
+            mask: Mask of output sequences. (B, sub(T))
+
+        """
+        lengths = mask.size(1) - mask.sum(1)
+
+        for module in self.conv:
+            if not isinstance(module, (torch.nn.Conv2d, torch.nn.MaxPool2d)):
+                continue
+
+            kernel_size, stride, padding = (
+                v[0] if isinstance(v, tuple) else v
+                for v in (module.kernel_size, module.stride, module.padding)
+            )
+            ceil_mode = getattr(module, "ceil_mode", False)
+
+            new_lengths = lengths + 2 * padding - kernel_size
+
+            if ceil_mode:
+                new_lengths = -torch.div(-new_lengths, stride, rounding_mode="floor")
+            else:
+                new_lengths = torch.div(new_lengths, stride, rounding_mode="floor")
+            new_lengths = new_lengths + 1
+
+            if ceil_mode:
+                # The last pooling window should start inside the input sequence.
+                new_lengths -= ((new_lengths - 1) * stride >= lengths + padding).long()
+
+            lengths = new_lengths
+
+        return torch.arange(size, device=mask.device).unsqueeze(0) >= lengths.unsqueeze(
+            1
+        )
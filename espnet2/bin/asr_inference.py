@@ -35,8 +35,13 @@ from espnet2.torch_utils.device_funcs import to_device
 from espnet2.torch_utils.set_all_random_seed import set_all_random_seed
 from espnet2.utils import config_argparse
 from espnet2.utils.nested_dict_action import NestedDictAction
+from espnet2.utils.parallel_inference import (
+    add_parallel_inference_arguments,
+    run_inference,
+)
 from espnet2.utils.types import str2bool, str2triple_str, str_or_none
 from espnet.nets.batch_beam_search import BatchBeamSearch
+from espnet.nets.batch_beam_search_multi_utt import BatchBeamSearchMultiUtt
 from espnet.nets.batch_beam_search_online_sim import BatchBeamSearchOnlineSim
 from espnet.nets.beam_search import BeamSearch, Hypothesis
 from espnet.nets.beam_search_timesync import BeamSearchTimeSync
@@ -354,26 +359,39 @@ class Speech2Text:
                 )
 
                 # TODO(karita): make all scorers batchfied
-                if batch_size == 1:
-                    non_batch = [
-                        k
-                        for k, v in beam_search.full_scorers.items()
-                        if not isinstance(v, BatchScorerInterface)
-                    ]
+                non_batch = [
+                    k
+                    for k, v in beam_search.full_scorers.items()
+                    if not isinstance(v, BatchScorerInterface)
+                ]
+                if len(non_batch) == 0:
+                    if streaming:
+                        beam_search.__class__ = BatchBeamSearchOnlineSim
+                        beam_search.set_streaming_config(asr_train_config)
+                        logging.info(
+                            "BatchBeamSearchOnlineSim implementation is selected."
+                        )
+                    else:
+                        beam_search.__class__ = BatchBeamSearch
+                        logging.info("BatchBeamSearch implementation is selected.")
+                else:
+                    logging.warning(
+                        f"As non-batch scorers {non_batch} are found, "
+                        f"fall back to non-batch implementation."
+                    )
+
+                if batch_size > 1 and type(beam_search) is BatchBeamSearch:
+                    beam_search.__class__ = BatchBeamSearchMultiUtt
+                    non_batch = beam_search.unbatchable_scorers()
                     if len(non_batch) == 0:
-                        if streaming:
-                            beam_search.__class__ = BatchBeamSearchOnlineSim
-                            beam_search.set_streaming_config(asr_train_config)
-                            logging.info(
-                                "BatchBeamSearchOnlineSim implementation is selected."
-                            )
-                        else:
-                            beam_search.__class__ = BatchBeamSearch
-                            logging.info("BatchBeamSearch implementation is selected.")
+                        logging.info(
+                            "BatchBeamSearchMultiUtt implementation is selected."
+                        )
                     else:
+                        beam_search.__class__ = BatchBeamSearch
                         logging.warning(
-                            f"As non-batch scorers {non_batch} are found, "
-                            f"fall back to non-batch implementation."
+                            f"As scorers {non_batch} cannot be batched across "
+                            f"utterances, decode the utterances one by one."
                         )
 
             beam_search.to(device=device, dtype=getattr(torch, dtype)).eval()
@@ -480,26 +498,39 @@ class Speech2Text:
 
     @torch.no_grad()
     @typechecked
-    def __call__(self, speech: Union[torch.Tensor, np.ndarray]) -> Union[
+    def __call__(
+        self,
+        speech: Union[torch.Tensor, np.ndarray],
+        speech_lengths: Union[torch.Tensor, np.ndarray, None] = None,
+    ) -> Union[
         ListOfHypothesis,
         List[ListOfHypothesis],
         Tuple[
             ListOfHypothesis,
             Union[Dict[int, List[str]], None],
         ],
+        List[Any],
     ]:
         """Inference
 
         Args:
-            data: Input speech data
+            speech: Input speech data (Nsamples,).
+                If speech_lengths is given, zero-padded input speech data
+                (Batch, Nsamples).
+            speech_lengths: The lengths of input speech data (Batch,)
         Returns:
             text, token, token_int, hyp
+            If speech_lengths is given, the list of the results of each utterance.
 
         """
 
         # Input as audio signal
         if isinstance(speech, np.ndarray):
             speech = torch.tensor(speech)
+        if speech_lengths is not None:
+            if isinstance(speech_lengths, np.ndarray):
+                speech_lengths = torch.tensor(speech_lengths)
+            return self._batch_decode(speech, speech_lengths)
 
         # data: (Nsamples,) -> (1, Nsamples)
         speech = speech.unsqueeze(0).to(getattr(torch, self.dtype))
@@ -552,6 +583,54 @@ class Speech2Text:
 
         return results
 
+    def _batch_decode(
+        self, speech: torch.Tensor, speech_lengths: torch.Tensor
+    ) -> List[Any]:
+        if self.enh_s2t_task or self.multi_asr:
+            return [self(s[:l]) for s, l in zip(speech, speech_lengths.tolist())]
+
+        # data: (Batch, Nsamples)
+        speech = speech.to(getattr(torch, self.dtype))
+        # lengths: (Batch,)
+        lengths = speech_lengths.to(dtype=torch.long)
+        batch = {"speech": speech, "speech_lengths": lengths}
+        logging.info("speech lengths: " + str(lengths.tolist()))
+
+        # a. To device
+        batch = to_device(batch, device=self.device)
+
+        # b. Forward Encoder
+        enc, enc_olens = self.asr_model.encode(**batch)
+        intermediate_outs = None
+        if isinstance(enc, tuple):
+            intermediate_outs = enc[1]
+            enc = enc[0]
+
+        # c. Passed the encoder result and the beam search
+        if isinstance(self.beam_search, BatchBeamSearchMultiUtt):
+            batch_nbest_hyps = self.beam_search(
+                x=enc,
+                maxlenratio=self.maxlenratio,
+                minlenratio=self.minlenratio,
+                xlens=enc_olens,
+            )
+            results = [self._hyps_to_results(hyps) for hyps in batch_nbest_hyps]
+        else:
+            results = [
+                self._decode_single_sample(e[:l])
+                for e, l in zip(enc, enc_olens.tolist())
+            ]
+
+        # Encoder intermediate CTC predictions
+        if intermediate_outs is not None:
+            for i, l in enumerate(enc_olens.tolist()):
+                encoder_interctc_res = self._decode_interctc(
+                    [(idx, out[i : i + 1, :l]) for idx, out in intermediate_outs]
+                )
+                results[i] = (results[i], encoder_interctc_res)
+
+        return results
+
     @typechecked
     def _decode_interctc(
         self, intermediate_outs: List[Tuple[int, torch.Tensor]]
@@ -640,6 +719,12 @@ class Speech2Text:
                 x=enc, maxlenratio=self.maxlenratio, minlenratio=self.minlenratio
             )
 
+        return self._hyps_to_results(nbest_hyps)
+
+    @typechecked
+    def _hyps_to_results(
+        self, nbest_hyps: List[Union[Hypothesis, TransHypothesis]]
+    ) -> ListOfHypothesis:
         nbest_hyps = nbest_hyps[: self.nbest]
 
         results = []
@@ -748,8 +833,6 @@ def inference(
     max_seq_len: int,
     max_mask_parallel: int,
 ):
-    if batch_size > 1:
-        raise NotImplementedError("batch decoding is not implemented")
     if word_lm_train_config is not None:
         raise NotImplementedError("Word LM is not implemented")
     if ngpu > 1:
@@ -781,6 +864,7 @@ def inference(
         device=device,
         maxlenratio=maxlenratio,
         minlenratio=minlenratio,
+        batch_size=batch_size,
         dtype=dtype,
         beam_size=beam_size,
         ctc_weight=ctc_weight,
@@ -833,68 +917,96 @@ def inference(
             assert all(isinstance(s, str) for s in keys), keys
             _bs = len(next(iter(batch.values())))
             assert len(keys) == _bs, f"{len(keys)} != {_bs}"
-            batch = {k: v[0] for k, v in batch.items() if not k.endswith("_lengths")}
 
-            # N-best list of (text, token, token_int, hyp_object)
-            try:
-                results = speech2text(**batch)
-            except TooShortUttError as e:
-                logging.warning(f"Utterance {keys} {e}")
-                hyp = Hypothesis(score=0.0, scores={}, states={}, yseq=[])
-                results = [[" ", ["<space>"], [2], hyp]] * nbest
-                if enh_s2t_task:
-                    num_spk = getattr(speech2text.asr_model.enh_model, "num_spk", 1)
-                    results = [results for _ in range(num_spk)]
-
-            # Only supporting batch_size==1
-            key = keys[0]
-            if enh_s2t_task or multi_asr:
-                # Enh+ASR joint task
-                for spk, ret in enumerate(results, 1):
-                    for n, (text, token, token_int, hyp) in zip(
-                        range(1, nbest + 1), ret
-                    ):
-                        # Create a directory: outdir/{n}best_recog_spk?
-                        ibest_writer = writer[f"{n}best_recog"]
-
-                        # Write the result to each file
-                        ibest_writer[f"token_spk{spk}"][key] = " ".join(token)
-                        ibest_writer[f"token_int_spk{spk}"][key] = " ".join(
-                            map(str, token_int)
+            if batch_size > 1:
+                # N-best lists of (text, token, token_int, hyp_object)
+                try:
+                    batch_results = speech2text(**batch)
+                except TooShortUttError:
+                    # retry one by one to isolate the too short utterances
+                    batch_results = []
+                    for i in range(_bs):
+                        single = {
+                            k: v[i, : batch[k + "_lengths"][i]]
+                            for k, v in batch.items()
+                            if not k.endswith("_lengths")
+                        }
+                        batch_results.append(
+                            _decode_or_dummy(speech2text, single, keys[i : i + 1])
                         )
-                        ibest_writer[f"score_spk{spk}"][key] = str(hyp.score)
+            else:
+                batch = {
+                    k: v[0] for k, v in batch.items() if not k.endswith("_lengths")
+                }
+                batch_results = [_decode_or_dummy(speech2text, batch, keys)]
 
-                        if text is not None:
-                            ibest_writer[f"text_spk{spk}"][key] = text
+            for key, results in zip(keys, batch_results):
+                _write_results(writer, key, results, nbest, enh_s2t_task, multi_asr)
 
-            else:
-                # Normal ASR
-                encoder_interctc_res = None
-                if isinstance(results, tuple):
-                    results, encoder_interctc_res = results
-
-                for n, (text, token, token_int, hyp) in zip(
-                    range(1, nbest + 1), results
-                ):
-                    # Create a directory: outdir/{n}best_recog
-                    ibest_writer = writer[f"{n}best_recog"]
-
-                    # Write the result to each file
-                    ibest_writer["token"][key] = " ".join(token)
-                    ibest_writer["token_int"][key] = " ".join(map(str, token_int))
-                    ibest_writer["score"][key] = str(hyp.score)
-
-                    if text is not None:
-                        ibest_writer["text"][key] = text
-
-                # Write intermediate predictions to
-                # encoder_interctc_layer<layer_idx>.txt
-                ibest_writer = writer["1best_recog"]
-                if encoder_interctc_res is not None:
-                    for idx, text in encoder_interctc_res.items():
-                        ibest_writer[f"encoder_interctc_layer{idx}.txt"][key] = (
-                            " ".join(text)
-                        )
+
+def _decode_or_dummy(
+    speech2text: Speech2Text, batch: Dict[str, torch.Tensor], keys: List[str]
+):
+    # N-best list of (text, token, token_int, hyp_object)
+    try:
+        results = speech2text(**batch)
+    except TooShortUttError as e:
+        logging.warning(f"Utterance {keys} {e}")
+        hyp = Hypothesis(score=0.0, scores={}, states={}, yseq=[])
+        results = [[" ", ["<space>"], [2], hyp]] * speech2text.nbest
+        if speech2text.enh_s2t_task:
+            num_spk = getattr(speech2text.asr_model.enh_model, "num_spk", 1)
+            results = [results for _ in range(num_spk)]
+    return results
+
+
+def _write_results(
+    writer: DatadirWriter,
+    key: str,
+    results,
+    nbest: int,
+    enh_s2t_task: bool,
+    multi_asr: bool,
+):
+    if enh_s2t_task or multi_asr:
+        # Enh+ASR joint task
+        for spk, ret in enumerate(results, 1):
+            for n, (text, token, token_int, hyp) in zip(range(1, nbest + 1), ret):
+                # Create a directory: outdir/{n}best_recog_spk?
+                ibest_writer = writer[f"{n}best_recog"]
+
+                # Write the result to each file
+                ibest_writer[f"token_spk{spk}"][key] = " ".join(token)
+                ibest_writer[f"token_int_spk{spk}"][key] = " ".join(map(str, token_int))
+                ibest_writer[f"score_spk{spk}"][key] = str(hyp.score)
+
+                if text is not None:
+                    ibest_writer[f"text_spk{spk}"][key] = text
+
+    else:
+        # Normal ASR
+        encoder_interctc_res = None
+        if isinstance(results, tuple):
+            results, encoder_interctc_res = results
+
+        for n, (text, token, token_int, hyp) in zip(range(1, nbest + 1), results):
+            # Create a directory: outdir/{n}best_recog
+            ibest_writer = writer[f"{n}best_recog"]
+
+            # Write the result to each file
+            ibest_writer["token"][key] = " ".join(token)
+            ibest_writer["token_int"][key] = " ".join(map(str, token_int))
+            ibest_writer["score"][key] = str(hyp.score)
+
+            if text is not None:
+                ibest_writer["text"][key] = text
+
+        # Write intermediate predictions to
+        # encoder_interctc_layer<layer_idx>.txt
+        ibest_writer = writer["1best_recog"]
+        if encoder_interctc_res is not None:
+            for idx, text in encoder_interctc_res.items():
+                ibest_writer[f"encoder_interctc_layer{idx}.txt"][key] = " ".join(text)
 
 
 def get_parser():
@@ -920,6 +1032,7 @@ def get_parser():
         default=0,
         help="The number of gpus. 0 indicates CPU mode",
     )
+    add_parallel_inference_arguments(parser)
     parser.add_argument("--seed", type=int, default=0, help="Random seed")
     parser.add_argument(
         "--dtype",
@@ -1164,7 +1277,7 @@ def main(cmd=None):
     args = parser.parse_args(cmd)
     kwargs = vars(args)
     kwargs.pop("config", None)
-    inference(**kwargs)
+    run_inference(inference, kwargs)
 
 
 if __name__ == "__main__":
@@ -17,6 +17,10 @@ from espnet2.text.token_id_converter import TokenIDConverter
 from espnet2.torch_utils.device_funcs import to_device
 from espnet2.torch_utils.set_all_random_seed import set_all_random_seed
 from espnet2.utils import config_argparse
+from espnet2.utils.parallel_inference import (
+    add_parallel_inference_arguments,
+    run_inference,
+)
 from espnet2.utils.types import str2bool, str2triple_str, str_or_none
 from espnet.nets.beam_search import Hypothesis
 from espnet.nets.pytorch_backend.transformer.subsampling import TooShortUttError
@@ -297,6 +301,7 @@ def get_parser():
         default=0,
         help="The number of gpus. 0 indicates CPU mode",
     )
+    add_parallel_inference_arguments(parser)
     parser.add_argument("--seed", type=int, default=0, help="Random seed")
     parser.add_argument(
         "--dtype",
@@ -368,7 +373,7 @@ def main(cmd=None):
     kwargs = vars(args)
     kwargs.pop("config", None)
 
-    inference(**kwargs)
+    run_inference(inference, kwargs)
 
 
 if __name__ == "__main__":
@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
 import logging
 import math
 import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Sequence, Tuple, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import torch
@@ -24,9 +29,14 @@ from espnet2.text.token_id_converter import TokenIDConverter
 from espnet2.torch_utils.device_funcs import to_device
 from espnet2.torch_utils.set_all_random_seed import set_all_random_seed
 from espnet2.utils import config_argparse
+from espnet2.utils.parallel_inference import (
+    add_parallel_inference_arguments,
+    run_inference,
+)
 from espnet2.utils.types import str2bool, str2triple_str, str_or_none
 from espnet.nets.batch_beam_search_online import BatchBeamSearchOnline
 from espnet.nets.beam_search import Hypothesis
+from espnet.nets.pytorch_backend.nets_utils import pad_list
 from espnet.nets.pytorch_backend.transformer.subsampling import TooShortUttError
 from espnet.nets.scorer_interface import BatchScorerInterface
 from espnet.nets.scorers.ctc import CTCPrefixScorer
@@ -72,6 +82,7 @@ class Speech2TextStreaming:
         disable_repetition_detection=False,
         decoder_text_length_limit=0,
         encoded_feat_length_limit=0,
+        incremental_frontend: bool = False,
     ):
 
         # 1. Build ASR model
@@ -194,6 +205,14 @@ class Speech2TextStreaming:
             self.win_length = asr_train_args.frontend_conf["win_length"]
         else:
             self.win_length = self.n_fft
+        if incremental_frontend and not hasattr(
+            asr_model.frontend, "forward_streaming"
+        ):
+            raise ValueError(
+                "incremental_frontend requires a frontend having forward_streaming: "
+                f"{type(asr_model.frontend).__name__}"
+            )
+        self.incremental_frontend = incremental_frontend
 
         self.reset()
 
@@ -205,6 +224,156 @@ class Speech2TextStreaming:
     def apply_frontend(
         self, speech: torch.Tensor, prev_states=None, is_final: bool = False
     ):
+        return self.batch_apply_frontend([speech], [prev_states], [is_final])[0]
+
+    def batch_apply_frontend(
+        self,
+        speechs: List[torch.Tensor],
+        prev_states: List[Optional[dict]],
+        is_final: List[bool],
+    ) -> List[Tuple[Optional[torch.Tensor], Optional[torch.Tensor], Optional[dict]]]:
+        """Apply the frontend to the chunks of multiple streams.
+
+        The chunks are padded into a batch per length bucket, where the number
+        of samples of a bucket is at most twice of its shortest chunk.
+        Each chunk is padded with the reflection of its end as the centered STFT
+        does before the zeros, so that the features are the same as the ones
+        extracted one by one. The chunks are grouped by the exact number of
+        samples if the frontend does not have an STFT.
+
+        Args:
+            speechs: The chunks of the streams: [(Nsamples,), ...]
+            prev_states: The frontend states of the streams
+            is_final: Whether the chunk is the last one of each stream
+
+        Returns:
+            [(feats, feats_lengths, next_states), ...]
+
+        """
+        if self.incremental_frontend:
+            return [
+                self._incremental_frontend(speech, states, final)
+                for speech, states, final in zip(speechs, prev_states, is_final)
+            ]
+
+        rets = [None] * len(speechs)
+        stft = getattr(self.asr_model.frontend, "stft", None)
+        # The inputs to extract the features grouped by the length bucket
+        groups = {}
+        for i, (speech, states, final) in enumerate(
+            zip(speechs, prev_states, is_final)
+        ):
+            speech_to_process, next_states = self._frontend_input(speech, states, final)
+            if speech_to_process is None:
+                rets[i] = (None, None, next_states)
+                continue
+            n_samples = speech_to_process.size(0)
+            key = n_samples if stft is None else (n_samples - 1).bit_length()
+            groups.setdefault(key, []).append((i, speech_to_process, next_states))
+
+        for group in groups.values():
+            lengths = torch.tensor([x.size(0) for _, x, _ in group], dtype=torch.long)
+            speech_to_process = [x for _, x, _ in group]
+            if stft is not None and stft.center:
+                pad = stft.n_fft // 2
+                speech_to_process = [
+                    torch.cat([x, x.flip(0)[1 : pad + 1]]) for x in speech_to_process
+                ]
+            # data: (Nsamples,) -> (B, Nsamples)
+            speech_to_process = pad_list(speech_to_process, 0.0).to(
+                getattr(torch, self.dtype)
+            )
+            batch = {"speech": speech_to_process, "speech_lengths": lengths}
+
+            # lenghts: (B,)
+            # a. To device
+            batch = to_device(batch, device=self.device)
+
+            if stft is not None:
+                # _extract_feats() would cut the reflection of the longest chunks
+                feats, feats_lengths = self.asr_model.frontend(
+                    batch["speech"], batch["speech_lengths"]
+                )
+            else:
+                feats, feats_lengths = self.asr_model._extract_feats(**batch)
+            if self.asr_model.normalize is not None:
+                feats, feats_lengths = self.asr_model.normalize(feats, feats_lengths)
+
+            for j, (i, _, next_states) in enumerate(group):
+                _feats = self._trim_feats(
+                    feats[j : j + 1, : feats_lengths[j]],
+                    prev_states[i] is None,
+                    is_final[i],
+                )
+                _feats_lengths = _feats.new_full(
+                    [1], dtype=torch.long, fill_value=_feats.size(1)
+                )
+                rets[i] = (_feats, _feats_lengths, next_states)
+        return rets
+
+    def batch_encode(
+        self,
+        feats: List[torch.Tensor],
+        prev_states: List[Optional[dict]],
+        is_final: List[bool],
+    ) -> List[Tuple[torch.Tensor, Optional[dict]]]:
+        """Apply the encoder to the features of multiple streams.
+
+        The contextual block encoders process the blocks of all the streams
+        as a batch by batch_forward_infer(). The other encoders are applied to
+        the streams one by one.
+
+        Args:
+            feats: The features of the streams: [(1, T, D), ...]
+            prev_states: The encoder states of the streams
+            is_final: Whether the features are the last ones of each stream
+
+        Returns:
+            [(encoder output (1, T', D'), next_states), ...]
+
+        """
+        encoder = self.asr_model.encoder
+        if hasattr(encoder, "batch_forward_infer"):
+            return [
+                (enc, next_states)
+                for enc, _, next_states in encoder.batch_forward_infer(
+                    feats, prev_states, is_final
+                )
+            ]
+        rets = []
+        for _feats, states, final in zip(feats, prev_states, is_final):
+            enc, _, next_states = encoder(
+                _feats,
+                _feats.new_full([1], dtype=torch.long, fill_value=_feats.size(1)),
+                states,
+                is_final=final,
+                infer_mode=True,
+            )
+            rets.append((enc, next_states))
+        return rets
+
+    def _incremental_frontend(
+        self, speech: torch.Tensor, prev_states=None, is_final: bool = False
+    ) -> Tuple[Optional[torch.Tensor], Optional[torch.Tensor], Optional[dict]]:
+        # Compute only the new frames without re-concatenating the waveform
+        speech = speech.unsqueeze(0).to(
+            dtype=getattr(torch, self.dtype), device=self.device
+        )
+        feats, feats_lengths, next_states = self.asr_model.frontend.forward_streaming(
+            speech, prev_states, is_final
+        )
+        if is_final:
+            next_states = None
+        elif feats.size(1) == 0:
+            return None, None, next_states
+        if self.asr_model.normalize is not None:
+            feats, feats_lengths = self.asr_model.normalize(feats, feats_lengths)
+        return feats, feats_lengths, next_states
+
+    def _frontend_input(
+        self, speech: torch.Tensor, prev_states=None, is_final: bool = False
+    ) -> Tuple[Optional[torch.Tensor], Optional[dict]]:
+        # Get the samples to extract the features and the next states
         if prev_states is not None:
             buf = prev_states["waveform_buffer"]
             speech = torch.cat([buf, speech], dim=0)
@@ -215,10 +384,8 @@ class Speech2TextStreaming:
                 pad = torch.zeros(self.win_length - speech.size(0), dtype=speech.dtype)
                 speech = torch.cat([speech, pad], dim=0)
             else:
-                feats = None
-                feats_lengths = None
                 next_states = {"waveform_buffer": speech.clone()}
-                return feats, feats_lengths, next_states
+                return None, next_states
 
         if is_final:
             speech_to_process = speech
@@ -238,26 +405,18 @@ class Speech2TextStreaming:
                 + n_residual,
             ).clone()
 
-        # data: (Nsamples,) -> (1, Nsamples)
-        speech_to_process = speech_to_process.unsqueeze(0).to(
-            getattr(torch, self.dtype)
-        )
-        lengths = speech_to_process.new_full(
-            [1], dtype=torch.long, fill_value=speech_to_process.size(1)
-        )
-        batch = {"speech": speech_to_process, "speech_lengths": lengths}
-
-        # lenghts: (1,)
-        # a. To device
-        batch = to_device(batch, device=self.device)
-
-        feats, feats_lengths = self.asr_model._extract_feats(**batch)
-        if self.asr_model.normalize is not None:
-            feats, feats_lengths = self.asr_model.normalize(feats, feats_lengths)
+        if is_final:
+            next_states = None
+        else:
+            next_states = {"waveform_buffer": waveform_buffer}
+        return speech_to_process, next_states
 
+    def _trim_feats(
+        self, feats: torch.Tensor, is_first: bool, is_final: bool
+    ) -> torch.Tensor:
         # Trimming
         if is_final:
-            if prev_states is None:
+            if is_first:
                 pass
             else:
                 feats = feats.narrow(
@@ -267,7 +426,7 @@ class Speech2TextStreaming:
                     - math.ceil(math.ceil(self.win_length / self.hop_length) / 2),
                 )
         else:
-            if prev_states is None:
+            if is_first:
                 feats = feats.narrow(
                     1,
                     0,
@@ -281,14 +440,7 @@ class Speech2TextStreaming:
                     feats.size(1)
                     - 2 * math.ceil(math.ceil(self.win_length / self.hop_length) / 2),
                 )
-
-        feats_lengths = feats.new_full([1], dtype=torch.long, fill_value=feats.size(1))
-
-        if is_final:
-            next_states = None
-        else:
-            next_states = {"waveform_buffer": waveform_buffer}
-        return feats, feats_lengths, next_states
+        return feats
 
     @torch.no_grad()
     @typechecked
@@ -358,6 +510,294 @@ class Speech2TextStreaming:
         return results
 
 
+class StreamingSession:
+    """The states of an audio stream decoded by StreamingSessionManager."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.frontend_states = None
+        self.encoder_states = None
+        self.search_state = None
+        # The chunks waiting for the next step: [(speech, is_final, time, future)]
+        self.pending = []
+        self.finished = False
+        # The latest results
+        self.results = []
+        # The seconds from the arrival of each chunk to its results
+        self.latencies = []
+
+    def latency_stats(self) -> Dict[str, Optional[float]]:
+        """Get the latency metrics of the chunks processed so far in seconds."""
+        latencies = self.latencies
+        return {
+            "num_chunks": len(latencies),
+            "latency_mean": (
+                sum(latencies) / len(latencies) if len(latencies) > 0 else None
+            ),
+            "latency_max": max(latencies) if len(latencies) > 0 else None,
+            "latency_last": latencies[-1] if len(latencies) > 0 else None,
+        }
+
+
+class StreamingSessionManager:
+    """Decode multiple audio streams with a single Speech2TextStreaming.
+
+    The frontend, encoder and beam search states of each stream are kept in
+    a StreamingSession instead of the Speech2TextStreaming instance,
+    so that one model copy serves any number of concurrent streams.
+    Each step() gathers the pending chunks of up to `max_batch_size` sessions
+    and decodes them as a batch: the frontend is applied to the padded chunks,
+    the contextual block encoder processes the blocks of all the sessions
+    with their own contexts, and the online beam search scores the running
+    hypotheses of all the sessions at once.
+
+    The Speech2TextStreaming instance must not be called while step() is running.
+
+    Examples:
+        >>> manager = StreamingSessionManager(speech2text)
+        >>> async def stream(chunks):
+        ...     session_id = manager.open()
+        ...     for chunk in chunks[:-1]:
+        ...         await manager.feed(session_id, chunk)
+        ...     results = await manager.feed(session_id, chunks[-1], is_final=True)
+        ...     print(manager.close(session_id).latency_stats())
+        ...     return results
+        >>> async def main(streams):
+        ...     server = asyncio.create_task(manager.serve())
+        ...     results = await asyncio.gather(*[stream(c) for c in streams])
+        ...     manager.shutdown()
+        ...     await server
+        ...     return results
+
+    """
+
+    @typechecked
+    def __init__(self, speech2text: Speech2TextStreaming, max_batch_size: int = 32):
+        self.speech2text = speech2text
+        self.max_batch_size = max_batch_size
+        self.sessions: Dict[str, StreamingSession] = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        self._shutdown = False
+
+    def open(self, session_id: Optional[str] = None) -> str:
+        """Start a new stream and return its session id."""
+        if session_id is None:
+            session_id = uuid.uuid4().hex
+        with self._lock:
+            if session_id in self.sessions:
+                raise RuntimeError(f"The session already exists: {session_id}")
+            self.sessions[session_id] = StreamingSession(session_id)
+        return session_id
+
+    def close(self, session_id: str) -> StreamingSession:
+        """Release the session, which may be in the middle of the stream."""
+        with self._lock:
+            return self.sessions.pop(session_id)
+
+    def push(
+        self,
+        session_id: str,
+        speech: Union[torch.Tensor, np.ndarray],
+        is_final: bool = False,
+        future: Optional[asyncio.Future] = None,
+    ):
+        """Queue a chunk of the stream, which is decoded by the next step().
+
+        Args:
+            session_id: The session id got by open()
+            speech: The chunk of the input speech: (Nsamples,)
+            is_final: Whether the chunk is the last one of the stream
+            future: The future to be set to the results of the chunk
+
+        """
+        if isinstance(speech, np.ndarray):
+            speech = torch.tensor(speech)
+        with self._lock:
+            session = self.sessions[session_id]
+            if session.finished or any(c[1] for c in session.pending):
+                raise RuntimeError(f"The stream is already finished: {session_id}")
+            session.pending.append((speech, is_final, time.perf_counter(), future))
+        if self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            return any(len(s.pending) > 0 for s in self.sessions.values())
+
+    @torch.no_grad()
+    def step(
+        self,
+    ) -> Dict[str, List[Tuple[Optional[str], List[str], List[int], Hypothesis]]]:
+        """Decode the pending chunks of the sessions.
+
+        The sessions waiting for the longest time are processed first,
+        and all the pending chunks of a session are decoded at once.
+
+        Returns:
+            The results of each processed session:
+                {session_id: [(text, token, token_int, hyp), ...]}
+
+        """
+        with self._lock:
+            sessions = sorted(
+                [s for s in self.sessions.values() if len(s.pending) > 0],
+                key=lambda s: s.pending[0][2],
+            )[: self.max_batch_size]
+            chunks = []
+            for session in sessions:
+                chunks.append(session.pending)
+                session.pending = []
+        if len(sessions) == 0:
+            return {}
+
+        rets = {}
+        error = None
+        is_final = [any(c[1] for c in chunk) for chunk in chunks]
+        # The results of each session, or the exception raised while decoding it
+        outputs = self._decode(sessions, chunks, is_final)
+
+        for session, chunk, final, results in zip(sessions, chunks, is_final, outputs):
+            if isinstance(results, Exception):
+                # The states of the session are no longer valid
+                session.finished = True
+                if all(c[3] is None for c in chunk):
+                    error = results
+                for c in chunk:
+                    if c[3] is not None:
+                        c[3].get_loop().call_soon_threadsafe(
+                            _set_exception, c[3], results
+                        )
+                continue
+
+            session.results = results
+            if final:
+                session.finished = True
+                session.frontend_states = None
+                session.encoder_states = None
+                session.search_state = None
+            now = time.perf_counter()
+            session.latencies.extend([now - c[2] for c in chunk])
+            rets[session.session_id] = session.results
+            for c in chunk:
+                if c[3] is not None:
+                    c[3].get_loop().call_soon_threadsafe(
+                        _set_result, c[3], session.results
+                    )
+        if error is not None:
+            raise error
+        return rets
+
+    def _decode(
+        self,
+        sessions: List[StreamingSession],
+        chunks: List[list],
+        is_final: List[bool],
+    ) -> List[Union[list, Exception]]:
+        # Each stage runs once for all the sessions, and an error in a stage
+        # fails all the sessions processed by it
+        speech2text = self.speech2text
+        outputs = [[] for _ in sessions]
+
+        try:
+            frontend_outputs = speech2text.batch_apply_frontend(
+                [torch.cat([c[0] for c in chunk]) for chunk in chunks],
+                [session.frontend_states for session in sessions],
+                is_final,
+            )
+        except Exception as e:
+            return [e] * len(sessions)
+        # The sessions having enough samples to extract the features
+        ids = []
+        for i, (feats, _, next_states) in enumerate(frontend_outputs):
+            sessions[i].frontend_states = next_states
+            if feats is not None:
+                ids.append(i)
+        if len(ids) == 0:
+            return outputs
+
+        try:
+            encoder_outputs = speech2text.batch_encode(
+                [frontend_outputs[i][0] for i in ids],
+                [sessions[i].encoder_states for i in ids],
+                [is_final[i] for i in ids],
+            )
+        except Exception as e:
+            for i in ids:
+                outputs[i] = e
+            return outputs
+        for i, (_, next_states) in zip(ids, encoder_outputs):
+            sessions[i].encoder_states = next_states
+
+        try:
+            nbest_hyps, search_states = speech2text.beam_search.batch_forward(
+                [enc[0] for enc, _ in encoder_outputs],
+                [sessions[i].search_state for i in ids],
+                maxlenratio=speech2text.maxlenratio,
+                minlenratio=speech2text.minlenratio,
+                is_final=[is_final[i] for i in ids],
+            )
+        except Exception as e:
+            for i in ids:
+                outputs[i] = e
+            return outputs
+        for i, hyps, search_state in zip(ids, nbest_hyps, search_states):
+            sessions[i].search_state = search_state
+            outputs[i] = speech2text.assemble_hyps(hyps)
+        return outputs
+
+    async def feed(
+        self,
+        session_id: str,
+        speech: Union[torch.Tensor, np.ndarray],
+        is_final: bool = False,
+    ) -> List[Tuple[Optional[str], List[str], List[int], Hypothesis]]:
+        """Queue a chunk and wait for its results decoded by serve()."""
+        future = asyncio.get_running_loop().create_future()
+        self.push(session_id, speech, is_final, future)
+        return await future
+
+    async def serve(self):
+        """Run step() in a worker thread while chunks are pending until shutdown()."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._shutdown = False
+        with ThreadPoolExecutor(1) as executor:
+            while not self._shutdown:
+                if not self.has_pending():
+                    await self._wakeup.wait()
+                    self._wakeup.clear()
+                    continue
+                try:
+                    await self._loop.run_in_executor(executor, self.step)
+                except Exception as e:
+                    # Only the sessions fed by push() without futures are affected
+                    logging.warning(f"Failed to decode the chunks: {e}")
+        self._wakeup = None
+
+    def shutdown(self):
+        """Stop serve() after the current step."""
+        self._shutdown = True
+        if self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def stats(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """Get the latency metrics of the sessions."""
+        with self._lock:
+            return {k: s.latency_stats() for k, s in self.sessions.items()}
+
+
+def _set_result(future: asyncio.Future, result: Any):
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, exception: Exception):
+    if not future.done():
+        future.set_exception(exception)
+
+
 @typechecked
 def inference(
     output_dir: str,
@@ -389,6 +829,7 @@ def inference(
     sim_chunk_length: int,
     disable_repetition_detection: bool,
     encoded_feat_length_limit: int,
+    incremental_frontend: bool,
     decoder_text_length_limit: int,
 ):
     if batch_size > 1:
@@ -432,6 +873,7 @@ def inference(
         disable_repetition_detection=disable_repetition_detection,
         decoder_text_length_limit=decoder_text_length_limit,
         encoded_feat_length_limit=encoded_feat_length_limit,
+        incremental_frontend=incremental_frontend,
     )
 
     # 3. Build data-iterator
@@ -517,6 +959,7 @@ def get_parser():
         default=0,
         help="The number of gpus. 0 indicates CPU mode",
     )
+    add_parallel_inference_arguments(parser)
     parser.add_argument("--seed", type=int, default=0, help="Random seed")
     parser.add_argument(
         "--dtype",
@@ -602,6 +1045,13 @@ def get_parser():
         default=0,
         help="Limit the lengths of the text" "to input to the decoder.",
     )
+    group.add_argument(
+        "--incremental_frontend",
+        type=str2bool,
+        default=False,
+        help="Compute only the new frames of each chunk in the frontend, "
+        "which gives the same features as the entire utterance",
+    )
 
     group = parser.add_argument_group("Text converter related")
     group.add_argument(
@@ -635,7 +1085,7 @@ def main(cmd=None):
     args = parser.parse_args(cmd)
     kwargs = vars(args)
     kwargs.pop("config", None)
-    inference(**kwargs)
+    run_inference(inference, kwargs)
 
 
 if __name__ == "__main__":
@@ -20,7 +20,7 @@ from espnet2.asr_transducer.beam_search_transducer import (
     Hypothesis,
 )
 from espnet2.asr_transducer.frontend.online_audio_processor import OnlineAudioProcessor
-from espnet2.asr_transducer.utils import TooShortUttError
+from espnet2.asr_transducer.utils import TooShortUttError, check_short_utt
 from espnet2.fileio.datadir_writer import DatadirWriter
 from espnet2.tasks.asr_transducer import ASRTransducerTask
 from espnet2.tasks.lm import LMTask
@@ -28,6 +28,10 @@ from espnet2.text.build_tokenizer import build_tokenizer
 from espnet2.text.token_id_converter import TokenIDConverter
 from espnet2.torch_utils.set_all_random_seed import set_all_random_seed
 from espnet2.utils import config_argparse
+from espnet2.utils.parallel_inference import (
+    add_parallel_inference_arguments,
+    run_inference,
+)
 from espnet2.utils.types import str2bool, str2triple_str, str_or_none
 from espnet.utils.cli_utils import get_commandline_args
 
@@ -247,20 +251,34 @@ class Speech2Text:
 
     @torch.no_grad()
     @typechecked
-    def __call__(self, speech: Union[torch.Tensor, np.ndarray]) -> List[Hypothesis]:
+    def __call__(
+        self,
+        speech: Union[torch.Tensor, np.ndarray],
+        speech_lengths: Union[torch.Tensor, np.ndarray, None] = None,
+    ) -> Union[List[Hypothesis], List[List[Hypothesis]]]:
         """Speech2Text call.
 
         Args:
             speech: Speech data. (S)
+                    If speech_lengths is given, zero-padded speech data. (B, S)
+            speech_lengths: Speech data lengths. (B,)
 
         Returns:
             nbest_hypothesis: N-best hypothesis.
+                              If speech_lengths is given, N-best hypothesis for
+                              each utterance.
 
         """
 
         if isinstance(speech, np.ndarray):
             speech = torch.tensor(speech)
 
+        if speech_lengths is not None:
+            if isinstance(speech_lengths, np.ndarray):
+                speech_lengths = torch.tensor(speech_lengths)
+
+            return self.batch_decode(speech, speech_lengths)
+
         speech = speech.unsqueeze(0).to(
             dtype=getattr(torch, self.dtype), device=self.device
         )
@@ -279,6 +297,45 @@ class Speech2Text:
 
         return nbest_hyps
 
+    def batch_decode(
+        self, speech: torch.Tensor, speech_lengths: torch.Tensor
+    ) -> List[List[Hypothesis]]:
+        """Decode a batch of utterances with the batched beam search.
+
+        Args:
+            speech: Zero-padded speech data. (B, S)
+            speech_lengths: Speech data lengths. (B,)
+
+        Returns:
+            batch_nbest_hypothesis: N-best hypothesis for each utterance.
+
+        """
+        speech = speech.to(dtype=getattr(torch, self.dtype), device=self.device)
+        lengths = speech_lengths.to(dtype=torch.long, device=self.device)
+
+        feats, feats_length = self.asr_model._extract_feats(speech, lengths)
+
+        if self.asr_model.normalize is not None:
+            feats, feats_length = self.asr_model.normalize(feats, feats_length)
+
+        # The encoder only checks the longest utterance of the batch.
+        min_length = int(feats_length.min())
+        short_status, limit_size = check_short_utt(
+            self.asr_model.encoder.embed.subsampling_factor, min_length
+        )
+
+        if short_status:
+            raise TooShortUttError(
+                f"has {min_length} frames and is too short for subsampling "
+                + f"(it needs more than {limit_size} frames), return empty results",
+                min_length,
+                limit_size,
+            )
+
+        enc_out, enc_out_lens = self.asr_model.encoder(feats, feats_length)
+
+        return self.beam_search.batch_decode(enc_out, enc_out_lens)
+
     def hypotheses_to_results(self, nbest_hyps: List[Hypothesis]) -> List[Any]:
         """Build partial or final results from the hypotheses.
 
@@ -400,8 +457,8 @@ def inference(
 
     """
 
-    if batch_size > 1:
-        raise NotImplementedError("batch decoding is not implemented")
+    if batch_size > 1 and streaming:
+        raise NotImplementedError("batch decoding is not implemented for streaming")
     if ngpu > 1:
         raise NotImplementedError("only single GPU decoding is supported")
 
@@ -472,61 +529,107 @@ def inference(
 
             _bs = len(next(iter(batch.values())))
             assert len(keys) == _bs, f"{len(keys)} != {_bs}"
-            batch = {k: v[0] for k, v in batch.items() if not k.endswith("_lengths")}
-            assert len(batch.keys()) == 1
 
-            try:
-                if speech2text.streaming:
-                    speech = batch["speech"]
-
-                    decoding_steps = len(speech) // decoding_samples
-
-                    for i in range(0, decoding_steps + 1, 1):
-                        _start = i * decoding_samples
-
-                        if i == decoding_steps:
-                            final_hyps = speech2text.streaming_decode(
-                                speech[i * decoding_samples : len(speech)],
-                                is_final=True,
-                            )
-                        else:
-                            part_hyps = speech2text.streaming_decode(
-                                speech[
-                                    (i * decoding_samples) : _start + decoding_samples
-                                ],
-                                is_final=False,
-                            )
-
-                            if display_hypotheses:
-                                _result = speech2text.hypotheses_to_results(part_hyps)
-                                _length = (i + 1) * decoding_window
-
-                                logging.info(
-                                    f"Current best hypothesis (0-{_length}ms): "
-                                    f"{keys}: {_result[0][0]}"
+            if batch_size > 1:
+                try:
+                    batch_results = [
+                        speech2text.hypotheses_to_results(nbest_hyps)
+                        for nbest_hyps in speech2text(**batch)
+                    ]
+                except TooShortUttError:
+                    # retry one by one to isolate the too short utterances
+                    batch_results = [
+                        _decode_or_dummy(speech2text, speech[:length], key)
+                        for key, speech, length in zip(
+                            keys, batch["speech"], batch["speech_lengths"].tolist()
+                        )
+                    ]
+
+                if display_hypotheses:
+                    for key, results in zip(keys, batch_results):
+                        logging.info(f"Final best hypothesis: {key}: {results[0][0]}")
+            else:
+                batch = {
+                    k: v[0] for k, v in batch.items() if not k.endswith("_lengths")
+                }
+                assert len(batch.keys()) == 1
+
+                try:
+                    if speech2text.streaming:
+                        speech = batch["speech"]
+
+                        decoding_steps = len(speech) // decoding_samples
+
+                        for i in range(0, decoding_steps + 1, 1):
+                            _start = i * decoding_samples
+
+                            if i == decoding_steps:
+                                final_hyps = speech2text.streaming_decode(
+                                    speech[i * decoding_samples : len(speech)],
+                                    is_final=True,
+                                )
+                            else:
+                                part_hyps = speech2text.streaming_decode(
+                                    speech[
+                                        (i * decoding_samples) : _start
+                                        + decoding_samples
+                                    ],
+                                    is_final=False,
                                 )
-                else:
-                    final_hyps = speech2text(**batch)
 
-                results = speech2text.hypotheses_to_results(final_hyps)
+                                if display_hypotheses:
+                                    _result = speech2text.hypotheses_to_results(
+                                        part_hyps
+                                    )
+                                    _length = (i + 1) * decoding_window
 
-                if display_hypotheses:
-                    logging.info(f"Final best hypothesis: {keys}: {results[0][0]}")
-            except TooShortUttError as e:
-                logging.warning(f"Utterance {keys} {e}")
-                hyp = Hypothesis(score=0.0, yseq=[], dec_state=None)
-                results = [[" ", ["<space>"], [2], hyp]] * nbest
+                                    logging.info(
+                                        f"Current best hypothesis (0-{_length}ms): "
+                                        f"{keys}: {_result[0][0]}"
+                                    )
+                    else:
+                        final_hyps = speech2text(**batch)
+
+                    results = speech2text.hypotheses_to_results(final_hyps)
+
+                    if display_hypotheses:
+                        logging.info(f"Final best hypothesis: {keys}: {results[0][0]}")
+                except TooShortUttError as e:
+                    logging.warning(f"Utterance {keys} {e}")
+                    hyp = Hypothesis(score=0.0, yseq=[], dec_state=None)
+                    results = [[" ", ["<space>"], [2], hyp]] * nbest
+
+                batch_results = [results]
+
+            for key, results in zip(keys, batch_results):
+                _write_results(writer, key, results, nbest)
 
-            key = keys[0]
-            for n, (text, token, token_int, hyp) in zip(range(1, nbest + 1), results):
-                ibest_writer = writer[f"{n}best_recog"]
 
-                ibest_writer["token"][key] = " ".join(token)
-                ibest_writer["token_int"][key] = " ".join(map(str, token_int))
-                ibest_writer["score"][key] = str(hyp.score)
+def _decode_or_dummy(
+    speech2text: Speech2Text, speech: torch.Tensor, key: str
+) -> List[Any]:
+    try:
+        results = speech2text.hypotheses_to_results(speech2text(speech))
+    except TooShortUttError as e:
+        logging.warning(f"Utterance {key} {e}")
+        hyp = Hypothesis(score=0.0, yseq=[], dec_state=None)
+        results = [[" ", ["<space>"], [2], hyp]] * speech2text.nbest
+
+    return results
+
+
+def _write_results(
+    writer: DatadirWriter, key: str, results: List[Any], nbest: int
+) -> None:
+    for n, (text, token, token_int, hyp) in zip(range(1, nbest + 1), results):
+        ibest_writer = writer[f"{n}best_recog"]
+
+        ibest_writer["token"][key] = " ".join(token)
+        ibest_writer["token_int"][key] = " ".join(map(str, token_int))
+        ibest_writer["score"][key] = str(hyp.score)
 
-                if text is not None:
-                    ibest_writer["text"][key] = text
+        if text is not None:
+            ibest_writer["text"][key] = text
 
 
 def get_parser():
@@ -552,6 +655,7 @@ def get_parser():
         default=0,
         help="The number of gpus. 0 indicates CPU mode",
     )
+    add_parallel_inference_arguments(parser)
     parser.add_argument("--seed", type=int, default=0, help="Random seed")
     parser.add_argument(
         "--dtype",
@@ -701,7 +805,7 @@ def main(cmd=None):
     kwargs = vars(args)
 
     kwargs.pop("config", None)
-    inference(**kwargs)
+    run_inference(inference, kwargs)
 
 
 if __name__ == "__main__":
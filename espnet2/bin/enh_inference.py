@@ -28,6 +28,10 @@ from espnet2.torch_utils.device_funcs import to_device
 from espnet2.torch_utils.set_all_random_seed import set_all_random_seed
 from espnet2.train.abs_espnet_model import AbsESPnetModel
 from espnet2.utils import config_argparse
+from espnet2.utils.parallel_inference import (
+    add_parallel_inference_arguments,
+    run_inference,
+)
 from espnet2.utils.types import str2bool, str2triple_str, str_or_none
 from espnet.utils.cli_utils import get_commandline_args
 
@@ -109,6 +113,7 @@ class SeparateSpeech:
         hop_size: Optional[float] = None,
         normalize_segment_scale: bool = False,
         show_progressbar: bool = False,
+        segment_batch_size: int = 1,
         ref_channel: Optional[int] = None,
         normalize_output_wav: bool = False,
         device: str = "cpu",
@@ -172,6 +177,8 @@ class SeparateSpeech:
         self.normalize_segment_scale = normalize_segment_scale
         self.normalize_output_wav = normalize_output_wav
         self.show_progressbar = show_progressbar
+        # the number of segments stacked into a batch in segment-wise processing
+        self.segment_batch_size = segment_batch_size
 
         self.num_spk = enh_model.num_spk
         task = "enhancement" if self.num_spk == 1 else "separation"
@@ -277,7 +284,11 @@ class SeparateSpeech:
             else:
                 additional["mode"] = "no_dereverb"
 
-        if self.segmenting and lengths[0] > self.segment_size * fs:
+        segmenting = self.segmenting and lengths[0] > self.segment_size * fs
+        if segmenting and self.segment_batch_size > 1:
+            # Segment-wise speech enhancement/separation with batched segments
+            waves = self._separate_segments(speech_mix, lengths, fs, fs_, additional)
+        elif segmenting:
             # Segment-wise speech enhancement/separation
             overlap_length = int(np.round(fs * (self.segment_size - self.hop_size)))
             num_segments = int(
@@ -314,7 +325,7 @@ class SeparateSpeech:
                 ]
                 if speech_seg.dim() > 2:
                     # multi-channel speech
-                    speech_seg_ = speech_seg[:, self.ref_channel]
+                    speech_seg_ = speech_seg[..., self.ref_channel]
                 else:
                     speech_seg_ = speech_seg
 
@@ -400,6 +411,134 @@ class SeparateSpeech:
 
         return waves
 
+    def _separate_segments(self, speech_mix, lengths, fs, fs_, additional):
+        """Segment-wise enhancement/separation with the segments in batches.
+
+        Up to `segment_batch_size` segments are processed by one forward pass.
+        The permutations between all adjacent segments are solved at once and
+        the segments are stitched by a weighted overlap-and-add, which is
+        the same as the sequential stitching in `__call__`.
+        Unlike `__call__`, the permutation is solved between the overlapped
+        parts of the adjacent segments instead of the stitched waveform,
+        so the results can differ only if hop_size < segment_size / 2.
+
+        Args:
+            speech_mix: (Batch, Nsamples [, Channels])
+            lengths: (Batch,)
+        Returns:
+            [(Batch, Nsamples), ...] x num_spk
+        """
+        batch_size = speech_mix.size(0)
+        overlap_length = int(np.round(fs * (self.segment_size - self.hop_size)))
+        num_segments = int(
+            np.ceil((speech_mix.size(1) - overlap_length) / (self.hop_size * fs))
+        )
+        T = int(self.segment_size * fs)
+        # the shift of the stitched segments
+        H = T - overlap_length
+        starts = [int(i * self.hop_size * fs) for i in range(num_segments)]
+        # the valid lengths of the segments: (num_segments,)
+        ts = [min(T, int(lengths[0]) - st) for st in starts]
+
+        # the last segment is zero-padded
+        pad = starts[-1] + T - speech_mix.size(1)
+        if pad > 0:
+            speech_mix = torch.cat(
+                [
+                    speech_mix,
+                    speech_mix.new_zeros(batch_size, pad, *speech_mix.shape[2:]),
+                ],
+                dim=1,
+            )
+
+        enh_waves = []
+        range_ = trange if self.show_progressbar else range
+        for i in range_(0, num_segments, self.segment_batch_size):
+            sts = starts[i : i + self.segment_batch_size]
+            # (n_seg * Batch, T [, C])
+            speech_seg = torch.cat([speech_mix[:, st : st + T] for st in sts])
+            lengths_seg = speech_mix.new_full(
+                [speech_seg.size(0)], dtype=torch.long, fill_value=T
+            )
+            # b. Enhancement/Separation Forward
+            feats, f_lens = self.enh_model.encoder(speech_seg, lengths_seg, fs=fs_)
+            if isinstance(self.enh_model, ESPnetDiffusionModel):
+                feats = [self.enh_model.enhance(feats)]
+            else:
+                feats, _, _ = self.enh_model.separator(feats, f_lens, additional)
+            processed_wav = [
+                self.enh_model.decoder(f, lengths_seg, fs=fs_)[0] for f in feats
+            ]
+
+            if self.normalize_segment_scale:
+                if speech_seg.dim() > 2:
+                    # multi-channel speech
+                    speech_seg = speech_seg[..., self.ref_channel]
+                # normalize the scale to match the input mixture scale
+                t = lengths_seg.new_tensor(ts[i : i + len(sts)]).repeat_interleave(
+                    batch_size
+                )[:, None]
+                mask = torch.arange(T, device=t.device) < t
+                mix_energy = torch.sqrt(
+                    (speech_seg.pow(2) * mask).sum(dim=1, keepdim=True) / t
+                )
+                enh_energy = torch.sqrt(
+                    (sum(processed_wav).pow(2) * mask).sum(dim=1, keepdim=True) / t
+                )
+                processed_wav = [w * (mix_energy / enh_energy) for w in processed_wav]
+            # (num_spk, n_seg, Batch, T)
+            enh_waves.append(
+                torch.stack(processed_wav, dim=0).view(
+                    len(processed_wav), len(sts), batch_size, T
+                )
+            )
+        # (num_spk, num_segments, Batch, T)
+        enh_waves = torch.cat(enh_waves, dim=1)
+        num_spk = enh_waves.size(0)
+
+        # c. Align the permutations of the segments
+        # perms[i, b, s]: the stream of the i-th segment for the s-th output
+        perms = [torch.arange(num_spk, device=enh_waves.device).expand(batch_size, -1)]
+        if num_segments > 1:
+            # permutation between the adjacent segments: (num_segments - 1, B, num_spk)
+            pair_perms = self.cal_permumation(
+                enh_waves[:, :-1, :, H:].reshape(num_spk, -1, overlap_length),
+                enh_waves[:, 1:, :, :overlap_length].reshape(
+                    num_spk, -1, overlap_length
+                ),
+                criterion="si_snr",
+            ).view(num_segments - 1, batch_size, num_spk)
+            for perm in pair_perms.to(enh_waves.device):
+                perms.append(perm.gather(1, perms[-1]))
+        perms = torch.stack(perms, dim=0).permute(2, 0, 1)
+        enh_waves = enh_waves.gather(0, perms[..., None].expand_as(enh_waves))
+
+        # d. Stitch the enhanced segments together
+        # The weights reproduce the sequential overlap-and-add, where
+        # the overlapped part is averaged with the next segment each time.
+        i = torch.arange(num_segments)[:, None]
+        pos = i * H + torch.arange(T)[None]
+        # the number of the later segments averaged with each sample
+        first = torch.maximum(
+            i + 1, torch.div(pos - overlap_length, H, rounding_mode="floor") + 1
+        )
+        last = torch.div(pos, H, rounding_mode="floor").clamp(max=num_segments - 1)
+        weight = 0.5 ** (last - first + 1).clamp(min=0)
+        weight[1:, :overlap_length] /= 2
+        weight[-1, ts[-1] :] = 0
+        enh_waves = enh_waves * weight.to(enh_waves)[:, None]
+
+        waves = enh_waves.new_zeros(num_spk, batch_size, (num_segments - 1) * H + T)
+        waves.index_add_(
+            2,
+            pos.flatten().to(waves.device),
+            enh_waves.transpose(1, 2).reshape(num_spk, batch_size, -1),
+        )
+        waves = waves[:, :, : (num_segments - 1) * H + ts[-1]]
+        # ensure the stitched length is same as input
+        assert waves.size(2) == lengths[0], (waves.shape, lengths)
+        return torch.unbind(waves, dim=0)
+
     @torch.no_grad()
     def cal_permumation(self, ref_wavs, enh_wavs, criterion="si_snr"):
         """Calculate the permutation between seaprated streams in two adjacent segments.
@@ -478,6 +617,7 @@ def inference(
     hop_size: Optional[float],
     normalize_segment_scale: bool,
     show_progressbar: bool,
+    segment_batch_size: int,
     ref_channel: Optional[int],
     output_format: str,
     normalize_output_wav: bool,
@@ -510,6 +650,7 @@ def inference(
         hop_size=hop_size,
         normalize_segment_scale=normalize_segment_scale,
         show_progressbar=show_progressbar,
+        segment_batch_size=segment_batch_size,
         ref_channel=ref_channel,
         normalize_output_wav=normalize_output_wav,
         device=device,
@@ -600,6 +741,7 @@ def get_parser():
         default=0,
         help="The number of gpus. 0 indicates CPU mode",
     )
+    add_parallel_inference_arguments(parser)
     parser.add_argument("--seed", type=int, default=0, help="Random seed")
     parser.add_argument(
         "--dtype",
@@ -705,6 +847,13 @@ def get_parser():
         help="Whether to show a progress bar when performing segment-wise speech "
         "enhancement/separation",
     )
+    group.add_argument(
+        "--segment_batch_size",
+        type=int,
+        default=1,
+        help="The number of segments processed by one forward pass in segment-wise "
+        "speech enhancement/separation. The segments are processed one by one if 1",
+    )
     group.add_argument(
         "--ref_channel",
         type=int,
@@ -722,7 +871,7 @@ def main(cmd=None):
     args = parser.parse_args(cmd)
     kwargs = vars(args)
     kwargs.pop("config", None)
-    inference(**kwargs)
+    run_inference(inference, kwargs)
 
 
 if __name__ == "__main__":
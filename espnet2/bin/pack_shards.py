@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+import humanfriendly
+import numpy as np
+import soundfile
+
+from espnet2.fileio.packed_shard import PackedShardWriter
+from espnet2.fileio.read_text import read_2columns_text
+from espnet2.train.dataset import ESPnetDataset
+from espnet2.utils.types import str2triple_str, str_or_none
+from espnet.utils.cli_utils import get_commandline_args
+
+
+def _encoded_audio_file(value: str) -> Optional[Path]:
+    # A single audio file which can be stored as is without decoding
+    path = Path(value)
+    if (
+        len(value.split()) == 1
+        and path.suffix.lstrip(".").upper() in soundfile.available_formats()
+        and path.is_file()
+    ):
+        return path
+    return None
+
+
+def pack_shards(
+    data_path_and_name_and_type: Sequence[Tuple[str, str, str]],
+    output_dir: str,
+    key_file: Optional[str],
+    max_utts: int,
+    max_bytes: Optional[str],
+    log_level: str,
+):
+    logging.basicConfig(
+        level=log_level,
+        format="%(asctime)s (%(module)s:%(lineno)d) %(levelname)s: %(message)s",
+    )
+
+    dataset = ESPnetDataset(data_path_and_name_and_type)
+    # The audio files listed in "sound" scp files are packed without decoding
+    sound_scps = {
+        name: read_2columns_text(path)
+        for path, name, _type in data_path_and_name_and_type
+        if _type == "sound"
+    }
+
+    if key_file is not None:
+        with open(key_file, encoding="utf-8") as f:
+            keys = [line.rstrip().split(maxsplit=1)[0] for line in f]
+    else:
+        keys = list(dataset)
+
+    with PackedShardWriter(
+        output_dir,
+        max_utts=max_utts,
+        max_bytes=None if max_bytes is None else humanfriendly.parse_size(max_bytes),
+    ) as writer:
+        for i, uid in enumerate(keys, 1):
+            data = {}
+            for name, loader in dataset.loader_dict.items():
+                if name in sound_scps:
+                    path = _encoded_audio_file(sound_scps[name][uid])
+                    if path is not None:
+                        data[name] = path
+                        continue
+                value = loader[uid]
+                data[name] = value if isinstance(value, str) else np.asarray(value)
+            writer[uid] = data
+            if i % 10000 == 0:
+                logging.info(f"Packed {i} utterances")
+
+    logging.info(
+        f"Packed {len(keys)} utterances into {len(writer.shards)} shards: {output_dir}"
+    )
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Pack data files into tar shards for the shard iterator",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--log_level",
+        type=lambda x: x.upper(),
+        default="INFO",
+        choices=("CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG", "NOTSET"),
+        help="The verbose level of logging",
+    )
+
+    parser.add_argument(
+        "--data_path_and_name_and_type",
+        type=str2triple_str,
+        required=True,
+        action="append",
+        help="e.g. '--data_path_and_name_and_type dump/raw/train/wav.scp,speech,sound'",
+    )
+    parser.add_argument(
+        "--key_file",
+        type=str_or_none,
+        default=None,
+        help="The keys to be packed, e.g. a shape file. "
+        "If not given, the keys of the first data file are used",
+    )
+    parser.add_argument("--output_dir", required=True, help="Output directory")
+    parser.add_argument(
+        "--max_utts", type=int, default=1000, help="Max utterances of each shard"
+    )
+    parser.add_argument(
+        "--max_bytes",
+        type=str_or_none,
+        default=None,
+        help="Max bytes of each shard, e.g. '1GB'",
+    )
+    return parser
+
+
+def main(cmd=None):
+    print(get_commandline_args(), file=sys.stderr)
+    parser = get_parser()
+    args = parser.parse_args(cmd)
+    kwargs = vars(args)
+    pack_shards(**kwargs)
+
+
+if __name__ == "__main__":
+    main()
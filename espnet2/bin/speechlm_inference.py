@@ -18,12 +18,17 @@ from typeguard import typechecked
 
 from espnet2.speechlm.core_lm.abs_core_lm import SpeechLMInferenceOptions
 from espnet2.speechlm.definitions import tasks as speechlm_tasks
+from espnet2.speechlm.engine import SpeechLMGenerationEngine
 from espnet2.tasks.speechlm import SpeechLMTask
 
 # utilities
 from espnet2.torch_utils.device_funcs import to_device
 from espnet2.torch_utils.set_all_random_seed import set_all_random_seed
 from espnet2.utils import config_argparse
+from espnet2.utils.parallel_inference import (
+    add_parallel_inference_arguments,
+    run_inference,
+)
 from espnet2.utils.types import str2bool, str2triple_str, str_or_none
 from espnet.utils.cli_utils import get_commandline_args
 
@@ -137,13 +142,20 @@ class SpeechLM:
             return None, None, None
 
         # post-processing
-        generated = []
-        for gen_token in gen_tokens:
-            gen_token = gen_token - self.bias
-            generated.append(self.post_processor(gen_token))
+        generated = [self.post_process(gen_token) for gen_token in gen_tokens]
 
         return generated, gen_tokens, gen_scores
 
+    def build_engine(self, n_slots: int, max_len: int) -> SpeechLMGenerationEngine:
+        """Build a continuous batching engine sharing the model and options."""
+        return SpeechLMGenerationEngine(
+            self.model.corelm, self.inference_opts, n_slots=n_slots, max_len=max_len
+        )
+
+    def post_process(self, gen_token: torch.Tensor) -> Any:
+        """Transform the generated tokens into the target modality."""
+        return self.post_processor(gen_token - self.bias)
+
     @staticmethod
     def from_pretrained(
         model_tag: Optional[str] = None,
@@ -180,13 +192,16 @@ def inference(
     minlenratio: float = 0.0,
     maxlenratio: float = 10.0,
     inference_nj: Optional[int] = 1,
+    engine_max_len: int = 4096,
     # post_processor related
     postprocessor: str = None,
     postprocessor_conf: dict = {},
 ):
-    """Run SpeechLM inference."""
-    if batch_size > 1:
-        raise NotImplementedError("batch decoding is not implemented")
+    """Run SpeechLM inference.
+
+    If batch_size > 1, the examples are decoded by continuous batching with
+    batch_size slots: a new request is admitted as soon as another finishes.
+    """
     if ngpu > 1:
         raise NotImplementedError("only single GPU decoding is supported")
     logging.basicConfig(
@@ -234,7 +249,7 @@ def inference(
     loader = SpeechLMTask.build_streaming_iterator(
         data_path_and_name_and_type,
         dtype=dtype,
-        batch_size=batch_size,
+        batch_size=1,
         key_file=key_file,
         num_workers=num_workers,
         preprocess_fn=SpeechLMTask.build_preprocess_fn(speechlm.train_args, False),
@@ -254,6 +269,46 @@ def inference(
     token_writer = WriteHelper(f'ark:{str(output_dir / "token" / "token")}.ark')
     score_writer = WriteHelper(f'ark:{str(output_dir / "score" / "score")}.ark')
 
+    def write_example(example_name, content, token, score):
+        if output_modality == "codec":
+            wave_path = output_dir / output_name / f"{example_name}.wav"
+            writer.write(f"{example_name} {str(wave_path)}\n")
+
+            torchaudio.save(
+                wave_path,
+                content.cpu(),
+                sample_rate=speechlm.post_processor.sample_rate,
+            )
+            logging.info(f"save audio {example_name}: {wave_path}")
+
+        else:
+            raise NotImplementedError(
+                f"Output modality {output_modality} is not supported"
+            )
+
+        if isinstance(token, torch.Tensor):
+            token = token.int().flatten().cpu().numpy()
+        if isinstance(score, torch.Tensor):
+            score = score.float().flatten().cpu().numpy()
+
+        token_writer[example_name] = token
+        score_writer[example_name] = score
+
+    def write_results(results):
+        for result in results:
+            key, h_idx = result.request_id
+            if not result.finished:
+                logging.info(f"fail on example: {key}_sample{h_idx}")
+                continue
+            content = speechlm.post_process(result.tokens)
+            write_example(f"{key}_sample{h_idx}", content, result.tokens, result.scores)
+
+    engine = (
+        speechlm.build_engine(n_slots=batch_size, max_len=engine_max_len)
+        if batch_size > 1
+        else None
+    )
+
     for _, (keys, batch) in enumerate(loader, 1):
         assert isinstance(batch, dict), type(batch)
         assert all(isinstance(s, str) for s in keys), keys
@@ -264,37 +319,30 @@ def inference(
         key = keys[0]
         logging.info(f"Inference on example: {key}")
 
+        if engine is not None:
+            # each hypothesis is an independent request of the engine
+            prefix = batch["dec_seq"][:, : batch["prefix_len"].squeeze()]
+            try:
+                for h_idx in range(nbest):
+                    engine.submit(prefix, request_id=(key, h_idx))
+            except ValueError as e:
+                logging.info(f"fail on example: {key}: {e}")
+                continue
+            # keep decoding while all the slots can be filled
+            while engine.pending.qsize() >= batch_size:
+                write_results(engine.step())
+            continue
+
         contents, tokens, scores = speechlm(**batch)
         if contents is None:
             logging.info(f"fail on example: {key}")
             continue
 
         for h_idx, (content, token, score) in enumerate(zip(contents, tokens, scores)):
-            example_name = f"{key}_sample{h_idx}"
-
-            if output_modality == "codec":
-                wave_path = output_dir / output_name / f"{example_name}.wav"
-                writer.write(f"{example_name} {str(wave_path)}\n")
-
-                torchaudio.save(
-                    wave_path,
-                    content.cpu(),
-                    sample_rate=speechlm.post_processor.sample_rate,
-                )
-                logging.info(f"save audio {example_name}: {wave_path}")
-
-            else:
-                raise NotImplementedError(
-                    f"Output modality {output_modality} is not supported"
-                )
+            write_example(f"{key}_sample{h_idx}", content, token, score)
 
-            if isinstance(token, torch.Tensor):
-                token = token.int().flatten().cpu().numpy()
-            if isinstance(score, torch.Tensor):
-                score = score.float().flatten().cpu().numpy()
-
-            token_writer[example_name] = token
-            score_writer[example_name] = score
+    if engine is not None:
+        write_results(engine.run())
 
 
 def get_parser():
@@ -326,6 +374,7 @@ def get_parser():
         default=0,
         help="The number of gpus. 0 indicates CPU mode",
     )
+    add_parallel_inference_arguments(parser)
     parser.add_argument(
         "--seed",
         type=int,
@@ -425,6 +474,13 @@ def get_parser():
         default=None,
         help="nj used in inference, should be the same/smaller than the nq in train",
     )
+    group.add_argument(
+        "--engine_max_len",
+        type=int,
+        default=4096,
+        help="Maximum length of prefix plus generated tokens of each request "
+        "when batch_size > 1, i.e., in continuous batching",
+    )
 
     group = parser.add_argument_group("Postprocessor related")
 
@@ -438,7 +494,7 @@ def main(cmd=None):
     args = parser.parse_args(cmd)
     kwargs = vars(args)
     kwargs.pop("config", None)
-    inference(**kwargs)
+    run_inference(inference, kwargs)
 
 
 if __name__ == "__main__":
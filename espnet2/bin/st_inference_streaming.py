@@ -25,6 +25,10 @@ from espnet2.text.token_id_converter import TokenIDConverter
 from espnet2.torch_utils.device_funcs import to_device
 from espnet2.torch_utils.set_all_random_seed import set_all_random_seed
 from espnet2.utils import config_argparse
+from espnet2.utils.parallel_inference import (
+    add_parallel_inference_arguments,
+    run_inference,
+)
 from espnet2.utils.types import str2bool, str2triple_str, str_or_none
 from espnet.nets.batch_beam_search_online import BatchBeamSearchOnline
 from espnet.nets.beam_search import Hypothesis
@@ -86,6 +90,7 @@ class Speech2TextStreaming:
         hold_n: int = 0,
         transducer_conf: Optional[dict] = None,
         hugging_face_decoder: bool = False,
+        incremental_frontend: bool = False,
     ):
 
         # 1. Build ST model
@@ -180,7 +185,7 @@ class Speech2TextStreaming:
             hugging_face_model.to(device=device).eval()
 
             # hacky way to use .score()
-            st_model.decoder.***REMOVED***generate = hugging_face_model
+            st_model.decoder.hf_generate = hugging_face_model
             weights = dict(
                 decoder=1.0 - ctc_weight,
                 ctc=ctc_weight,
@@ -297,6 +302,12 @@ class Speech2TextStreaming:
             self.win_length = st_train_args.frontend_conf["win_length"]
         else:
             self.win_length = self.n_fft
+        if incremental_frontend and not hasattr(st_model.frontend, "forward_streaming"):
+            raise ValueError(
+                "incremental_frontend requires a frontend having forward_streaming: "
+                f"{type(st_model.frontend).__name__}"
+            )
+        self.incremental_frontend = incremental_frontend
 
         self.reset()
 
@@ -309,6 +320,9 @@ class Speech2TextStreaming:
     def apply_frontend(
         self, speech: torch.Tensor, prev_states=None, is_final: bool = False
     ):
+        if self.incremental_frontend:
+            return self._incremental_frontend(speech, prev_states, is_final)
+
         if prev_states is not None:
             buf = prev_states["waveform_buffer"]
             speech = torch.cat([buf, speech], dim=0)
@@ -384,6 +398,24 @@ class Speech2TextStreaming:
             next_states = {"waveform_buffer": waveform_buffer}
         return feats, feats_lengths, next_states
 
+    def _incremental_frontend(
+        self, speech: torch.Tensor, prev_states=None, is_final: bool = False
+    ):
+        # Compute only the new frames without re-concatenating the waveform
+        speech = speech.unsqueeze(0).to(
+            dtype=getattr(torch, self.dtype), device=self.device
+        )
+        feats, feats_lengths, next_states = self.st_model.frontend.forward_streaming(
+            speech, prev_states, is_final
+        )
+        if is_final:
+            next_states = None
+        elif feats.size(1) == 0:
+            return None, None, next_states
+        if self.st_model.normalize is not None:
+            feats, feats_lengths = self.st_model.normalize(feats, feats_lengths)
+        return feats, feats_lengths, next_states
+
     @torch.no_grad()
     @typechecked
     def __call__(
@@ -408,6 +440,8 @@ class Speech2TextStreaming:
             feats, feats_lengths, self.frontend_states = self.apply_frontend(
                 speech, self.frontend_states, is_final=is_final
             )
+            if feats is None:
+                return []
             enc, _, self.encoder_states = self.st_model.encoder(
                 feats,
                 feats_lengths,
@@ -496,6 +530,7 @@ def inference(
     hold_n: int,
     transducer_conf: Optional[dict],
     hugging_face_decoder: bool,
+    incremental_frontend: bool,
 ):
     if batch_size > 1:
         raise NotImplementedError("batch decoding is not implemented")
@@ -544,6 +579,7 @@ def inference(
         hold_n=hold_n,
         transducer_conf=transducer_conf,
         hugging_face_decoder=hugging_face_decoder,
+        incremental_frontend=incremental_frontend,
     )
 
     # 3. Build data-iterator
@@ -649,6 +685,7 @@ def get_parser():
         default=0,
         help="The number of gpus. 0 indicates CPU mode",
     )
+    add_parallel_inference_arguments(parser)
     parser.add_argument("--seed", type=int, default=0, help="Random seed")
     parser.add_argument(
         "--dtype",
@@ -729,6 +766,13 @@ def get_parser():
         default=0,
         help="Limit the lengths of the text" "to input to the decoder.",
     )
+    group.add_argument(
+        "--incremental_frontend",
+        type=str2bool,
+        default=False,
+        help="Compute only the new frames of each chunk in the frontend, "
+        "which gives the same features as the entire utterance",
+    )
 
     group = parser.add_argument_group("Text converter related")
     group.add_argument(
@@ -792,7 +836,7 @@ def main(cmd=None):
     args = parser.parse_args(cmd)
     kwargs = vars(args)
     kwargs.pop("config", None)
-    inference(**kwargs)
+    run_inference(inference, kwargs)
 
 
 if __name__ == "__main__":
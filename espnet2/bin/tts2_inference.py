@@ -23,6 +23,10 @@ from espnet2.torch_utils.set_all_random_seed import set_all_random_seed
 from espnet2.tts2.fastspeech2 import FastSpeech2Discrete
 from espnet2.tts.utils import DurationCalculator
 from espnet2.utils import config_argparse
+from espnet2.utils.parallel_inference import (
+    add_parallel_inference_arguments,
+    run_inference,
+)
 from espnet2.utils.types import str2bool, str2triple_str, str_or_none
 from espnet.utils.cli_utils import get_commandline_args
 
@@ -543,6 +547,7 @@ def get_parser():
         default=0,
         help="The number of gpus. 0 indicates CPU mode",
     )
+    add_parallel_inference_arguments(parser)
     parser.add_argument(
         "--seed",
         type=int,
@@ -698,7 +703,7 @@ def main(cmd=None):
     args = parser.parse_args(cmd)
     kwargs = vars(args)
     kwargs.pop("config", None)
-    inference(**kwargs)
+    run_inference(inference, kwargs)
 
 
 if __name__ == "__main__":
@@ -8,7 +8,17 @@ import shutil
 import sys
 import time
 from pathlib import Path
-from typing import Any, Dict, Optional, Sequence, Tuple, Union
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 import soundfile as sf
@@ -27,9 +37,25 @@ from espnet2.tts.tacotron2 import Tacotron2
 from espnet2.tts.transformer import Transformer
 from espnet2.tts.utils import DurationCalculator
 from espnet2.utils import config_argparse
+from espnet2.utils.parallel_inference import (
+    add_parallel_inference_arguments,
+    run_inference,
+)
 from espnet2.utils.types import str2bool, str2triple_str, str_or_none
+from espnet.nets.pytorch_backend.nets_utils import pad_list
 from espnet.utils.cli_utils import get_commandline_args
 
+# The keys of the lengths to trim each padded output of batch inference
+_BATCH_OUTPUT_LENGTHS = dict(
+    feat_gen=("feat_gen_lengths",),
+    feat_gen_denorm=("feat_gen_lengths",),
+    duration=("duration_lengths",),
+    pitch=("duration_lengths",),
+    energy=("duration_lengths",),
+    wav=("wav_lengths",),
+    att_w=("feats_lengths", "duration_lengths"),
+)
+
 
 class Text2Speech:
     """Text2Speech class.
@@ -214,6 +240,110 @@ class Text2Speech:
 
         return output_dict
 
+    @torch.no_grad()
+    @typechecked
+    def batch_inference(
+        self,
+        texts: Sequence[Union[str, torch.Tensor, np.ndarray]],
+        spembs: Optional[Sequence[Union[torch.Tensor, np.ndarray]]] = None,
+        sids: Optional[Sequence[Union[torch.Tensor, np.ndarray]]] = None,
+        lids: Optional[Sequence[Union[torch.Tensor, np.ndarray]]] = None,
+        decode_conf: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, torch.Tensor]]:
+        """Run text-to-speech for a batch of texts with non-autoregressive models.
+
+        The texts are synthesized by one forward of the padded batch, and the
+        vocoder runs once on the padded features if it has batch_forward. The
+        outputs are trimmed by the predicted lengths, so sorting the texts by
+        their lengths beforehand keeps the padding small.
+
+        Returns:
+            List[Dict[str, Tensor]]: The outputs of each text as __call__.
+
+        """
+        if not self.use_batch_inference:
+            raise NotImplementedError(
+                f"batch inference is not supported for {type(self.tts).__name__}"
+            )
+        if self.use_sids and sids is None:
+            raise RuntimeError("Missing required argument: 'sids'")
+        if self.use_lids and lids is None:
+            raise RuntimeError("Missing required argument: 'lids'")
+        if self.use_spembs and spembs is None:
+            raise RuntimeError("Missing required argument: 'spembs'")
+
+        # prepare batch
+        texts = [
+            (
+                self.preprocess_fn("<dummy>", dict(text=text))["text"]
+                if isinstance(text, str)
+                else text
+            )
+            for text in texts
+        ]
+        texts = [torch.as_tensor(text) for text in texts]
+        batch = dict(
+            text=pad_list(texts, 0),
+            text_lengths=torch.tensor([len(text) for text in texts]),
+        )
+        for name, values in [("spembs", spembs), ("sids", sids), ("lids", lids)]:
+            if values is not None:
+                batch[name] = torch.stack([torch.as_tensor(v) for v in values])
+        batch = to_device(batch, self.device)
+
+        # overwrite the decode configs if provided
+        cfg = self.decode_conf
+        if decode_conf is not None:
+            cfg = self.decode_conf.copy()
+            cfg.update(decode_conf)
+
+        # inference
+        if self.always_fix_seed:
+            set_all_random_seed(self.seed)
+        batch_output_dict = self.model.batch_inference(**batch, **cfg)
+
+        # apply vocoder (mel-to-wav) on the padded batch
+        wavs = None
+        if self.vocoder is not None:
+            if (
+                self.prefer_normalized_feats
+                or batch_output_dict.get("feat_gen_denorm") is None
+            ):
+                input_feats = batch_output_dict["feat_gen"]
+            else:
+                input_feats = batch_output_dict["feat_gen_denorm"]
+            input_feats_lengths = batch_output_dict["feat_gen_lengths"]
+            if hasattr(self.vocoder, "batch_forward"):
+                wavs = self.vocoder.batch_forward(input_feats, input_feats_lengths)
+            else:
+                wavs = [
+                    self.vocoder(feat[:length])
+                    for feat, length in zip(input_feats, input_feats_lengths)
+                ]
+
+        output_dicts = []
+        for i in range(len(texts)):
+            # trim the padded outputs by their lengths
+            output_dict = {}
+            for key, value in batch_output_dict.items():
+                if key.endswith("_lengths"):
+                    continue
+                lengths_keys = _BATCH_OUTPUT_LENGTHS.get(key, ())
+                output_dict[key] = value[i][
+                    tuple(slice(int(batch_output_dict[k][i])) for k in lengths_keys)
+                ]
+
+            # calculate additional metrics
+            if output_dict.get("att_w") is not None:
+                duration, focus_rate = self.duration_calculator(output_dict["att_w"])
+                output_dict.update(duration=duration, focus_rate=focus_rate)
+
+            if wavs is not None:
+                output_dict.update(wav=wavs[i])
+            output_dicts.append(output_dict)
+
+        return output_dicts
+
     @property
     def fs(self) -> Optional[int]:
         """Return sampling rate."""
@@ -224,6 +354,11 @@ class Text2Speech:
         else:
             return None
 
+    @property
+    def use_batch_inference(self) -> bool:
+        """Return the batch inference is available or not."""
+        return hasattr(self.tts, "batch_inference") and not self.use_speech
+
     @property
     def use_speech(self) -> bool:
         """Return speech is needed or not in the inference."""
@@ -310,6 +445,7 @@ class Text2Speech:
 def inference(
     output_dir: Union[Path, str],
     batch_size: int,
+    bucket_size: int,
     dtype: str,
     ngpu: int,
     seed: int,
@@ -337,8 +473,6 @@ def inference(
     vocoder_tag: Optional[str],
 ):
     """Run text-to-speech inference."""
-    if batch_size > 1:
-        raise NotImplementedError("batch decoding is not implemented")
     if ngpu > 1:
         raise NotImplementedError("only single GPU decoding is supported")
     logging.basicConfig(
@@ -381,6 +515,11 @@ def inference(
         **text2speech_kwargs,
     )
 
+    if batch_size > 1 and not text2speech.use_batch_inference:
+        raise NotImplementedError(
+            f"batch decoding is not implemented for {type(text2speech.tts).__name__}"
+        )
+
     # 3. Build data-iterator
     if not text2speech.use_speech:
         data_path_and_name_and_type = list(
@@ -389,7 +528,7 @@ def inference(
     loader = TTSTask.build_streaming_iterator(
         data_path_and_name_and_type,
         dtype=dtype,
-        batch_size=batch_size,
+        batch_size=1,
         key_file=key_file,
         num_workers=num_workers,
         preprocess_fn=TTSTask.build_preprocess_fn(text2speech.train_args, False),
@@ -428,119 +567,152 @@ def inference(
     ) as duration_writer, open(
         output_dir / "focus_rates/focus_rates", "w"
     ) as focus_rate_writer:
-        for idx, (keys, batch) in enumerate(loader, 1):
-            assert isinstance(batch, dict), type(batch)
-            assert all(isinstance(s, str) for s in keys), keys
-            _bs = len(next(iter(batch.values())))
-            assert _bs == 1, _bs
-
-            # Change to single sequence and remove *_length
-            # because inference() requires 1-seq, not mini-batch.
-            batch = {k: v[0] for k, v in batch.items() if not k.endswith("_lengths")}
-
-            start_time = time.perf_counter()
-            output_dict = text2speech(**batch)
-
-            key = keys[0]
-            insize = next(iter(batch.values())).size(0) + 1
-            if output_dict.get("feat_gen") is not None:
-                # standard text2mel model case
-                feat_gen = output_dict["feat_gen"]
-                logging.info(
-                    "inference speed = {:.1f} frames / sec.".format(
-                        int(feat_gen.size(0)) / (time.perf_counter() - start_time)
+        # The elapsed time and the generated seconds of each batch size
+        rtf_stats = {}
+        for order, results in _synthesize(text2speech, loader, batch_size, bucket_size):
+            outputs = {}
+            for keys, batches, output_dicts, elapsed in results:
+                if output_dicts[0].get("feat_gen") is not None:
+                    # standard text2mel model case
+                    n_frames = sum(int(d["feat_gen"].size(0)) for d in output_dicts)
+                    logging.info(
+                        "inference speed = {:.1f} frames / sec.".format(
+                            n_frames / elapsed
+                        )
                     )
-                )
-                logging.info(f"{key} (size:{insize}->{feat_gen.size(0)})")
-                if feat_gen.size(0) == insize * maxlenratio:
-                    logging.warning(f"output length reaches maximum length ({key}).")
-
-                norm_writer[key] = output_dict["feat_gen"].cpu().numpy()
-                shape_writer.write(
-                    f"{key} " + ",".join(map(str, output_dict["feat_gen"].shape)) + "\n"
-                )
-                if output_dict.get("feat_gen_denorm") is not None:
-                    denorm_writer[key] = output_dict["feat_gen_denorm"].cpu().numpy()
-            else:
-                # end-to-end text2wav model case
-                wav = output_dict["wav"]
-                logging.info(
-                    "inference speed = {:.1f} points / sec.".format(
-                        int(wav.size(0)) / (time.perf_counter() - start_time)
+                else:
+                    # end-to-end text2wav model case
+                    n_points = sum(int(d["wav"].size(0)) for d in output_dicts)
+                    logging.info(
+                        "inference speed = {:.1f} points / sec.".format(
+                            n_points / elapsed
+                        )
+                    )
+                if (
+                    output_dicts[0].get("wav") is not None
+                    and text2speech.fs is not None
+                ):
+                    seconds = sum(int(d["wav"].size(0)) for d in output_dicts)
+                    seconds /= text2speech.fs
+                    stats = rtf_stats.setdefault(len(keys), [0.0, 0.0])
+                    stats[0] += elapsed
+                    stats[1] += seconds
+                    logging.info(
+                        f"RTF = {elapsed / seconds:.4f} (batch size: {len(keys)})"
+                    )
+                outputs.update(zip(keys, zip(batches, output_dicts)))
+
+            # write the outputs of each bucket in the input order
+            for key in order:
+                batch, output_dict = outputs[key]
+                insize = next(iter(batch.values())).size(0) + 1
+                if output_dict.get("feat_gen") is not None:
+                    # standard text2mel model case
+                    feat_gen = output_dict["feat_gen"]
+                    logging.info(f"{key} (size:{insize}->{feat_gen.size(0)})")
+                    if feat_gen.size(0) == insize * maxlenratio:
+                        logging.warning(
+                            f"output length reaches maximum length ({key})."
+                        )
+
+                    norm_writer[key] = output_dict["feat_gen"].cpu().numpy()
+                    shape_writer.write(
+                        f"{key} "
+                        + ",".join(map(str, output_dict["feat_gen"].shape))
+                        + "\n"
+                    )
+                    if output_dict.get("feat_gen_denorm") is not None:
+                        denorm_writer[key] = (
+                            output_dict["feat_gen_denorm"].cpu().numpy()
+                        )
+                else:
+                    # end-to-end text2wav model case
+                    wav = output_dict["wav"]
+                    logging.info(f"{key} (size:{insize}->{wav.size(0)})")
+
+                if output_dict.get("duration") is not None:
+                    # Save duration and fucus rates
+                    duration_writer.write(
+                        f"{key} "
+                        + " ".join(
+                            map(str, output_dict["duration"].long().cpu().numpy())
+                        )
+                        + "\n"
                     )
-                )
-                logging.info(f"{key} (size:{insize}->{wav.size(0)})")
-
-            if output_dict.get("duration") is not None:
-                # Save duration and fucus rates
-                duration_writer.write(
-                    f"{key} "
-                    + " ".join(map(str, output_dict["duration"].long().cpu().numpy()))
-                    + "\n"
-                )
 
-            if output_dict.get("focus_rate") is not None:
-                focus_rate_writer.write(
-                    f"{key} {float(output_dict['focus_rate']):.5f}\n"
-                )
+                if output_dict.get("focus_rate") is not None:
+                    focus_rate_writer.write(
+                        f"{key} {float(output_dict['focus_rate']):.5f}\n"
+                    )
 
-            if output_dict.get("att_w") is not None:
-                # Plot attention weight
-                att_w = output_dict["att_w"].cpu().numpy()
-
-                if att_w.ndim == 2:
-                    att_w = att_w[None][None]
-                elif att_w.ndim != 4:
-                    raise RuntimeError(f"Must be 2 or 4 dimension: {att_w.ndim}")
-
-                w, h = plt.figaspect(att_w.shape[0] / att_w.shape[1])
-                fig = plt.Figure(
-                    figsize=(
-                        w * 1.3 * min(att_w.shape[0], 2.5),
-                        h * 1.3 * min(att_w.shape[1], 2.5),
+                if output_dict.get("att_w") is not None:
+                    # Plot attention weight
+                    att_w = output_dict["att_w"].cpu().numpy()
+
+                    if att_w.ndim == 2:
+                        att_w = att_w[None][None]
+                    elif att_w.ndim != 4:
+                        raise RuntimeError(f"Must be 2 or 4 dimension: {att_w.ndim}")
+
+                    w, h = plt.figaspect(att_w.shape[0] / att_w.shape[1])
+                    fig = plt.Figure(
+                        figsize=(
+                            w * 1.3 * min(att_w.shape[0], 2.5),
+                            h * 1.3 * min(att_w.shape[1], 2.5),
+                        )
                     )
-                )
-                fig.suptitle(f"{key}")
-                axes = fig.subplots(att_w.shape[0], att_w.shape[1])
-                if len(att_w) == 1:
-                    axes = [[axes]]
-                for ax, att_w in zip(axes, att_w):
-                    for ax_, att_w_ in zip(ax, att_w):
-                        ax_.imshow(att_w_.astype(np.float32), aspect="auto")
-                        ax_.set_xlabel("Input")
-                        ax_.set_ylabel("Output")
-                        ax_.xaxis.set_major_locator(MaxNLocator(integer=True))
-                        ax_.yaxis.set_major_locator(MaxNLocator(integer=True))
-
-                fig.set_tight_layout({"rect": [0, 0.03, 1, 0.95]})
-                fig.savefig(output_dir / f"att_ws/{key}.png")
-                fig.clf()
-
-            if output_dict.get("prob") is not None:
-                # Plot stop token prediction
-                prob = output_dict["prob"].cpu().numpy()
-
-                fig = plt.Figure()
-                ax = fig.add_subplot(1, 1, 1)
-                ax.plot(prob)
-                ax.set_title(f"{key}")
-                ax.set_xlabel("Output")
-                ax.set_ylabel("Stop probability")
-                ax.set_ylim(0, 1)
-                ax.grid(which="both")
-
-                fig.set_tight_layout(True)
-                fig.savefig(output_dir / f"probs/{key}.png")
-                fig.clf()
-
-            if output_dict.get("wav") is not None:
-                # TODO(kamo): Write scp
-                sf.write(
-                    f"{output_dir}/wav/{key}.wav",
-                    output_dict["wav"].cpu().numpy(),
-                    text2speech.fs,
-                    "PCM_16",
-                )
+                    fig.suptitle(f"{key}")
+                    axes = fig.subplots(att_w.shape[0], att_w.shape[1])
+                    if len(att_w) == 1:
+                        axes = [[axes]]
+                    for ax, att_w in zip(axes, att_w):
+                        for ax_, att_w_ in zip(ax, att_w):
+                            ax_.imshow(att_w_.astype(np.float32), aspect="auto")
+                            ax_.set_xlabel("Input")
+                            ax_.set_ylabel("Output")
+                            ax_.xaxis.set_major_locator(MaxNLocator(integer=True))
+                            ax_.yaxis.set_major_locator(MaxNLocator(integer=True))
+
+                    fig.set_tight_layout({"rect": [0, 0.03, 1, 0.95]})
+                    fig.savefig(output_dir / f"att_ws/{key}.png")
+                    fig.clf()
+
+                if output_dict.get("prob") is not None:
+                    # Plot stop token prediction
+                    prob = output_dict["prob"].cpu().numpy()
+
+                    fig = plt.Figure()
+                    ax = fig.add_subplot(1, 1, 1)
+                    ax.plot(prob)
+                    ax.set_title(f"{key}")
+                    ax.set_xlabel("Output")
+                    ax.set_ylabel("Stop probability")
+                    ax.set_ylim(0, 1)
+                    ax.grid(which="both")
+
+                    fig.set_tight_layout(True)
+                    fig.savefig(output_dir / f"probs/{key}.png")
+                    fig.clf()
+
+                if output_dict.get("wav") is not None:
+                    # TODO(kamo): Write scp
+                    sf.write(
+                        f"{output_dir}/wav/{key}.wav",
+                        output_dict["wav"].cpu().numpy(),
+                        text2speech.fs,
+                        "PCM_16",
+                    )
+            for writer in (
+                norm_writer,
+                denorm_writer,
+                shape_writer,
+                duration_writer,
+                focus_rate_writer,
+            ):
+                writer.flush()
+
+    for bs, (elapsed, seconds) in sorted(rtf_stats.items()):
+        logging.info(f"RTF = {elapsed / seconds:.4f} in total (batch size: {bs})")
 
     # remove files if those are not included in output dict
     if output_dict.get("feat_gen") is None:
@@ -559,6 +731,81 @@ def inference(
         shutil.rmtree(output_dir / "wav")
 
 
+def _synthesize(
+    text2speech: Text2Speech,
+    loader: Iterable[Tuple[List[str], Dict[str, torch.Tensor]]],
+    batch_size: int,
+    bucket_size: int,
+) -> Iterator[
+    Tuple[
+        List[str],
+        List[Tuple[List[str], List[Dict[str, Any]], List[Dict[str, Any]], float]],
+    ]
+]:
+    """Synthesize the inputs of the loader by the batches of batch_size.
+
+    If batch_size > 1, the inputs are read by the buckets of bucket_size and
+    sorted by the lengths of the texts in each bucket, so that each batch has
+    the texts of similar lengths.
+
+    Yields:
+        The keys of each bucket in the input order, and the keys, inputs,
+        outputs, and the elapsed time of each batch in the bucket.
+
+    """
+    items = []
+    for keys, batch in loader:
+        assert isinstance(batch, dict), type(batch)
+        assert all(isinstance(s, str) for s in keys), keys
+        _bs = len(next(iter(batch.values())))
+        assert _bs == 1, _bs
+
+        # Change to single sequence and remove *_length
+        # because inference() requires 1-seq, not mini-batch.
+        batch = {k: v[0] for k, v in batch.items() if not k.endswith("_lengths")}
+
+        if batch_size == 1:
+            start_time = time.perf_counter()
+            output_dict = text2speech(**batch)
+            elapsed = time.perf_counter() - start_time
+            yield keys, [(keys, [batch], [output_dict], elapsed)]
+        else:
+            items.append((keys[0], batch))
+            if len(items) >= max(bucket_size, batch_size):
+                yield _synthesize_bucket(text2speech, items, batch_size)
+                items = []
+    if len(items) > 0:
+        yield _synthesize_bucket(text2speech, items, batch_size)
+
+
+def _synthesize_bucket(
+    text2speech: Text2Speech,
+    items: List[Tuple[str, Dict[str, torch.Tensor]]],
+    batch_size: int,
+) -> Tuple[
+    List[str],
+    List[Tuple[List[str], List[Dict[str, Any]], List[Dict[str, Any]], float]],
+]:
+    """Synthesize a bucket of the inputs by the length-sorted batches."""
+    order = [key for key, _ in items]
+    # length-sorted bucketing to reduce the padding in the batches
+    items = sorted(items, key=lambda item: len(item[1]["text"]), reverse=True)
+    results = []
+    for i in range(0, len(items), batch_size):
+        keys, batches = map(list, zip(*items[i : i + batch_size]))
+        inputs = {
+            k: [batch[k] for batch in batches]
+            for k in ("spembs", "sids", "lids")
+            if k in batches[0]
+        }
+        start_time = time.perf_counter()
+        output_dicts = text2speech.batch_inference(
+            [batch["text"] for batch in batches], **inputs
+        )
+        results.append((keys, batches, output_dicts, time.perf_counter() - start_time))
+    return order, results
+
+
 def get_parser():
     """Get argument parser."""
     parser = config_argparse.ArgumentParser(
@@ -588,6 +835,7 @@ def get_parser():
         default=0,
         help="The number of gpus. 0 indicates CPU mode",
     )
+    add_parallel_inference_arguments(parser)
     parser.add_argument(
         "--seed",
         type=int,
@@ -610,7 +858,15 @@ def get_parser():
         "--batch_size",
         type=int,
         default=1,
-        help="The batch size for inference",
+        help="The batch size for inference. If > 1, the inputs are sorted by the "
+        "text lengths and synthesized by batches with non-autoregressive models",
+    )
+    parser.add_argument(
+        "--bucket_size",
+        type=int,
+        default=256,
+        help="The number of inputs sorted by the text lengths at once if "
+        "batch_size > 1. The outputs are written in the input order per bucket",
     )
 
     group = parser.add_argument_group("Input data related")
@@ -743,7 +999,7 @@ def main(cmd=None):
     args = parser.parse_args(cmd)
     kwargs = vars(args)
     kwargs.pop("config", None)
-    inference(**kwargs)
+    run_inference(inference, kwargs)
 
 
 if __name__ == "__main__":
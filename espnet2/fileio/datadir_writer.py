@@ -16,11 +16,14 @@ class DatadirWriter:
         ...     subwriter["uttidA"] = "some/where/a.wav"
         ...     subwriter["uttidB"] = "some/where/b.wav"
 
+    If append=True, the lines are appended to the existing files.
+
     """
 
     @typechecked
-    def __init__(self, p: Union[Path, str]):
+    def __init__(self, p: Union[Path, str], append: bool = False):
         self.path = Path(p)
+        self.append = append
         self.chilidren = {}
         self.fd = None
         self.has_children = False
@@ -35,7 +38,7 @@ class DatadirWriter:
             raise RuntimeError("This writer points out a file")
 
         if key not in self.chilidren:
-            w = DatadirWriter((self.path / key))
+            w = DatadirWriter((self.path / key), append=self.append)
             self.chilidren[key] = w
             self.has_children = True
 
@@ -51,7 +54,7 @@ class DatadirWriter:
 
         if self.fd is None:
             self.path.parent.mkdir(parents=True, exist_ok=True)
-            self.fd = self.path.open("w", encoding="utf-8")
+            self.fd = self.path.open("a" if self.append else "w", encoding="utf-8")
 
         self.keys.add(key)
         self.fd.write(f"{key} {value}\n")
@@ -59,6 +62,12 @@ class DatadirWriter:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
 
+    def flush(self):
+        for child in self.chilidren.values():
+            child.flush()
+        if self.fd is not None:
+            self.fd.flush()
+
     def close(self):
         if self.has_children:
             prev_child = None
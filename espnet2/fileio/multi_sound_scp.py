@@ -1,11 +1,12 @@
 import collections.abc
-from typing import Tuple
+from typing import Optional, Tuple
 
 import numpy as np
 from typeguard import typechecked
 
 from espnet2.fileio.read_text import read_multi_columns_text
 from espnet2.fileio.sound_scp import soundfile_read
+from espnet2.fileio.text_index import IndexedTextReader, get_indexed_reader
 
 
 class MultiSoundScpReader(collections.abc.Mapping):
@@ -34,7 +35,13 @@ class MultiSoundScpReader(collections.abc.Mapping):
 
     @typechecked
     def __init__(
-        self, fname, dtype=None, always_2d: bool = False, stack_axis=0, pad=np.nan
+        self,
+        fname,
+        dtype=None,
+        always_2d: bool = False,
+        stack_axis=0,
+        pad=np.nan,
+        compact_index: bool = False,
     ):
         self.fname = fname
         self.dtype = dtype
@@ -42,7 +49,7 @@ class MultiSoundScpReader(collections.abc.Mapping):
         self.stack_axis = stack_axis
         self.pad = pad
 
-        self.data, _ = read_multi_columns_text(fname)
+        self.data, _ = read_multi_columns_text(fname, compact_index=compact_index)
 
     def __getitem__(self, key) -> Tuple[int, np.ndarray]:
         wavs = self.data[key]
@@ -102,3 +109,6 @@ class MultiSoundScpReader(collections.abc.Mapping):
 
     def keys(self):
         return self.data.keys()
+
+    def get_indexed_reader(self) -> Optional[IndexedTextReader]:
+        return get_indexed_reader(self.data)
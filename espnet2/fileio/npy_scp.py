@@ -1,11 +1,12 @@
 import collections.abc
 from pathlib import Path
-from typing import Union
+from typing import Dict, Optional, Union
 
 import numpy as np
 from typeguard import typechecked
 
 from espnet2.fileio.read_text import read_2columns_text
+from espnet2.fileio.text_index import IndexedTextReader, get_indexed_reader
 
 
 class NpyScpWriter:
@@ -21,16 +22,22 @@ class NpyScpWriter:
         >>> writer = NpyScpWriter('./data/', './data/feat.scp')
         >>> writer['aa'] = numpy_array
         >>> writer['bb'] = numpy_array
+        >>> writer.update({'cc': numpy_array, 'dd': numpy_array})
 
     """
 
     @typechecked
-    def __init__(self, outdir: Union[Path, str], scpfile: Union[Path, str]):
+    def __init__(
+        self,
+        outdir: Union[Path, str],
+        scpfile: Union[Path, str],
+        append: bool = False,
+    ):
         self.dir = Path(outdir)
         self.dir.mkdir(parents=True, exist_ok=True)
         scpfile = Path(scpfile)
         scpfile.parent.mkdir(parents=True, exist_ok=True)
-        self.fscp = scpfile.open("w", encoding="utf-8")
+        self.fscp = scpfile.open("a" if append else "w", encoding="utf-8")
 
         self.data = {}
 
@@ -47,6 +54,24 @@ class NpyScpWriter:
         # Store the file path
         self.data[key] = str(p)
 
+    def update(self, values: Dict[str, np.ndarray]):
+        """Write the arrays of a mini-batch at once."""
+        lines = []
+        dirs = {self.dir}
+        for key, value in values.items():
+            assert isinstance(value, np.ndarray), type(value)
+            p = self.dir / f"{key}.npy"
+            if p.parent not in dirs:
+                p.parent.mkdir(parents=True, exist_ok=True)
+                dirs.add(p.parent)
+            np.save(str(p), value)
+            lines.append(f"{key} {p}\n")
+            self.data[key] = str(p)
+        self.fscp.write("".join(lines))
+
+    def flush(self):
+        self.fscp.flush()
+
     def __enter__(self):
         return self
 
@@ -73,9 +98,9 @@ class NpyScpReader(collections.abc.Mapping):
     """
 
     @typechecked
-    def __init__(self, fname: Union[Path, str]):
+    def __init__(self, fname: Union[Path, str], compact_index: bool = False):
         self.fname = Path(fname)
-        self.data = read_2columns_text(fname)
+        self.data = read_2columns_text(fname, compact_index=compact_index)
 
     def get_path(self, key):
         return self.data[key]
@@ -95,3 +120,6 @@ class NpyScpReader(collections.abc.Mapping):
 
     def keys(self):
         return self.data.keys()
+
+    def get_indexed_reader(self) -> Optional[IndexedTextReader]:
+        return get_indexed_reader(self.data)
@@ -0,0 +1,192 @@
+import io
+import json
+import tarfile
+import time
+from pathlib import Path
+from typing import Any, Collection, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import soundfile
+from typeguard import typechecked
+
+MANIFEST_NAME = "shards.json"
+
+
+def _split_member_name(member_name: str) -> Tuple[str, str, str]:
+    # "{uid}.{name}.{ext}": uid can include "." but name and ext can't
+    uid, name, ext = member_name.rsplit(".", 2)
+    return uid, name, ext
+
+
+def _decode(ext: str, data: bytes) -> Union[np.ndarray, str]:
+    if ext == "npy":
+        return np.load(io.BytesIO(data), allow_pickle=False)
+    elif ext == "txt":
+        return data.decode("utf-8")
+    else:
+        # Encoded audio files, e.g. wav or flac, normalized to [-1,1] range
+        array, _ = soundfile.read(io.BytesIO(data))
+        return array
+
+
+class PackedShardWriter:
+    """Writer class to pack utterances into tar shards for sequential reading.
+
+    Each utterance is stored as consecutive members of a tar file,
+    "{uid}.{name}.{ext}" for each data name, so that a shard is read by a single
+    sequential scan instead of opening a file per utterance. The value is:
+
+        - np.ndarray: stored as "npy"
+        - str: stored as "txt"
+        - Path: the file is stored as is, e.g. "flac", and decoded by soundfile
+
+    A new shard is started when max_utts or max_bytes is exceeded, and
+    the list of the shards is written to "shards.json" when closed.
+
+    Examples:
+        >>> with PackedShardWriter('dump/shards/train') as writer:
+        ...     writer['uttid_a'] = {'speech': Path('a.flac'), 'text': 'hello'}
+        ...     writer['uttid_b'] = {'speech': np.zeros(16000), 'text': 'world'}
+
+        dump/shards/train/
+            shard.000000.tar
+            shards.json
+    """
+
+    @typechecked
+    def __init__(
+        self,
+        outdir: Union[Path, str],
+        max_utts: int = 1000,
+        max_bytes: Optional[int] = None,
+    ):
+        self.dir = Path(outdir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_utts = max_utts
+        self.max_bytes = max_bytes
+
+        self.shards: List[Dict[str, Any]] = []
+        self.names: Optional[List[str]] = None
+        self._tar = None
+        self._num_utts = 0
+        self._num_bytes = 0
+
+    def _open_shard(self):
+        self._close_shard()
+        path = f"shard.{len(self.shards):06d}.tar"
+        self._tar = tarfile.open(self.dir / path, "w")
+        self.shards.append({"path": path, "num_utts": 0})
+        self._num_utts = 0
+        self._num_bytes = 0
+
+    def _close_shard(self):
+        if self._tar is not None:
+            self._tar.close()
+            self.shards[-1]["num_utts"] = self._num_utts
+            self._tar = None
+
+    def _add(self, member_name: str, data: bytes):
+        info = tarfile.TarInfo(member_name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self._tar.addfile(info, io.BytesIO(data))
+        self._num_bytes += len(data)
+
+    def __setitem__(self, uid: str, value: Dict[str, Union[np.ndarray, str, Path]]):
+        if self.names is None:
+            for name in value:
+                if "." in name:
+                    raise RuntimeError(f"data name can't include '.': {name}")
+            self.names = list(value)
+        elif set(value) != set(self.names):
+            raise RuntimeError(
+                f"{uid}: data names are mismatched: {list(value)} != {self.names}"
+            )
+
+        if (
+            self._tar is None
+            or self._num_utts >= self.max_utts
+            or (self.max_bytes is not None and self._num_bytes >= self.max_bytes)
+        ):
+            self._open_shard()
+
+        for name, v in value.items():
+            if isinstance(v, np.ndarray):
+                f = io.BytesIO()
+                np.save(f, v, allow_pickle=False)
+                self._add(f"{uid}.{name}.npy", f.getvalue())
+            elif isinstance(v, str):
+                self._add(f"{uid}.{name}.txt", v.encode("utf-8"))
+            elif isinstance(v, Path):
+                ext = v.suffix.lstrip(".").lower()
+                if ext in ("npy", "txt", ""):
+                    raise RuntimeError(f"Not supported file extension: {v}")
+                self._add(f"{uid}.{name}.{ext}", v.read_bytes())
+            else:
+                raise TypeError(f"Not supported type: {type(v)}")
+        self._num_utts += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._close_shard()
+        manifest = {
+            "names": self.names if self.names is not None else [],
+            "num_utts": sum(s["num_utts"] for s in self.shards),
+            "shards": self.shards,
+        }
+        with (self.dir / MANIFEST_NAME).open("w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+
+@typechecked
+def load_shard_manifest(path: Union[Path, str]) -> Dict[str, Any]:
+    """Load shards.json, resolving the shard paths relative to it.
+
+    Args:
+        path: shards.json or the directory containing it.
+    """
+    path = Path(path)
+    if path.is_dir():
+        path = path / MANIFEST_NAME
+    with path.open("r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    for shard in manifest["shards"]:
+        shard["path"] = str(path.parent / shard["path"])
+    return manifest
+
+
+@typechecked
+def iter_packed_shard(
+    path: Union[Path, str],
+    names: Optional[Collection[str]] = None,
+    buffer_size: int = 2**20,
+) -> Iterator[Tuple[str, Dict[str, Union[np.ndarray, str]]]]:
+    """Read the utterances of a shard by a sequential scan.
+
+    Args:
+        path: The shard file.
+        names: The data names to be loaded. Others are skipped without decoding.
+        buffer_size: The read buffer size of the file.
+    """
+    uid, data = None, {}
+    with open(path, "rb", buffering=buffer_size) as f, tarfile.open(
+        fileobj=f, mode="r|"
+    ) as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            _uid, name, ext = _split_member_name(member.name)
+            if _uid != uid:
+                if uid is not None:
+                    yield uid, data
+                uid, data = _uid, {}
+            if names is not None and name not in names:
+                continue
+            data[name] = _decode(ext, tar.extractfile(member).read())
+    if uid is not None:
+        yield uid, data
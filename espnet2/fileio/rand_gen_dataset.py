@@ -1,11 +1,12 @@
 import collections
 from pathlib import Path
-from typing import Union
+from typing import Optional, Union
 
 import numpy as np
 from typeguard import typechecked
 
 from espnet2.fileio.read_text import load_num_sequence_text
+from espnet2.fileio.text_index import IndexedTextReader, get_indexed_reader
 
 
 class FloatRandomGenerateDataset(collections.abc.Mapping):
@@ -29,9 +30,12 @@ class FloatRandomGenerateDataset(collections.abc.Mapping):
         shape_file: Union[Path, str],
         dtype: Union[str, np.dtype] = "float32",
         loader_type: str = "csv_int",
+        compact_index: bool = False,
     ):
         shape_file = Path(shape_file)
-        self.utt2shape = load_num_sequence_text(shape_file, loader_type)
+        self.utt2shape = load_num_sequence_text(
+            shape_file, loader_type, compact_index=compact_index
+        )
         self.dtype = np.dtype(dtype)
 
     def __iter__(self):
@@ -40,6 +44,9 @@ class FloatRandomGenerateDataset(collections.abc.Mapping):
     def __len__(self):
         return len(self.utt2shape)
 
+    def get_indexed_reader(self) -> Optional[IndexedTextReader]:
+        return get_indexed_reader(self.utt2shape)
+
     def __getitem__(self, item) -> np.ndarray:
         shape = self.utt2shape[item]
         return np.random.randn(*shape).astype(self.dtype)
@@ -68,9 +75,12 @@ class IntRandomGenerateDataset(collections.abc.Mapping):
         high: int = None,
         dtype: Union[str, np.dtype] = "int64",
         loader_type: str = "csv_int",
+        compact_index: bool = False,
     ):
         shape_file = Path(shape_file)
-        self.utt2shape = load_num_sequence_text(shape_file, loader_type)
+        self.utt2shape = load_num_sequence_text(
+            shape_file, loader_type, compact_index=compact_index
+        )
         self.dtype = np.dtype(dtype)
         self.low = low
         self.high = high
@@ -81,6 +91,9 @@ class IntRandomGenerateDataset(collections.abc.Mapping):
     def __len__(self):
         return len(self.utt2shape)
 
+    def get_indexed_reader(self) -> Optional[IndexedTextReader]:
+        return get_indexed_reader(self.utt2shape)
+
     def __getitem__(self, item) -> np.ndarray:
         shape = self.utt2shape[item]
         return np.random.randint(self.low, self.high, size=shape, dtype=self.dtype)
@@ -1,4 +1,5 @@
 import collections.abc
+import functools
 import logging
 from mmap import mmap
 from pathlib import Path
@@ -7,9 +8,13 @@ from typing import Dict, List, Optional, Tuple, Union
 
 from typeguard import typechecked
 
+from espnet2.fileio.text_index import IndexedTextReader
+
 
 @typechecked
-def read_2columns_text(path: Union[Path, str]) -> Dict[str, str]:
+def read_2columns_text(
+    path: Union[Path, str], compact_index: bool = False
+) -> Union[Dict[str, str], IndexedTextReader]:
     """Read a text file having 2 columns as dict object.
 
     Examples:
@@ -20,7 +25,12 @@ def read_2columns_text(path: Union[Path, str]) -> Dict[str, str]:
         >>> read_2columns_text('wav.scp')
         {'key1': '/some/path/a.wav', 'key2': '/some/path/b.wav'}
 
+    If compact_index=True, a memory-mapped `IndexedTextReader` is returned
+    instead of dict, and the values are read lazily.
+
     """
+    if compact_index:
+        return IndexedTextReader(path)
 
     data = {}
     with Path(path).open("r", encoding="utf-8") as f:
@@ -37,10 +47,17 @@ def read_2columns_text(path: Union[Path, str]) -> Dict[str, str]:
     return data
 
 
+def _split_columns(value: str) -> List[str]:
+    return value.split() if value != "" else [""]
+
+
 @typechecked
 def read_multi_columns_text(
-    path: Union[Path, str], return_unsplit: bool = False
-) -> Tuple[Dict[str, List[str]], Optional[Dict[str, str]]]:
+    path: Union[Path, str], return_unsplit: bool = False, compact_index: bool = False
+) -> Tuple[
+    Union[Dict[str, List[str]], IndexedTextReader],
+    Optional[Union[Dict[str, str], IndexedTextReader]],
+]:
     """Read a text file having 2 or more columns as dict object.
 
     Examples:
@@ -55,7 +72,15 @@ def read_multi_columns_text(
          'key2': ['/some/path/b1.wav', '/some/path/b2.wav', '/some/path/b3.wav'],
          'key3': ['/some/path/c1.wav']}
 
+    If compact_index=True, memory-mapped `IndexedTextReader`s are returned
+    instead of dict, and the values are read lazily.
+
     """
+    if compact_index:
+        data = IndexedTextReader(path, value_parser=_split_columns)
+        # both readers map the same index file
+        unsplit_data = IndexedTextReader(path) if return_unsplit else None
+        return data, unsplit_data
 
     data = {}
 
@@ -75,17 +100,21 @@ def read_multi_columns_text(
             if k in data:
                 raise RuntimeError(f"{k} is duplicated ({path}:{linenum})")
 
-            data[k] = v.split() if v != "" else [""]
+            data[k] = _split_columns(v)
             if return_unsplit:
                 unsplit_data[k] = v
 
     return data, unsplit_data
 
 
+def _parse_num_sequence(value: str, delimiter: str, dtype: type) -> List:
+    return [dtype(i) for i in value.split(delimiter)]
+
+
 @typechecked
 def load_num_sequence_text(
-    path: Union[Path, str], loader_type: str = "csv_int"
-) -> Dict[str, List[Union[float, int]]]:
+    path: Union[Path, str], loader_type: str = "csv_int", compact_index: bool = False
+) -> Union[Dict[str, List[Union[float, int]]], IndexedTextReader]:
     """Read a text file indicating sequences of number
 
     Examples:
@@ -94,6 +123,9 @@ def load_num_sequence_text(
 
         >>> d = load_num_sequence_text('text')
         >>> np.testing.assert_array_equal(d["key1"], np.array([1, 2, 3]))
+
+    If compact_index=True, a memory-mapped `IndexedTextReader` is returned
+    instead of dict, and the values are parsed lazily.
     """
     if loader_type == "text_int":
         delimiter = " "
@@ -110,6 +142,10 @@ def load_num_sequence_text(
     else:
         raise ValueError(f"Not supported loader_type={loader_type}")
 
+    parser = functools.partial(_parse_num_sequence, delimiter=delimiter, dtype=dtype)
+    if compact_index:
+        return IndexedTextReader(path, value_parser=parser)
+
     # path looks like:
     #   utta 1,0
     #   uttb 3,4,5
@@ -121,7 +157,7 @@ def load_num_sequence_text(
     retval = {}
     for k, v in d.items():
         try:
-            retval[k] = [dtype(i) for i in v.split(delimiter)]
+            retval[k] = parser(v)
         except TypeError:
             logging.error(f'Error happened with path="{path}", id="{k}", value="{v}"')
             raise
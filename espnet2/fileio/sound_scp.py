@@ -7,6 +7,7 @@ import soundfile
 from typeguard import typechecked
 
 from espnet2.fileio.read_text import read_2columns_text, read_multi_columns_text
+from espnet2.fileio.text_index import IndexedTextReader, get_indexed_reader
 
 
 def soundfile_read(
@@ -107,6 +108,9 @@ class SoundScpReader(collections.abc.Mapping):
 
         In the above case, a.wav and a2.wav are concatenated.
 
+        If compact_index=True is given, the scp file is accessed via
+        a memory-mapped index instead of being loaded as dict object.
+
         Note that even if multi_columns=True is given,
         SoundScpReader still supports a normal wav.scp,
         i.e., a wav file is given per line,
@@ -123,15 +127,16 @@ class SoundScpReader(collections.abc.Mapping):
         always_2d: bool = False,
         multi_columns: bool = False,
         concat_axis=1,
+        compact_index: bool = False,
     ):
         self.fname = fname
         self.dtype = dtype
         self.always_2d = always_2d
 
         if multi_columns:
-            self.data, _ = read_multi_columns_text(fname)
+            self.data, _ = read_multi_columns_text(fname, compact_index=compact_index)
         else:
-            self.data = read_2columns_text(fname)
+            self.data = read_2columns_text(fname, compact_index=compact_index)
         self.multi_columns = multi_columns
         self.concat_axis = concat_axis
 
@@ -162,6 +167,9 @@ class SoundScpReader(collections.abc.Mapping):
     def keys(self):
         return self.data.keys()
 
+    def get_indexed_reader(self) -> Optional[IndexedTextReader]:
+        return get_indexed_reader(self.data)
+
 
 class SoundScpWriter:
     """Writer class for 'wav.scp'
@@ -0,0 +1,292 @@
+import bisect
+import collections.abc
+import hashlib
+import logging
+import os
+import re
+import struct
+from mmap import ACCESS_READ, mmap
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional, Union
+
+import numpy as np
+from typeguard import typechecked
+
+_MAGIC = b"ESPIDX01"
+# magic, the number of keys, the size of key blob,
+# the size and the mtime of the source file
+_HEADER = struct.Struct("<8sqqqq")
+_LINE_RE = re.compile(rb"\s*(\S+)\s*(.*?)\s*$", re.DOTALL)
+
+
+def default_index_path(path: Union[Path, str]) -> Path:
+    return Path(f"{path}.idx")
+
+
+def cache_index_path(path: Union[Path, str]) -> Path:
+    """Return the index path in the cache directory, e.g. for read-only data dirs.
+
+    The cache directory is $ESPNET_TEXT_INDEX_DIR if set,
+    else ~/.cache/espnet/text_index.
+    """
+    cache_dir = os.environ.get("ESPNET_TEXT_INDEX_DIR")
+    if cache_dir is None:
+        cache_dir = Path.home() / ".cache" / "espnet" / "text_index"
+    digest = hashlib.sha256(str(Path(path).resolve()).encode()).hexdigest()[:16]
+    return Path(cache_dir) / f"{Path(path).name}.{digest}.idx"
+
+
+@typechecked
+def build_text_index(
+    path: Union[Path, str], index_path: Union[Path, str, None] = None
+) -> Path:
+    """Build the compact index of a text file having 2 columns.
+
+    The index is a binary file consisting of:
+        - header: magic, the number of keys N, the size of the key blob,
+          and the size and mtime of the source file (to detect stale indices)
+        - key_offsets (int64, N + 1): offsets of the sorted keys in the key blob
+        - value_spans (int64, N x 2): byte spans of the values in the source file,
+          in the order of the sorted keys
+        - order (int64, N): the sorted position of each line in the file order
+        - key blob: the utf-8 encoded keys concatenated in the sorted order
+
+    Examples:
+        wav.scp:
+            key1 /some/path/a.wav
+            key2 /some/path/b.wav
+
+        >>> build_text_index('wav.scp')
+        PosixPath('wav.scp.idx')
+    """
+    path = Path(path)
+    index_path = default_index_path(path) if index_path is None else Path(index_path)
+    _write_index(index_path, _build_index_bytes(path))
+    return index_path
+
+
+def _write_index(index_path: Path, index: bytes):
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file and rename it, so that concurrent builders
+    # (e.g. DDP ranks) never read a partially written index
+    tmp_path = Path(f"{index_path}.{os.getpid()}.tmp")
+    try:
+        with tmp_path.open("wb") as f:
+            f.write(index)
+        os.replace(tmp_path, index_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def _build_index_bytes(path: Path) -> bytes:
+    keys, spans = [], []
+    offset = 0
+    with path.open("rb") as f:
+        for line in f:
+            m = _LINE_RE.match(line)
+            if m is not None:
+                keys.append(m.group(1))
+                spans.append((offset + m.start(2), offset + m.end(2)))
+            offset += len(line)
+
+    sorted_ids = sorted(range(len(keys)), key=keys.__getitem__)
+    sorted_keys = [keys[i] for i in sorted_ids]
+    for i in range(1, len(sorted_keys)):
+        if sorted_keys[i - 1] == sorted_keys[i]:
+            raise RuntimeError(
+                f"{sorted_keys[i].decode('utf-8')} is duplicated ({path})"
+            )
+
+    key_offsets = np.zeros(len(keys) + 1, dtype="<i8")
+    np.cumsum([len(k) for k in sorted_keys], out=key_offsets[1:])
+    value_spans = np.array(spans, dtype="<i8").reshape(-1, 2)[sorted_ids]
+    order = np.empty(len(keys), dtype="<i8")
+    order[sorted_ids] = np.arange(len(keys))
+
+    stat = path.stat()
+    header = _HEADER.pack(
+        _MAGIC, len(keys), int(key_offsets[-1]), stat.st_size, stat.st_mtime_ns
+    )
+    return b"".join(
+        [
+            header,
+            key_offsets.tobytes(),
+            value_spans.tobytes(),
+            order.tobytes(),
+            b"".join(sorted_keys),
+        ]
+    )
+
+
+def get_indexed_reader(loader: Any) -> Optional["IndexedTextReader"]:
+    """Return the IndexedTextReader backing the loader if any.
+
+    The readers built with compact_index=True (e.g. SoundScpReader, NpyScpReader)
+    and their adapters expose it by `get_indexed_reader()`.
+    """
+    if isinstance(loader, IndexedTextReader):
+        return loader
+    if hasattr(loader, "get_indexed_reader"):
+        return loader.get_indexed_reader()
+    return None
+
+
+class _SortedKeys(collections.abc.Sequence):
+    """Sequence view of the sorted keys in the index for binary search."""
+
+    def __init__(self, blob: memoryview, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return bytes(self.blob[self.offsets[i] : self.offsets[i + 1]])
+
+
+class IndexedTextReader(collections.abc.Mapping):
+    """Mapping of a text file having 2 columns backed by a memory-mapped index.
+
+    Unlike `read_2columns_text`, which loads the whole file into a dict,
+    only the index is mapped into memory and each value is read from the
+    source file and parsed when it is accessed. Since both files are
+    memory-mapped, the memory is shared by the processes (DataLoader workers,
+    DDP ranks) via the page cache and opening the reader is O(1).
+    The index is built once next to the source file, or rebuilt if the source
+    file is modified. If the index can't be written there, e.g. the data
+    directory is read-only, it is built in the cache directory
+    (see `cache_index_path`), or kept in memory as the last resort.
+    Keys are iterated in the order of the source file.
+
+    Examples:
+        text:
+            key1 hello world
+            key2 foo bar
+
+        >>> reader = IndexedTextReader('text')
+        >>> reader['key1']
+        'hello world'
+        >>> reader = IndexedTextReader('text', value_parser=str.split)
+        >>> reader['key1']
+        ['hello', 'world']
+    """
+
+    @typechecked
+    def __init__(
+        self,
+        path: Union[Path, str],
+        value_parser: Optional[Callable[[str], Any]] = None,
+        index_path: Union[Path, str, None] = None,
+    ):
+        self.path = Path(path)
+        self.value_parser = value_parser
+        if index_path is None:
+            candidates = [default_index_path(path), cache_index_path(path)]
+        else:
+            candidates = [Path(index_path)]
+
+        # The index path, or None if the index is kept in memory
+        self.index_path = next((p for p in candidates if self._is_valid_index(p)), None)
+        if self.index_path is None:
+            logging.info(f"Building the index of {self.path}")
+            index = _build_index_bytes(self.path)
+            for p in candidates:
+                try:
+                    _write_index(p, index)
+                    self.index_path = p
+                    break
+                except OSError as e:
+                    logging.warning(f"Failed to write the index: {p}: {e}")
+            else:
+                logging.warning(f"Keeping the index of {self.path} in memory")
+                self._index_mm = index
+        self._open()
+
+    def _is_valid_index(self, index_path: Path) -> bool:
+        if not index_path.exists():
+            return False
+        with index_path.open("rb") as f:
+            header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return False
+        magic, _, _, src_size, src_mtime = _HEADER.unpack(header)
+        stat = self.path.stat()
+        return (
+            magic == _MAGIC
+            and src_size == stat.st_size
+            and src_mtime == stat.st_mtime_ns
+        )
+
+    def _open(self):
+        if self.index_path is not None:
+            with self.index_path.open("rb") as f:
+                self._index_mm = mmap(f.fileno(), 0, access=ACCESS_READ)
+        _, n, blob_size, src_size, _ = _HEADER.unpack_from(self._index_mm)
+        buf = memoryview(self._index_mm)
+        offset = _HEADER.size
+        self._key_offsets = np.frombuffer(buf, "<i8", n + 1, offset)
+        offset += self._key_offsets.nbytes
+        self._value_spans = np.frombuffer(buf, "<i8", 2 * n, offset).reshape(n, 2)
+        offset += self._value_spans.nbytes
+        self._order = np.frombuffer(buf, "<i8", n, offset)
+        offset += self._order.nbytes
+        self._keys = _SortedKeys(buf[offset : offset + blob_size], self._key_offsets)
+
+        if src_size > 0:
+            with self.path.open("rb") as f:
+                self._src_mm = mmap(f.fileno(), 0, access=ACCESS_READ)
+        else:
+            self._src_mm = None
+
+    def __getstate__(self):
+        # mmap objects can't be pickled, e.g. for spawned DataLoader workers
+        state = self.__dict__.copy()
+        for k in ["_src_mm", "_key_offsets", "_value_spans", "_order", "_keys"]:
+            del state[k]
+        if self.index_path is not None:
+            del state["_index_mm"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+    def _find(self, key: str) -> int:
+        if not isinstance(key, str):
+            return -1
+        key = key.encode("utf-8")
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return i
+        return -1
+
+    def get_raw(self, key: str) -> str:
+        """Return the value as is without `value_parser`."""
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        start, end = self._value_spans[i]
+        return self._src_mm[start:end].decode("utf-8") if end > start else ""
+
+    def key_at(self, index: int) -> str:
+        """Return the key of the index-th line in the source file order. O(1)."""
+        i = self._order[index]
+        return self._keys[i].decode("utf-8")
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get_raw(key)
+        if self.value_parser is not None:
+            return self.value_parser(value)
+        return value
+
+    def __contains__(self, key) -> bool:
+        return self._find(key) >= 0
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self.key_at(i)
@@ -456,7 +456,8 @@ class VITSGenerator(torch.nn.Module):
             g = self.global_emb(sids.view(-1)).unsqueeze(-1)
         if self.spk_embed_dim is not None:
             # (B, global_channels, 1)
-            g_ = self.spemb_proj(F.normalize(spembs.unsqueeze(0))).unsqueeze(-1)
+            g_ = self.spemb_proj(F.normalize(spembs.view(-1, self.spk_embed_dim)))
+            g_ = g_.unsqueeze(-1)
             if g is None:
                 g = g_
             else:
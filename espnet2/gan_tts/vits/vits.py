@@ -28,6 +28,7 @@ from espnet2.gan_tts.utils import get_segments
 from espnet2.gan_tts.vits.generator import VITSGenerator
 from espnet2.gan_tts.vits.loss import KLDivergenceLoss
 from espnet2.torch_utils.device_funcs import force_gatherable
+from espnet.nets.pytorch_backend.nets_utils import make_pad_mask
 
 AVAILABLE_GENERATERS = {
     "vits_generator": VITSGenerator,
@@ -646,3 +647,65 @@ class VITS(AbsGANTTS):
                 max_len=max_len,
             )
         return dict(wav=wav.view(-1), att_w=att_w[0], duration=dur[0])
+
+    def batch_inference(
+        self,
+        text: torch.Tensor,
+        text_lengths: torch.Tensor,
+        sids: Optional[torch.Tensor] = None,
+        spembs: Optional[torch.Tensor] = None,
+        lids: Optional[torch.Tensor] = None,
+        noise_scale: float = 0.667,
+        noise_scale_dur: float = 0.8,
+        alpha: float = 1.0,
+        max_len: Optional[int] = None,
+    ) -> Dict[str, torch.Tensor]:
+        """Run inference for a padded batch of texts.
+
+        Args:
+            text (Tensor): Padded text index tensor (B, T_text).
+            text_lengths (Tensor): Text length tensor (B,).
+            sids (Tensor): Speaker index tensor (B, 1).
+            spembs (Optional[Tensor]): Speaker embedding tensor (B, spk_embed_dim).
+            lids (Tensor): Language index tensor (B, 1).
+            noise_scale (float): Noise scale value for flow.
+            noise_scale_dur (float): Noise scale value for duration predictor.
+            alpha (float): Alpha parameter to control the speed of generated speech.
+            max_len (Optional[int]): Maximum length.
+
+        Returns:
+            Dict[str, Tensor]:
+                * wav (Tensor): Padded waveform tensor (B, T_wav).
+                * wav_lengths (Tensor): Waveform length tensor (B,).
+                * att_w (Tensor): Monotonic attention weight tensor
+                    (B, T_feats, T_text).
+                * feats_lengths (Tensor): Feature length tensor (B,).
+                * duration (Tensor): Padded duration tensor (B, T_text).
+                * duration_lengths (Tensor): Duration length tensor (B,).
+
+        """
+        wav, att_w, dur = self.generator.inference(
+            text=text,
+            text_lengths=text_lengths,
+            sids=sids,
+            spembs=spembs,
+            lids=lids,
+            noise_scale=noise_scale,
+            noise_scale_dur=noise_scale_dur,
+            alpha=alpha,
+            max_len=max_len,
+        )
+        feats_lengths = torch.clamp_min(dur.sum(dim=1), 1).long()
+        if max_len is not None:
+            feats_lengths = torch.clamp_max(feats_lengths, max_len)
+        wav_lengths = feats_lengths * self.generator.upsample_factor
+        wav = wav.view(wav.size(0), -1)
+        wav = wav.masked_fill(make_pad_mask(wav_lengths, wav, 1), 0.0)
+        return dict(
+            wav=wav,
+            wav_lengths=wav_lengths,
+            att_w=att_w,
+            feats_lengths=feats_lengths,
+            duration=dur,
+            duration_lengths=text_lengths,
+        )
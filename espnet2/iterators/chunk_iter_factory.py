@@ -1,9 +1,10 @@
+import itertools
 import logging
 import re
-from collections import defaultdict
+from collections import Counter, deque
 from copy import deepcopy
 from math import inf
-from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import torch
@@ -132,169 +133,329 @@ class ChunkIterFactory(AbsIterFactory):
         self,
         epoch: int,
         shuffle: Optional[bool] = None,
-    ) -> Iterator[Tuple[List[str], Dict[str, torch.Tensor]]]:
-        per_sample_loader = self.per_sample_iter_factory.build_iter(epoch, shuffle)
-
+        state: Optional[Dict[str, Any]] = None,
+        keep_state: bool = False,
+    ) -> "ChunkIterator":
+        """Build the iterator of the epoch.
+
+        Args:
+            epoch: The epoch number.
+            shuffle: Shuffle the chunks. If None, use the value given at init.
+            state: The state returned by ChunkIterator.state_dict()
+                to resume the epoch from the middle.
+            keep_state: Keep the state after each mini-batch
+                to enable ChunkIterator.state_dict().
+        """
         if shuffle is None:
             shuffle = self.shuffle
-        state = np.random.RandomState(epoch + self.seed)
+        return ChunkIterator(self, epoch, shuffle, state, keep_state)
+
+    def load_sample(
+        self, ids: List[str], batch: Dict[str, torch.Tensor]
+    ) -> Tuple[str, Dict[str, torch.Tensor], List[str]]:
+        """Convert the mini-batch of the per-sample-loader to a single sample."""
+        # Must be per-sample-loader
+        assert len(ids) == 1, f"Must be per-sample-loader: {len(ids)}"
+        assert all(len(x) == 1 for x in batch.values())
+
+        # Get keys of sequence data
+        sequence_keys = []
+        for key in batch:
+            if key + "_lengths" in batch:
+                sequence_keys.append(key)
+        # Remove lengths data and get the first sample
+        batch = {k: v[0] for k, v in batch.items() if not k.endswith("_lengths")}
+        return ids[0], batch, sequence_keys
+
+    def is_excluded_key(self, key: str) -> bool:
+        return self.excluded_key_pattern is not None and bool(
+            re.fullmatch(self.excluded_key_pattern, key)
+        )
+
+    def prepare_for_collate(self, id_list, batches):
+        return [
+            (id_, {k: vs[i].numpy() for k, vs in batches.items()})
+            for i, id_ in enumerate(id_list)
+        ]
+
+
+class ChunkIterator:
+    """Iterator of the chunk mini-batches of an epoch, which can be resumed.
+
+    The chunks in the cache are kept as the descriptors of
+    (sample-index, start, width) and the samples are referred by them, so that
+    the state after any mini-batch can be saved without the data.
+    When resuming, only the per-sample-loader after the saved cursor and
+    the samples remaining in the cache are loaded.
 
+    Note that the random data-augmentation in the preprocessing of
+    the cached samples is not reproduced, because they are loaded again.
+    Taking the state after every mini-batch is not free,
+    so it is kept only if keep_state=True.
+    """
+
+    def __init__(
+        self,
+        factory: ChunkIterFactory,
+        epoch: int,
+        shuffle: bool,
+        state: Optional[Dict[str, Any]] = None,
+        keep_state: bool = False,
+    ):
+        self.factory = factory
+        self.epoch = epoch
+        self.shuffle = shuffle
+        self.random_state = np.random.RandomState(epoch + factory.seed)
+
+        # The number of samples taken from the per-sample-loader
+        self.cursor = 0
+        # The number of yielded mini-batches
+        self.num_iters = 0
         # NOTE(kamo):
         #   This iterator supports multiple chunk lengths and
         #   keep chunks for each lengths here until collecting specified numbers
-        cache_chunks_dict = defaultdict(dict)
-        cache_id_list_dict = defaultdict(dict)
-        for ids, batch in per_sample_loader:
-            # Must be per-sample-loader
-            assert len(ids) == 1, f"Must be per-sample-loader: {len(ids)}"
-            assert all(len(x) == 1 for x in batch.values())
-
-            # Get keys of sequence data
-            sequence_keys = []
-            for key in batch:
-                if key + "_lengths" in batch:
-                    sequence_keys.append(key)
-            # Remove lengths data and get the first sample
-            batch = {k: v[0] for k, v in batch.items() if not k.endswith("_lengths")}
-            id_ = ids[0]
-
-            for key in sequence_keys:
-                if self.excluded_key_pattern is not None and re.fullmatch(
-                    self.excluded_key_pattern, key
-                ):
-                    # ignore length inconsistency for `excluded_key_prefixes`
-                    continue
-                if len(batch[key]) != len(batch[sequence_keys[0]]):
-                    raise RuntimeError(
-                        f"All sequences must has same length: "
-                        f"{len(batch[key])} != {len(batch[sequence_keys[0]])}"
-                    )
-
-            # Get sampling frequency of the batch to recalculate the chunk length
-            fs = batch.get("utt2fs", torch.LongTensor([16000])).type(torch.int64).item()
-            default_fs = fs if self.default_fs is None else self.default_fs
-            assert fs % default_fs == 0 or default_fs % fs == 0
-
-            L = len(batch[sequence_keys[0]])
-            # Select chunk length
-            chunk_lengths = [lg * fs // default_fs for lg in self.chunk_lengths]
-            chunk_lengths = [
-                min(lg, self.chunk_max_abs_length) for lg in chunk_lengths if lg < L
-            ]
-            if len(chunk_lengths) == 0 and getattr(self, "discard_short_samples", True):
-                logging.warning(
-                    f"The length of '{id_}' is {L}, but it is shorter than "
-                    f"any candidates of chunk-length: {self.chunk_lengths}"
-                )
-                continue
+        # caches[category][W]: List[Tuple[sample-index, start, width]]
+        self.caches: Dict[int, Dict[int, List[Tuple[int, int, int]]]] = {}
+        # The mini-batches to be yielded: List[List[Tuple[sample-index, start, width]]]
+        self.pending = deque()
+        self.finished = False
+        # sample-index -> (id, data, sequence_keys)
+        self.samples: Dict[int, Tuple[str, Dict[str, torch.Tensor], List[str]]] = {}
+        self.num_refs = Counter()
+
+        if state is not None:
+            self._load_state(state)
+        self.per_sample_loader = iter(
+            factory.per_sample_iter_factory.build_iter(
+                epoch, shuffle, start_iter=self.cursor
+            )
+        )
+        # The states after the last two mini-batches.
+        # Keep two states to allow to prefetch one mini-batch.
+        self.keep_state = keep_state
+        self._snapshots = deque(maxlen=2)
+        if keep_state:
+            self._snapshots.append(self._snapshot())
+        self._generator = self._generate()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Tuple[List[str], Dict[str, torch.Tensor]]:
+        return next(self._generator)
+
+    def state_dict(self, num_iters: Optional[int] = None) -> Dict[str, Any]:
+        """Return the state after the given number of mini-batches.
+
+        Args:
+            num_iters: The number of mini-batches consumed by the caller.
+                Either the last or the second last mini-batch can be given.
+                If None, the last one.
+        """
+        if not self.keep_state:
+            raise RuntimeError("The state is not kept: build with keep_state=True")
+        if num_iters is None:
+            return self._snapshots[-1]
+        for snapshot in self._snapshots:
+            if snapshot["num_iters"] == num_iters:
+                return snapshot
+        raise RuntimeError(
+            f"The state after {num_iters} mini-batches is not kept: "
+            f"{[s['num_iters'] for s in self._snapshots]}"
+        )
 
-            # Convert numpy array to number
-            category = (
-                batch.get("utt2category", torch.LongTensor([0]))
-                .type(torch.int64)
-                .item()
+    def _snapshot(self) -> Dict[str, Any]:
+        uids = {}
+        for chunks in itertools.chain(
+            (c for d in self.caches.values() for c in d.values()), self.pending
+        ):
+            for index, _, _ in chunks:
+                uids[index] = self.samples[index][0]
+        name, keys, pos, has_gauss, cached_gaussian = self.random_state.get_state()
+        return {
+            "epoch": self.epoch,
+            "num_iters": self.num_iters,
+            "cursor": self.cursor,
+            "finished": self.finished,
+            "random_state": (name, keys.tolist(), pos, has_gauss, cached_gaussian),
+            "caches": {
+                category: {W: list(chunks) for W, chunks in d.items()}
+                for category, d in self.caches.items()
+            },
+            "pending": [list(chunks) for chunks in self.pending],
+            "uids": uids,
+        }
+
+    def _load_state(self, state: Dict[str, Any]):
+        if state["epoch"] != self.epoch:
+            raise RuntimeError(
+                f"The state is for epoch {state['epoch']}, but epoch {self.epoch}"
             )
+        self.num_iters = state["num_iters"]
+        self.cursor = state["cursor"]
+        self.finished = state["finished"]
+        name, keys, pos, has_gauss, cached_gaussian = state["random_state"]
+        self.random_state.set_state(
+            (name, np.array(keys, dtype=np.uint32), pos, has_gauss, cached_gaussian)
+        )
+        self.caches = {
+            category: {W: list(chunks) for W, chunks in d.items()}
+            for category, d in state["caches"].items()
+        }
+        self.pending = deque(list(chunks) for chunks in state["pending"])
+
+        # Load the samples remaining in the cache
+        indices = sorted(state["uids"])
+        per_sample_factory = self.factory.per_sample_iter_factory
+        loader = SequenceIterFactory(
+            dataset=per_sample_factory.dataset,
+            batches=[[state["uids"][index]] for index in indices],
+            num_workers=per_sample_factory.num_workers,
+            collate_fn=per_sample_factory.collate_fn,
+            pin_memory=per_sample_factory.pin_memory,
+        ).build_iter(self.epoch)
+        for index, (ids, batch) in zip(indices, loader):
+            self.samples[index] = self.factory.load_sample(ids, batch)
+        for chunks in itertools.chain(
+            (c for d in self.caches.values() for c in d.values()), self.pending
+        ):
+            self.num_refs.update(index for index, _, _ in chunks)
+
+    def _generate(self):
+        while True:
+            while len(self.pending) > 0:
+                chunks = self.pending.popleft()
+                batch = self._make_mini_batch(chunks)
+                self._release(chunks)
+                self.num_iters += 1
+                if self.keep_state:
+                    self._snapshots.append(self._snapshot())
+                yield batch
+
+            if self.finished:
+                return
+            try:
+                ids, batch = next(self.per_sample_loader)
+            except StopIteration:
+                for category in self.caches:
+                    for W in self.caches[category]:
+                        chunks = self.caches[category][W]
+                        # The remainder shorter than the batch-size is discarded
+                        self._release(self._split_mini_batches(chunks))
+                self.caches = {}
+                self.finished = True
+                continue
 
-            if len(chunk_lengths) == 0:
-                # keep the batch as is
-                cache_id_list = cache_id_list_dict[category].setdefault(0, [])
-                cache_chunks = cache_chunks_dict[category].setdefault(0, {})
-                Z, N, W, S = 0, 1, L, 0
-            else:
-                W = int(state.choice(chunk_lengths, 1))
-                cache_id_list = cache_id_list_dict[category].setdefault(W, [])
-                cache_chunks = cache_chunks_dict[category].setdefault(W, {})
-
-                # Shift width to the next chunk
-                S = int(W * self.chunk_shift_ratio)
-                # Number of chunks
-                N = (L - W) // S + 1
-                if shuffle:
-                    Z = state.randint(0, (L - W) % S + 1)
-                else:
-                    Z = 0
+            index = self.cursor
+            self.cursor += 1
+            self._add_sample(index, *self.factory.load_sample(ids, batch))
 
-            # Split a sequence into chunks.
-            # Note that the marginal frames divided by chunk length are discarded
-            for k, v in batch.items():
-                if k not in cache_chunks:
-                    cache_chunks[k] = []
-                if k in sequence_keys:
-                    # Shift chunks with overlapped length for data augmentation
-                    if self.excluded_key_pattern is not None and re.fullmatch(
-                        self.excluded_key_pattern, k
-                    ):
-                        for _ in range(N):
-                            cache_chunks[k].append(v)
-                    else:
-                        cache_chunks[k] += [
-                            v[Z + i * S : Z + i * S + W] for i in range(N)
-                        ]
-                else:
-                    # If not sequence, use whole data instead of chunk
-                    cache_chunks[k] += [v for _ in range(N)]
-            cache_id_list += [id_ for _ in range(N)]
-
-            if len(cache_id_list) > self.num_cache_chunks:
-                cache_id_list, cache_chunks = yield from self._generate_mini_batches(
-                    cache_id_list,
-                    cache_chunks,
-                    shuffle,
-                    state,
+    def _add_sample(
+        self,
+        index: int,
+        id_: str,
+        batch: Dict[str, torch.Tensor],
+        sequence_keys: List[str],
+    ):
+        factory = self.factory
+        for key in sequence_keys:
+            if factory.is_excluded_key(key):
+                # ignore length inconsistency for `excluded_key_prefixes`
+                continue
+            if len(batch[key]) != len(batch[sequence_keys[0]]):
+                raise RuntimeError(
+                    f"All sequences must has same length: "
+                    f"{len(batch[key])} != {len(batch[sequence_keys[0]])}"
                 )
 
-            if len(chunk_lengths) == 0:
-                W = 0
-            cache_id_list_dict[category][W] = cache_id_list
-            cache_chunks_dict[category][W] = cache_chunks
+        # Get sampling frequency of the batch to recalculate the chunk length
+        fs = batch.get("utt2fs", torch.LongTensor([16000])).type(torch.int64).item()
+        default_fs = fs if factory.default_fs is None else factory.default_fs
+        assert fs % default_fs == 0 or default_fs % fs == 0
 
-        else:
-            for category in cache_id_list_dict.keys():
-                for W in cache_id_list_dict[category]:
-                    cache_id_list = cache_id_list_dict[category].setdefault(W, [])
-                    cache_chunks = cache_chunks_dict[category].setdefault(W, {})
-
-                    yield from self._generate_mini_batches(
-                        cache_id_list,
-                        cache_chunks,
-                        shuffle,
-                        state,
-                    )
-
-    def prepare_for_collate(self, id_list, batches):
-        return [
-            (id_, {k: vs[i].numpy() for k, vs in batches.items()})
-            for i, id_ in enumerate(id_list)
+        L = len(batch[sequence_keys[0]])
+        # Select chunk length
+        chunk_lengths = [lg * fs // default_fs for lg in factory.chunk_lengths]
+        chunk_lengths = [
+            min(lg, factory.chunk_max_abs_length) for lg in chunk_lengths if lg < L
         ]
+        if len(chunk_lengths) == 0 and getattr(factory, "discard_short_samples", True):
+            logging.warning(
+                f"The length of '{id_}' is {L}, but it is shorter than "
+                f"any candidates of chunk-length: {factory.chunk_lengths}"
+            )
+            return
 
-    def _generate_mini_batches(
-        self,
-        id_list: List[str],
-        batches: Dict[str, List[torch.Tensor]],
-        shuffle: bool,
-        state: np.random.RandomState,
-    ):
-        if shuffle:
-            indices = np.arange(0, len(id_list))
-            state.shuffle(indices)
-            batches = {k: [v[i] for i in indices] for k, v in batches.items()}
-            id_list = [id_list[i] for i in indices]
-
-        bs = self.batch_size
-        while len(id_list) >= bs:
-            # Make mini-batch and yield
-            if self.discard_short_samples:
-                yield (
-                    id_list[:bs],
-                    {k: torch.stack(v[:bs], 0) for k, v in batches.items()},
-                )
-            else:
-                yield self.collate_fn(
-                    self.prepare_for_collate(
-                        id_list[:bs], {k: v[:bs] for k, v in batches.items()}
-                    )
-                )
-            id_list = id_list[bs:]
-            batches = {k: v[bs:] for k, v in batches.items()}
+        # Convert numpy array to number
+        category = (
+            batch.get("utt2category", torch.LongTensor([0])).type(torch.int64).item()
+        )
 
-        return id_list, batches
+        if len(chunk_lengths) == 0:
+            # keep the batch as is
+            Z, N, W, S = 0, 1, L, 0
+            cache = self.caches.setdefault(category, {}).setdefault(0, [])
+        else:
+            W = int(self.random_state.choice(chunk_lengths, 1))
+            cache = self.caches.setdefault(category, {}).setdefault(W, [])
+
+            # Shift width to the next chunk
+            S = int(W * factory.chunk_shift_ratio)
+            # Number of chunks
+            N = (L - W) // S + 1
+            if self.shuffle:
+                Z = self.random_state.randint(0, (L - W) % S + 1)
+            else:
+                Z = 0
+
+        # Split a sequence into chunks.
+        # Note that the marginal frames divided by chunk length are discarded
+        cache += [(index, int(Z + i * S), W) for i in range(N)]
+        self.samples[index] = (id_, batch, sequence_keys)
+        self.num_refs[index] += N
+
+        if len(cache) > factory.num_cache_chunks:
+            cache[:] = self._split_mini_batches(cache)
+
+    def _split_mini_batches(
+        self, chunks: List[Tuple[int, int, int]]
+    ) -> List[Tuple[int, int, int]]:
+        """Move the mini-batches to the pending queue and return the remainder."""
+        if self.shuffle:
+            indices = np.arange(0, len(chunks))
+            self.random_state.shuffle(indices)
+            chunks = [chunks[i] for i in indices]
+
+        bs = self.factory.batch_size
+        while len(chunks) >= bs:
+            self.pending.append(chunks[:bs])
+            chunks = chunks[bs:]
+        return chunks
+
+    def _release(self, chunks: List[Tuple[int, int, int]]):
+        for index, _, _ in chunks:
+            self.num_refs[index] -= 1
+            if self.num_refs[index] == 0:
+                del self.num_refs[index]
+                del self.samples[index]
+
+    def _make_mini_batch(self, chunks: List[Tuple[int, int, int]]):
+        id_list = []
+        batches = {}
+        for index, start, width in chunks:
+            id_, batch, sequence_keys = self.samples[index]
+            id_list.append(id_)
+            for k, v in batch.items():
+                # Shift chunks with overlapped length for data augmentation
+                if k in sequence_keys and not self.factory.is_excluded_key(k):
+                    v = v[start : start + width]
+                # If not sequence, use whole data instead of chunk
+                batches.setdefault(k, []).append(v)
+
+        # Make mini-batch
+        if self.factory.discard_short_samples:
+            return id_list, {k: torch.stack(v, 0) for k, v in batches.items()}
+        else:
+            return self.factory.collate_fn(
+                self.factory.prepare_for_collate(id_list, batches)
+            )
@@ -4,6 +4,7 @@ from functools import partial
 from typing import Any, Optional, Sequence, Union
 
 import numpy as np
+import torch
 from torch.utils.data import DataLoader
 from typeguard import typechecked
 
@@ -72,7 +73,19 @@ class SequenceIterFactory(AbsIterFactory):
         # https://discuss.pytorch.org/t/what-is-the-disadvantage-of-using-pin-memory/1702
         self.pin_memory = pin_memory
 
-    def build_iter(self, epoch: int, shuffle: bool = None) -> DataLoader:
+    def build_iter(
+        self, epoch: int, shuffle: bool = None, start_iter: int = 0
+    ) -> DataLoader:
+        """Build the DataLoader of the epoch.
+
+        Args:
+            epoch: The epoch number.
+            shuffle: Shuffle the mini-batches. If None, use the value given at init.
+            start_iter: Skip the first mini-batches of the epoch
+                to resume it from the middle. The mini-batches are decided only from
+                the epoch and the seed, so the data of the skipped mini-batches
+                are not loaded.
+        """
         if shuffle is None:
             shuffle = self.shuffle
 
@@ -155,11 +168,16 @@ class SequenceIterFactory(AbsIterFactory):
             batches = _batches
             del _batches
 
+        if start_iter > 0:
+            batches = batches[start_iter:]
+
         return DataLoader(
             dataset=self.dataset,
             batch_sampler=batches,
             num_workers=self.num_workers,
             pin_memory=self.pin_memory,
             worker_init_fn=partial(worker_init_fn, base_seed=epoch + self.seed),
+            # Not to consume the global random state, which is restored when resuming
+            generator=torch.Generator().manual_seed(epoch + self.seed),
             **kwargs,
         )
@@ -0,0 +1,86 @@
+import itertools
+from functools import partial
+from typing import Iterator, Optional
+
+from torch.utils.data import DataLoader
+from typeguard import typechecked
+
+from espnet2.iterators.abs_iter_factory import AbsIterFactory
+from espnet2.iterators.sequence_iter_factory import worker_init_fn
+from espnet2.train.iterable_dataset import ShardedIterableESPnetDataset
+
+
+class ShardIterFactory(AbsIterFactory):
+    """Build iterator streaming the packed shards for each epoch.
+
+    The shuffling of the shards and the samples is decided by "seed + epoch".
+    Unlike SequenceIterFactory, the mini-batches are made of the consecutive
+    samples with a fixed batch_size, since the lengths are unknown in advance.
+
+    If num_iters_per_epoch is given, the batches are taken from a stream
+    continued over the passes of the corpus, so the remaining batches of
+    a pass are used in the next epoch. Note that the stream restarts
+    from the beginning of the pass when resuming.
+    """
+
+    @typechecked
+    def __init__(
+        self,
+        dataset: ShardedIterableESPnetDataset,
+        batch_size: int = 1,
+        num_iters_per_epoch: Optional[int] = None,
+        seed: int = 0,
+        shuffle: bool = False,
+        num_workers: int = 0,
+        collate_fn=None,
+        pin_memory: bool = False,
+    ):
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.num_iters_per_epoch = num_iters_per_epoch
+        self.seed = seed
+        self.shuffle = shuffle
+        self.num_workers = num_workers
+        self.collate_fn = collate_fn
+        self.pin_memory = pin_memory
+
+        self._stream = None
+
+    def _build_loader(self, epoch: int, shuffle: bool) -> DataLoader:
+        self.dataset.set_epoch(epoch)
+        self.dataset.seed = self.seed
+        self.dataset.shuffle = shuffle
+
+        # For backward compatibility for pytorch DataLoader
+        if self.collate_fn is not None:
+            kwargs = dict(collate_fn=self.collate_fn)
+        else:
+            kwargs = {}
+
+        return DataLoader(
+            dataset=self.dataset,
+            batch_size=self.batch_size,
+            num_workers=self.num_workers,
+            pin_memory=self.pin_memory,
+            worker_init_fn=partial(worker_init_fn, base_seed=epoch + self.seed),
+            **kwargs,
+        )
+
+    def _iter_passes(self, epoch: int, shuffle: bool) -> Iterator:
+        for _epoch in itertools.count(epoch):
+            count = 0
+            for count, batch in enumerate(self._build_loader(_epoch, shuffle), 1):
+                yield batch
+            if count == 0:
+                raise RuntimeError("No iteration")
+
+    def build_iter(self, epoch: int, shuffle: bool = None) -> Iterator:
+        if shuffle is None:
+            shuffle = self.shuffle
+
+        if self.num_iters_per_epoch is None:
+            return self._build_loader(epoch, shuffle)
+
+        if self._stream is None:
+            self._stream = self._iter_passes(epoch, shuffle)
+        return itertools.islice(self._stream, self.num_iters_per_epoch)
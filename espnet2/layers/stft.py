@@ -1,4 +1,4 @@
-from typing import Optional, Tuple, Union
+from typing import Any, Dict, Optional, Tuple, Union
 
 import librosa
 import numpy as np
@@ -175,6 +175,116 @@ class Stft(torch.nn.Module, InversibleInterface):
 
         return output, olens
 
+    def forward_streaming(
+        self,
+        input: torch.Tensor,
+        states: Optional[Dict[str, Any]] = None,
+        is_final: bool = False,
+    ) -> Tuple[torch.Tensor, Dict[str, Any]]:
+        """STFT of a stream, computing only the frames not emitted before.
+
+        The samples are written to a fixed-size buffer, which is compacted
+        only when it's full, so the previous samples are neither concatenated
+        nor transformed again. The frames of all the chunks are the same as
+        forward() of the entire stream with the reflect padding of "center".
+
+        Args:
+            input: The new samples of the stream: (Batch, Nsamples)
+            states: The states returned by the previous chunk or None
+            is_final: Whether the chunk is the last one of the stream
+        Returns:
+            output: (Batch, Frames, Freq, 2) of the new frames
+            next_states: The states for the next chunk
+
+        """
+        assert input.dim() == 2, "forward_streaming supports single-channel input"
+        bs = input.size(0)
+        pad = self.n_fft // 2 if self.center else 0
+        if states is None:
+            states = {
+                # buffer[:, :end] is the padded stream from the index "start"
+                "buffer": input.new_zeros(
+                    bs, max(2 * self.n_fft, input.size(1) + 2 * pad + self.n_fft)
+                ),
+                "start": 0,
+                "end": pad,
+                "n_samples": 0,
+                "n_frames": 0,
+            }
+        if is_final and states["n_samples"] + input.size(1) <= pad:
+            # Zero-pad the too short stream for the reflect padding
+            input = torch.nn.functional.pad(
+                input, [0, max(self.win_length, pad + 1) - states["n_samples"]]
+            )
+        length = input.size(1) + (pad if is_final else 0)
+        buffer, start, end = states["buffer"], states["start"], states["end"]
+
+        if end + length > buffer.size(1):
+            # Drop the samples not used by the next frame nor the reflect padding
+            drop = min(states["n_frames"] * self.hop_length - start, end - pad - 1)
+            if states["n_samples"] <= pad:
+                drop = 0
+            if drop > 0:
+                buffer[:, : end - drop] = buffer[:, drop:end].clone()
+                start, end = start + drop, end - drop
+            if end + length > buffer.size(1):
+                new_buffer = buffer.new_zeros(bs, max(2 * buffer.size(1), end + length))
+                new_buffer[:, :end] = buffer[:, :end]
+                buffer = new_buffer
+
+        n_samples = states["n_samples"] + input.size(1)
+        buffer[:, end : end + input.size(1)] = input
+        end += input.size(1)
+        if pad > 0 and states["n_samples"] <= pad < n_samples:
+            # The samples for the reflect padding of the beginning are available
+            buffer[:, :pad] = buffer[:, pad + 1 : 2 * pad + 1].flip(1)
+        if pad > 0 and is_final:
+            buffer[:, end : end + pad] = buffer[:, end - pad - 1 : end - 1].flip(1)
+            end += pad
+
+        offset = states["n_frames"] * self.hop_length - start
+        if pad > 0 and n_samples <= pad:
+            n_frames = 0
+        else:
+            n_frames = max(0, (end - offset - self.n_fft) // self.hop_length + 1)
+        if self.window is not None:
+            window_func = getattr(torch, f"{self.window}_window")
+            window = window_func(
+                self.win_length, dtype=torch.float32, device=input.device
+            )
+        else:
+            window = torch.ones(self.win_length, device=input.device)
+        # Pad the window to n_fft as torch.stft does
+        n_pad_left = (self.n_fft - self.win_length) // 2
+        window = torch.nn.functional.pad(
+            window, [n_pad_left, self.n_fft - self.win_length - n_pad_left]
+        )
+        n_freq = self.n_fft // 2 + 1 if self.onesided else self.n_fft
+        if n_frames > 0:
+            # frames: (Batch, Frames, n_fft)
+            frames = buffer[
+                :, offset : offset + (n_frames - 1) * self.hop_length + self.n_fft
+            ].unfold(1, self.n_fft, self.hop_length)
+            windowed = frames.float() * window
+            if self.onesided:
+                output = torch.fft.rfft(windowed)
+            else:
+                output = torch.fft.fft(windowed)
+            if self.normalized:
+                output = output * self.n_fft ** (-0.5)
+            output = torch.view_as_real(output).type(input.dtype)
+        else:
+            output = input.new_zeros(bs, 0, n_freq, 2)
+
+        next_states = {
+            "buffer": buffer,
+            "start": start,
+            "end": end,
+            "n_samples": n_samples,
+            "n_frames": states["n_frames"] + n_frames,
+        }
+        return output, next_states
+
     def inverse(
         self, input: Union[torch.Tensor, ComplexTensor], ilens: torch.Tensor = None
     ) -> Tuple[torch.Tensor, Optional[torch.Tensor]]:
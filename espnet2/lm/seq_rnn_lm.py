@@ -128,7 +128,11 @@ class SequentialRNNLM(AbsLM):
         return logp, new_state
 
     def batch_score(
-        self, ys: torch.Tensor, states: torch.Tensor, xs: torch.Tensor
+        self,
+        ys: torch.Tensor,
+        states: torch.Tensor,
+        xs: torch.Tensor,
+        ylens: torch.Tensor = None,
     ) -> Tuple[torch.Tensor, torch.Tensor]:
         """Score new token batch.
 
@@ -137,6 +141,8 @@ class SequentialRNNLM(AbsLM):
             states (List[Any]): Scorer states for prefix tokens.
             xs (torch.Tensor):
                 The encoder feature that generates ys (n_batch, xlen, n_feat).
+            ylens (torch.Tensor): The lengths of ys (n_batch,)
+                if the prefixes have different lengths and are right-padded.
 
         Returns:
             tuple[torch.Tensor, List[Any]]: Tuple of
@@ -144,6 +150,16 @@ class SequentialRNNLM(AbsLM):
                 and next state list for ys.
 
         """
+        if any(s is None for s in states) and any(s is not None for s in states):
+            # The initial states of the new prefixes are zeros as in the RNN
+            ref = next(s for s in states if s is not None)
+            zeros = (
+                tuple(torch.zeros_like(r) for r in ref)
+                if isinstance(ref, tuple)
+                else torch.zeros_like(ref)
+            )
+            states = [zeros if s is None else s for s in states]
+
         if states[0] is None:
             states = None
         elif isinstance(self.rnn, torch.nn.LSTM):
@@ -155,7 +171,11 @@ class SequentialRNNLM(AbsLM):
             # states: Batch x (Nlayers, Dim) -> (Nlayers, Batch, Dim)
             states = torch.stack(states, dim=1)
 
-        ys, states = self(ys[:, -1:], states)
+        if ylens is None:
+            last_ids = ys[:, -1:]
+        else:
+            last_ids = ys[torch.arange(ys.size(0), device=ys.device), ylens - 1, None]
+        ys, states = self(last_ids, states)
         # ys: (Batch, 1, Nvocab) -> (Batch, NVocab)
         assert ys.size(1) == 1, ys.shape
         ys = ys.squeeze(1)
@@ -1,7 +1,9 @@
+import copy
+import inspect
 import logging
 import warnings
 from pathlib import Path
-from typing import Collection, Optional, Sequence, Union
+from typing import Collection, Dict, Optional, Sequence, Union
 
 import torch
 from typeguard import typechecked
@@ -47,16 +49,18 @@ def average_nbest_models(
         if reporter.has(ph, k)
     ]
 
-    _loaded = {}
+    # 2. Load each model file only once and average the n-best models
+    #    with a running sum for each criterion, e.g. the sum of the 5-best
+    #    is used for the 10-best, so that only the sum and the averaged model
+    #    are kept in memory in addition to the (memory-mapped) model files.
+    loader = _ModelLoader(output_dir)
     for ph, cr, epoch_and_values in nbest_epochs:
         _nbests = [i for i in nbests if i <= len(epoch_and_values)]
         if len(_nbests) == 0:
             _nbests = [1]
 
         for n in _nbests:
-            if n == 0:
-                continue
-            elif n == 1:
+            if n == 1:
                 # The averaged model is same as the best model
                 e, _ = epoch_and_values[0]
                 op = output_dir / f"{e}epoch.pth"
@@ -64,42 +68,42 @@ def average_nbest_models(
                 if sym_op.is_symlink() or sym_op.exists():
                     sym_op.unlink()
                 sym_op.symlink_to(op.name)
-            else:
-                op = output_dir / f"{ph}.{cr}.ave_{n}best.{suffix}pth"
-                logging.info(
-                    f"Averaging {n}best models: " f'criterion="{ph}.{cr}": {op}'
-                )
-
-                avg = None
-                # 2.a. Averaging model
-                for e, _ in epoch_and_values[:n]:
-                    if e not in _loaded:
-                        _loaded[e] = torch.load(
-                            output_dir / f"{e}epoch.pth",
-                            map_location="cpu",
-                        )
-                    states = _loaded[e]
-
-                    if avg is None:
-                        avg = states
-                    else:
-                        # Accumulated
-                        for k in avg:
-                            avg[k] = avg[k] + states[k]
-                for k in avg:
-                    if str(avg[k].dtype).startswith("torch.int"):
-                        # For int type, not averaged, but only accumulated.
-                        # e.g. BatchNorm.num_batches_tracked
-                        # (If there are any cases that requires averaging
-                        #  or the other reducing method, e.g. max/min, for integer type,
-                        #  please report.)
-                        logging.info(f"Accumulating {k} instead of averaging")
-                        pass
-                    else:
-                        avg[k] = avg[k] / n
-
-                # 2.b. Save the ave model and create a symlink
-                torch.save(avg, op)
+
+        avg = None
+        num_accumulated = 0
+        for n in sorted(set(i for i in _nbests if i >= 2)):
+            op = output_dir / f"{ph}.{cr}.ave_{n}best.{suffix}pth"
+            logging.info(f"Averaging {n}best models: " f'criterion="{ph}.{cr}": {op}')
+
+            # 2.a. Accumulate the models from the last n
+            for e, _ in epoch_and_values[num_accumulated:n]:
+                states = loader.load(e)
+                if avg is None:
+                    # copy.copy() keeps the class and the attributes of state_dict
+                    avg = copy.copy(states)
+                    for k in avg:
+                        avg[k] = states[k].clone()
+                else:
+                    # Accumulated
+                    for k in avg:
+                        avg[k] += states[k]
+            num_accumulated = n
+
+            # 2.b. Save the ave model
+            ave = copy.copy(avg)
+            for k in ave:
+                if str(ave[k].dtype).startswith("torch.int"):
+                    # For int type, not averaged, but only accumulated.
+                    # e.g. BatchNorm.num_batches_tracked
+                    # (If there are any cases that requires averaging
+                    #  or the other reducing method, e.g. max/min, for integer type,
+                    #  please report.)
+                    logging.info(f"Accumulating {k} instead of averaging")
+                else:
+                    ave[k] = ave[k] / n
+            torch.save(ave, op)
+            del ave
+        del avg
 
         # 3. *.*.ave.pth is a symlink to the max ave model
         op = output_dir / f"{ph}.{cr}.ave_{max(_nbests)}best.{suffix}pth"
@@ -107,3 +111,38 @@ def average_nbest_models(
         if sym_op.is_symlink() or sym_op.exists():
             sym_op.unlink()
         sym_op.symlink_to(op.name)
+
+    if loader.num_loads > 0:
+        logging.info(f"Loaded {loader.num_loads} model files for averaging")
+
+
+class _ModelLoader:
+    """Load the model files, memory-mapped if possible.
+
+    The memory-mapped states are kept and reused for the other criteria
+    because they don't occupy the memory except for the page cache.
+    """
+
+    def __init__(self, output_dir: Path):
+        self.output_dir = output_dir
+        self.mmap = "mmap" in inspect.signature(torch.load).parameters
+        self.num_loads = 0
+        self._loaded = {}
+
+    def load(self, epoch: int) -> Dict[str, torch.Tensor]:
+        if epoch in self._loaded:
+            return self._loaded[epoch]
+
+        path = self.output_dir / f"{epoch}epoch.pth"
+        self.num_loads += 1
+        if self.mmap:
+            try:
+                states = torch.load(str(path), map_location="cpu", mmap=True)
+            except RuntimeError:
+                # e.g. The file is saved in the legacy format
+                logging.warning(f"{path} can't be memory-mapped")
+                self.mmap = False
+            else:
+                self._loaded[epoch] = states
+                return states
+        return torch.load(path, map_location="cpu")
@@ -1,5 +1,7 @@
+import inspect
 import logging
-from collections import defaultdict
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Tuple, Union
 
@@ -11,21 +13,141 @@ from typeguard import typechecked
 
 from espnet2.fileio.datadir_writer import DatadirWriter
 from espnet2.fileio.npy_scp import NpyScpWriter
+from espnet2.iterators.abs_iter_factory import AbsIterFactory
+from espnet2.torch_utils.atomic_save import atomic_save
 from espnet2.torch_utils.device_funcs import to_device
 from espnet2.torch_utils.forward_adaptor import ForwardAdaptor
 from espnet2.train.abs_espnet_model import AbsESPnetModel
 
 
+class StatsAccumulator:
+    """Mergeable accumulator of the count, the mean, and the variance.
+
+    The mean and the sum of squared deviations from the mean are kept
+    in float64 instead of the sum and the square sum, and two accumulators
+    are merged by the parallel algorithm of Chan et al.,
+    which is numerically stable for long and large-valued features.
+
+    Examples:
+        >>> acc = StatsAccumulator()
+        >>> acc.merge(StatsAccumulator.from_batch(feats, feats_lengths))
+        >>> acc.save("feats_stats.npz")
+
+    """
+
+    def __init__(
+        self,
+        count: int = 0,
+        mean: Union[np.ndarray, float] = 0.0,
+        m2: Union[np.ndarray, float] = 0.0,
+        dtype: Optional[np.dtype] = None,
+    ):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.dtype = dtype
+
+    @classmethod
+    def from_batch(
+        cls, feats: torch.Tensor, lengths: Optional[torch.Tensor] = None
+    ) -> "StatsAccumulator":
+        """Compute the statistics of a mini-batch.
+
+        Args:
+            feats: (Batch, Length, Dim, ...) if lengths is given,
+                otherwise (Batch, Dim, ...), which is regarded as Length=1.
+            lengths: (Batch,)
+        """
+        dtype = torch.empty(0, dtype=feats.dtype).numpy().dtype
+        x = feats.double()
+        if lengths is None:
+            x = x[:, None]
+            mask = None
+            count = x.size(0)
+        else:
+            lengths = lengths.to(x.device)
+            mask = torch.arange(x.size(1), device=x.device)[None] < lengths[:, None]
+            mask = mask.view(*mask.shape, *[1] * (x.dim() - 2))
+            x = x.masked_fill(~mask, 0.0)
+            count = int(lengths.sum())
+
+        mean = x.sum((0, 1)) / max(count, 1)
+        deviation = x - mean
+        if mask is not None:
+            deviation = deviation.masked_fill(~mask, 0.0)
+        m2 = (deviation**2).sum((0, 1))
+        return cls(count, mean.cpu().numpy(), m2.cpu().numpy(), dtype)
+
+    def merge(self, other: "StatsAccumulator") -> "StatsAccumulator":
+        if self.dtype is None:
+            self.dtype = other.dtype
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / count)
+        self.m2 = self.m2 + other.m2 + delta**2 * (self.count * other.count / count)
+        self.count = count
+        return self
+
+    @property
+    def sum(self) -> np.ndarray:
+        return self._cast(self.mean * self.count)
+
+    @property
+    def sum_square(self) -> np.ndarray:
+        return self._cast(self.m2 + self.mean**2 * self.count)
+
+    def _cast(self, value: np.ndarray) -> np.ndarray:
+        # Save in the same dtype as the features
+        if self.dtype is None:
+            return value
+        if np.issubdtype(self.dtype, np.integer):
+            value = np.rint(value)
+        return np.asarray(value).astype(self.dtype)
+
+    def save(self, path: Union[Path, str]):
+        """Save the stats as the format of GlobalMVN and aggregate_stats_dirs.py"""
+        np.savez(path, count=self.count, sum=self.sum, sum_square=self.sum_square)
+
+    def state_dict(self) -> dict:
+        return dict(
+            count=self.count,
+            mean=self.mean,
+            m2=self.m2,
+            dtype=None if self.dtype is None else str(self.dtype),
+        )
+
+    def load_state_dict(self, state: dict):
+        self.count = state["count"]
+        self.mean = state["mean"]
+        self.m2 = state["m2"]
+        self.dtype = None if state["dtype"] is None else np.dtype(state["dtype"])
+
+
 @torch.no_grad()
 @typechecked
 def collect_stats(
     model: Union[AbsESPnetModel, None],
-    train_iter: DataLoader and Iterable[Tuple[List[str], Dict[str, torch.Tensor]]],
-    valid_iter: DataLoader and Iterable[Tuple[List[str], Dict[str, torch.Tensor]]],
+    train_iter: Union[
+        AbsIterFactory,
+        DataLoader and Iterable[Tuple[List[str], Dict[str, torch.Tensor]]],
+    ],
+    valid_iter: Union[
+        AbsIterFactory,
+        DataLoader and Iterable[Tuple[List[str], Dict[str, torch.Tensor]]],
+    ],
     output_dir: Path,
     ngpu: Optional[int],
     log_interval: Optional[int],
     write_collected_feats: bool,
+    num_workers: int = 1,
+    checkpoint_interval: int = 0,
+    resume: bool = False,
 ) -> None:
     """Perform on collect_stats mode.
 
@@ -33,91 +155,221 @@ def collect_stats(
     and gathering statistics.
     This method is used before executing train().
 
+    The features are extracted by "num_workers" threads in parallel and
+    the statistics of each mini-batch are merged in the order of mini-batches,
+    so the outputs don't depend on "num_workers".
+    If checkpoint_interval > 0, the progress is saved every checkpoint_interval
+    mini-batches and the killed job can be restarted from it with resume=True.
+    The iterators can be given as iter-factories, whose build_iter() takes
+    start_iter to skip the mini-batches processed before the checkpoint
+    without loading them. Otherwise, the skipped mini-batches are loaded again.
+
     """
+    checkpoint = output_dir / "collect_stats_checkpoint.pth"
+    progress = {"finished": []}
+    if resume and checkpoint.exists():
+        progress = torch.load(checkpoint)
+        logging.info(f"The collect_stats was resumed using {checkpoint}")
 
     npy_scp_writers = {}
     for itr, mode in zip([train_iter, valid_iter], ["train", "valid"]):
+        if mode in progress["finished"]:
+            logging.info(f"Skipping {mode}: Already finished")
+            continue
+
+        stats_dict = {}
+        batch_names = []
+        start_iter = 0
+        if progress.get("mode") == mode:
+            # Discard the outputs written after the checkpoint
+            _truncate_outputs(output_dir / mode, progress["file_sizes"])
+            start_iter = progress["num_iters"]
+            batch_names = progress["batch_names"]
+            for key, state in progress["stats"].items():
+                stats_dict[key] = StatsAccumulator()
+                stats_dict[key].load_state_dict(state)
+            logging.info(f"Resumed {mode} from {start_iter} iterations")
+
+        # The number of mini-batches to be skipped while iterating
+        num_skipped = start_iter
+        if isinstance(itr, AbsIterFactory):
+            if (
+                start_iter > 0
+                and "start_iter" in inspect.signature(itr.build_iter).parameters
+            ):
+                itr = itr.build_iter(1, shuffle=False, start_iter=start_iter)
+                num_skipped = 0
+            else:
+                itr = itr.build_iter(1, shuffle=False)
         if log_interval is None:
             try:
                 log_interval = max(len(itr) // 20, 10)
             except TypeError:
                 log_interval = 100
 
-        sum_dict = defaultdict(lambda: 0)
-        sq_dict = defaultdict(lambda: 0)
-        count_dict = defaultdict(lambda: 0)
+        with DatadirWriter(
+            output_dir / mode, append=start_iter > 0
+        ) as datadir_writer, ThreadPoolExecutor(num_workers) as executor:
+            # The mini-batches being processed by the workers
+            queue = deque()
+
+            def flush(max_len: int):
+                while len(queue) > max_len:
+                    keys, future = queue.popleft()
+                    _write_stats(
+                        keys,
+                        future.result(),
+                        stats_dict,
+                        npy_scp_writers,
+                        output_dir / mode,
+                        append=start_iter > 0,
+                    )
 
-        with DatadirWriter(output_dir / mode) as datadir_writer:
-            for iiter, (keys, batch) in enumerate(itr, 1):
-                batch = to_device(batch, "cuda" if ngpu > 0 else "cpu")
+            for iiter, (keys, batch) in enumerate(itr, start_iter - num_skipped + 1):
+                if iiter <= start_iter:
+                    # Only the data loading is repeated
+                    continue
 
                 # 1. Write shape file
-                for name in batch:
-                    if name.endswith("_lengths"):
-                        continue
-                    for i, (key, data) in enumerate(zip(keys, batch[name])):
-                        if f"{name}_lengths" in batch:
-                            lg = int(batch[f"{name}_lengths"][i])
-                            data = data[:lg]
-                        datadir_writer[f"{name}_shape"][key] = ",".join(
-                            map(str, data.shape)
-                        )
+                batch_names = [n for n in batch if not n.endswith("_lengths")]
+                for name in batch_names:
+                    if f"{name}_lengths" in batch:
+                        lengths = batch[f"{name}_lengths"].tolist()
+                        shapes = [(lg,) + batch[name].shape[2:] for lg in lengths]
+                    else:
+                        shapes = [batch[name].shape[1:]] * len(keys)
+                    for key, shape in zip(keys, shapes):
+                        datadir_writer[f"{name}_shape"][key] = ",".join(map(str, shape))
 
                 if model is not None:
-                    # 2. Extract feats
-                    if ngpu <= 1:
-                        data = model.collect_feats(**batch)
-                    else:
-                        # Note that data_parallel can parallelize only "forward()"
-                        data = data_parallel(
-                            ForwardAdaptor(model, "collect_feats"),
-                            (),
-                            range(ngpu),
-                            module_kwargs=batch,
-                        )
-
-                    # 3. Calculate sum and square sum
-                    for key, v in data.items():
-                        for i, (uttid, seq) in enumerate(zip(keys, v.cpu().numpy())):
-                            # Truncate zero-padding region
-                            if f"{key}_lengths" in data:
-                                length = data[f"{key}_lengths"][i]
-                                # seq: (Length, Dim, ...)
-                                seq = seq[:length]
-                            else:
-                                # seq: (Dim, ...) -> (1, Dim, ...)
-                                seq = seq[None]
-                            # Accumulate value, its square, and count
-                            sum_dict[key] += seq.sum(0)
-                            sq_dict[key] += (seq**2).sum(0)
-                            count_dict[key] += len(seq)
-
-                            # 4. [Option] Write derived features as npy format file.
-                            if write_collected_feats:
-                                # Instantiate NpyScpWriter for the first iteration
-                                if (key, mode) not in npy_scp_writers:
-                                    p = output_dir / mode / "collect_feats"
-                                    npy_scp_writers[(key, mode)] = NpyScpWriter(
-                                        p / f"data_{key}", p / f"{key}.scp"
-                                    )
-                                # Save array as npy file
-                                npy_scp_writers[(key, mode)][uttid] = seq
+                    # 2. Extract feats and calculate the stats in background
+                    future = executor.submit(
+                        _collect_feats, model, batch, ngpu, write_collected_feats
+                    )
+                    queue.append((keys, future))
 
+                # Keep num_workers mini-batches in the queue
+                flush(num_workers)
                 if iiter % log_interval == 0:
                     logging.info(f"Niter: {iiter}")
 
-        for key in sum_dict:
-            np.savez(
-                output_dir / mode / f"{key}_stats.npz",
-                count=count_dict[key],
-                sum=sum_dict[key],
-                sum_square=sq_dict[key],
-            )
+                if checkpoint_interval > 0 and iiter % checkpoint_interval == 0:
+                    flush(0)
+                    datadir_writer.flush()
+                    for writer in npy_scp_writers.values():
+                        writer.flush()
+                    atomic_save(
+                        dict(
+                            progress,
+                            mode=mode,
+                            num_iters=iiter,
+                            batch_names=batch_names,
+                            stats={k: v.state_dict() for k, v in stats_dict.items()},
+                            file_sizes=_get_file_sizes(output_dir / mode),
+                        ),
+                        checkpoint,
+                    )
+
+            flush(0)
+
+        for key, stats in stats_dict.items():
+            stats.save(output_dir / mode / f"{key}_stats.npz")
 
         # batch_keys and stats_keys are used by aggregate_stats_dirs.py
         with (output_dir / mode / "batch_keys").open("w", encoding="utf-8") as f:
-            f.write(
-                "\n".join(filter(lambda x: not x.endswith("_lengths"), batch)) + "\n"
-            )
+            f.write("\n".join(batch_names) + "\n")
         with (output_dir / mode / "stats_keys").open("w", encoding="utf-8") as f:
-            f.write("\n".join(sum_dict) + "\n")
+            f.write("\n".join(stats_dict) + "\n")
+
+        progress = {"finished": progress["finished"] + [mode]}
+        if checkpoint_interval > 0:
+            atomic_save(progress, checkpoint)
+
+    for writer in npy_scp_writers.values():
+        writer.close()
+    if checkpoint.exists():
+        checkpoint.unlink()
+
+
+def _collect_feats(
+    model: AbsESPnetModel,
+    batch: Dict[str, torch.Tensor],
+    ngpu: int,
+    return_feats: bool,
+) -> Dict[str, Tuple[StatsAccumulator, Optional[List[np.ndarray]]]]:
+    # NOTE: torch.no_grad() is thread-local
+    with torch.no_grad():
+        batch = to_device(batch, "cuda" if ngpu > 0 else "cpu")
+        if ngpu <= 1:
+            data = model.collect_feats(**batch)
+        else:
+            # Note that data_parallel can parallelize only "forward()"
+            data = data_parallel(
+                ForwardAdaptor(model, "collect_feats"),
+                (),
+                range(ngpu),
+                module_kwargs=batch,
+            )
+
+        retval = {}
+        for key, v in data.items():
+            lengths = data.get(f"{key}_lengths")
+            stats = StatsAccumulator.from_batch(v, lengths)
+
+            feats = None
+            if return_feats:
+                v = v.cpu().numpy()
+                if lengths is not None:
+                    # Truncate zero-padding region: (Length, Dim, ...)
+                    feats = [seq[:lg] for seq, lg in zip(v, lengths.tolist())]
+                else:
+                    # (Dim, ...) -> (1, Dim, ...)
+                    feats = [seq[None] for seq in v]
+            retval[key] = (stats, feats)
+        return retval
+
+
+def _write_stats(
+    keys: List[str],
+    data: Dict[str, Tuple[StatsAccumulator, Optional[List[np.ndarray]]]],
+    stats_dict: Dict[str, StatsAccumulator],
+    npy_scp_writers: Dict[Path, NpyScpWriter],
+    mode_dir: Path,
+    append: bool,
+):
+    # 3. Accumulate the stats in the order of mini-batches
+    for key, (stats, feats) in data.items():
+        stats_dict.setdefault(key, StatsAccumulator()).merge(stats)
+
+        # 4. [Option] Write derived features as npy format file.
+        if feats is not None:
+            p = mode_dir / "collect_feats"
+            # Instantiate NpyScpWriter for the first iteration
+            if p / f"{key}.scp" not in npy_scp_writers:
+                npy_scp_writers[p / f"{key}.scp"] = NpyScpWriter(
+                    p / f"data_{key}", p / f"{key}.scp", append=append
+                )
+            npy_scp_writers[p / f"{key}.scp"].update(dict(zip(keys, feats)))
+
+
+def _output_files(mode_dir: Path) -> List[Path]:
+    # The files appended while iterating the mini-batches
+    return list(mode_dir.glob("*_shape")) + list(
+        (mode_dir / "collect_feats").glob("*.scp")
+    )
+
+
+def _get_file_sizes(mode_dir: Path) -> Dict[str, int]:
+    return {
+        str(p.relative_to(mode_dir)): p.stat().st_size for p in _output_files(mode_dir)
+    }
+
+
+def _truncate_outputs(mode_dir: Path, file_sizes: Dict[str, int]):
+    for p in _output_files(mode_dir):
+        size = file_sizes.get(str(p.relative_to(mode_dir)))
+        if size is None:
+            p.unlink()
+        else:
+            with p.open("r+b") as f:
+                f.truncate(size)
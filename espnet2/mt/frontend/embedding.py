@@ -131,7 +131,7 @@ class CodecEmbedding(AbsFrontend):
     def __init__(
         self,
         input_size,
-        ***REMOVED***model_tag: str = "espnet/amuse_encodec_16k",
+        hf_model_tag: str = "espnet/amuse_encodec_16k",
         token_bias: int = 2,
         token_per_frame: int = 8,
         pos_enc_class=PositionalEncoding,
@@ -140,7 +140,7 @@ class CodecEmbedding(AbsFrontend):
         """Initialize.
 
         Args:
-            ***REMOVED***model_tag: HuggingFace model tag for Espnet codec models
+            hf_model_tag: HuggingFace model tag for Espnet codec models
             token_bias: the index of the first codec code
             pos_enc_class: PositionalEncoding or ScaledPositionalEncoding
             positional_dropout_rate: dropout rate after adding positional encoding
@@ -150,7 +150,7 @@ class CodecEmbedding(AbsFrontend):
 
         from espnet2.bin.gan_codec_inference import AudioCoding
 
-        model = AudioCoding.from_pretrained(model_tag=***REMOVED***model_tag).model
+        model = AudioCoding.from_pretrained(model_tag=hf_model_tag).model
         self.quantizer = model.codec.generator.quantizer
         self.codebook_size = self.quantizer.bins
         self.codebook_dim = self.quantizer.codebook_dim
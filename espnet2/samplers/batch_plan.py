@@ -0,0 +1,278 @@
+"""Vectorized helpers of the variable batch-size samplers and their plan cache.
+
+`LengthBatchSampler` and `NumElementsBatchSampler` decide the mini-batches
+greedily over the samples sorted by length. Here, the shape files are parsed
+into integer matrices and each mini-batch boundary is found by a vectorized
+search (`np.searchsorted` over the cumulative sums, or a vectorized scan when
+the bins are decided by the longest sample), so Python loops run per
+mini-batch instead of per sample and per shape file.
+
+The resulting mini-batches (the "plan") can be cached in a directory, keyed by
+the hash of the shape files and the sampler arguments, so that restarting
+loads it instead of building it again. With DDP, only rank 0 builds and writes
+the plan, and the other ranks load it after a barrier.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import torch
+
+from espnet2.fileio.read_text import read_2columns_text
+
+# Increment when the algorithm to decide the mini-batches changes
+PLAN_VERSION = 1
+
+
+def load_shape_file(path: Union[Path, str]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Load a shape file as an integer matrix.
+
+    Examples:
+        shape.txt:
+            uttA 100,80
+            uttB 201,80
+
+        >>> keys, shapes, ndims = load_shape_file('shape.txt')
+        >>> keys
+        ['uttA', 'uttB']
+        >>> shapes
+        array([[100,  80],
+               [201,  80]])
+
+    Returns:
+        keys: The keys in the file order.
+        shapes: (N, D). If the numbers of dimensions are different, the shorter
+            rows are padded with 1, which doesn't change the number of elements.
+        ndims: (N,) The number of dimensions of each row.
+    """
+    d = read_2columns_text(path)
+    keys = list(d)
+    values = list(d.values())
+    ndims = np.fromiter((v.count(",") + 1 for v in values), np.int64, len(values))
+    max_ndim = int(ndims.max()) if len(values) > 0 else 1
+
+    if (ndims == max_ndim).all():
+        shapes = np.array(",".join(values).split(","), dtype=np.int64)
+        shapes = shapes.reshape(len(values), max_ndim)
+    else:
+        shapes = np.ones((len(values), max_ndim), dtype=np.int64)
+        for i, v in enumerate(values):
+            shapes[i, : ndims[i]] = np.array(v.split(","), dtype=np.int64)
+    return keys, shapes, ndims
+
+
+def load_shape_files(
+    shape_files: Sequence[str],
+) -> Tuple[List[str], List[np.ndarray], List[np.ndarray]]:
+    """Load the shape files aligned to the key order of the first file."""
+    keys, shapes, ndims = load_shape_file(shape_files[0])
+    shapes_list, ndims_list = [shapes], [ndims]
+    for s in shape_files[1:]:
+        _keys, _shapes, _ndims = load_shape_file(s)
+        if _keys != keys:
+            if set(_keys) != set(keys):
+                raise RuntimeError(
+                    f"keys are mismatched between {s} != {shape_files[0]}"
+                )
+            position = {k: i for i, k in enumerate(_keys)}
+            index = np.array([position[k] for k in keys], dtype=np.int64)
+            _shapes, _ndims = _shapes[index], _ndims[index]
+        shapes_list.append(_shapes)
+        ndims_list.append(_ndims)
+    return keys, shapes_list, ndims_list
+
+
+def decide_batch_sizes(
+    costs: np.ndarray,
+    batch_bins: int,
+    min_batch_size: int = 1,
+    drop_last: bool = False,
+    padding: bool = True,
+) -> List[int]:
+    """Decide the batch sizes greedily over the samples sorted by length.
+
+    A mini-batch is closed when its bins exceed batch_bins and it has
+    min_batch_size samples at least.
+
+    Args:
+        costs: (N,) The bins of each sample.
+        padding: If True, the bins of a mini-batch are
+            "batch size x the cost of the last (longest) sample",
+            otherwise the sum of the costs.
+    """
+    n = len(costs)
+    min_batch_size = max(min_batch_size, 1)
+    if not padding:
+        cumsum = np.concatenate([[0], np.cumsum(costs)])
+
+    batch_sizes = []
+    start = 0
+    window = 2 * min_batch_size
+    while start < n:
+        if padding:
+            # Scan the windows growing from the last batch size
+            end = None
+            w = window
+            while end is None:
+                stop = min(start + w, n)
+                over = np.arange(1, stop - start + 1) * costs[start:stop] > batch_bins
+                over[: min_batch_size - 1] = False
+                if over.any():
+                    end = start + int(np.argmax(over)) + 1
+                elif stop == n:
+                    break
+                w *= 2
+        else:
+            # The first index where sum(costs[start:index]) > batch_bins
+            end = int(np.searchsorted(cumsum, cumsum[start] + batch_bins, "right"))
+            end = max(end, start + min_batch_size)
+            if end > n:
+                end = None
+
+        if end is None:
+            # The leftover
+            if not drop_last or len(batch_sizes) == 0:
+                batch_sizes.append(n - start)
+            break
+        batch_sizes.append(end - start)
+        window = 2 * max(batch_sizes[-1], min_batch_size)
+        start = end
+
+    if len(batch_sizes) == 0:
+        # Maybe we can't reach here
+        raise RuntimeError("0 batches")
+
+    # If the last batch-size is smaller than minimum batch_size,
+    # the samples are redistributed to the other mini-batches
+    if len(batch_sizes) > 1 and batch_sizes[-1] < min_batch_size:
+        for i in range(batch_sizes.pop(-1)):
+            batch_sizes[-(i % len(batch_sizes)) - 1] += 1
+
+    if not drop_last:
+        # Bug check
+        assert sum(batch_sizes) == n, f"{sum(batch_sizes)} != {n}"
+    return batch_sizes
+
+
+def make_batch_list(
+    sorted_keys: Sequence[str],
+    batch_sizes: Sequence[int],
+    sort_in_batch: str,
+    sort_batch: str,
+) -> List[Tuple[str, ...]]:
+    """Split the keys sorted in ascending order into mini-batches."""
+    batch_list = []
+    offset = 0
+    for bs in batch_sizes:
+        minibatch_keys = sorted_keys[offset : offset + bs]
+        if sort_in_batch == "descending":
+            minibatch_keys = minibatch_keys[::-1]
+        batch_list.append(tuple(minibatch_keys))
+        offset += bs
+
+    if sort_batch == "descending":
+        batch_list.reverse()
+    return batch_list
+
+
+def batch_plan_digest(shape_files: Sequence[str], **kwargs: Any) -> str:
+    """Return the hash of the contents of the shape files and the arguments."""
+    h = hashlib.sha256()
+    h.update(json.dumps([PLAN_VERSION, kwargs], sort_keys=True).encode())
+    for s in shape_files:
+        with open(s, "rb") as f:
+            for chunk in iter(lambda: f.read(2**20), b""):
+                h.update(chunk)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def load_batch_plan(
+    cache_dir: Union[Path, str], digest: str
+) -> Optional[List[Tuple[str, ...]]]:
+    path = Path(cache_dir) / f"{digest}.npz"
+    if not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            keys = npz["keys"].tolist()
+            offsets = npz["offsets"].tolist()
+    except Exception as e:
+        logging.warning(f"Failed to load the batch plan: {path}: {e}")
+        return None
+    return [tuple(keys[s:e]) for s, e in zip(offsets[:-1], offsets[1:])]
+
+
+def save_batch_plan(
+    cache_dir: Union[Path, str], digest: str, batch_list: List[Tuple[str, ...]]
+):
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    keys = np.array([k for batch in batch_list for k in batch], dtype=np.str_)
+    offsets = np.zeros(len(batch_list) + 1, dtype=np.int64)
+    np.cumsum([len(batch) for batch in batch_list], out=offsets[1:])
+    # Write to a temporary file and rename it,
+    # so that the other ranks never read a partially written plan
+    tmp_path = cache_dir / f"{digest}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, keys=keys, offsets=offsets)
+    os.replace(tmp_path, cache_dir / f"{digest}.npz")
+
+
+def cached_batch_plan(
+    cache_dir: Optional[Union[Path, str]],
+    shape_files: Sequence[str],
+    build_fn,
+    **kwargs: Any,
+) -> List[Tuple[str, ...]]:
+    """Load the plan from cache_dir if exists, else build it by build_fn and save.
+
+    If torch.distributed is initialized, rank 0 loads or builds and saves the
+    plan while the other ranks wait at a barrier, and then they load it from
+    cache_dir, so cache_dir must be shared by all the ranks. A rank which can't
+    load the plan, e.g. because rank 0 failed to save it, builds it by itself.
+
+    Args:
+        cache_dir: If None, the plan is always built without caching.
+        shape_files: The shape files used by build_fn.
+        build_fn: The function to build the plan without arguments.
+        kwargs: The arguments of the sampler affecting the plan.
+    """
+    if cache_dir is None:
+        return build_fn()
+
+    digest = batch_plan_digest(shape_files, **kwargs)
+    distributed = torch.distributed.is_available() and (
+        torch.distributed.is_initialized()
+    )
+    is_rank0 = not distributed or torch.distributed.get_rank() == 0
+    if is_rank0:
+        batch_list = load_batch_plan(cache_dir, digest)
+        if batch_list is None:
+            batch_list = build_fn()
+            try:
+                save_batch_plan(cache_dir, digest, batch_list)
+            except OSError as e:
+                logging.warning(f"Failed to save the batch plan in {cache_dir}: {e}")
+        else:
+            logging.info(f"Loaded the batch plan: {Path(cache_dir) / digest}.npz")
+
+    if distributed:
+        # The other ranks load the plan after rank 0 has written it
+        torch.distributed.barrier()
+
+    if not is_rank0:
+        batch_list = load_batch_plan(cache_dir, digest)
+        if batch_list is None:
+            logging.warning(
+                f"The batch plan is not found in {cache_dir}, so build it again. "
+                "The cache directory must be shared by all the ranks"
+            )
+            batch_list = build_fn()
+        else:
+            logging.info(f"Loaded the batch plan: {Path(cache_dir) / digest}.npz")
+    return batch_list
@@ -1,9 +1,16 @@
-from typing import Iterator, List, Tuple, Union
+import functools
+from typing import Iterator, List, Optional, Tuple, Union
 
+import numpy as np
 from typeguard import typechecked
 
-from espnet2.fileio.read_text import load_num_sequence_text
 from espnet2.samplers.abs_sampler import AbsSampler
+from espnet2.samplers.batch_plan import (
+    cached_batch_plan,
+    decide_batch_sizes,
+    load_shape_files,
+    make_batch_list,
+)
 
 
 class LengthBatchSampler(AbsSampler):
@@ -17,7 +24,14 @@ class LengthBatchSampler(AbsSampler):
         sort_batch: str = "ascending",
         drop_last: bool = False,
         padding: bool = True,
+        cache_dir: Optional[str] = None,
     ):
+        """Initialize the sampler.
+
+        Args:
+            cache_dir: If given, the mini-batches are cached in this directory
+                and loaded if the shape files and the arguments are same.
+        """
         assert batch_bins > 0
         if sort_batch != "ascending" and sort_batch != "descending":
             raise ValueError(
@@ -34,95 +48,49 @@ class LengthBatchSampler(AbsSampler):
         self.sort_batch = sort_batch
         self.drop_last = drop_last
 
-        # utt2shape: (Length, ...)
+        self.batch_list = cached_batch_plan(
+            cache_dir,
+            shape_files,
+            functools.partial(self._build_batch_list, min_batch_size, padding),
+            sampler=self.__class__.__name__,
+            batch_bins=batch_bins,
+            min_batch_size=min_batch_size,
+            sort_in_batch=sort_in_batch,
+            sort_batch=sort_batch,
+            drop_last=drop_last,
+            padding=padding,
+        )
+
+    def _build_batch_list(
+        self, min_batch_size: int, padding: bool
+    ) -> List[Tuple[str, ...]]:
+        # shape files: (Length, ...)
         #    uttA 100,...
         #    uttB 201,...
-        utt2shapes = [
-            load_num_sequence_text(s, loader_type="csv_int") for s in shape_files
-        ]
-
-        first_utt2shape = utt2shapes[0]
-        for s, d in zip(shape_files, utt2shapes):
-            if set(d) != set(first_utt2shape):
-                raise RuntimeError(
-                    f"keys are mismatched between {s} != {shape_files[0]}"
-                )
+        keys, shapes, _ = load_shape_files(self.shape_files)
+        if len(keys) == 0:
+            raise RuntimeError(f"0 lines found: {self.shape_files[0]}")
 
         # Sort samples in ascending order
         # (shape order should be like (Length, Dim))
-        keys = sorted(first_utt2shape, key=lambda k: first_utt2shape[k][0])
-        if len(keys) == 0:
-            raise RuntimeError(f"0 lines found: {shape_files[0]}")
-
-        # Decide batch-sizes
-        batch_sizes = []
-        current_batch_keys = []
-        for key in keys:
-            current_batch_keys.append(key)
-            # shape: (Length, dim1, dim2, ...)
-            if padding:
-                # bins = bs x max_length
-                bins = sum(len(current_batch_keys) * sh[key][0] for sh in utt2shapes)
-            else:
-                # bins = sum of lengths
-                bins = sum(d[k][0] for k in current_batch_keys for d in utt2shapes)
-
-            if bins > batch_bins and len(current_batch_keys) >= min_batch_size:
-                batch_sizes.append(len(current_batch_keys))
-                current_batch_keys = []
-        else:
-            if len(current_batch_keys) != 0 and (
-                not self.drop_last or len(batch_sizes) == 0
-            ):
-                batch_sizes.append(len(current_batch_keys))
+        order = np.argsort(shapes[0][:, 0], kind="stable")
+        shapes = [sh[order] for sh in shapes]
+        sorted_keys = np.array(keys)[order].tolist()
 
-        if len(batch_sizes) == 0:
-            # Maybe we can't reach here
-            raise RuntimeError("0 batches")
+        # padding: bins = bs x max_length, else: bins = sum of lengths
+        costs = sum(sh[:, 0] for sh in shapes)
 
-        # If the last batch-size is smaller than minimum batch_size,
-        # the samples are redistributed to the other mini-batches
-        if len(batch_sizes) > 1 and batch_sizes[-1] < min_batch_size:
-            for i in range(batch_sizes.pop(-1)):
-                batch_sizes[-(i % len(batch_sizes)) - 1] += 1
-
-        if not self.drop_last:
-            # Bug check
-            assert sum(batch_sizes) == len(keys), f"{sum(batch_sizes)} != {len(keys)}"
-
-        # Set mini-batch
-        self.batch_list = []
-        iter_bs = iter(batch_sizes)
-        bs = next(iter_bs)
-        minibatch_keys = []
-        for key in keys:
-            minibatch_keys.append(key)
-            if len(minibatch_keys) == bs:
-                if sort_in_batch == "descending":
-                    minibatch_keys.reverse()
-                elif sort_in_batch == "ascending":
-                    # Key are already sorted in ascending
-                    pass
-                else:
-                    raise ValueError(
-                        "sort_in_batch must be ascending"
-                        f" or descending: {sort_in_batch}"
-                    )
-                self.batch_list.append(tuple(minibatch_keys))
-                minibatch_keys = []
-                try:
-                    bs = next(iter_bs)
-                except StopIteration:
-                    break
-
-        if sort_batch == "ascending":
-            pass
-        elif sort_batch == "descending":
-            self.batch_list.reverse()
-        else:
-            raise ValueError(
-                f"sort_batch must be ascending or descending: {sort_batch}"
-            )
+        # Decide batch-sizes
+        batch_sizes = decide_batch_sizes(
+            costs,
+            self.batch_bins,
+            min_batch_size=min_batch_size,
+            drop_last=self.drop_last,
+            padding=padding,
+        )
+        return make_batch_list(
+            sorted_keys, batch_sizes, self.sort_in_batch, self.sort_batch
+        )
 
     def __repr__(self):
         return (
@@ -5,7 +5,7 @@
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Dict, Optional, Tuple
+from typing import Dict, Tuple
 
 import torch
 
@@ -92,3 +92,59 @@ class AbsCoreLM(torch.nn.Module, ABC):
                 usually the target sequence for teacher-forcing.
         """
         raise NotImplementedError
+
+    def inference_prefill(self, prefix: torch.Tensor, kv_cache):
+        """Forward the prefix of a single request for step-wise inference.
+
+        Step-wise inference (`inference_prefill`, `inference_step` and
+        `inference_finalize`) is used by the continuous batching engine
+        in `espnet2.speechlm.engine`, where each request occupies one slot.
+
+        Args:
+            prefix (LongTensor): Prefix part of dec_seq (1, T_dec, nq).
+            kv_cache (KVCache): The cache to fill.
+        """
+        raise NotImplementedError
+
+    def inference_step(
+        self,
+        prev_tok: torch.Tensor,
+        kv_cache,
+        opts: SpeechLMInferenceOptions,
+        allow_eos: torch.Tensor,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Generate the next frame for each slot.
+
+        Args:
+            prev_tok (LongTensor): Previous frame of each slot (B, 1, nq).
+            kv_cache (SlotKVCache): The cache of the slots.
+            opts (SpeechLMInferenceOptions): inference options.
+            allow_eos (BoolTensor): Whether eos can be predicted in each slot (B,).
+
+        Returns:
+            LongTensor: Generated tokens (B, 1, nq_step).
+            Tensor: Scores of the generated tokens (B, 1, nq_step).
+        """
+        raise NotImplementedError
+
+    def inference_finalize(
+        self,
+        prefix: torch.Tensor,
+        gen_tokens: torch.Tensor,
+        gen_scores: torch.Tensor,
+        opts: SpeechLMInferenceOptions,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Build the output of a finished request.
+
+        Args:
+            prefix (LongTensor): Prefix part of dec_seq (1, T_dec, nq).
+            gen_tokens (LongTensor): Tokens by `inference_step`, ending with
+                the eos frame (1, T, nq_step).
+            gen_scores (Tensor): Scores by `inference_step` (1, T, nq_step).
+            opts (SpeechLMInferenceOptions): inference options.
+
+        Returns:
+            LongTensor: Generated tokens without eos (T - 1, nq).
+            Tensor: Scores of the generated tokens (T - 1, nq).
+        """
+        return gen_tokens[0, :-1], gen_scores[0, :-1]
@@ -6,13 +6,14 @@
 # Implementation of UniAudio architecture: https://arxiv.org/abs/2310.00704
 
 import logging
-from typing import Dict, Tuple
+from typing import Dict, Tuple, Union
 
 import torch
 
 from espnet2.speechlm.core_lm.abs_core_lm import AbsCoreLM, SpeechLMInferenceOptions
+from espnet2.speechlm.module.kv_cache import KVCache, SlotKVCache
 from espnet2.speechlm.module.transformer import TransformerDecoder
-from espnet2.speechlm.net_utils import ce_loss, install_kv_cache_hook, logits_to_tokens
+from espnet2.speechlm.net_utils import ce_loss, logits_to_tokens
 
 
 class MultiScaleLM(AbsCoreLM):
@@ -135,6 +136,80 @@ class MultiScaleLM(AbsCoreLM):
 
         return loss, stats, weight
 
+    def _local_inference(
+        self,
+        g_hidden: torch.Tensor,
+        l_cache: KVCache,
+        opts: SpeechLMInferenceOptions,
+        allow_eos: Union[bool, torch.Tensor],
+        suffix: torch.Tensor = None,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Generate the nq codes of one frame with the local decoders.
+
+        Args:
+            g_hidden (Tensor): Global hidden state of the frame (B, 1, D).
+            l_cache (KVCache): Local cache, reset here and reused across frames.
+            opts (SpeechLMInferenceOptions): inference options.
+            allow_eos (bool or BoolTensor): Whether eos can be predicted, for the
+                whole batch or for each row (B,).
+            suffix (LongTensor): Frame for teacher-forcing (B, 1, nq).
+        """
+        l_cache.reset()
+        l_generated = {"token": [], "score": []}
+        l_prev_emb = self.placeholder.tile(g_hidden.size(0), 1, 1)  # [B, 1, D]
+        for l_step in range(opts.nq):
+            l_hidden = l_prev_emb + g_hidden
+            l_hidden = self.l_decoders(l_hidden, kv_cache=l_cache)
+            logits = self.lm_head(l_hidden)
+
+            gen_tok, gen_score = logits_to_tokens(
+                logits.unsqueeze(2),
+                opts,
+                allow_eos=allow_eos if l_step == 0 else False,
+                nq_level=l_step,
+            )
+            # [B, 1, 1] -> [B, 1]
+            gen_tok, gen_score = gen_tok.squeeze(2), gen_score.squeeze(2)
+
+            if suffix is not None:
+                l_prev_tok = suffix[:, :, l_step]
+            else:
+                l_prev_tok = gen_tok
+            l_prev_emb = self.emb(l_prev_tok)
+
+            l_generated["token"].append(gen_tok)
+            l_generated["score"].append(gen_score)
+
+        gen_tokens_local = torch.stack(l_generated["token"], dim=2)  # [B, 1, nq]
+        gen_scores_local = torch.stack(l_generated["score"], dim=2)
+        return gen_tokens_local, gen_scores_local
+
+    @torch.no_grad()
+    def inference_prefill(self, prefix: torch.Tensor, kv_cache: KVCache):
+        """Forward the prefix (1, T, nq) into the global cache."""
+        self.g_decoders(self.emb(prefix).sum(2), kv_cache=kv_cache)
+
+    @torch.no_grad()
+    def inference_step(
+        self,
+        prev_tok: torch.Tensor,
+        kv_cache: SlotKVCache,
+        opts: SpeechLMInferenceOptions,
+        allow_eos: torch.Tensor,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Generate one frame for each slot of continuous batching.
+
+        Args:
+            prev_tok (LongTensor): Previous frame of each slot (B, 1, nq).
+            kv_cache (SlotKVCache): Global cache of the slots.
+            opts (SpeechLMInferenceOptions): inference options.
+            allow_eos (BoolTensor): Whether eos can be predicted in each slot (B,).
+        """
+        g_hidden = self.g_decoders(self.emb(prev_tok).sum(2), kv_cache=kv_cache)
+        return self._local_inference(
+            g_hidden, KVCache(max_len=opts.nq), opts, allow_eos
+        )
+
     @torch.no_grad()
     def inference(
         self,
@@ -154,7 +229,15 @@ class MultiScaleLM(AbsCoreLM):
         """
 
         # (1) global initialization
-        g_cache, g_hooks = install_kv_cache_hook(self.g_decoders, {})
+        minlen = int(prefix.size(1) * opts.minlenratio) if opts.minlenratio > 0 else 0
+        maxlen = int(prefix.size(1) * opts.maxlenratio)
+        if opts.search_algo == "teacher_force":
+            minlen = suffix.size(1)
+            maxlen = suffix.size(1)
+        logging.info(f"maxlen={maxlen}, minlen={minlen}, reflen={suffix.size(1)}")
+        g_cache = KVCache(max_len=prefix.size(1) + maxlen)
+        # the local cache is preallocated once and reset at every global step
+        l_cache = KVCache(max_len=opts.nq)
 
         # (2) Prefix forward
         prefix = prefix.expand(opts.nbest, -1, -1)
@@ -164,13 +247,6 @@ class MultiScaleLM(AbsCoreLM):
 
         # (3) global loop
         # (3.1) global initialization
-        minlen = int(prefix.size(1) * opts.minlenratio) if opts.minlenratio > 0 else 0
-        maxlen = int(prefix.size(1) * opts.maxlenratio)
-        if opts.search_algo == "teacher_force":
-            minlen = suffix.size(1)
-            maxlen = suffix.size(1)
-        logging.info(f"maxlen={maxlen}, minlen={minlen}, reflen={suffix.size(1)}")
-
         finish_idx = torch.Tensor([-1]).expand(opts.nbest).long().to(opts.device)
 
         g_generated = {"token": [], "score": []}
@@ -184,41 +260,18 @@ class MultiScaleLM(AbsCoreLM):
         for g_step in range(maxlen):
             g_hidden = self.g_decoders(g_prev_emb, kv_cache=g_cache)  # [B, 1, D]
 
-            # (3.2) local initialization
-            l_cache, l_hooks = install_kv_cache_hook(self.l_decoders, {})
-
-            # (3.3) local loop
-            l_generated = {"token": [], "score": []}
-            l_prev_emb = self.placeholder.tile(opts.nbest, 1, 1)  # [B, 1, D]
-            for l_step in range(opts.nq):
-                l_hidden = l_prev_emb + g_hidden
-                l_hidden = self.l_decoders(l_hidden, kv_cache=l_cache)
-                logits = self.lm_head(l_hidden)
-
-                gen_tok, gen_score = logits_to_tokens(
-                    logits.unsqueeze(2),
-                    opts,
-                    allow_eos=(l_step == 0 and g_step >= minlen),
-                    nq_level=l_step,
-                )
-                # [B, 1, 1] -> [B, 1]
-                gen_tok, gen_score = gen_tok.squeeze(2), gen_score.squeeze(2)
-
-                if opts.search_algo == "teacher_force":
-                    l_prev_tok = suffix[:, g_step : g_step + 1, l_step]
-                else:
-                    l_prev_tok = gen_tok
-                l_prev_emb = self.emb(l_prev_tok)
-
-                l_generated["token"].append(gen_tok)
-                l_generated["score"].append(gen_score)
-
-            # (3.4) local finalize
-            for hook in l_hooks:
-                hook.remove()
-
-            gen_tokens_local = torch.stack(l_generated["token"], dim=2)  # [B, 1, nq]
-            gen_scores_local = torch.stack(l_generated["score"], dim=2)
+            # (3.2) local loop
+            gen_tokens_local, gen_scores_local = self._local_inference(
+                g_hidden,
+                l_cache,
+                opts,
+                allow_eos=g_step >= minlen,
+                suffix=(
+                    suffix[:, g_step : g_step + 1]
+                    if opts.search_algo == "teacher_force"
+                    else None
+                ),
+            )  # [B, 1, nq]
 
             g_generated["token"].append(gen_tokens_local)
             g_generated["score"].append(gen_scores_local)
@@ -229,7 +282,7 @@ class MultiScaleLM(AbsCoreLM):
                 g_prev_tok = gen_tokens_local
             g_prev_emb = self.emb(g_prev_tok).sum(2)  # [B, 1, D]
 
-            # (3.5) detect ended hypotheses
+            # (3.3) detect ended hypotheses
             finish_idx = torch.where(
                 torch.logical_and(g_prev_tok[:, 0, 0] == opts.eos, finish_idx == -1),
                 g_step,
@@ -248,8 +301,7 @@ class MultiScaleLM(AbsCoreLM):
         logging.info(f"Finish with lengths: {finish_idx}")
 
         # (4) global finalize & build hypotheses
-        for hook in g_hooks:
-            hook.remove()
+        del g_cache, l_cache
 
         valid_idx = finish_idx.ne(-1).nonzero(as_tuple=True)[0]
         g_generated = {
@@ -11,14 +11,10 @@ from typing import Dict, Tuple
 import torch
 
 from espnet2.speechlm.core_lm.abs_core_lm import AbsCoreLM, SpeechLMInferenceOptions
+from espnet2.speechlm.module.kv_cache import KVCache, SlotKVCache
 from espnet2.speechlm.module.transformer import TransformerDecoder
 from espnet2.speechlm.module.valle import ValleNARDecoder
-from espnet2.speechlm.net_utils import (
-    ce_loss,
-    install_kv_cache_hook,
-    length_mask,
-    logits_to_tokens,
-)
+from espnet2.speechlm.net_utils import ce_loss, length_mask, logits_to_tokens
 
 
 class ValleLM(AbsCoreLM):
@@ -145,6 +141,107 @@ class ValleLM(AbsCoreLM):
         mask = torch.logical_or(level_mask, prefix_mask)
         return dec_seq_emb.masked_fill(~mask, 0.0).sum(2)
 
+    def _nar_inference(
+        self,
+        prefix_emb: torch.Tensor,
+        prev_tok: torch.Tensor,
+        opts: SpeechLMInferenceOptions,
+        suffix: torch.Tensor = None,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Non-auto-regressive inference on the remained code layers.
+
+        Args:
+            prefix_emb (Tensor): Embedding of the prefix (B, T_prefix, D).
+            prev_tok (LongTensor): First code layer of the target (B, T).
+            opts (SpeechLMInferenceOptions): inference options.
+            suffix (LongTensor): Target sequence for teacher-forcing (B, T, nq).
+
+        Returns:
+            LongTensor: Generated tokens of the code layers 1 to nq (B, T, nq - 1).
+            Tensor: Scores of the generated tokens (B, T, nq - 1).
+        """
+        # (1) NAR initialization
+        prefix_len = prefix_emb.size(1)
+        start_emb = self.emb.weight[opts.start].tile(
+            prev_tok.size(0), 1, 1
+        )  # [B, 1, D]
+        prev_emb = torch.cat(
+            [prefix_emb[:, 1:], start_emb, self.emb(prev_tok)], dim=1
+        )  # [B, T, D]
+
+        ones = torch.ones_like(prev_tok[:, 0])
+        generated = {"token": [], "score": []}
+        # (2) NAR loop
+        for step in range(1, opts.nq):
+            h_nar = self.nar_decoder(prev_emb, ones * step - 1)  # [B, T, D]
+            logits = self.lm_head(h_nar)  # [B, T, V]
+            gen_tok, gen_score = logits_to_tokens(
+                logits.unsqueeze(2),
+                opts,
+                allow_eos=False,
+                nq_level=step,
+            )
+            gen_tok, gen_score = gen_tok.squeeze(2), gen_score.squeeze(2)  # [B, T]
+
+            generated["token"].append(gen_tok[:, prefix_len:])
+            generated["score"].append(gen_score[:, prefix_len:])
+
+            if suffix is not None:
+                prev_tok = suffix[:, :, step]
+            else:
+                prev_tok = gen_tok[:, prefix_len:]
+            prev_emb[:, prefix_len:] += self.emb(prev_tok)  # [B, T, D]
+            prev_emb[:, prefix_len - 1 : prefix_len] += start_emb
+
+        gen_tokens_nar = torch.stack(generated["token"], dim=2)  # [B, T, nq]
+        gen_scores_nar = torch.stack(generated["score"], dim=2)
+        return gen_tokens_nar, gen_scores_nar
+
+    @torch.no_grad()
+    def inference_prefill(self, prefix: torch.Tensor, kv_cache: KVCache):
+        """Forward the prefix (1, T, nq) into the AR cache."""
+        self.ar_decoder(self.emb(prefix).sum(dim=2), kv_cache=kv_cache)
+
+    @torch.no_grad()
+    def inference_step(
+        self,
+        prev_tok: torch.Tensor,
+        kv_cache: SlotKVCache,
+        opts: SpeechLMInferenceOptions,
+        allow_eos: torch.Tensor,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Generate the first code layer of one frame for each slot.
+
+        Args:
+            prev_tok (LongTensor): Previous frame of each slot (B, 1, nq);
+                only the first code layer is used.
+            kv_cache (SlotKVCache): AR cache of the slots.
+            opts (SpeechLMInferenceOptions): inference options.
+            allow_eos (BoolTensor): Whether eos can be predicted in each slot (B,).
+        """
+        h_ar = self.ar_decoder(self.emb(prev_tok[:, :, 0]), kv_cache=kv_cache)
+        logits = self.lm_head(h_ar)  # [B, 1, V]
+        return logits_to_tokens(
+            logits.unsqueeze(2), opts, allow_eos=allow_eos, nq_level=0
+        )  # [B, 1, 1]
+
+    @torch.no_grad()
+    def inference_finalize(
+        self,
+        prefix: torch.Tensor,
+        gen_tokens: torch.Tensor,
+        gen_scores: torch.Tensor,
+        opts: SpeechLMInferenceOptions,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Run the NAR stage on the AR tokens of a finished request."""
+        prefix_emb = self.emb(prefix).sum(dim=2)  # [1, T, D]
+        gen_tokens_nar, gen_scores_nar = self._nar_inference(
+            prefix_emb, gen_tokens[:, :, 0], opts
+        )
+        gen_tokens = torch.cat([gen_tokens, gen_tokens_nar], dim=2)  # [1, T, nq]
+        gen_scores = torch.cat([gen_scores, gen_scores_nar], dim=2)
+        return gen_tokens[0, :-1], gen_scores[0, :-1]
+
     @torch.no_grad()
     def inference(
         self,
@@ -164,7 +261,14 @@ class ValleLM(AbsCoreLM):
         """
 
         # (1) initialization
-        cache, hooks = install_kv_cache_hook(self.ar_decoder, {})
+        minlen = int(prefix.size(1) * opts.minlenratio) if opts.minlenratio > 0 else 0
+        maxlen = int(prefix.size(1) * opts.maxlenratio)
+        if opts.search_algo == "teacher_force":
+            assert suffix is not None
+            minlen = suffix.size(1)
+            maxlen = suffix.size(1)
+        logging.info(f"maxlen={maxlen}, minlen={minlen}, reflen={suffix.size(1)}")
+        cache = KVCache(max_len=prefix.size(1) + maxlen)
 
         # (2) auto-regressive prefix forward on first code layer
         prefix = prefix.expand(opts.nbest, -1, -1)
@@ -174,14 +278,6 @@ class ValleLM(AbsCoreLM):
 
         # (3) auto-regressive loop on first code layer
         # (3.1) AR initialization
-        minlen = int(prefix.size(1) * opts.minlenratio) if opts.minlenratio > 0 else 0
-        maxlen = int(prefix.size(1) * opts.maxlenratio)
-        if opts.search_algo == "teacher_force":
-            assert suffix is not None
-            minlen = suffix.size(1)
-            maxlen = suffix.size(1)
-        logging.info(f"maxlen={maxlen}, minlen={minlen}, reflen={suffix.size(1)}")
-
         generated = {"token": [], "score": []}
         finish_idx = torch.Tensor([-1]).expand(opts.nbest).long().to(opts.device)
         prev_tok = torch.Tensor([opts.start]).tile(opts.nbest, 1).long().to(opts.device)
@@ -236,49 +332,21 @@ class ValleLM(AbsCoreLM):
         gen_tokens_ar = gen_tokens_ar[:, : finish_idx.max() + 1]  # to include <sos>
         gen_scores_ar = gen_scores_ar[:, : finish_idx.max() + 1]
 
-        for hook in hooks:
-            hook.remove()
-        cache = {}
+        del cache
 
         # (4) non-auto-regressive loop on the remained code layers
-        # (4.1) NAR initialization
         if opts.search_algo == "teacher_force":
             prev_tok = suffix[:, :, 0]
         else:
             prev_tok = gen_tokens_ar[:, :, 0]
-        start_emb = self.emb.weight[opts.start].tile(opts.nbest, 1, 1)  # [B, 1, D]
-        prev_emb = torch.cat(
-            [prefix_emb[:, 1:], start_emb, self.emb(prev_tok)], dim=1
-        )  # [B, T, D]
-
-        ones = torch.ones_like(valid_idx)
-        generated = {"token": [], "score": []}
-        # (4.2) NAR loop
-        for step in range(1, opts.nq):
-            h_nar = self.nar_decoder(prev_emb, ones * step - 1)  # [B, T, D]
-            logits = self.lm_head(h_nar)  # [B, T, V]
-            gen_tok, gen_score = logits_to_tokens(
-                logits.unsqueeze(2),
-                opts,
-                allow_eos=False,
-                nq_level=step,
-            )
-            gen_tok, gen_score = gen_tok.squeeze(2), gen_score.squeeze(2)  # [B, T]
-
-            generated["token"].append(gen_tok[:, prefix.size(1) :])
-            generated["score"].append(gen_score[:, prefix.size(1) :])
-
-            if opts.search_algo == "teacher_force":
-                prev_tok = suffix[:, :, step]
-            else:
-                prev_tok = gen_tok
-            prev_emb[:, prefix.size(1) :] += self.emb(prev_tok)  # [B, T, D]
-            prev_emb[:, prefix.size(1) - 1 : prefix.size(1)] += start_emb
+        gen_tokens_nar, gen_scores_nar = self._nar_inference(
+            prefix_emb,
+            prev_tok,
+            opts,
+            suffix=suffix if opts.search_algo == "teacher_force" else None,
+        )
 
         # (5) combine AR and NAR results
-        gen_tokens_nar = torch.stack(generated["token"], dim=2)  # [B, T, nq]
-        gen_scores_nar = torch.stack(generated["score"], dim=2)
-
         gen_tokens = torch.cat([gen_tokens_ar, gen_tokens_nar], dim=2)  # [B, T, nq]
         gen_scores = torch.cat([gen_scores_ar, gen_scores_nar], dim=2)
 
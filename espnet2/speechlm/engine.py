@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+# Continuous batching engine for SpeechLM generation.
+# `AbsCoreLM.inference` decodes one prompt (expanded to nbest) until every row
+# has produced eos, so a single long sample keeps the whole batch busy. Here,
+# each request occupies one decoding slot; a slot is released as soon as its
+# request finishes and a pending request is admitted into it at the next step.
+
+import itertools
+import logging
+import queue
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+import torch
+
+from espnet2.speechlm.core_lm.abs_core_lm import AbsCoreLM, SpeechLMInferenceOptions
+from espnet2.speechlm.module.kv_cache import KVCache, SlotKVCache
+
+
+@dataclass
+class GenerationRequest:
+    request_id: Any
+    prefix: torch.Tensor  # (1, T, nq)
+    minlen: int
+    maxlen: int
+
+
+@dataclass
+class GenerationResult:
+    request_id: Any
+    tokens: Optional[torch.Tensor]  # (T_gen, nq), without eos
+    scores: Optional[torch.Tensor]  # (T_gen, nq)
+    finished: bool  # False if eos was not generated within maxlen
+
+
+class SpeechLMGenerationEngine:
+    """Continuous batching engine for the step-wise CoreLM inference.
+
+    Requests are put into a thread-safe queue by `submit` and are decoded by
+    `step`, which is driven by a single thread (e.g., the serving loop).
+
+    Examples:
+        >>> engine = SpeechLMGenerationEngine(corelm, opts, n_slots=8, max_len=2048)
+        >>> for prefix in prefixes:
+        ...     engine.submit(prefix)
+        >>> for result in engine.run():
+        ...     print(result.request_id, result.tokens.shape)
+    """
+
+    def __init__(
+        self,
+        corelm: AbsCoreLM,
+        opts: SpeechLMInferenceOptions,
+        n_slots: int = 8,
+        max_len: int = 4096,
+    ):
+        """Initialize the engine.
+
+        Args:
+            corelm (AbsCoreLM): CoreLM implementing `inference_prefill`,
+                `inference_step` and `inference_finalize`.
+            opts (SpeechLMInferenceOptions): inference options. `nbest` is
+                ignored: submit a prefix several times for several samples.
+            n_slots (int): Number of requests decoded in parallel.
+            max_len (int): Maximum length of prefix plus generated tokens.
+        """
+        if opts.search_algo == "teacher_force":
+            raise ValueError("teacher_force is not supported by continuous batching")
+
+        self.corelm = corelm
+        self.opts = opts
+        self.n_slots = n_slots
+        self.max_len = max_len
+
+        self.pending: "queue.Queue[GenerationRequest]" = queue.Queue()
+        self.requests: List[Optional[GenerationRequest]] = [None] * n_slots
+        self.kv_cache = SlotKVCache(n_slots, max_len)
+        self._counter = itertools.count()
+
+        device = opts.device
+        self.steps = torch.zeros(n_slots, dtype=torch.long, device=device)
+        self.minlens = torch.zeros(n_slots, dtype=torch.long, device=device)
+        self.maxlens = torch.zeros(n_slots, dtype=torch.long, device=device)
+        self.active = torch.zeros(n_slots, dtype=torch.bool, device=device)
+        self.prev_tok = torch.full(
+            (n_slots, 1, opts.nq), opts.start, dtype=torch.long, device=device
+        )
+        self.tokens: Optional[torch.Tensor] = None  # (n_slots, max_len, nq_step)
+        self.scores: Optional[torch.Tensor] = None
+
+    @property
+    def has_work(self) -> bool:
+        """Whether any request is pending or being decoded."""
+        return not self.pending.empty() or any(r is not None for r in self.requests)
+
+    def submit(
+        self,
+        prefix: torch.Tensor,
+        request_id: Any = None,
+        minlen: Optional[int] = None,
+        maxlen: Optional[int] = None,
+    ) -> Any:
+        """Add a request. Thread-safe.
+
+        Args:
+            prefix (LongTensor): Prefix part of dec_seq (T, nq) or (1, T, nq).
+            request_id: Identifier returned with the result. Defaults to a counter.
+            minlen (int): Minimum generated length. Defaults to
+                `prefix length * opts.minlenratio`.
+            maxlen (int): Maximum generated length. Defaults to
+                `prefix length * opts.maxlenratio`.
+
+        Returns:
+            The request id.
+        """
+        if prefix.dim() == 2:
+            prefix = prefix.unsqueeze(0)
+        assert prefix.size(0) == 1, "submit requests one by one"
+
+        if request_id is None:
+            request_id = next(self._counter)
+        if minlen is None:
+            minlen = (
+                int(prefix.size(1) * self.opts.minlenratio)
+                if self.opts.minlenratio > 0
+                else 0
+            )
+        if maxlen is None:
+            maxlen = int(prefix.size(1) * self.opts.maxlenratio)
+        # +1: the start frame fed at the first step
+        if prefix.size(1) + maxlen + 1 > self.max_len:
+            raise ValueError(
+                f"prefix length {prefix.size(1)} + maxlen {maxlen} "
+                f"exceeds max_len={self.max_len}"
+            )
+
+        self.pending.put(GenerationRequest(request_id, prefix, minlen, maxlen))
+        return request_id
+
+    @torch.no_grad()
+    def step(self) -> List[GenerationResult]:
+        """Admit pending requests into free slots and decode one frame.
+
+        Returns:
+            List[GenerationResult]: Requests finished at this step.
+        """
+        self._admit()
+        if not bool(self.active.any()):
+            return []
+
+        self.kv_cache.begin_step()
+        gen_tok, gen_score = self.corelm.inference_step(
+            self.prev_tok,
+            self.kv_cache,
+            self.opts,
+            allow_eos=self.steps >= self.minlens,
+        )  # [n_slots, 1, nq_step]
+        self.kv_cache.advance(self.active)
+
+        if self.tokens is None:
+            shape = (self.n_slots, self.max_len, gen_tok.size(2))
+            self.tokens = gen_tok.new_zeros(shape)
+            self.scores = gen_score.new_zeros(shape)
+        rows = torch.arange(self.n_slots, device=gen_tok.device)
+        self.tokens[rows, self.steps] = gen_tok[:, 0]
+        self.scores[rows, self.steps] = gen_score[:, 0]
+        self.prev_tok[:, :, : gen_tok.size(2)] = gen_tok
+
+        self.steps += self.active.long()
+        is_eos = gen_tok[:, 0, 0] == self.opts.eos
+        done = self.active & (is_eos | (self.steps >= self.maxlens))
+        # a single host synchronization per step
+        done_slots = done.nonzero(as_tuple=True)[0].tolist()
+        if len(done_slots) == 0:
+            return []
+        is_eos = is_eos.tolist()
+        return [self._finish(slot, is_eos[slot]) for slot in done_slots]
+
+    def run(self) -> Iterator[GenerationResult]:
+        """Decode until no request is left, yielding results as they finish."""
+        while self.has_work:
+            yield from self.step()
+
+    def generate(self, prefixes: List[torch.Tensor]) -> List[GenerationResult]:
+        """Decode a list of prefixes and return the results in the input order."""
+        ids = [self.submit(prefix) for prefix in prefixes]
+        results: Dict[Any, GenerationResult] = {r.request_id: r for r in self.run()}
+        return [results[i] for i in ids]
+
+    def _admit(self):
+        for slot in range(self.n_slots):
+            if self.requests[slot] is not None:
+                continue
+            try:
+                request = self.pending.get_nowait()
+            except queue.Empty:
+                return
+
+            cache = KVCache(max_len=request.prefix.size(1))
+            self.corelm.inference_prefill(
+                request.prefix.to(self.opts.device), kv_cache=cache
+            )
+            self.kv_cache.load(slot, cache)
+            del cache
+
+            self.requests[slot] = request
+            self.steps[slot] = 0
+            self.minlens[slot] = request.minlen
+            self.maxlens[slot] = request.maxlen
+            self.active[slot] = True
+            self.prev_tok[slot] = self.opts.start
+
+    def _finish(self, slot: int, is_eos: bool) -> GenerationResult:
+        request = self.requests[slot]
+        length = int(self.steps[slot])
+        if is_eos:
+            # copy out of the slot buffers, which are reused by the next request
+            tokens, scores = self.corelm.inference_finalize(
+                request.prefix.to(self.opts.device),
+                self.tokens[slot : slot + 1, :length].clone(),
+                self.scores[slot : slot + 1, :length].clone(),
+                self.opts,
+            )
+        else:
+            logging.warning(
+                f"Request {request.request_id} cannot finish in {request.maxlen} "
+                f"steps. Consider increasing the maxlenratio"
+            )
+            tokens, scores = None, None
+
+        self.requests[slot] = None
+        self.active[slot] = False
+        self.kv_cache.release(slot)
+        return GenerationResult(request.request_id, tokens, scores, is_eos)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+# Preallocated key/value cache for the SpeechLM Transformer inference.
+# Compared with growing the cache by `torch.cat` at every generated token,
+# which copies the whole history (quadratic in the sequence length), the keys
+# and values are written in place into buffers whose capacity is either fixed
+# by `max_len` or doubled when full (amortized linear copying).
+
+from typing import Dict, Optional
+
+import torch
+from torch import Tensor, nn
+
+
+class KVCache:
+    def __init__(self, max_len: Optional[int] = None, min_capacity: int = 64):
+        """Initialize the key/value cache.
+
+        Args:
+            max_len (int): If given, the buffers are allocated once with this
+                length and exceeding it raises an error. Otherwise, the capacity
+                starts from `min_capacity` and is doubled when full.
+            min_capacity (int): Initial capacity when `max_len` is not given.
+        """
+        self.max_len = max_len
+        self.min_capacity = min_capacity
+        self.buffers: Dict[nn.Module, Tensor] = {}
+        self.lengths: Dict[nn.Module, int] = {}
+
+    def __contains__(self, module: nn.Module) -> bool:
+        return module in self.buffers
+
+    def __len__(self) -> int:
+        return len(self.buffers)
+
+    @property
+    def seq_len(self) -> int:
+        """Length cached by the first module, i.e., the position offset."""
+        return next(iter(self.lengths.values())) if self.lengths else 0
+
+    def get(self, module: nn.Module) -> Tensor:
+        """Return the cached tensor (B, T, D) of the module as a view."""
+        return self.buffers[module][:, : self.lengths[module]]
+
+    def append(self, module: nn.Module, x: Tensor) -> Tensor:
+        """Write new keys or values (B, T_new, D) after the cached ones.
+
+        Returns:
+            Tensor: All the cached keys or values (B, T + T_new, D).
+        """
+        x = x.detach()
+        length = self.lengths.get(module, 0)
+        new_length = length + x.size(1)
+        buf = self.buffers.get(module)
+        if buf is None or buf.size(1) < new_length:
+            buf = self._grow(buf, length, new_length, x)
+            self.buffers[module] = buf
+        buf[:, length:new_length] = x
+        self.lengths[module] = new_length
+        return buf[:, :new_length]
+
+    def set(self, module: nn.Module, x: Tensor) -> Tensor:
+        """Cache the keys or values computed once, e.g., for cross attention."""
+        self.buffers[module] = x.detach()
+        self.lengths[module] = x.size(1)
+        return self.buffers[module]
+
+    def select(self, index: Tensor):
+        """Select or reorder the batch, e.g., for n-best or beam search.
+
+        Args:
+            index (LongTensor): Indices of the kept batch entries (B',).
+        """
+        for module, buf in self.buffers.items():
+            self.buffers[module] = buf.index_select(0, index.to(buf.device))
+
+    def reset(self):
+        """Drop the cached entries but keep the buffers for reuse."""
+        for module in self.lengths:
+            self.lengths[module] = 0
+
+    def _grow(self, buf: Optional[Tensor], length: int, new_length: int, x: Tensor):
+        if self.max_len is not None:
+            if new_length > self.max_len:
+                raise ValueError(
+                    f"KVCache overflow: {new_length} > max_len={self.max_len}"
+                )
+            capacity = self.max_len
+        else:
+            capacity = max(self.min_capacity, 1 if buf is None else buf.size(1))
+            while capacity < new_length:
+                capacity *= 2
+        new_buf = x.new_empty(x.size(0), capacity, x.size(2))
+        if length > 0:
+            new_buf[:, :length] = buf[:, :length]
+        return new_buf
+
+
+class SlotKVCache:
+    def __init__(self, n_slots: int, max_len: int):
+        """Initialize the key/value cache of decoding slots for continuous batching.
+
+        Each slot (batch row) holds one request with its own cached length, so
+        requests of different lengths are decoded in the same batch and a slot is
+        refilled as soon as its request finishes. A decoding step writes one new
+        position per slot at the slot's own offset, and the attention mask hides
+        the stale entries beyond each slot's length.
+
+        Args:
+            n_slots (int): Number of slots, i.e., the batch size of decoding.
+            max_len (int): Maximum number of positions of each slot.
+        """
+        self.n_slots = n_slots
+        self.max_len = max_len
+        self.buffers: Dict[nn.Module, Tensor] = {}
+        self.lengths: Optional[Tensor] = None
+        self._step_len = 0
+        self._mask = None
+
+    def __contains__(self, module: nn.Module) -> bool:
+        return module in self.buffers
+
+    def __len__(self) -> int:
+        return len(self.buffers)
+
+    def load(self, slot: int, cache: KVCache):
+        """Copy the prefilled cache of a single request (batch 1) into a slot."""
+        for module in cache.buffers:
+            x = cache.get(module)
+            assert x.size(0) == 1, "Only a single request can be loaded"
+            if x.size(1) >= self.max_len:
+                raise ValueError(f"Prefix exceeds max_len={self.max_len}")
+            buf = self._buffer(module, x)
+            buf[slot, : x.size(1)] = x[0]
+            length = x.size(1)
+        if self.lengths is None:
+            self.lengths = torch.zeros(self.n_slots, dtype=torch.long, device=x.device)
+        self.lengths[slot] = length
+
+    def release(self, slot: int):
+        """Free a slot."""
+        self.lengths[slot] = 0
+
+    def begin_step(self):
+        """Fix the positions written by the next decoding step."""
+        self._step_len = int(self.lengths.max()) + 1
+        if self._step_len > self.max_len:
+            raise ValueError(f"SlotKVCache overflow: max_len={self.max_len}")
+        positions = torch.arange(self._step_len, device=self.lengths.device)
+        # [n_slots, 1, 1, T]: each slot attends to its own positions only
+        self._mask = (positions <= self.lengths.unsqueeze(1))[:, None, None, :]
+
+    def advance(self, active: Tensor):
+        """Increase the lengths of the active slots (n_slots,) after a step."""
+        self.lengths += active.long()
+
+    def positions(self) -> Tensor:
+        """Positions of the new tokens of the step (n_slots, 1)."""
+        return self.lengths.unsqueeze(1)
+
+    def attention_mask(self) -> Tensor:
+        return self._mask
+
+    def append(self, module: nn.Module, x: Tensor) -> Tensor:
+        """Write the keys or values (n_slots, 1, D) of the step at each offset.
+
+        Returns:
+            Tensor: The cached keys or values (n_slots, T, D), where T is the
+                longest length among the slots (see `attention_mask`).
+        """
+        assert x.size(0) == self.n_slots and x.size(1) == 1
+        buf = self._buffer(module, x)
+        rows = torch.arange(self.n_slots, device=buf.device)
+        buf[rows, self.lengths] = x[:, 0].detach()
+        return buf[:, : self._step_len]
+
+    def _buffer(self, module: nn.Module, x: Tensor) -> Tensor:
+        if module not in self.buffers:
+            self.buffers[module] = x.new_zeros(self.n_slots, self.max_len, x.size(2))
+        return self.buffers[module]
@@ -23,6 +23,15 @@ import torch
 import torch.nn.functional as F
 from torch import Tensor, nn
 
+from espnet2.speechlm.module.kv_cache import KVCache, SlotKVCache
+
+
+def cache_offset(kv_cache) -> int:
+    """Return the number of positions already in the cache."""
+    if isinstance(kv_cache, KVCache):
+        return kv_cache.seq_len
+    return next(iter(kv_cache.values())).shape[1] if kv_cache else 0
+
 
 class LayerNorm(nn.LayerNorm):
     def forward(self, x: Tensor) -> Tensor:
@@ -61,7 +70,24 @@ class MultiHeadAttention(nn.Module):
     ):
         q = self.query(x)
 
-        if kv_cache is None or xa is None or self.key not in kv_cache:
+        if isinstance(kv_cache, SlotKVCache):
+            # continuous batching: each slot writes at its own offset
+            assert xa is None, "cross attention is not supported by SlotKVCache"
+            k = kv_cache.append(self.key, self.key(x))
+            v = kv_cache.append(self.value, self.value(x))
+            mask = kv_cache.attention_mask()
+        elif isinstance(kv_cache, KVCache):
+            # preallocated cache: write the new keys/values in place
+            if xa is None:
+                k = kv_cache.append(self.key, self.key(x))
+                v = kv_cache.append(self.value, self.value(x))
+            elif self.key not in kv_cache:
+                k = kv_cache.set(self.key, self.key(xa))
+                v = kv_cache.set(self.value, self.value(xa))
+            else:
+                k = kv_cache.get(self.key)
+                v = kv_cache.get(self.value)
+        elif kv_cache is None or xa is None or self.key not in kv_cache:
             # hooks, if installed (i.e. kv_cache is not None)
             #   will prepend the cached kv tensors;
             # otherwise, perform key/value projections
@@ -81,7 +107,7 @@ class MultiHeadAttention(nn.Module):
     def qkv_attention(
         self, q: Tensor, k: Tensor, v: Tensor, mask: Optional[Tensor] = None
     ):
-        if self.causal and mask is not None:
+        if self.causal and mask is not None and q.size(1) == k.size(1):
             raise ValueError("mask is not allowed when the attention is causal")
 
         if self.causal and q.size(1) == k.size(1):
@@ -167,8 +193,11 @@ class TransformerDecoder(nn.Module):
         if self.causal and mask is not None:
             raise ValueError("Causal Transformer dones't allow mask")
 
-        offset = next(iter(kv_cache.values())).shape[1] if kv_cache else 0
-        x = x + self.pos_emb.weight[offset : offset + x.shape[1]].unsqueeze(0)
+        if isinstance(kv_cache, SlotKVCache):
+            x = x + self.pos_emb(kv_cache.positions())
+        else:
+            offset = cache_offset(kv_cache)
+            x = x + self.pos_emb.weight[offset : offset + x.shape[1]].unsqueeze(0)
 
         for block in self.blocks:
             x = block(x, mask=mask, kv_cache=kv_cache)
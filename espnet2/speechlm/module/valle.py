@@ -5,6 +5,7 @@ from torch import Tensor, nn
 from espnet2.speechlm.module.transformer import (
     ResidualAttentionBlock,
     TransformerDecoder,
+    cache_offset,
 )
 
 
@@ -85,7 +86,7 @@ class ValleNARDecoder(TransformerDecoder):
     def forward(self, x: Tensor, level: Tensor, kv_cache: Optional[dict] = None):
         level = self.level_emb(level)
 
-        offset = next(iter(kv_cache.values())).shape[1] if kv_cache else 0
+        offset = cache_offset(kv_cache)
         x = x + self.pos_emb.weight[offset : offset + x.shape[1]].unsqueeze(0)
 
         for block in self.blocks:
@@ -3,7 +3,7 @@
 # Copyright 2024 Jinchuan Tian
 #  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
 
-from typing import Dict, Tuple
+from typing import Dict, Tuple, Union
 
 import torch
 
@@ -103,18 +103,26 @@ def install_kv_cache_hook(model, cache):
 def logits_to_tokens(
     logits: torch.Tensor,
     opts: SpeechLMInferenceOptions,
-    allow_eos: bool = True,
+    allow_eos: Union[bool, torch.Tensor] = True,
     nq_level: int = None,
 ):
+    """Select tokens from logits [B, T, nq, V].
+
+    `allow_eos` is either a bool for the whole batch or a bool tensor [B]
+    so that each row follows its own minimum length.
+    """
     assert logits.dim() == 4
 
-    # (1) Apply mask
-    mask = opts.masks
-    if allow_eos:  # only predict eos in the first code
+    # (1) Apply mask; eos is only predicted in the first code
+    mask = opts.masks.unsqueeze(0).unsqueeze(0)  # [1, 1, nq, V]
+    if isinstance(allow_eos, torch.Tensor):
+        mask = mask.repeat(logits.size(0), 1, 1, 1)
+        mask[allow_eos.to(mask.device), :, 0, opts.eos] = False
+    elif allow_eos:
+        mask = mask.clone()
         mask[..., 0, opts.eos] = False
     if nq_level is not None:
-        mask = mask[nq_level : nq_level + 1]
-    mask = mask.unsqueeze(0).unsqueeze(0)
+        mask = mask[:, :, nq_level : nq_level + 1]
     logits = logits.masked_fill_(mask, -1e20)
 
     # (2) token selection
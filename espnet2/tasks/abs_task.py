@@ -29,6 +29,7 @@ from espnet2.iterators.category_iter_factory import CategoryIterFactory
 from espnet2.iterators.chunk_iter_factory import ChunkIterFactory
 from espnet2.iterators.multiple_iter_factory import MultipleIterFactory
 from espnet2.iterators.sequence_iter_factory import SequenceIterFactory
+from espnet2.iterators.shard_iter_factory import ShardIterFactory
 from espnet2.layers.create_adapter import create_adapter
 from espnet2.main_funcs.collect_stats import collect_stats
 from espnet2.optimizers.optim_groups import configure_optimizer
@@ -66,6 +67,7 @@ from espnet2.train.distributed_utils import (
 )
 from espnet2.train.iterable_dataset import (
     IterableESPnetDataset,
+    ShardedIterableESPnetDataset,
     SplicedIterableESPnetDataset,
 )
 from espnet2.train.trainer import Trainer
@@ -195,7 +197,9 @@ class IteratorOptions:
     batch_type: str
     max_cache_size: float
     max_cache_fd: int
+    cache_dir: Optional[str]
     allow_multi_rates: bool
+    compact_index: bool
     distributed: bool
     num_batches: Optional[int]
     num_iters_per_epoch: Optional[int]
@@ -337,14 +341,14 @@ class AbsTask(ABC):
         group.add_argument(
             "--iterator_type",
             type=str,
-            choices=["sequence", "category", "chunk", "task", "none"],
+            choices=["sequence", "category", "chunk", "task", "shard", "none"],
             default="sequence",
             help="Specify iterator type",
         )
         group.add_argument(
             "--valid_iterator_type",
             type=str,
-            choices=["sequence", "category", "chunk", "task", "none"],
+            choices=["sequence", "category", "chunk", "task", "shard", "none"],
             default=None,
             help="Specify iterator type",
         )
@@ -501,6 +505,22 @@ class AbsTask(ABC):
             default=False,
             help='Write the output features from the model when "collect stats" mode',
         )
+        group.add_argument(
+            "--collect_stats_num_workers",
+            type=int,
+            default=1,
+            help='The number of threads to extract the features in "collect stats" '
+            "mode. The mini-batches are distributed to the threads and "
+            "the statistics are merged in the order of mini-batches",
+        )
+        group.add_argument(
+            "--collect_stats_checkpoint_interval",
+            type=int,
+            default=0,
+            help='Save the progress of "collect stats" mode every this number of '
+            "mini-batches to restart the killed job with --resume true. "
+            "0 indicates no checkpoint",
+        )
 
         group = parser.add_argument_group("Trainer related")
         group.add_argument(
@@ -638,6 +658,36 @@ class AbsTask(ABC):
             default=False,
             help="Whether to create graph in tensorboard",
         )
+        group.add_argument(
+            "--deferred_report",
+            type=str2bool,
+            default=False,
+            help="Keep the training stats on the device and transfer them to the "
+            "host only at log_interval, to avoid the synchronization for every step",
+        )
+        group.add_argument(
+            "--reduce_stats_at_log_interval",
+            type=str2bool,
+            default=False,
+            help="Reduce the training stats over the processes only at log_interval "
+            "in distributed mode. The weight is still reduced for every step",
+        )
+        group.add_argument(
+            "--checkpoint_interval",
+            type=int,
+            default=0,
+            help="Save checkpoint.pth every this number of optimizer steps "
+            "within an epoch to resume the training from the middle of the epoch. "
+            "If 0, the checkpoint is saved only at the end of each epoch",
+        )
+        group.add_argument(
+            "--async_checkpoint",
+            type=str2bool,
+            default=False,
+            help="Write the checkpoint and the model files in a background thread "
+            "after copying the states to CPU memory, "
+            "so that the training isn't blocked by the writing",
+        )
         group.add_argument(
             "--use_wandb",
             type=str2bool,
@@ -837,6 +887,16 @@ class AbsTask(ABC):
             default=False,
             help="Use multiple iterator mode",
         )
+        group.add_argument(
+            "--batch_plan_cache_dir",
+            type=str_or_none,
+            default=None,
+            help="The directory to cache the mini-batches of the numel and length "
+            "batch types, which are loaded if the shape files and the arguments are "
+            "same, e.g. when resuming. With DDP, only rank 0 builds the mini-batches "
+            "and the other ranks load them, so the directory must be shared. "
+            "If not given, the mini-batches are not cached.",
+        )
 
         group = parser.add_argument_group("Chunk iterator related")
         group.add_argument(
@@ -897,6 +957,15 @@ class AbsTask(ABC):
             help="Discard samples shorter than the minimum chunk length",
         )
 
+        group = parser.add_argument_group("Shard iterator related")
+        group.add_argument(
+            "--shuffle_buffer_size",
+            type=int,
+            default=1000,
+            help="The number of samples shuffled in a buffer by the shard iterator. "
+            "The order of the shards is also shuffled at every epoch.",
+        )
+
         group = parser.add_argument_group("Dataset related")
         _data_path_and_name_and_type_help = (
             "Give three words splitted by comma. It's used for the training data. "
@@ -944,6 +1013,14 @@ class AbsTask(ABC):
             default=0.0,
             help="The maximum cache size for data loader. e.g. 10MB, 20GB.",
         )
+        group.add_argument(
+            "--cache_dir",
+            type=str_or_none,
+            default=None,
+            help="The directory to keep the data cached by --max_cache_size in. "
+            "If not given, /dev/shm is used if it has enough free space, "
+            "else the temporary directory",
+        )
         group.add_argument(
             "--max_cache_fd",
             type=int,
@@ -958,6 +1035,14 @@ class AbsTask(ABC):
             default=False,
             help="Whether to allow audios to have different sampling rates",
         )
+        group.add_argument(
+            "--compact_index",
+            type=str2bool,
+            default=False,
+            help="Whether to access the text-based data files (scp, text, shape) "
+            "via memory-mapped indices instead of loading them as dict objects. "
+            "The index is built once as <file>.idx and shared by all processes",
+        )
         group.add_argument(
             "--valid_max_cache_size",
             type=humanfriendly_parse_size_or_none,
@@ -1148,7 +1233,7 @@ class AbsTask(ABC):
     @typechecked
     def check_task_requirements(
         cls,
-        dataset: Union[AbsDataset, IterableESPnetDataset],
+        dataset: Union[AbsDataset, IterableESPnetDataset, ShardedIterableESPnetDataset],
         allow_variable_data_keys: bool,
         train: bool,
         inference: bool = False,
@@ -1410,51 +1495,21 @@ class AbsTask(ABC):
             if args.valid_batch_size is None:
                 args.valid_batch_size = args.batch_size
 
-            if len(args.train_shape_file) != 0:
-                train_key_file = args.train_shape_file[0]
-            else:
-                train_key_file = None
-            if len(args.valid_shape_file) != 0:
-                valid_key_file = args.valid_shape_file[0]
-            else:
-                valid_key_file = None
-
             if model and not getattr(model, "extract_feats_in_collect_stats", True):
                 model = None
                 logging.info("Skipping collect_feats in collect_stats stage.")
 
             collect_stats(
                 model=model,
-                train_iter=cls.build_streaming_iterator(
-                    data_path_and_name_and_type=args.train_data_path_and_name_and_type,
-                    key_file=train_key_file,
-                    batch_size=args.batch_size,
-                    dtype=args.train_dtype,
-                    num_workers=args.num_workers,
-                    allow_variable_data_keys=args.allow_variable_data_keys,
-                    ngpu=args.ngpu,
-                    preprocess_fn=cls.build_preprocess_fn(args, train=False),
-                    collate_fn=cls.build_collate_fn(args, train=False),
-                    mode="train",
-                    multi_task_dataset=args.multi_task_dataset,
-                ),
-                valid_iter=cls.build_streaming_iterator(
-                    data_path_and_name_and_type=args.valid_data_path_and_name_and_type,
-                    key_file=valid_key_file,
-                    batch_size=args.valid_batch_size,
-                    dtype=args.train_dtype,
-                    num_workers=args.num_workers,
-                    allow_variable_data_keys=args.allow_variable_data_keys,
-                    ngpu=args.ngpu,
-                    preprocess_fn=cls.build_preprocess_fn(args, train=False),
-                    collate_fn=cls.build_collate_fn(args, train=False),
-                    mode="valid",
-                    multi_task_dataset=args.multi_task_dataset,
-                ),
+                train_iter=cls.build_collect_stats_iter_factory(args, mode="train"),
+                valid_iter=cls.build_collect_stats_iter_factory(args, mode="valid"),
                 output_dir=output_dir,
                 ngpu=args.ngpu,
                 log_interval=args.log_interval,
                 write_collected_feats=args.write_collected_feats,
+                num_workers=args.collect_stats_num_workers,
+                checkpoint_interval=args.collect_stats_checkpoint_interval,
+                resume=args.resume,
             )
         else:
             # 6. Loads pre-trained model
@@ -1597,6 +1652,8 @@ class AbsTask(ABC):
             max_cache_size = args.max_cache_size
             max_cache_fd = args.max_cache_fd
             allow_multi_rates = args.allow_multi_rates
+            # NOTE: configs of old experiments don't have compact_index
+            compact_index = getattr(args, "compact_index", False)
             distributed = distributed_option.distributed
             num_batches = None
             num_iters_per_epoch = args.num_iters_per_epoch
@@ -1627,6 +1684,8 @@ class AbsTask(ABC):
                 max_cache_size = args.valid_max_cache_size
             max_cache_fd = args.max_cache_fd
             allow_multi_rates = args.allow_multi_rates
+            # NOTE: configs of old experiments don't have compact_index
+            compact_index = getattr(args, "compact_index", False)
             distributed = distributed_option.distributed
             num_batches = None
             num_iters_per_epoch = None
@@ -1643,6 +1702,8 @@ class AbsTask(ABC):
             num_batches = args.num_att_plot
             max_cache_fd = args.max_cache_fd
             allow_multi_rates = args.allow_multi_rates
+            # NOTE: configs of old experiments don't have compact_index
+            compact_index = getattr(args, "compact_index", False)
             # num_att_plot should be a few sample ~ 3, so cache all data.
             max_cache_size = np.inf if args.max_cache_size != 0.0 else 0.0
             # always False because plot_attention performs on RANK0
@@ -1663,7 +1724,10 @@ class AbsTask(ABC):
             num_batches=num_batches,
             max_cache_size=max_cache_size,
             max_cache_fd=max_cache_fd,
+            # NOTE: configs of old experiments don't have cache_dir
+            cache_dir=getattr(args, "cache_dir", None),
             allow_multi_rates=allow_multi_rates,
+            compact_index=compact_index,
             distributed=distributed,
             num_iters_per_epoch=num_iters_per_epoch,
             train=train,
@@ -1744,6 +1808,12 @@ class AbsTask(ABC):
                 iter_options=iter_options,
                 mode=mode,
             )
+        elif iterator_type == "shard":
+            return cls.build_shard_iter_factory(
+                args=args,
+                iter_options=iter_options,
+                mode=mode,
+            )
         else:
             raise RuntimeError(f"Not supported: iterator_type={iterator_type}")
 
@@ -1764,7 +1834,9 @@ class AbsTask(ABC):
             preprocess=iter_options.preprocess_fn,
             max_cache_size=iter_options.max_cache_size,
             max_cache_fd=iter_options.max_cache_fd,
+            cache_dir=iter_options.cache_dir,
             allow_multi_rates=iter_options.allow_multi_rates,
+            compact_index=iter_options.compact_index,
         )
         cls.check_task_requirements(
             dataset, args.allow_variable_data_keys, train=iter_options.train
@@ -1796,6 +1868,8 @@ class AbsTask(ABC):
                 torch.distributed.get_world_size() if iter_options.distributed else 1
             ),
             utt2category_file=utt2category_file,
+            # NOTE: configs of old experiments don't have batch_plan_cache_dir
+            cache_dir=getattr(args, "batch_plan_cache_dir", None),
         )
 
         batches = list(batch_sampler)
@@ -1846,7 +1920,9 @@ class AbsTask(ABC):
             preprocess=iter_options.preprocess_fn,
             max_cache_size=iter_options.max_cache_size,
             max_cache_fd=iter_options.max_cache_fd,
+            cache_dir=iter_options.cache_dir,
             allow_multi_rates=iter_options.allow_multi_rates,
+            compact_index=iter_options.compact_index,
         )
         cls.check_task_requirements(
             dataset, args.allow_variable_data_keys, train=iter_options.train
@@ -1933,7 +2009,9 @@ class AbsTask(ABC):
             preprocess=iter_options.preprocess_fn,
             max_cache_size=iter_options.max_cache_size,
             max_cache_fd=iter_options.max_cache_fd,
+            cache_dir=iter_options.cache_dir,
             allow_multi_rates=iter_options.allow_multi_rates,
+            compact_index=iter_options.compact_index,
         )
         cls.check_task_requirements(
             dataset, args.allow_variable_data_keys, train=iter_options.train
@@ -2010,7 +2088,9 @@ class AbsTask(ABC):
             preprocess=iter_options.preprocess_fn,
             max_cache_size=iter_options.max_cache_size,
             max_cache_fd=iter_options.max_cache_fd,
+            cache_dir=iter_options.cache_dir,
             allow_multi_rates=iter_options.allow_multi_rates,
+            compact_index=iter_options.compact_index,
         )
         cls.check_task_requirements(
             dataset, args.allow_variable_data_keys, train=iter_options.train
@@ -2092,6 +2172,59 @@ class AbsTask(ABC):
             discard_short_samples=args.chunk_discard_short_samples,
         )
 
+    @classmethod
+    @typechecked
+    def build_shard_iter_factory(
+        cls, args: argparse.Namespace, iter_options: IteratorOptions, mode: str
+    ) -> AbsIterFactory:
+        """Build a factory streaming the shards packed by espnet2/bin/pack_shards.py.
+
+        e.g. --iterator_type shard
+             --train_data_path_and_name_and_type dump/shards/train,speech,shard
+             --train_data_path_and_name_and_type dump/shards/train,text,shard
+        """
+        if iter_options.distributed:
+            world_size = torch.distributed.get_world_size()
+            rank = torch.distributed.get_rank()
+        else:
+            world_size = 1
+            rank = 0
+
+        dataset = ShardedIterableESPnetDataset(
+            iter_options.data_path_and_name_and_type,
+            float_dtype=args.train_dtype,
+            preprocess=iter_options.preprocess_fn,
+            shuffle=iter_options.train,
+            shuffle_buffer_size=args.shuffle_buffer_size,
+            seed=args.seed,
+            rank=rank,
+            world_size=world_size,
+        )
+        cls.check_task_requirements(
+            dataset, args.allow_variable_data_keys, train=iter_options.train
+        )
+        if iter_options.batch_type in ("length", "numel"):
+            logging.warning(
+                f"batch_type={iter_options.batch_type} is not supported by "
+                f"the shard iterator: batch_size={iter_options.batch_size} is used"
+            )
+        logging.info(f"[{mode}] dataset:\n{dataset}")
+
+        return ShardIterFactory(
+            dataset=dataset,
+            batch_size=iter_options.batch_size,
+            num_iters_per_epoch=(
+                iter_options.num_iters_per_epoch
+                if iter_options.num_batches is None
+                else iter_options.num_batches
+            ),
+            seed=args.seed,
+            shuffle=iter_options.train,
+            num_workers=args.num_workers,
+            collate_fn=iter_options.collate_fn,
+            pin_memory=args.ngpu > 0,
+        )
+
     # NOTE(kamo): Not abstract class
     @classmethod
     def build_task_iter_factory(
@@ -2214,6 +2347,69 @@ class AbsTask(ABC):
             build_funcs=build_funcs, shuffle=iter_options.train, seed=args.seed
         )
 
+    @classmethod
+    @typechecked
+    def build_collect_stats_iter_factory(
+        cls, args: argparse.Namespace, mode: str
+    ) -> Union[AbsIterFactory, DataLoader]:
+        """Build the iterator of collect_stats mode.
+
+        The mini-batches are made of "batch_size" keys in the order of the key file
+        as the streaming iterator does, and the iter-factory can skip them
+        without loading to resume collect_stats from the middle.
+        """
+        if mode == "train":
+            data_path_and_name_and_type = args.train_data_path_and_name_and_type
+            shape_files = args.train_shape_file
+            batch_size = args.batch_size
+        elif mode == "valid":
+            data_path_and_name_and_type = args.valid_data_path_and_name_and_type
+            shape_files = args.valid_shape_file
+            batch_size = args.valid_batch_size
+        else:
+            raise NotImplementedError(f"mode={mode}")
+        key_file = shape_files[0] if len(shape_files) != 0 else None
+
+        if args.multi_task_dataset:
+            return cls.build_streaming_iterator(
+                data_path_and_name_and_type=data_path_and_name_and_type,
+                key_file=key_file,
+                batch_size=batch_size,
+                dtype=args.train_dtype,
+                num_workers=args.num_workers,
+                allow_variable_data_keys=args.allow_variable_data_keys,
+                ngpu=args.ngpu,
+                preprocess_fn=cls.build_preprocess_fn(args, train=False),
+                collate_fn=cls.build_collate_fn(args, train=False),
+                mode=mode,
+                multi_task_dataset=True,
+            )
+
+        dataset = ESPnetDataset(
+            data_path_and_name_and_type,
+            float_dtype=args.train_dtype,
+            preprocess=cls.build_preprocess_fn(args, train=False),
+        )
+        cls.check_task_requirements(dataset, args.allow_variable_data_keys, train=False)
+
+        data_dir = Path(data_path_and_name_and_type[0][0]).parent
+        if (data_dir / "utt2category").exists():
+            batch_size = 1
+        if key_file is None:
+            key_file = data_path_and_name_and_type[0][0]
+        with open(key_file, encoding="utf-8") as f:
+            keys = [line.rstrip().split(maxsplit=1)[0] for line in f]
+        batches = [keys[i : i + batch_size] for i in range(0, len(keys), batch_size)]
+
+        return SequenceIterFactory(
+            dataset=dataset,
+            batches=batches,
+            shuffle=False,
+            num_workers=args.num_workers,
+            collate_fn=cls.build_collate_fn(args, train=False),
+            pin_memory=args.ngpu > 0,
+        )
+
     @classmethod
     @typechecked
     def build_streaming_iterator(
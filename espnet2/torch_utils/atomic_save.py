@@ -0,0 +1,17 @@
+import os
+from pathlib import Path
+from typing import Any, Union
+
+import torch
+
+
+def atomic_save(obj: Any, path: Union[Path, str]):
+    """Save the object by torch.save() without leaving a broken file.
+
+    The object is written to a temporary file and renamed,
+    so that the file is not broken if the process is killed while writing.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    torch.save(obj, tmp)
+    os.replace(tmp, path)
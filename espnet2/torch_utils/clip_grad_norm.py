@@ -0,0 +1,75 @@
+import math
+from collections import defaultdict
+from typing import Iterable, Union
+
+import torch
+
+
+def clip_grad_norm(
+    parameters: Iterable[torch.nn.Parameter],
+    max_norm: float,
+    norm_type: float = 2.0,
+) -> torch.Tensor:
+    """Clip the gradient norm of the parameters and return the total norm.
+
+    Same as torch.nn.utils.clip_grad_norm_(), but
+
+    - The norms and the scaling are computed by the multi-tensor "foreach"
+      kernels for each device and dtype, also on CPU.
+    - If max_norm is not positive or infinite, the gradients are not clipped
+      and only the total norm is computed.
+
+    Args:
+        parameters: The parameters having the gradients.
+        max_norm: The max norm of the gradients.
+        norm_type: The type of the p-norm. Can be inf.
+    Returns:
+        The total norm of the gradients as a tensor.
+    """
+    if isinstance(parameters, torch.Tensor):
+        parameters = [parameters]
+    grads = [p.grad for p in parameters if p.grad is not None]
+    if len(grads) == 0:
+        return torch.tensor(0.0)
+    norm_type = float(norm_type)
+
+    # Group the gradients: Dict[Tuple[device, dtype], List[torch.Tensor]]
+    groups = defaultdict(list)
+    for g in grads:
+        groups[g.device, g.dtype].append(g.detach())
+
+    device = grads[0].device
+    norms = []
+    for gs in groups.values():
+        norms.extend(_foreach_norm(gs, norm_type))
+    total_norm = torch.linalg.vector_norm(
+        torch.stack([n.to(device) for n in norms]), norm_type
+    )
+
+    if 0 < max_norm < math.inf:
+        # Avoid synchronization by clamping instead of "if clip_coef < 1"
+        clip_coef = torch.clamp(max_norm / (total_norm + 1e-6), max=1.0)
+        for (_device, _), gs in groups.items():
+            _foreach_mul_(gs, clip_coef.to(_device))
+    return total_norm
+
+
+def _foreach_norm(tensors, norm_type: float):
+    if hasattr(torch, "_foreach_norm"):
+        try:
+            return torch._foreach_norm(tensors, norm_type)
+        except RuntimeError:
+            # e.g. Not supported norm_type or device
+            pass
+    return [torch.linalg.vector_norm(t, norm_type) for t in tensors]
+
+
+def _foreach_mul_(tensors, scalar: Union[torch.Tensor, float]):
+    if hasattr(torch, "_foreach_mul_"):
+        try:
+            torch._foreach_mul_(tensors, scalar)
+            return
+        except (RuntimeError, TypeError):
+            pass
+    for t in tensors:
+        t.mul_(scalar)
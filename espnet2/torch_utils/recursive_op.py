@@ -1,5 +1,8 @@
 """Torch utility module."""
 
+from typing import List, Sequence, Tuple
+
+import numpy as np
 import torch
 
 if torch.distributed.is_available():
@@ -50,10 +53,88 @@ def recursive_divide(a, b: torch.Tensor):
 
 
 def recursive_average(obj, weight: torch.Tensor, distributed: bool = False):
-    obj = recursive_sum(obj, weight, distributed)
+    obj, weight, _ = recursive_average_coalesced(obj, weight, distributed)
+    return obj, weight
+
+
+def _flatten_tensors(obj, out: List[torch.Tensor]):
+    if isinstance(obj, (tuple, list)):
+        for v in obj:
+            _flatten_tensors(v, out)
+    elif isinstance(obj, dict):
+        for v in obj.values():
+            _flatten_tensors(v, out)
+    elif isinstance(obj, torch.Tensor):
+        out.append(obj)
+    elif obj is not None:
+        raise ValueError(type(obj))
+
+
+def _unflatten_tensors(obj, it):
+    if isinstance(obj, (tuple, list)):
+        return type(obj)(_unflatten_tensors(v, it) for v in obj)
+    elif isinstance(obj, dict):
+        return {k: _unflatten_tensors(v, it) for k, v in obj.items()}
+    elif isinstance(obj, torch.Tensor):
+        return next(it)
+    else:
+        return None
+
+
+def coalesced_all_reduce(tensors: Sequence[torch.Tensor]) -> List[torch.Tensor]:
+    """Sum the scalar tensors over all workers by a single all_reduce().
+
+    The tensors are packed into a float64 buffer and the results are
+    casted back to their dtypes.
+    """
+    if len(tensors) == 0:
+        return []
+    buffer = torch.stack([t.detach().reshape(()).to(torch.float64) for t in tensors])
+    torch.distributed.all_reduce(buffer, op=ReduceOp.SUM)
+    return [b.to(t.dtype) for b, t in zip(buffer, tensors)]
+
+
+def recursive_average_coalesced(
+    obj,
+    weight: torch.Tensor,
+    distributed: bool = False,
+    extras: Sequence[torch.Tensor] = (),
+) -> Tuple[object, torch.Tensor, List[torch.Tensor]]:
+    """Same as recursive_average(), but all values are reduced at once.
+
+    Instead of all_gather() for each tensor and all_reduce() for the weight,
+    the weighted sums, the numbers of the non-nan values, the weight and
+    the extra scalars, e.g. a stop-flag, are summed by a single collective.
+
+    Returns:
+        obj: The weighted average.
+        weight: The summation of the weight over all workers.
+        extras: The summations of the extras over all workers.
+    """
+    obj = recursive_sum(obj, weight, distributed=False)
     weight = weight.sum()
+    extras = list(extras)
     if distributed:
-        torch.distributed.all_reduce(weight, op=ReduceOp.SUM)
+        leaves = []
+        _flatten_tensors(obj, leaves)
+        n = len(leaves)
+        isnan = [torch.isnan(v) for v in leaves]
+        reduced = coalesced_all_reduce(
+            [torch.where(m, torch.zeros_like(v), v) for v, m in zip(leaves, isnan)]
+            + [(~m).to(torch.float64) for m in isnan]
+            + [weight]
+            + extras
+        )
+        world_size = torch.distributed.get_world_size()
+        # Same as recursive_sum(): nanmean() * world_size to compensate for
+        # the samples of the nan values, or nan if all values are nan.
+        leaves = [
+            torch.where(c > 0, v / c.to(v.dtype) * world_size, v.new_tensor(np.nan))
+            for v, c in zip(reduced[:n], reduced[n : 2 * n])
+        ]
+        obj = _unflatten_tensors(obj, iter(leaves))
+        weight = reduced[2 * n]
+        extras = reduced[2 * n + 1 :]
     # Normalize weight to be sum-to-1
     obj = recursive_divide(obj, weight)
-    return obj, weight
+    return obj, weight, extras
@@ -8,3 +8,28 @@ def set_all_random_seed(seed: int):
     random.seed(seed)
     np.random.seed(seed)
     torch.random.manual_seed(seed)
+
+
+def get_all_random_state() -> dict:
+    """Return the states of the random generators of python, numpy and torch.
+
+    Only the state of the current device is saved for cuda.
+    """
+    name, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    return {
+        "random": random.getstate(),
+        "numpy": (name, keys.tolist(), pos, has_gauss, cached_gaussian),
+        "torch": torch.random.get_rng_state(),
+        "cuda": torch.cuda.get_rng_state() if torch.cuda.is_initialized() else None,
+    }
+
+
+def set_all_random_state(state: dict):
+    random.setstate(state["random"])
+    name, keys, pos, has_gauss, cached_gaussian = state["numpy"]
+    np.random.set_state(
+        (name, np.array(keys, dtype=np.uint32), pos, has_gauss, cached_gaussian)
+    )
+    torch.random.set_rng_state(state["torch"])
+    if state["cuda"] is not None and torch.cuda.is_available():
+        torch.cuda.set_rng_state(state["cuda"])
@@ -0,0 +1,236 @@
+"""Checkpoint writer saving the files in background."""
+
+import copy
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import torch
+from typeguard import typechecked
+
+from espnet2.torch_utils.atomic_save import atomic_save
+
+
+class CheckpointWriter:
+    """Save the checkpoint files in a background thread.
+
+    save() takes a snapshot of the given objects, i.e. copies the tensors
+    to CPU memory, and returns without waiting for the serialization.
+    The files are written by a worker thread in the order of save() calls,
+    and the functions given by submit() are also run by the thread
+    after the files which are saved before.
+
+    - The tensors of CUDA are copied to pinned CPU buffers asynchronously,
+      and the buffers are reused for the next snapshots.
+    - The tensors sharing the same storage are copied once, e.g.
+      the model parameters saved in both "checkpoint.pth" and "{epoch}epoch.pth",
+      and torch.save() keeps them sharing in each file.
+    - Each file is written to a temporary file and renamed,
+      so that the file is never left broken.
+    - The time of the snapshot and the writing is logged for each save().
+
+    If asynchronous=False, the files are written before save() returns.
+
+    Examples:
+        >>> writer = CheckpointWriter()
+        >>> model_state = model.state_dict()
+        >>> writer.save(
+        ...     {
+        ...         "exp/checkpoint.pth": {"model": model_state, ...},
+        ...         "exp/1epoch.pth": model_state,
+        ...     }
+        ... )
+        >>> writer.submit(average_nbest_models, ...)
+        >>> writer.wait()
+
+    """
+
+    @typechecked
+    def __init__(self, asynchronous: bool = True, pin_memory: bool = True):
+        self.asynchronous = asynchronous
+        self.pin_memory = pin_memory and torch.cuda.is_available()
+
+        self._jobs = deque()
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self._worker = None
+        self._error = None
+        # The reusable pinned buffers: Dict[Tuple[shape, dtype], List[torch.Tensor]]
+        self._buffers = defaultdict(list)
+        # The latency of the last save(): Dict[str, float]
+        self.last_stats = {}
+
+    def save(self, files: Dict[Union[str, Path], Any]) -> None:
+        """Save the objects to the files.
+
+        Args:
+            files: The mapping from the file path to the object to be saved.
+                The tensors shared among the objects are copied only once.
+        """
+        self._raise_error()
+        if not self.asynchronous:
+            start = time.perf_counter()
+            for path, obj in files.items():
+                atomic_save(obj, Path(path))
+            self._log(list(files), 0.0, time.perf_counter() - start, None)
+            return
+
+        start = time.perf_counter()
+        memo, buffers = {}, []
+        snapshot = {
+            Path(path): self._snapshot(obj, memo, buffers)
+            for path, obj in files.items()
+        }
+        event = None
+        if any(b.is_pinned() for b in buffers):
+            # The copies to the pinned buffers are waited in the worker
+            event = torch.cuda.Event()
+            event.record()
+        snapshot_time = time.perf_counter() - start
+        self._put(
+            self._write, snapshot, buffers, event, snapshot_time, time.perf_counter()
+        )
+
+    def submit(self, fn: Callable, *args, **kwargs) -> None:
+        """Run the function after the files given by the previous save()."""
+        self._raise_error()
+        if not self.asynchronous:
+            fn(*args, **kwargs)
+            return
+        self._put(fn, *args, **kwargs)
+
+    def wait(self) -> None:
+        """Wait for all of the given jobs to finish."""
+        with self._lock:
+            while self._worker is not None:
+                self._done.wait()
+        self._raise_error()
+
+    def _put(self, fn: Callable, *args, **kwargs):
+        with self._lock:
+            self._jobs.append((fn, args, kwargs))
+            if self._worker is None:
+                # The worker exits when no jobs are left. It's not daemon
+                # not to lose the checkpoint when the main thread finishes.
+                self._worker = threading.Thread(
+                    target=self._run, name="CheckpointWriter"
+                )
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if len(self._jobs) == 0 or self._error is not None:
+                    self._jobs.clear()
+                    self._worker = None
+                    self._done.notify_all()
+                    return
+                fn, args, kwargs = self._jobs.popleft()
+            try:
+                fn(*args, **kwargs)
+            except BaseException as e:
+                logging.exception("Failed in CheckpointWriter")
+                with self._lock:
+                    self._error = e
+
+    def _raise_error(self):
+        with self._lock:
+            error, self._error = self._error, None
+        if error is not None:
+            raise RuntimeError("Failed to write the checkpoint") from error
+
+    def _write(
+        self,
+        snapshot: Dict[Path, Any],
+        buffers: List[torch.Tensor],
+        event: Optional["torch.cuda.Event"],
+        snapshot_time: float,
+        queued_time: float,
+    ):
+        start = time.perf_counter()
+        if event is not None:
+            event.synchronize()
+        for path, obj in snapshot.items():
+            atomic_save(obj, path)
+        write_time = time.perf_counter() - start
+        nbytes = sum(b.numel() * b.element_size() for b in buffers)
+        self._log(list(snapshot), snapshot_time, write_time, start - queued_time)
+
+        with self._lock:
+            for b in buffers:
+                if b.is_pinned():
+                    self._buffers[b.shape, b.dtype].append(b)
+        self.last_stats = dict(
+            snapshot_time=snapshot_time,
+            write_time=write_time,
+            wait_time=start - queued_time,
+            snapshot_MB=nbytes / 2**20,
+        )
+
+    def _log(self, paths, snapshot_time, write_time, wait_time):
+        names = ", ".join(str(p) for p in paths)
+        message = f"Wrote {names} in {write_time:.2f} seconds"
+        if self.asynchronous:
+            message += (
+                f" (snapshot: {snapshot_time:.2f} seconds, "
+                f"waited in queue: {wait_time:.2f} seconds)"
+            )
+        logging.info(message)
+
+    def _snapshot(self, obj: Any, memo: dict, buffers: List[torch.Tensor]) -> Any:
+        if isinstance(obj, torch.Tensor):
+            return self._copy_tensor(obj, memo, buffers)
+        elif isinstance(obj, dict):
+            # copy.copy() keeps the class and the attributes,
+            # e.g. "_metadata" of the state_dict of torch.nn.Module
+            retval = copy.copy(obj)
+            for k, v in obj.items():
+                retval[k] = self._snapshot(v, memo, buffers)
+            return retval
+        elif isinstance(obj, list):
+            return [self._snapshot(v, memo, buffers) for v in obj]
+        elif isinstance(obj, tuple):
+            values = [self._snapshot(v, memo, buffers) for v in obj]
+            if hasattr(obj, "_fields"):
+                # namedtuple
+                return type(obj)(*values)
+            return type(obj)(values)
+        else:
+            return copy.deepcopy(obj, memo)
+
+    def _copy_tensor(
+        self, tensor: torch.Tensor, memo: dict, buffers: List[torch.Tensor]
+    ) -> torch.Tensor:
+        tensor = tensor.detach()
+        # Copy the whole storage once and make the same view of it,
+        # so that the tensors sharing the storage are also shared in the snapshot
+        storage = tensor.untyped_storage()
+        key = ("storage", storage.data_ptr(), tensor.device, storage.nbytes())
+        if key not in memo:
+            src = torch.empty(0, dtype=torch.uint8, device=tensor.device).set_(storage)
+            if src.is_cuda and self.pin_memory:
+                dst = self._get_buffer(src.shape, src.dtype)
+                dst.copy_(src, non_blocking=True)
+            else:
+                dst = src.to("cpu", copy=True)
+            buffers.append(dst)
+            memo[key] = dst
+        return (
+            torch.empty(0, dtype=tensor.dtype)
+            .set_(
+                memo[key].untyped_storage(),
+                tensor.storage_offset(),
+                tensor.shape,
+                tensor.stride(),
+            )
+            .requires_grad_(False)
+        )
+
+    def _get_buffer(self, shape: torch.Size, dtype: torch.dtype) -> torch.Tensor:
+        with self._lock:
+            if len(self._buffers[shape, dtype]) > 0:
+                return self._buffers[shape, dtype].pop()
+        return torch.empty(shape, dtype=dtype, pin_memory=True)
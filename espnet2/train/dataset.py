@@ -16,6 +16,7 @@ from typing import (
     List,
     Mapping,
     Optional,
+    Sequence,
     Tuple,
     Union,
 )
@@ -43,7 +44,8 @@ from espnet2.fileio.read_text import (
 from espnet2.fileio.rttm import RttmReader
 from espnet2.fileio.score_scp import SingingScoreReader
 from espnet2.fileio.sound_scp import SoundScpReader
-from espnet2.utils.sized_dict import SizedDict
+from espnet2.fileio.text_index import IndexedTextReader, get_indexed_reader
+from espnet2.utils.shared_array_cache import SharedArrayCache
 
 
 class AdapterForSoundScpReader(collections.abc.Mapping):
@@ -67,6 +69,9 @@ class AdapterForSoundScpReader(collections.abc.Mapping):
     def __iter__(self):
         return iter(self.loader)
 
+    def get_indexed_reader(self) -> Optional[IndexedTextReader]:
+        return get_indexed_reader(self.loader)
+
     def __getitem__(self, key: str) -> np.ndarray:
         retval = self.loader[key]
 
@@ -181,7 +186,13 @@ class AdapterForLabelScpReader(collections.abc.Mapping):
         return sample_time, sample_label
 
 
-def sound_loader(path, float_dtype=None, multi_columns=False, allow_multi_rates=False):
+def sound_loader(
+    path,
+    float_dtype=None,
+    multi_columns=False,
+    allow_multi_rates=False,
+    compact_index=False,
+):
     # The file is as follows:
     #   utterance_id_A /some/where/a.wav
     #   utterance_id_B /some/where/a.flac
@@ -190,7 +201,11 @@ def sound_loader(path, float_dtype=None, multi_columns=False, allow_multi_rates=
     # like Kaldi e.g. "cat a.wav |".
     # NOTE(kamo): The audio signal is normalized to [-1,1] range.
     loader = SoundScpReader(
-        path, always_2d=False, dtype=float_dtype, multi_columns=multi_columns
+        path,
+        always_2d=False,
+        dtype=float_dtype,
+        multi_columns=multi_columns,
+        compact_index=compact_index,
     )
 
     # SoundScpReader.__getitem__() returns Tuple[int, ndarray],
@@ -198,13 +213,21 @@ def sound_loader(path, float_dtype=None, multi_columns=False, allow_multi_rates=
     return AdapterForSoundScpReader(loader, allow_multi_rates=allow_multi_rates)
 
 
-def multi_columns_sound_loader(path, float_dtype=None, allow_multi_rates=False):
+def multi_columns_sound_loader(
+    path, float_dtype=None, allow_multi_rates=False, compact_index=False
+):
     return sound_loader(
-        path, float_dtype, multi_columns=True, allow_multi_rates=allow_multi_rates
+        path,
+        float_dtype,
+        multi_columns=True,
+        allow_multi_rates=allow_multi_rates,
+        compact_index=compact_index,
     )
 
 
-def variable_columns_sound_loader(path, float_dtype=None, allow_multi_rates=False):
+def variable_columns_sound_loader(
+    path, float_dtype=None, allow_multi_rates=False, compact_index=False
+):
     # The file is as follows:
     #   utterance_id_A /some/where/a1.wav /some/where/a2.wav /some/where/a3.wav
     #   utterance_id_B /some/where/b1.flac /some/where/b2.flac
@@ -212,7 +235,13 @@ def variable_columns_sound_loader(path, float_dtype=None, allow_multi_rates=Fals
     # NOTE(wangyou): SoundScpReader doesn't support pipe-fashion
     # like Kaldi e.g. "cat a.wav |".
     # NOTE(wangyou): The audio signal is normalized to [-1,1] range.
-    loader = MultiSoundScpReader(path, always_2d=False, dtype=float_dtype, stack_axis=0)
+    loader = MultiSoundScpReader(
+        path,
+        always_2d=False,
+        dtype=float_dtype,
+        stack_axis=0,
+        compact_index=compact_index,
+    )
     return AdapterForSoundScpReader(loader, allow_multi_rates=allow_multi_rates)
 
 
@@ -227,27 +256,35 @@ def label_loader(path):
 
 
 def kaldi_loader(
-    path, float_dtype=None, max_cache_fd: int = 0, allow_multi_rates=False
+    path,
+    float_dtype=None,
+    max_cache_fd: int = 0,
+    allow_multi_rates=False,
+    compact_index=False,
 ):
-    loader = kaldiio.load_scp(path, max_cache_fd=max_cache_fd)
+    if compact_index:
+        # NOTE: file descriptors are not cached in this case
+        loader = IndexedTextReader(path, value_parser=kaldiio.load_mat)
+    else:
+        loader = kaldiio.load_scp(path, max_cache_fd=max_cache_fd)
     return AdapterForSoundScpReader(
         loader, float_dtype, allow_multi_rates=allow_multi_rates
     )
 
 
-def rand_int_loader(filepath, loader_type):
+def rand_int_loader(filepath, loader_type, compact_index=False):
     # e.g. rand_int_3_10
     try:
         low, high = map(int, loader_type[len("rand_int_") :].split("_"))
     except ValueError:
         raise RuntimeError(f"e.g rand_int_3_10: but got {loader_type}")
-    return IntRandomGenerateDataset(filepath, low, high)
+    return IntRandomGenerateDataset(filepath, low, high, compact_index=compact_index)
 
 
 DATA_TYPES = {
     "sound": dict(
         func=sound_loader,
-        kwargs=["float_dtype", "allow_multi_rates"],
+        kwargs=["float_dtype", "allow_multi_rates", "compact_index"],
         help="Audio format types which supported by sndfile wav, flac, etc."
         "\n\n"
         "   utterance_id_a a.wav\n"
@@ -256,7 +293,7 @@ DATA_TYPES = {
     ),
     "multi_columns_sound": dict(
         func=multi_columns_sound_loader,
-        kwargs=["float_dtype", "allow_multi_rates"],
+        kwargs=["float_dtype", "allow_multi_rates", "compact_index"],
         help="Enable multi columns wav.scp. "
         "The following text file can be loaded as multi channels audio data"
         "\n\n"
@@ -266,7 +303,7 @@ DATA_TYPES = {
     ),
     "variable_columns_sound": dict(
         func=variable_columns_sound_loader,
-        kwargs=["float_dtype", "allow_multi_rates"],
+        kwargs=["float_dtype", "allow_multi_rates", "compact_index"],
         help="Loading variable numbers (columns) of audios in wav.scp. "
         "The following text file can be loaded as stacked audio data"
         "\n\n"
@@ -300,7 +337,7 @@ DATA_TYPES = {
     ),
     "kaldi_ark": dict(
         func=kaldi_loader,
-        kwargs=["max_cache_fd", "allow_multi_rates"],
+        kwargs=["max_cache_fd", "allow_multi_rates", "compact_index"],
         help="Kaldi-ark file type."
         "\n\n"
         "   utterance_id_A /some/where/a.ark:123\n"
@@ -309,7 +346,7 @@ DATA_TYPES = {
     ),
     "npy": dict(
         func=NpyScpReader,
-        kwargs=[],
+        kwargs=["compact_index"],
         help="Npy file format."
         "\n\n"
         "   utterance_id_A /some/where/a.npy\n"
@@ -318,7 +355,7 @@ DATA_TYPES = {
     ),
     "text_int": dict(
         func=functools.partial(load_num_sequence_text, loader_type="text_int"),
-        kwargs=[],
+        kwargs=["compact_index"],
         help="A text file in which is written a sequence of interger numbers "
         "separated by space."
         "\n\n"
@@ -328,7 +365,7 @@ DATA_TYPES = {
     ),
     "csv_int": dict(
         func=functools.partial(load_num_sequence_text, loader_type="csv_int"),
-        kwargs=[],
+        kwargs=["compact_index"],
         help="A text file in which is written a sequence of interger numbers "
         "separated by comma."
         "\n\n"
@@ -338,7 +375,7 @@ DATA_TYPES = {
     ),
     "text_float": dict(
         func=functools.partial(load_num_sequence_text, loader_type="text_float"),
-        kwargs=[],
+        kwargs=["compact_index"],
         help="A text file in which is written a sequence of float numbers "
         "separated by space."
         "\n\n"
@@ -348,7 +385,7 @@ DATA_TYPES = {
     ),
     "csv_float": dict(
         func=functools.partial(load_num_sequence_text, loader_type="csv_float"),
-        kwargs=[],
+        kwargs=["compact_index"],
         help="A text file in which is written a sequence of float numbers "
         "separated by comma."
         "\n\n"
@@ -358,7 +395,7 @@ DATA_TYPES = {
     ),
     "text": dict(
         func=read_2columns_text,
-        kwargs=[],
+        kwargs=["compact_index"],
         help="Return text as is. The text must be converted to ndarray "
         "by 'preprocess'."
         "\n\n"
@@ -386,7 +423,7 @@ DATA_TYPES = {
     ),
     "rand_float": dict(
         func=FloatRandomGenerateDataset,
-        kwargs=[],
+        kwargs=["compact_index"],
         help="Generate random float-ndarray which has the given shapes "
         "in the file."
         "\n\n"
@@ -396,7 +433,7 @@ DATA_TYPES = {
     ),
     "rand_int_\\d+_\\d+": dict(
         func=rand_int_loader,
-        kwargs=["loader_type"],
+        kwargs=["loader_type", "compact_index"],
         help="e.g. 'rand_int_0_10'. Generate random int-ndarray which has the given "
         "shapes in the path. "
         "Give the lower and upper value by the file type. e.g. "
@@ -457,6 +494,8 @@ class ESPnetDataset(AbsDataset):
         max_cache_size: Union[float, int, str] = 0.0,
         max_cache_fd: int = 0,
         allow_multi_rates: bool = False,
+        compact_index: bool = False,
+        cache_dir: Optional[str] = None,
     ):
         if len(path_name_type_list) == 0:
             raise ValueError(
@@ -471,6 +510,8 @@ class ESPnetDataset(AbsDataset):
         self.max_cache_fd = max_cache_fd
         # allow audios to have different sampling rates
         self.allow_multi_rates = allow_multi_rates
+        # use memory-mapped indices instead of dict for the text-based loaders
+        self.compact_index = compact_index
 
         self.loader_dict = {}
         self.debug_info = {}
@@ -486,13 +527,18 @@ class ESPnetDataset(AbsDataset):
 
             # TODO(kamo): Should check consistency of each utt-keys?
 
+        # keys of the first loader for integer-id access, built at first use
+        self._uid_keys = None
+
         if isinstance(max_cache_size, str):
             max_cache_size = humanfriendly.parse_size(max_cache_size)
         self.max_cache_size = max_cache_size
+        self.cache = None
         if max_cache_size > 0:
-            self.cache = SizedDict(shared=True)
-        else:
-            self.cache = None
+            try:
+                self.cache = SharedArrayCache(max_cache_size, root=cache_dir)
+            except OSError as e:
+                logging.warning(f"The data cache is disabled: {e}")
 
     def _build_loader(
         self, path: str, loader_type: str
@@ -519,6 +565,8 @@ class ESPnetDataset(AbsDataset):
                         kwargs["max_cache_fd"] = self.max_cache_fd
                     elif key2 == "allow_multi_rates":
                         kwargs["allow_multi_rates"] = self.allow_multi_rates
+                    elif key2 == "compact_index":
+                        kwargs["compact_index"] = self.compact_index
                     else:
                         raise RuntimeError(f"Not implemented keyword argument: {key2}")
 
@@ -552,48 +600,53 @@ class ESPnetDataset(AbsDataset):
         _mes += f"\n  preprocess: {self.preprocess})"
         return _mes
 
-    @typechecked
-    def __getitem__(self, uid: Union[str, int]) -> Tuple[str, Dict[str, np.ndarray]]:
+    def _to_key(self, uid: Union[str, int]) -> str:
+        """Change integer-id to string-id in O(1)."""
+        if isinstance(uid, str):
+            return uid
 
-        # Change integer-id to string-id
-        if isinstance(uid, int):
+        if self._uid_keys is None:
             d = next(iter(self.loader_dict.values()))
-            uid = list(d)[uid]
-
-        if self.cache is not None and uid in self.cache:
-            data = self.cache[uid]
-            return uid, data
-
-        data = {}
-        # 1. Load data from each loaders
-        for name, loader in self.loader_dict.items():
-            try:
-                value = loader[uid]
-                if isinstance(value, (list)):
-                    value = np.array(value)
-                if not isinstance(
-                    value, (np.ndarray, torch.Tensor, str, numbers.Number, tuple)
-                ):
-                    raise TypeError(
-                        (
-                            "Must be ndarray, torch.Tensor, "
-                            "str,  Number or tuple: {}".format(type(value))
-                        )
+            reader = get_indexed_reader(d)
+            if reader is not None:
+                self._uid_keys = reader
+            else:
+                # NOTE: A numpy array is used instead of list because the str
+                # objects in a list are copied to each DataLoader worker by
+                # the reference counting (copy-on-read).
+                self._uid_keys = np.array(list(d))
+
+        if isinstance(self._uid_keys, IndexedTextReader):
+            return self._uid_keys.key_at(uid)
+        return str(self._uid_keys[uid])
+
+    def _load_value(self, name: str, loader, uid: str) -> Any:
+        try:
+            value = loader[uid]
+            if isinstance(value, (list)):
+                value = np.array(value)
+            if not isinstance(
+                value, (np.ndarray, torch.Tensor, str, numbers.Number, tuple)
+            ):
+                raise TypeError(
+                    (
+                        "Must be ndarray, torch.Tensor, "
+                        "str,  Number or tuple: {}".format(type(value))
                     )
-            except Exception:
-                path, _type = self.debug_info[name]
-                logging.error(
-                    f"Error happened with path={path}, type={_type}, id={uid}"
                 )
-                raise
-
-            # torch.Tensor is converted to ndarray
-            if isinstance(value, torch.Tensor):
-                value = value.numpy()
-            elif isinstance(value, numbers.Number):
-                value = np.array([value])
-            data[name] = value
-
+        except Exception:
+            path, _type = self.debug_info[name]
+            logging.error(f"Error happened with path={path}, type={_type}, id={uid}")
+            raise
+
+        # torch.Tensor is converted to ndarray
+        if isinstance(value, torch.Tensor):
+            value = value.numpy()
+        elif isinstance(value, numbers.Number):
+            value = np.array([value])
+        return value
+
+    def _process(self, uid: str, data: Dict[str, Any]) -> Dict[str, np.ndarray]:
         # 2. [Option] Apply preprocessing
         if getattr(self, "install_speaker_prompt", None) is not None:
             self.install_speaker_prompt(uid, data)
@@ -620,10 +673,52 @@ class ESPnetDataset(AbsDataset):
                 raise NotImplementedError(f"Not supported dtype: {value.dtype}")
             data[name] = value
 
-        if self.cache is not None and self.cache.size < self.max_cache_size:
-            self.cache[uid] = data
+        if self.cache is not None:
+            self.cache.put(uid, data)
+        return data
+
+    @typechecked
+    def __getitem__(self, uid: Union[str, int]) -> Tuple[str, Dict[str, np.ndarray]]:
+        return self.getitems([uid])[0]
+
+    def __getitems__(self, uids):
+        # Called by torch.utils.data.DataLoader (torch>=2.0) for a minibatch
+        return self.getitems(uids)
+
+    @typechecked
+    def getitems(
+        self, uids: Sequence[Union[str, int]]
+    ) -> List[Tuple[str, Dict[str, np.ndarray]]]:
+        """Load a minibatch.
+
+        This is a plain batched wrapper of `__getitem__`:
+        each value is still read by `loader[uid]` one sample at a time.
+        It only lets DataLoader fetch a minibatch in one call (`__getitems__`)
+        and checks the cache before loading the missing samples.
+
+        Examples:
+            >>> dataset.getitems(['uttid_a', 'uttid_b'])
+            [('uttid_a', {'input': ...}), ('uttid_b', {'input': ...})]
+        """
+        uids = [self._to_key(uid) for uid in uids]
+        retval = [None] * len(uids)
+
+        uncached = []
+        for i, uid in enumerate(uids):
+            data = self.cache.get(uid) if self.cache is not None else None
+            if data is not None:
+                retval[i] = uid, data
+            else:
+                uncached.append(i)
+
+        # 1. Load data from each loaders
+        batch = {i: {} for i in uncached}
+        for name, loader in self.loader_dict.items():
+            for i in uncached:
+                batch[i][name] = self._load_value(name, loader, uids[i])
 
-        retval = uid, data
+        for i in uncached:
+            retval[i] = uids[i], self._process(uids[i], batch[i])
         return retval
 
 
@@ -2,7 +2,7 @@ import dataclasses
 import logging
 import os
 import socket
-from typing import Optional
+from typing import Iterable, Optional, Union
 
 import torch
 import torch.distributed
@@ -397,3 +397,54 @@ def get_num_nodes(prior=None, launcher: Optional[str] = None) -> Optional[int]:
     else:
         # prior is None -> NUM_NODES = 1
         return int(os.environ.get("WORLD_SIZE", 1))
+
+
+def get_min_num_iters(
+    iterable: Iterable, device: Union[torch.device, str]
+) -> Optional[int]:
+    """Return the minimum number of iterations over all processes.
+
+    If all processes stop at this number, no stop-flag is needed in each step.
+
+    Returns:
+        None if the length of the iterable is unknown.
+    """
+    try:
+        num_iters = len(iterable)
+    except TypeError:
+        num_iters = -1
+    # The lengths are known in all processes or none of them
+    num_iters = torch.tensor(num_iters, device=device)
+    torch.distributed.all_reduce(num_iters, op=torch.distributed.ReduceOp.MIN)
+    num_iters = int(num_iters)
+    return None if num_iters < 0 else num_iters
+
+
+class LookaheadIterable:
+    """Iterate one item ahead to know whether the current item is the last.
+
+    Used to send the stop-flag together with the stats of the current step,
+    instead of a barrier before each step, if the length is unknown.
+
+    Examples:
+        >>> it = LookaheadIterable(range(2))
+        >>> [(x, it.is_last) for x in it]
+        [(0, False), (1, True)]
+    """
+
+    def __init__(self, iterable: Iterable):
+        self.iterable = iterable
+        self.is_last = False
+
+    def __iter__(self):
+        self.is_last = False
+        iterator = iter(self.iterable)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        for next_item in iterator:
+            yield item
+            item = next_item
+        self.is_last = True
+        yield item
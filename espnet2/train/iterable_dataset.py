@@ -13,6 +13,7 @@ import torch
 from torch.utils.data.dataset import IterableDataset
 from typeguard import typechecked
 
+from espnet2.fileio.packed_shard import iter_packed_shard, load_shard_manifest
 from espnet2.train.dataset import ESPnetDataset
 
 
@@ -363,3 +364,167 @@ class SplicedIterableESPnetDataset(IterableDataset):
         data[key] = np.ones(spk_conf["length"]).astype(np.int32)
 
         return data
+
+
+class ShardedIterableESPnetDataset(IterableDataset):
+    """Iterable dataset reading the tar shards packed by `pack_shards.py`.
+
+    The shards are read sequentially, so each DataLoader worker opens one file
+    per shard instead of one per utterance. At each epoch, the order of
+    the shards is shuffled and the shards are split among the ranks and then
+    among the DataLoader workers. The utterances are shuffled within a bounded
+    buffer, i.e. the randomness is shard-level plus `shuffle_buffer_size`.
+
+    All the entries of path_name_type_list must be of type "shard" and point to
+    the same shards.json (or its directory). The name selects the data in
+    the shards.
+
+    Examples:
+        >>> dataset = ShardedIterableESPnetDataset(
+        ...     [('dump/shards/train', 'speech', 'shard'),
+        ...      ('dump/shards/train', 'text', 'shard')],
+        ...     shuffle=True,
+        ... )
+        >>> dataset.set_epoch(1)
+        >>> for uid, data in dataset:
+        ...     data
+        {'speech': per_utt_array, 'text': per_utt_array}
+    """
+
+    @typechecked
+    def __init__(
+        self,
+        path_name_type_list: Collection[Tuple[str, str, str]],
+        preprocess: Optional[
+            Callable[[str, Dict[str, np.ndarray]], Dict[str, np.ndarray]]
+        ] = None,
+        float_dtype: str = "float32",
+        int_dtype: str = "long",
+        shuffle: bool = False,
+        shuffle_buffer_size: int = 1000,
+        seed: int = 0,
+        rank: int = 0,
+        world_size: int = 1,
+    ):
+        if len(path_name_type_list) == 0:
+            raise ValueError(
+                '1 or more elements are required for "path_name_type_list"'
+            )
+        paths = {path for path, _, _ in path_name_type_list}
+        if len(paths) != 1:
+            raise RuntimeError(f"All the data must be in the same shards: {paths}")
+        for path, name, _type in path_name_type_list:
+            if _type != "shard":
+                raise RuntimeError(f"Not supported: type={_type} ({path},{name})")
+
+        self.path = paths.pop()
+        self.manifest = load_shard_manifest(self.path)
+        self.debug_info = {
+            name: (path, _type) for path, name, _type in path_name_type_list
+        }
+        for name in self.debug_info:
+            if name not in self.manifest["names"]:
+                raise RuntimeError(f'"{name}" is not in the shards: {self.path}')
+
+        self.preprocess = preprocess
+        self.float_dtype = float_dtype
+        self.int_dtype = int_dtype
+        self.shuffle = shuffle
+        self.shuffle_buffer_size = shuffle_buffer_size
+        self.seed = seed
+        self.rank = rank
+        self.world_size = world_size
+        self.epoch = 0
+
+        # Keep same interface with IterableESPnetDataset
+        self.apply_utt2category = False
+
+    def set_epoch(self, epoch: int):
+        """Set the epoch to change the shuffling. Call before building DataLoader."""
+        self.epoch = epoch
+
+    def has_name(self, name) -> bool:
+        return name in self.debug_info
+
+    def names(self) -> Tuple[str, ...]:
+        return tuple(self.debug_info)
+
+    def __repr__(self):
+        _mes = self.__class__.__name__
+        _mes += "("
+        for name, (path, _type) in self.debug_info.items():
+            _mes += f'\n  {name}: {{"path": "{path}", "type": "{_type}"}}'
+        _mes += f"\n  num_shards: {len(self.manifest['shards'])}"
+        _mes += f"\n  num_utts: {self.manifest['num_utts']}"
+        _mes += f"\n  shuffle_buffer_size: {self.shuffle_buffer_size}"
+        _mes += f"\n  preprocess: {self.preprocess})"
+        return _mes
+
+    def _shards(self) -> List[str]:
+        shards = [shard["path"] for shard in self.manifest["shards"]]
+        if self.shuffle:
+            # The same order for all the ranks and workers
+            order = np.random.RandomState(self.seed + self.epoch).permutation(
+                len(shards)
+            )
+            shards = [shards[i] for i in order]
+
+        shards = shards[self.rank :: self.world_size]
+        worker_info = torch.utils.data.get_worker_info()
+        if worker_info is not None:
+            shards = shards[worker_info.id :: worker_info.num_workers]
+        return shards
+
+    def _iter_samples(self) -> Iterator[Tuple[str, Dict[str, np.ndarray]]]:
+        names = set(self.debug_info)
+        for shard in self._shards():
+            yield from iter_packed_shard(shard, names=names)
+
+    def __iter__(self) -> Iterator[Tuple[str, Dict[str, np.ndarray]]]:
+        samples = self._iter_samples()
+        if self.shuffle and self.shuffle_buffer_size > 1:
+            worker_info = torch.utils.data.get_worker_info()
+            worker_id = 0 if worker_info is None else worker_info.id
+            rng = np.random.default_rng([self.seed, self.epoch, self.rank, worker_id])
+            buffer = []
+            for sample in samples:
+                if len(buffer) < self.shuffle_buffer_size:
+                    buffer.append(sample)
+                    continue
+                # Yield a random sample in the buffer and put the new one instead
+                i = rng.integers(len(buffer))
+                buffer[i], sample = sample, buffer[i]
+                yield self._process(*sample)
+            rng.shuffle(buffer)
+            for sample in buffer:
+                yield self._process(*sample)
+        else:
+            for sample in samples:
+                yield self._process(*sample)
+
+    def _process(
+        self, uid: str, data: Dict[str, Union[np.ndarray, str]]
+    ) -> Tuple[str, Dict[str, np.ndarray]]:
+        # [Option] Apply preprocessing
+        #   e.g. espnet2.train.preprocessor:CommonPreprocessor
+        if self.preprocess is not None:
+            data = self.preprocess(uid, data)
+
+        # Force data-precision
+        for name in data:
+            value = data[name]
+            if not isinstance(value, np.ndarray):
+                raise RuntimeError(
+                    f"All values must be converted to np.ndarray object "
+                    f'by preprocessing, but "{name}" is still {type(value)}.'
+                )
+
+            # Cast to desired type
+            if value.dtype.kind == "f":
+                value = value.astype(self.float_dtype)
+            elif value.dtype.kind == "i":
+                value = value.astype(self.int_dtype)
+            else:
+                raise NotImplementedError(f"Not supported dtype: {value.dtype}")
+            data[name] = value
+        return uid, data
@@ -109,14 +109,60 @@ class WeightedAverage(ReportedValue):
     weight: Num
 
 
+@dataclasses.dataclass(frozen=True)
+class DeferredValue(ReportedValue):
+    """The value kept on its device until SubReporter.flush().
+
+    Converted to Average or WeightedAverage when flushed.
+    """
+
+    value: Num
+    weight: Optional[Num] = None
+    weighted: bool = False
+
+
+def _is_weighted(r: ReportedValue) -> bool:
+    if isinstance(r, DeferredValue):
+        return r.weighted
+    elif isinstance(r, WeightedAverage):
+        return True
+    elif isinstance(r, Average):
+        return False
+    else:
+        raise NotImplementedError(f"type={type(r)}")
+
+
+def _detach_scalar(v: Num, name: str) -> Num:
+    if isinstance(v, (torch.Tensor, np.ndarray)):
+        if np.prod(v.shape) != 1:
+            raise ValueError(f"{name} must be 0 or 1 dimension: {len(v.shape)}")
+    if isinstance(v, torch.Tensor):
+        # Copy to avoid being changed by the following in-place operations
+        return v.detach().reshape(()).clone()
+    return v
+
+
 class SubReporter:
     """This class is used in Reporter.
 
     See the docstring of Reporter for the usage.
+
+    If deferred=True, the registered tensors are kept on their devices
+    without synchronization, and transferred to the host together
+    when the stats are required, i.e. log_message(), tensorboard_add_scalar(),
+    wandb_log() or Reporter.finish_epoch(), or when max_pending values are
+    accumulated. The reported values are same as the default mode.
     """
 
     @typechecked
-    def __init__(self, key: str, epoch: int, total_count: int):
+    def __init__(
+        self,
+        key: str,
+        epoch: int,
+        total_count: int,
+        deferred: bool = False,
+        max_pending: int = 2**16,
+    ):
         self.key = key
         self.epoch = epoch
         self.start_time = time.perf_counter()
@@ -125,6 +171,10 @@ class SubReporter:
         self.total_count = total_count
         self.count = 0
         self._seen_keys_in_the_step = set()
+        self.deferred = deferred
+        self.max_pending = max_pending
+        # The positions of DeferredValue: List[Tuple[key, index]]
+        self._pending = []
 
     def get_total_count(self) -> int:
         """Returns the number of iterations over all epochs."""
@@ -138,12 +188,10 @@ class SubReporter:
         for key, stats_list in self.stats.items():
             if key not in self._seen_keys_in_the_step:
                 # Fill nan value if the key is not registered in this step
-                if isinstance(stats_list[0], WeightedAverage):
+                if _is_weighted(stats_list[0]):
                     stats_list.append(to_reported_value(np.nan, 0))
-                elif isinstance(stats_list[0], Average):
-                    stats_list.append(to_reported_value(np.nan))
                 else:
-                    raise NotImplementedError(f"type={type(stats_list[0])}")
+                    stats_list.append(to_reported_value(np.nan))
 
             assert len(stats_list) == self.count, (len(stats_list), self.count)
 
@@ -169,7 +217,17 @@ class SubReporter:
                 raise RuntimeError(f"{key2} is registered twice.")
             if v is None:
                 v = np.nan
-            r = to_reported_value(v, weight)
+            if self.deferred and (
+                isinstance(v, torch.Tensor) or isinstance(weight, torch.Tensor)
+            ):
+                r = DeferredValue(
+                    _detach_scalar(v, "v"),
+                    None if weight is None else _detach_scalar(weight, "weight"),
+                    weight is not None,
+                )
+                self._pending.append((key2, self.count - 1))
+            else:
+                r = to_reported_value(v, weight)
 
             if key2 not in self.stats:
                 # If it's the first time to register the key,
@@ -186,6 +244,81 @@ class SubReporter:
                 self.stats[key2].append(r)
             self._seen_keys_in_the_step.add(key2)
 
+        if len(self._pending) >= self.max_pending:
+            self.flush()
+
+    def flush(self) -> None:
+        """Transfer the deferred values to the host.
+
+        The tensors are stacked for each device and dtype,
+        so that only one synchronization is needed for each of them.
+        """
+        if len(self._pending) == 0:
+            return
+
+        # Gather the tensors: Dict[Tuple[device, dtype], List[torch.Tensor]]
+        groups = defaultdict(list)
+        for key2, idx in self._pending:
+            r = self.stats[key2][idx]
+            for t in (r.value, r.weight):
+                if isinstance(t, torch.Tensor):
+                    groups[t.device, t.dtype].append(t)
+
+        values = {}
+        for tensors in groups.values():
+            for t, x in zip(tensors, torch.stack(tensors).tolist()):
+                values[id(t)] = x
+
+        for key2, idx in self._pending:
+            r = self.stats[key2][idx]
+            v, w = (
+                values[id(t)] if isinstance(t, torch.Tensor) else t
+                for t in (r.value, r.weight)
+            )
+            self.stats[key2][idx] = to_reported_value(v, w if r.weighted else None)
+        self._pending = []
+
+    def state_dict(self) -> dict:
+        """Return the stats of the steps so far to resume the epoch later.
+
+        The values of each key are packed into float64 tensors.
+        """
+        if len(self._seen_keys_in_the_step) != 0:
+            raise RuntimeError("state_dict() must be called after next()")
+        self.flush()
+        stats = {}
+        for key2, values in self.stats.items():
+            weighted = _is_weighted(values[0])
+            stats[key2] = {
+                "value": torch.tensor([v.value for v in values], dtype=torch.float64),
+                "weight": (
+                    torch.tensor([v.weight for v in values], dtype=torch.float64)
+                    if weighted
+                    else None
+                ),
+            }
+        return {
+            "stats": stats,
+            "count": self.count,
+            "total_count": self.total_count,
+            "elapsed": time.perf_counter() - self.start_time,
+        }
+
+    def load_state_dict(self, state_dict: dict):
+        self.stats = defaultdict(list)
+        for key2, d in state_dict["stats"].items():
+            if d["weight"] is None:
+                self.stats[key2] = [Average(v) for v in d["value"].tolist()]
+            else:
+                self.stats[key2] = [
+                    WeightedAverage(v, w)
+                    for v, w in zip(d["value"].tolist(), d["weight"].tolist())
+                ]
+        self.count = state_dict["count"]
+        self.total_count = state_dict["total_count"]
+        self.start_time = time.perf_counter() - state_dict["elapsed"]
+        self._pending = []
+
     def log_message(self, start: int = None, end: int = None) -> str:
         if self._finished:
             raise RuntimeError("Already finished")
@@ -199,6 +332,8 @@ class SubReporter:
         if self.count == 0 or start == end:
             return ""
 
+        self.flush()
+
         message = f"{self.epoch}epoch:{self.key}:" f"{start + 1}-{end}batch: "
 
         for idx, (key2, stats_list) in enumerate(self.stats.items()):
@@ -218,6 +353,7 @@ class SubReporter:
         return message
 
     def tensorboard_add_scalar(self, summary_writer, start: int = None):
+        self.flush()
         if start is None:
             start = 0
         if start < 0:
@@ -233,6 +369,7 @@ class SubReporter:
     def wandb_log(self, start: int = None):
         import wandb
 
+        self.flush()
         if start is None:
             start = 0
         if start < 0:
@@ -302,13 +439,17 @@ class Reporter:
         self.epoch = epoch
 
     @contextmanager
-    def observe(self, key: str, epoch: int = None) -> ContextManager[SubReporter]:
-        sub_reporter = self.start_epoch(key, epoch)
+    def observe(
+        self, key: str, epoch: int = None, deferred: bool = False
+    ) -> ContextManager[SubReporter]:
+        sub_reporter = self.start_epoch(key, epoch, deferred)
         yield sub_reporter
         # Receive the stats from sub_reporter
         self.finish_epoch(sub_reporter)
 
-    def start_epoch(self, key: str, epoch: int = None) -> SubReporter:
+    def start_epoch(
+        self, key: str, epoch: int = None, deferred: bool = False
+    ) -> SubReporter:
         if epoch is not None:
             if epoch < 0:
                 raise ValueError(f"epoch must be 0 or more: {epoch}")
@@ -326,7 +467,7 @@ class Reporter:
         else:
             total_count = self.stats[self.epoch - 1][key]["total_count"]
 
-        sub_reporter = SubReporter(key, self.epoch, total_count)
+        sub_reporter = SubReporter(key, self.epoch, total_count, deferred=deferred)
         # Clear the stats for the next epoch if it exists
         self.stats.pop(epoch, None)
         return sub_reporter
@@ -339,6 +480,7 @@ class Reporter:
             )
 
         # Calc mean of current stats and set it as previous epochs stats
+        sub_reporter.flush()
         stats = {}
         for key2, values in sub_reporter.stats.items():
             v = aggregate(values)
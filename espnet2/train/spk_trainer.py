@@ -20,6 +20,7 @@ from espnet2.train.distributed_utils import DistributedOption
 from espnet2.train.reporter import SubReporter
 from espnet2.train.trainer import Trainer, TrainerOptions
 from espnet2.utils.eer import ComputeErrorRates, ComputeMinDcf, tuneThresholdfromScore
+from espnet2.utils.trial_scoring import EmbeddingTable, score_trials
 
 if torch.distributed.is_available():
     from torch.distributed import ReduceOp
@@ -51,7 +52,7 @@ class SpkTrainer(Trainer):
 
         model.eval()
 
-        scores = []
+        trials = []
         labels = []
         spk_embd_dic = {}
         bs = 0
@@ -116,7 +117,7 @@ class SpkTrainer(Trainer):
         del utt_id_list
         del speech_list
 
-        # calculate similarity scores
+        # collect the trials
         for utt_id, batch in iterator:
             batch["spk_labels"] = to_device(
                 batch["spk_labels"], "cuda" if ngpu > 0 else "cpu"
@@ -127,11 +128,7 @@ class SpkTrainer(Trainer):
                 if iterator_stop > 0:
                     break
 
-            for _utt_id in utt_id:
-                _utt_id_1, _utt_id_2 = _utt_id.split("*")
-                score = torch.cdist(spk_embd_dic[_utt_id_1], spk_embd_dic[_utt_id_2])
-                score = -1.0 * torch.mean(score)
-                scores.append(score.view(1))  # 0-dim to 1-dim tensor for cat
+            trials.extend(_utt_id.split("*") for _utt_id in utt_id)
             labels.append(batch["spk_labels"])
 
         else:
@@ -140,7 +137,12 @@ class SpkTrainer(Trainer):
                 torch.distributed.all_reduce(iterator_stop, ReduceOp.SUM)
         torch.cuda.empty_cache()
 
-        scores = torch.cat(scores).type(torch.float32)
+        # calculate similarity scores of all trials at once
+        scores = score_trials(
+            EmbeddingTable.from_dict(spk_embd_dic, normalize=False),
+            [t[0] for t in trials],
+            [t[1] for t in trials],
+        ).to("cuda" if ngpu > 0 else "cpu")
         labels = torch.cat(labels).type(torch.int32).flatten()
 
         if distributed:
@@ -174,18 +176,15 @@ class SpkTrainer(Trainer):
 
         # calculate statistics in target and nontarget classes.
         n_trials = len(scores)
-        scores_trg = []
-        scores_nontrg = []
-        for _s, _l in zip(scores, labels):
-            if _l == 1:
-                scores_trg.append(_s)
-            elif _l == 0:
-                scores_nontrg.append(_s)
-            else:
-                raise ValueError(f"{_l}, {type(_l)}")
+        invalid = (labels != 1) & (labels != 0)
+        if invalid.any():
+            _l = labels[invalid][0]
+            raise ValueError(f"{_l}, {type(_l)}")
+        scores_trg = scores[labels == 1]
+        scores_nontrg = scores[labels == 0]
         trg_mean = float(np.mean(scores_trg))
         trg_std = float(np.std(scores_trg))
-        nontrg_mean = float(np.std(scores_nontrg))
+        nontrg_mean = float(np.mean(scores_nontrg))
         nontrg_std = float(np.std(scores_nontrg))
 
         # exception for collect_stats.
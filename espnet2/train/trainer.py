@@ -1,13 +1,18 @@
 """Trainer module."""
 
 import argparse
+import copy
 import dataclasses
+import inspect
+import itertools
 import logging
+import math
 import time
-from contextlib import contextmanager
+from contextlib import ExitStack, contextmanager
 from dataclasses import is_dataclass
+from functools import partial
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
 import humanfriendly
 import numpy as np
@@ -18,6 +23,7 @@ from packaging.version import parse as V
 from typeguard import typechecked
 
 from espnet2.iterators.abs_iter_factory import AbsIterFactory
+from espnet2.iterators.chunk_iter_factory import ChunkIterator
 from espnet2.main_funcs.average_nbest_models import average_nbest_models
 from espnet2.main_funcs.calculate_all_attentions import calculate_all_attentions
 from espnet2.schedulers.abs_scheduler import (
@@ -27,14 +33,29 @@ from espnet2.schedulers.abs_scheduler import (
     AbsValEpochStepScheduler,
 )
 from espnet2.torch_utils.add_gradient_noise import add_gradient_noise
+from espnet2.torch_utils.clip_grad_norm import clip_grad_norm
 from espnet2.torch_utils.device_funcs import to_device
-from espnet2.torch_utils.recursive_op import recursive_average
-from espnet2.torch_utils.set_all_random_seed import set_all_random_seed
+from espnet2.torch_utils.recursive_op import (
+    coalesced_all_reduce,
+    recursive_average_coalesced,
+    recursive_sum,
+)
+from espnet2.torch_utils.set_all_random_seed import (
+    get_all_random_state,
+    set_all_random_seed,
+    set_all_random_state,
+)
 from espnet2.train.abs_espnet_model import AbsESPnetModel
-from espnet2.train.distributed_utils import DistributedOption
+from espnet2.train.checkpoint_writer import CheckpointWriter
+from espnet2.train.distributed_utils import (
+    DistributedOption,
+    LookaheadIterable,
+    get_min_num_iters,
+)
 from espnet2.train.reporter import Reporter, SubReporter
 from espnet2.utils.build_dataclass import build_dataclass
 from espnet2.utils.kwargs2args import kwargs2args
+from espnet2.utils.shared_array_cache import SharedArrayCache
 
 if torch.distributed.is_available():
     from torch.distributed import ReduceOp
@@ -104,6 +125,10 @@ class TrainerOptions:
     unused_parameters: bool
     wandb_model_log_interval: int
     create_graph_in_tensorboard: bool
+    deferred_report: bool
+    reduce_stats_at_log_interval: bool
+    checkpoint_interval: int
+    async_checkpoint: bool
 
 
 class Trainer:
@@ -153,7 +178,13 @@ class Trainer:
         scaler: Optional[GradScaler],
         ngpu: int = 0,
         strict: bool = True,
-    ):
+    ) -> Optional[dict]:
+        """Load the checkpoint.
+
+        Returns:
+            The progress of the training epoch if the checkpoint was saved
+            in the middle of the epoch, otherwise None.
+        """
         states = torch.load(
             checkpoint,
             map_location=f"cuda:{torch.cuda.current_device()}" if ngpu > 0 else "cpu",
@@ -172,6 +203,111 @@ class Trainer:
                 scaler.load_state_dict(states["scaler"])
 
         logging.info(f"The training was resumed using {checkpoint}")
+        return states.get("train_progress")
+
+    @staticmethod
+    def get_model_state_dict(
+        model: torch.nn.Module,
+        use_adapter: bool = False,
+        adapter: Optional[str] = None,
+        save_strategy: str = "all",
+    ) -> Dict[str, torch.Tensor]:
+        """Return the model parameters to be saved according to save_strategy."""
+        model_state_dict = model.state_dict()
+        if use_adapter:
+            if save_strategy == "all":
+                model_state_dict = model_state_dict
+            elif save_strategy == "adapter_only":
+                if adapter == "lora":
+                    model_state_dict = lora.lora_state_dict(model)
+                elif adapter == "houlsby":
+                    model_state_dict = {
+                        k: v for k, v in model_state_dict.items() if "adapter" in k
+                    }
+                else:
+                    raise ValueError(f"Adapter type {adapter} not supported")
+            else:  # save_strategy == "required_grad_only"
+                for n, p in model.named_parameters():
+                    if not p.requires_grad:
+                        model_state_dict.pop(n)
+        return model_state_dict
+
+    @classmethod
+    def save_train_progress(
+        cls,
+        checkpoint: Path,
+        iiter: int,
+        iterator: Iterable,
+        start_iter: int,
+        model: torch.nn.Module,
+        reporter: Reporter,
+        sub_reporter: SubReporter,
+        optimizers: Sequence[torch.optim.Optimizer],
+        schedulers: Sequence[Optional[AbsScheduler]],
+        scaler: Optional[GradScaler],
+        trainer_options: TrainerOptions,
+        distributed_option: DistributedOption,
+        checkpoint_writer: Optional[CheckpointWriter] = None,
+    ) -> None:
+        """Save the checkpoint in the middle of the training epoch.
+
+        In addition to the states saved at the end of epoch,
+        "train_progress" keeps the position of the iterator and the random states
+        of all processes, and the stats of the steps so far,
+        so that the epoch can be resumed at the next mini-batch.
+
+        Args:
+            checkpoint: The path of the checkpoint.
+            iiter: The number of the mini-batches taken from the iterator.
+            iterator: The iterator given by the iter-factory.
+            start_iter: The number of the mini-batches skipped when resuming.
+            checkpoint_writer: If given, the checkpoint is written by it.
+        """
+        num_iters = start_iter + iiter
+        if isinstance(iterator, ChunkIterator):
+            iter_kwargs = {"state": iterator.state_dict(num_iters)}
+        else:
+            iter_kwargs = {"start_iter": num_iters}
+        rank_state = {"random_state": get_all_random_state(), "iterator": iter_kwargs}
+
+        if trainer_options.sharded_ddp:
+            for optimizer in optimizers:
+                if isinstance(optimizer, fairscale.optim.oss.OSS):
+                    optimizer.consolidate_state_dict()
+        if distributed_option.distributed:
+            rank_states = [None] * torch.distributed.get_world_size()
+            torch.distributed.all_gather_object(rank_states, rank_state)
+            if torch.distributed.get_rank() != 0:
+                return
+        else:
+            rank_states = [rank_state]
+
+        epoch = reporter.get_epoch()
+        states = {
+            "model": cls.get_model_state_dict(
+                model,
+                getattr(trainer_options, "use_adapter", False),
+                getattr(trainer_options, "adapter", None),
+                getattr(trainer_options, "save_strategy", "all"),
+            ),
+            # The current epoch is not finished yet
+            "reporter": dict(reporter.state_dict(), epoch=epoch - 1),
+            "optimizers": [o.state_dict() for o in optimizers],
+            "schedulers": [
+                s.state_dict() if s is not None else None for s in schedulers
+            ],
+            "scaler": scaler.state_dict() if scaler is not None else None,
+            "train_progress": {
+                "epoch": epoch,
+                "num_iters": num_iters,
+                "sub_reporter": sub_reporter.state_dict(),
+                "rank_states": rank_states,
+            },
+        }
+        if checkpoint_writer is None:
+            checkpoint_writer = CheckpointWriter(asynchronous=False)
+        checkpoint_writer.save({checkpoint: states})
+        logging.info(f"Saved {checkpoint} at {num_iters} iterations of {epoch}epoch")
 
     @classmethod
     @typechecked
@@ -201,6 +337,9 @@ class Trainer:
 
         output_dir = Path(trainer_options.output_dir)
         reporter = Reporter()
+        checkpoint_writer = CheckpointWriter(
+            asynchronous=trainer_options.async_checkpoint
+        )
         if trainer_options.use_amp:
             if V(torch.__version__) < V("1.6.0"):
                 raise RuntimeError(
@@ -228,8 +367,9 @@ class Trainer:
                 print("Please install S3PRL: cd ${MAIN_ROOT}/tools && make s3prl.done")
                 raise RuntimeError("Requiring S3PRL. ")
 
+        train_progress = None
         if trainer_options.resume and (output_dir / "checkpoint.pth").exists():
-            cls.resume(
+            train_progress = cls.resume(
                 checkpoint=output_dir / "checkpoint.pth",
                 model=model,
                 optimizers=optimizers,
@@ -241,6 +381,41 @@ class Trainer:
             )
 
         start_epoch = reporter.get_epoch() + 1
+        if train_progress is not None:
+            world_size = (
+                torch.distributed.get_world_size()
+                if distributed_option.distributed
+                else 1
+            )
+            if len(train_progress["rank_states"]) != world_size:
+                logging.warning(
+                    "The number of processes is changed from "
+                    f"{len(train_progress['rank_states'])} to {world_size}. "
+                    f"The {start_epoch}epoch is started from the beginning"
+                )
+                train_progress = None
+
+        checkpoint_interval = trainer_options.checkpoint_interval
+        if checkpoint_interval > 0:
+            if "checkpoint_fn" not in inspect.signature(cls.train_one_epoch).parameters:
+                logging.warning(
+                    f"{cls.__name__} doesn't support --checkpoint_interval. "
+                    "The checkpoint is saved only at the end of each epoch"
+                )
+                checkpoint_interval = 0
+            elif not {"start_iter", "state"} & set(
+                inspect.signature(train_iter_factory.build_iter).parameters
+            ):
+                logging.warning(
+                    f"{type(train_iter_factory).__name__} can't be resumed from "
+                    "the middle of epoch. "
+                    "The checkpoint is saved only at the end of each epoch"
+                )
+                checkpoint_interval = 0
+        # NOTE: ChunkIterator takes its state after each mini-batch only if asked
+        keep_state = checkpoint_interval > 0 and (
+            "keep_state" in inspect.signature(train_iter_factory.build_iter).parameters
+        )
         if start_epoch == trainer_options.max_epoch + 1:
             logging.warning(
                 f"The training has already reached at max_epoch: {start_epoch}"
@@ -313,20 +488,61 @@ class Trainer:
 
             reporter.set_epoch(iepoch)
             # 1. Train and validation for one-epoch
-            with reporter.observe("train") as sub_reporter:
+            with reporter.observe(
+                "train", deferred=trainer_options.deferred_report
+            ) as sub_reporter:
+                start_iter, iter_kwargs = 0, {}
+                if train_progress is not None:
+                    # Resume the epoch from the middle
+                    rank_state = train_progress["rank_states"][
+                        (
+                            torch.distributed.get_rank()
+                            if distributed_option.distributed
+                            else 0
+                        )
+                    ]
+                    set_all_random_state(rank_state["random_state"])
+                    start_iter = train_progress["num_iters"]
+                    iter_kwargs = rank_state["iterator"]
+                    sub_reporter.load_state_dict(train_progress["sub_reporter"])
+                    logging.info(f"Resumed {iepoch}epoch from {start_iter} iterations")
+                    train_progress = None
+                if keep_state:
+                    iter_kwargs = dict(iter_kwargs, keep_state=True)
+                iterator = train_iter_factory.build_iter(iepoch, **iter_kwargs)
+
+                kwargs = {}
+                if checkpoint_interval > 0:
+                    kwargs["checkpoint_fn"] = partial(
+                        cls.save_train_progress,
+                        output_dir / "checkpoint.pth",
+                        start_iter=start_iter,
+                        model=model,
+                        reporter=reporter,
+                        sub_reporter=sub_reporter,
+                        optimizers=optimizers,
+                        schedulers=schedulers,
+                        scaler=scaler,
+                        trainer_options=trainer_options,
+                        distributed_option=distributed_option,
+                        checkpoint_writer=checkpoint_writer,
+                    )
                 all_steps_are_invalid = cls.train_one_epoch(
                     model=dp_model,
                     optimizers=optimizers,
                     schedulers=schedulers,
-                    iterator=train_iter_factory.build_iter(iepoch),
+                    iterator=iterator,
                     reporter=sub_reporter,
                     scaler=scaler,
                     summary_writer=train_summary_writer,
                     options=trainer_options,
                     distributed_option=distributed_option,
+                    **kwargs,
                 )
 
-            with reporter.observe("valid") as sub_reporter:
+            with reporter.observe(
+                "valid", deferred=trainer_options.deferred_report
+            ) as sub_reporter:
                 cls.validate_one_epoch(
                     model=dp_model,
                     iterator=valid_iter_factory.build_iter(iepoch),
@@ -372,48 +588,30 @@ class Trainer:
                     reporter.wandb_log()
 
                 # 4. Save/Update the checkpoint
-                model_state_dict = model.state_dict()
-                if use_adapter:
-                    if save_strategy == "all":
-                        model_state_dict = model_state_dict
-                    elif save_strategy == "adapter_only":
-                        if adapter == "lora":
-                            model_state_dict = lora.lora_state_dict(model)
-                        elif adapter == "houlsby":
-                            model_state_dict = {
-                                k: v
-                                for k, v in model_state_dict.items()
-                                if "adapter" in k
-                            }
-                        else:
-                            raise ValueError(f"Adapter type {adapter} not supported")
-                    else:  # save_strategy == "required_grad_only"
-                        for n, p in model.named_parameters():
-                            if not p.requires_grad:
-                                model_state_dict.pop(n)
-
-                torch.save(
-                    {
-                        "model": model_state_dict,
-                        "reporter": reporter.state_dict(),
-                        "optimizers": [o.state_dict() for o in optimizers],
-                        "schedulers": [
-                            s.state_dict() if s is not None else None
-                            for s in schedulers
-                        ],
-                        "scaler": scaler.state_dict() if scaler is not None else None,
-                    },
-                    output_dir / "checkpoint.pth",
+                model_state_dict = cls.get_model_state_dict(
+                    model, use_adapter, adapter, save_strategy
                 )
 
                 # 5. Save and log the model and update the link to the best model
-                torch.save(model_state_dict, output_dir / f"{iepoch}epoch.pth")
-
-                # Creates a sym link latest.pth -> {iepoch}epoch.pth
-                p = output_dir / "latest.pth"
-                if p.is_symlink() or p.exists():
-                    p.unlink()
-                p.symlink_to(f"{iepoch}epoch.pth")
+                # NOTE: The files are written in background if async_checkpoint
+                checkpoint_writer.save(
+                    {
+                        output_dir
+                        / "checkpoint.pth": {
+                            "model": model_state_dict,
+                            "reporter": reporter.state_dict(),
+                            "optimizers": [o.state_dict() for o in optimizers],
+                            "schedulers": [
+                                s.state_dict() if s is not None else None
+                                for s in schedulers
+                            ],
+                            "scaler": (
+                                scaler.state_dict() if scaler is not None else None
+                            ),
+                        },
+                        output_dir / f"{iepoch}epoch.pth": model_state_dict,
+                    }
+                )
 
                 _improved = []
                 for _phase, k, _mode in trainer_options.best_model_criterion:
@@ -422,11 +620,16 @@ class Trainer:
                         best_epoch = reporter.get_best_epoch(_phase, k, _mode)
                         # Creates sym links if it's the best result
                         if best_epoch == iepoch:
-                            p = output_dir / f"{_phase}.{k}.best.pth"
-                            if p.is_symlink() or p.exists():
-                                p.unlink()
-                            p.symlink_to(f"{iepoch}epoch.pth")
                             _improved.append(f"{_phase}.{k}")
+
+                # Creates sym links latest.pth and {_phase}.{k}.best.pth
+                # -> {iepoch}epoch.pth after the file is written
+                checkpoint_writer.submit(
+                    _update_symlinks,
+                    [output_dir / "latest.pth"]
+                    + [output_dir / f"{name}.best.pth" for name in _improved],
+                    f"{iepoch}epoch.pth",
+                )
                 if len(_improved) == 0:
                     logging.info("There are no improvements in this epoch")
                 else:
@@ -441,6 +644,8 @@ class Trainer:
                 if log_model and trainer_options.use_wandb:
                     import wandb
 
+                    checkpoint_writer.wait()
+
                     logging.info("Logging Model on this epoch :::::")
                     artifact = wandb.Artifact(
                         name=f"model_{wandb.run.id}",
@@ -455,7 +660,6 @@ class Trainer:
                     wandb.log_artifact(artifact, aliases=aliases)
 
                 # 6. Remove the model files excluding n-best epoch and latest epoch
-                _removed = []
                 # Get the union set of the n-best among multiple criterion
                 nbests = set().union(
                     *[
@@ -470,21 +674,25 @@ class Trainer:
                     trainer_options.nbest_averaging_interval > 0
                     and iepoch % trainer_options.nbest_averaging_interval == 0
                 ):
-                    average_nbest_models(
-                        reporter=reporter,
+                    # After the model files are written
+                    checkpoint_writer.submit(
+                        average_nbest_models,
+                        reporter=copy.deepcopy(reporter),
                         output_dir=output_dir,
                         best_model_criterion=trainer_options.best_model_criterion,
                         nbest=keep_nbest_models,
                         suffix=f"till{iepoch}epoch",
                     )
 
-                for e in range(1, iepoch):
-                    p = output_dir / f"{e}epoch.pth"
-                    if p.exists() and e not in nbests:
-                        p.unlink()
-                        _removed.append(str(p))
-                if len(_removed) != 0:
-                    logging.info("The model files were removed: " + ", ".join(_removed))
+                # After the queued averaging reads the files
+                checkpoint_writer.submit(
+                    _remove_model_files,
+                    [
+                        output_dir / f"{e}epoch.pth"
+                        for e in range(1, iepoch)
+                        if e not in nbests
+                    ],
+                )
 
             # 7. If any updating haven't happened, stops the training
             if all_steps_are_invalid:
@@ -506,6 +714,7 @@ class Trainer:
                 f"The training was finished at {trainer_options.max_epoch} epochs "
             )
 
+        checkpoint_writer.wait()
         # Generated n-best averaged model
         if not distributed_option.distributed or distributed_option.dist_rank == 0:
             average_nbest_models(
@@ -528,8 +737,15 @@ class Trainer:
         summary_writer,
         options: TrainerOptions,
         distributed_option: DistributedOption,
+        checkpoint_fn: Optional[Callable] = None,
     ) -> bool:
+        """Train the model for one epoch.
 
+        Args:
+            checkpoint_fn: Called with the number of mini-batches and the given
+                iterator every options.checkpoint_interval optimizer steps
+                to save the checkpoint in the middle of the epoch.
+        """
         grad_noise = options.grad_noise
         accum_grad = options.accum_grad
         grad_clip = options.grad_clip
@@ -540,6 +756,14 @@ class Trainer:
         use_wandb = options.use_wandb
         create_graph_in_tensorboard = options.create_graph_in_tensorboard
         distributed = distributed_option.distributed
+        checkpoint_interval = (
+            accum_grad * options.checkpoint_interval if checkpoint_fn else 0
+        )
+        # Reduce the stats over the processes only at log_interval,
+        # while the weight is reduced in each step to normalize the loss.
+        reduce_stats_at_log_interval = (
+            options.reduce_stats_at_log_interval and distributed
+        )
 
         if log_interval is None:
             try:
@@ -549,9 +773,26 @@ class Trainer:
 
         model.train()
         all_steps_are_invalid = True
+        # The sample cache shared with the DataLoader workers, if any
+        dataset_cache = getattr(getattr(iterator, "dataset", None), "cache", None)
+        if not isinstance(dataset_cache, SharedArrayCache):
+            dataset_cache = None
+        checkpoint_iterator = iterator
+
         # [For distributed] Because iteration counts are not always equals between
-        # processes, send stop-flag to the other processes if iterator is finished
+        # processes, all processes stop at the minimum count if the lengths are
+        # known, otherwise the stop-flag is sent together with the stats
+        # if the iterator of any process reaches the last batch.
         iterator_stop = torch.tensor(0).to("cuda" if ngpu > 0 else "cpu")
+        num_iters, lookahead = None, None
+        if distributed:
+            num_iters = get_min_num_iters(iterator, iterator_stop.device)
+            if num_iters is not None:
+                iterator = itertools.islice(iterator, num_iters)
+            else:
+                iterator = lookahead = LookaheadIterable(iterator)
+        # The local weighted sums of stats: Dict[str, Tuple[sum, weight]]
+        stats_sums = {}
 
         start_time = time.perf_counter()
         for iiter, (utt_id, batch) in enumerate(
@@ -559,17 +800,27 @@ class Trainer:
         ):
             assert isinstance(batch, dict), type(batch)
 
-            if distributed:
-                torch.distributed.all_reduce(iterator_stop, ReduceOp.SUM)
-                if iterator_stop > 0:
-                    break
+            if lookahead is not None:
+                if iiter == 1:
+                    # Stop if the iterator of any process is empty
+                    torch.distributed.all_reduce(iterator_stop, ReduceOp.SUM)
+                    if iterator_stop > 0:
+                        break
+                iterator_stop.fill_(int(lookahead.is_last))
 
             batch["utt_id"] = utt_id
 
             batch = to_device(batch, "cuda" if ngpu > 0 else "cpu")
             if no_forward_run:
                 all_steps_are_invalid = False
+                if lookahead is not None:
+                    torch.distributed.all_reduce(iterator_stop, ReduceOp.SUM)
+                    if iterator_stop > 0:
+                        break
                 continue
+            save_checkpoint = (
+                checkpoint_interval > 0 and iiter % checkpoint_interval == 0
+            )
 
             if (
                 create_graph_in_tensorboard
@@ -606,6 +857,12 @@ class Trainer:
                         )
                 del _model
 
+            # DistributedDataParallel doesn't need to all-reduce the gradients
+            # except the last micro-batch of the gradient accumulation
+            sync_context = ExitStack()
+            if iiter % accum_grad != 0 and hasattr(model, "no_sync"):
+                sync_context.enter_context(model.no_sync())
+
             with autocast(
                 scaler is not None,
                 **autocast_args,
@@ -653,8 +910,26 @@ class Trainer:
                     # Apply weighted averaging for loss and stats
                     loss = (loss * weight.type(loss.dtype)).sum()
 
+                    if reduce_stats_at_log_interval:
+                        local_weight = weight.sum()
+                        for k, v in recursive_sum(stats, weight).items():
+                            # Exclude nan values as recursive_average()
+                            valid = ~torch.isnan(v)
+                            s, w = stats_sums.get(k, (0, 0))
+                            stats_sums[k] = (
+                                s + torch.where(valid, v, torch.zeros_like(v)),
+                                w
+                                + torch.where(
+                                    valid, local_weight, torch.zeros_like(local_weight)
+                                ),
+                            )
+                        stats = {}
+
                     # if distributed, this method can also apply all_reduce()
-                    stats, weight = recursive_average(stats, weight, distributed)
+                    # for all stats, the weight and the stop-flag at once
+                    stats, weight, (iterator_stop,) = recursive_average_coalesced(
+                        stats, weight, distributed, [iterator_stop]
+                    )
 
                     # Now weight is summation over all workers
                     loss /= weight
@@ -665,7 +940,25 @@ class Trainer:
 
                 loss /= accum_grad
 
-            reporter.register(stats, weight)
+            if len(stats) > 0 or not reduce_stats_at_log_interval:
+                reporter.register(stats, weight)
+            if len(stats_sums) > 0 and (
+                iiter % log_interval == 0
+                or iiter == num_iters
+                or save_checkpoint
+                or (lookahead is not None and iterator_stop > 0)
+            ):
+                # The stats accumulated from the last log_interval,
+                # weighted by the summation of the weights of the steps
+                keys = list(stats_sums)
+                reduced = coalesced_all_reduce(
+                    [stats_sums[k][0] for k in keys] + [stats_sums[k][1] for k in keys]
+                )
+                for k, s, w in zip(keys, reduced[: len(keys)], reduced[len(keys) :]):
+                    reporter.register({k: s / w}, w)
+                stats_sums = {}
+            if dataset_cache is not None:
+                reporter.register(dataset_cache.report_stats())
 
             with reporter.measure_time("backward_time"):
                 if scaler is not None:
@@ -678,6 +971,7 @@ class Trainer:
                 else:
                     loss.backward()
             del loss
+            sync_context.close()
 
             if iiter % accum_grad == 0:
                 if scaler is not None:
@@ -697,15 +991,13 @@ class Trainer:
                         scale_factor=0.55,
                     )
 
-                # compute the gradient norm to check if it is normal or not
-                grad_norm = torch.nn.utils.clip_grad_norm_(
+                # compute the gradient norm to check if it is normal or not.
+                # If grad_clip is not positive or inf, the gradients are not clipped
+                grad_norm = clip_grad_norm(
                     model.parameters(),
                     max_norm=grad_clip,
                     norm_type=grad_clip_type,
                 )
-                # PyTorch<=1.4, clip_grad_norm_ returns float value
-                if not isinstance(grad_norm, torch.Tensor):
-                    grad_norm = torch.tensor(grad_norm)
 
                 if not torch.isfinite(grad_norm):
                     logging.warning(
@@ -730,7 +1022,7 @@ class Trainer:
                         {
                             "grad_norm": grad_norm,
                             "clip": torch.where(
-                                grad_norm > grad_clip,
+                                grad_norm > (grad_clip if grad_clip > 0 else math.inf),
                                 grad_norm.new_tensor(100),
                                 grad_norm.new_tensor(0),
                             ),
@@ -783,8 +1075,15 @@ class Trainer:
                 if use_wandb:
                     reporter.wandb_log()
 
+            if save_checkpoint:
+                checkpoint_fn(iiter, checkpoint_iterator)
+
+            if lookahead is not None and iterator_stop > 0:
+                break
+
         else:
-            if distributed:
+            if lookahead is not None:
+                # The iterator is empty: Notify the other processes
                 iterator_stop.fill_(1)
                 torch.distributed.all_reduce(iterator_stop, ReduceOp.SUM)
         return all_steps_are_invalid
@@ -807,19 +1106,36 @@ class Trainer:
         model.eval()
 
         # [For distributed] Because iteration counts are not always equals between
-        # processes, send stop-flag to the other processes if iterator is finished
+        # processes, all processes stop at the minimum count if the lengths are
+        # known, otherwise the stop-flag is sent together with the stats.
+        # See train_one_epoch()
         iterator_stop = torch.tensor(0).to("cuda" if ngpu > 0 else "cpu")
-        for utt_id, batch in iterator:
+        lookahead = None
+        if distributed:
+            num_iters = get_min_num_iters(iterator, iterator_stop.device)
+            if num_iters is not None:
+                iterator = itertools.islice(iterator, num_iters)
+            else:
+                iterator = lookahead = LookaheadIterable(iterator)
+
+        for iiter, (utt_id, batch) in enumerate(iterator, 1):
             assert isinstance(batch, dict), type(batch)
-            if distributed:
-                torch.distributed.all_reduce(iterator_stop, ReduceOp.SUM)
-                if iterator_stop > 0:
-                    break
+            if lookahead is not None:
+                if iiter == 1:
+                    # Stop if the iterator of any process is empty
+                    torch.distributed.all_reduce(iterator_stop, ReduceOp.SUM)
+                    if iterator_stop > 0:
+                        break
+                iterator_stop.fill_(int(lookahead.is_last))
 
             batch["utt_id"] = utt_id
 
             batch = to_device(batch, "cuda" if ngpu > 0 else "cpu")
             if no_forward_run:
+                if lookahead is not None:
+                    torch.distributed.all_reduce(iterator_stop, ReduceOp.SUM)
+                    if iterator_stop > 0:
+                        break
                 continue
 
             retval = model(**batch)
@@ -831,13 +1147,20 @@ class Trainer:
             if ngpu > 1 or distributed:
                 # Apply weighted averaging for stats.
                 # if distributed, this method can also apply all_reduce()
-                stats, weight = recursive_average(stats, weight, distributed)
+                # for all stats, the weight and the stop-flag at once
+                stats, weight, (iterator_stop,) = recursive_average_coalesced(
+                    stats, weight, distributed, [iterator_stop]
+                )
 
             reporter.register(stats, weight)
             reporter.next()
 
+            if lookahead is not None and iterator_stop > 0:
+                break
+
         else:
-            if distributed:
+            if lookahead is not None:
+                # The iterator is empty: Notify the other processes
                 iterator_stop.fill_(1)
                 torch.distributed.all_reduce(iterator_stop, ReduceOp.SUM)
 
@@ -926,3 +1249,20 @@ class Trainer:
 
                         wandb.log({f"attention plot/{k}_{id_}": wandb.Image(fig)})
             reporter.next()
+
+
+def _update_symlinks(paths: List[Path], target: str):
+    for p in paths:
+        if p.is_symlink() or p.exists():
+            p.unlink()
+        p.symlink_to(target)
+
+
+def _remove_model_files(paths: List[Path]):
+    _removed = []
+    for p in paths:
+        if p.exists():
+            p.unlink()
+            _removed.append(str(p))
+    if len(_removed) != 0:
+        logging.info("The model files were removed: " + ", ".join(_removed))
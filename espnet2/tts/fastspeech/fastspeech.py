@@ -442,7 +442,8 @@ class FastSpeech(AbsTTS):
         d_masks = make_pad_mask(ilens).to(xs.device)
         if is_inference:
             d_outs = self.duration_predictor.inference(hs, d_masks)  # (B, T_text)
-            hs = self.length_regulator(hs, d_outs, alpha)  # (B, T_feats, adim)
+            ds = self.length_regulator.scale_durations(d_outs, alpha, d_masks)
+            hs = self.length_regulator(hs, ds)  # (B, T_feats, adim)
         else:
             d_outs = self.duration_predictor(hs, d_masks)  # (B, T_text)
             hs = self.length_regulator(hs, ds)  # (B, T_feats, adim)
@@ -459,6 +460,9 @@ class FastSpeech(AbsTTS):
             else:
                 olens_in = olens
             h_masks = self._source_mask(olens_in)
+        elif is_inference:
+            # mask the frames padded by the length regulator in batch inference
+            h_masks = self._source_mask(ds.sum(dim=1))
         else:
             h_masks = None
         zs, _ = self.decoder(hs, h_masks)  # (B, T_feats, adim)
@@ -470,8 +474,12 @@ class FastSpeech(AbsTTS):
         if self.postnet is None:
             after_outs = before_outs
         else:
+            # fill the padded frames with zeros before each layer in inference
+            p_masks = None
+            if is_inference:
+                p_masks = ~h_masks.repeat_interleave(self.reduction_factor, dim=2)
             after_outs = before_outs + self.postnet(
-                before_outs.transpose(1, 2)
+                before_outs.transpose(1, 2), p_masks
             ).transpose(1, 2)
 
         return before_outs, after_outs, d_outs
@@ -646,6 +654,61 @@ class FastSpeech(AbsTTS):
 
         return dict(feat_gen=outs[0], duration=d_outs[0])
 
+    def batch_inference(
+        self,
+        text: torch.Tensor,
+        text_lengths: torch.Tensor,
+        spembs: Optional[torch.Tensor] = None,
+        sids: Optional[torch.Tensor] = None,
+        lids: Optional[torch.Tensor] = None,
+        alpha: float = 1.0,
+    ) -> Dict[str, torch.Tensor]:
+        """Generate the sequences of features given a padded batch of characters.
+
+        Args:
+            text (LongTensor): Batch of padded character ids (B, T_text).
+            text_lengths (LongTensor): Batch of lengths of each input (B,).
+            spembs (Optional[Tensor]): Batch of speaker embeddings (B, spk_embed_dim).
+            sids (Optional[Tensor]): Batch of speaker IDs (B, 1).
+            lids (Optional[Tensor]): Batch of language IDs (B, 1).
+            alpha (float): Alpha to control the speed.
+
+        Returns:
+            Dict[str, Tensor]: Output dict including the following items:
+                * feat_gen (Tensor): Padded output features (B, T_feats, odim).
+                * feat_gen_lengths (LongTensor): Lengths of the outputs (B,).
+                * duration (Tensor): Padded duration sequences (B, T_text + 1).
+                * duration_lengths (LongTensor): Lengths of the durations (B,).
+
+        """
+        # add eos at the last of each sequence
+        xs = F.pad(text, [0, 1], "constant", self.padding_idx)
+        for i, l in enumerate(text_lengths):
+            xs[i, l] = self.eos
+        ilens = text_lengths + 1
+
+        _, outs, d_outs = self._forward(
+            xs,
+            ilens,
+            spembs=spembs,
+            sids=sids,
+            lids=lids,
+            is_inference=True,
+            alpha=alpha,
+        )  # (B, T_feats, odim)
+        ds = self.length_regulator.scale_durations(
+            d_outs, alpha, make_pad_mask(ilens).to(xs.device)
+        )
+        olens = ds.sum(dim=1) * self.reduction_factor
+        outs = outs.masked_fill(make_pad_mask(olens, outs, 1), 0.0)
+
+        return dict(
+            feat_gen=outs,
+            feat_gen_lengths=olens,
+            duration=d_outs,
+            duration_lengths=ilens,
+        )
+
     def _integrate_with_spk_embed(
         self, hs: torch.Tensor, spembs: torch.Tensor
     ) -> torch.Tensor:
@@ -3,10 +3,11 @@
 
 """Wrapper class for the vocoder model trained with parallel_wavegan repo."""
 
+import inspect
 import logging
 import os
 from pathlib import Path
-from typing import Optional, Union
+from typing import List, Optional, Union
 
 import torch
 import yaml
@@ -58,3 +59,38 @@ class ParallelWaveGANPretrainedVocoder(torch.nn.Module):
             feats,
             normalize_before=self.normalize_before,
         ).view(-1)
+
+    @torch.no_grad()
+    def batch_forward(
+        self, feats: torch.Tensor, feats_lengths: torch.Tensor
+    ) -> List[torch.Tensor]:
+        """Generate waveforms of a padded batch with pretrained vocoder.
+
+        The generator runs once on the (B, #mels, T_feats) batch if its forward
+        takes only the features (e.g. HiFi-GAN and MelGAN). Otherwise, e.g.
+        ParallelWaveGAN with the noise input, each sequence is vocoded separately.
+
+        Args:
+            feats (Tensor): Padded feature tensor (B, T_feats, #mels).
+            feats_lengths (LongTensor): Feature lengths (B,).
+
+        Returns:
+            List[Tensor]: Generated waveform tensors (T_wav,) of each sequence.
+
+        """
+        params = inspect.signature(self.vocoder.forward).parameters.values()
+        n_required = sum(p.default is inspect.Parameter.empty for p in params)
+        if n_required != 1 or hasattr(self.vocoder, "pqmf"):
+            return [self(feat[:length]) for feat, length in zip(feats, feats_lengths)]
+
+        if self.normalize_before:
+            feats = (feats - self.vocoder.mean) / self.vocoder.scale
+        mask = torch.arange(feats.size(1), device=feats.device)[None]
+        mask = mask < feats_lengths.to(feats.device)[:, None]
+        feats = feats.masked_fill(~mask[..., None], 0.0)
+        wavs = self.vocoder(feats.transpose(1, 2)).view(feats.size(0), -1)
+        upsample_factor = wavs.size(1) // feats.size(1)
+        return [
+            wav[: int(length) * upsample_factor]
+            for wav, length in zip(wavs, feats_lengths)
+        ]
@@ -7,7 +7,7 @@
 
 import logging
 from functools import partial
-from typing import Optional
+from typing import List, Optional
 
 import librosa
 import numpy as np
@@ -191,3 +191,53 @@ class Spectrogram2Waveform(object):
             spc = self.logmel2linear(spc)
         wav = self.griffin_lim(spc)
         return torch.tensor(wav).to(device=device, dtype=dtype)
+
+    def batch_forward(
+        self, spcs: torch.Tensor, spcs_lengths: torch.Tensor
+    ) -> List[torch.Tensor]:
+        """Convert a padded batch of spectrograms to waveforms.
+
+        Griffin-Lim runs once on the (B, n_fft // 2 + 1, T_feats) batch, where the
+        padded frames have zero magnitude, and each waveform is trimmed by its
+        length in frames.
+
+        Args:
+            spcs: Padded log Mel filterbank (B, T_feats, n_mels)
+                or linear spectrogram (B, T_feats, n_fft // 2 + 1).
+            spcs_lengths: Lengths in frames (B,).
+
+        Returns:
+            List[Tensor]: Reconstructed waveforms (T_wav,) of each sequence.
+
+        """
+        lengths = [int(length) for length in spcs_lengths]
+        if V(librosa.__version__) < V("0.9.0") or min(lengths) < 2:
+            # multi-channel griffinlim is not available, or centering is disabled
+            return [self(spc[:length]) for spc, length in zip(spcs, lengths)]
+
+        device = spcs.device
+        dtype = spcs.dtype
+        spcs = spcs.cpu().numpy()
+        batch = np.zeros(
+            (len(lengths), self.params["n_fft"] // 2 + 1, max(lengths)),
+            dtype=np.float32,
+        )
+        for i, (spc, length) in enumerate(zip(spcs, lengths)):
+            spc = spc[:length]
+            if self.logmel2linear is not None:
+                spc = self.logmel2linear(spc)
+            batch[i, :, :length] = np.abs(spc.T)
+        wavs = librosa.griffinlim(
+            S=batch,
+            n_iter=self.params["n_iter"],
+            hop_length=self.params["n_shift"],
+            win_length=self.params["win_length"],
+            window=self.params["window"],
+            center=True,
+        )
+        return [
+            torch.tensor(wav[: (length - 1) * self.params["n_shift"]]).to(
+                device=device, dtype=dtype
+            )
+            for wav, length in zip(wavs, lengths)
+        ]
@@ -0,0 +1,220 @@
+"""Data-parallel runner for the inference entry points of espnet2/bin."""
+
+import argparse
+import heapq
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import torch.multiprocessing as mp
+from typeguard import typechecked
+
+
+def add_parallel_inference_arguments(parser: argparse.ArgumentParser):
+    """Add the options of run_inference() to the parser of an entry point."""
+    parser.add_argument(
+        "--num_procs",
+        type=int,
+        default=1,
+        help="The number of inference processes. The keys are split into "
+        "max(ngpu, num_procs) shards balanced by the utterance lengths, "
+        "and each process decodes a shard on the GPU (rank %% ngpu) if ngpu > 0. "
+        "The outputs are merged into output_dir in the order of the keys",
+    )
+
+
+@typechecked
+def run_inference(inference: Callable[..., None], kwargs: Dict[str, Any]):
+    """Run the inference function of an entry point on one or more processes.
+
+    Each worker process calls ``inference`` once with its own shard of the keys,
+    so the model is loaded once per worker and kept for the whole shard.
+    The shards are balanced by the lengths of the utterances: the utterances are
+    given to the least loaded worker in the descending order of their lengths.
+    The keys of a shard keep the order of the data files,
+    which the iterable dataset requires.
+
+    The worker i writes its outputs in output_dir/split{N}/output.{i}, and the
+    kaldi-style text files written by DatadirWriter are merged into output_dir
+    in the order of the keys. The other files, e.g. wav or npy files,
+    are left in the worker directories where the merged scp files point to.
+
+    Args:
+        inference: The inference function of an entry point, e.g.
+            espnet2.bin.asr_inference.inference.
+        kwargs: The keyword arguments of ``inference`` with
+            "num_procs" of add_parallel_inference_arguments().
+
+    """
+    kwargs = dict(kwargs)
+    num_procs = kwargs.pop("num_procs", 1)
+    ngpu = kwargs["ngpu"]
+    nworkers = max(ngpu, num_procs)
+    if nworkers <= 1:
+        inference(**kwargs)
+        return
+
+    keys, lengths = read_keys_and_lengths(
+        kwargs["data_path_and_name_and_type"], kwargs.get("key_file")
+    )
+    shards = split_keys(keys, lengths, nworkers)
+    nworkers = len(shards)
+
+    output_dir = Path(kwargs["output_dir"])
+    split_dir = output_dir / f"split{nworkers}"
+    split_dir.mkdir(parents=True, exist_ok=True)
+
+    if ngpu > 0:
+        visible_devices = os.environ.get("CUDA_VISIBLE_DEVICES")
+        if visible_devices is not None:
+            devices = visible_devices.split(",")[:ngpu]
+        else:
+            devices = [str(i) for i in range(ngpu)]
+
+    ctx = mp.get_context("spawn")
+    processes = []
+    worker_dirs = []
+    for rank, shard in enumerate(shards):
+        key_file = split_dir / f"keys.{rank}"
+        with key_file.open("w", encoding="utf-8") as f:
+            for key in shard:
+                f.write(f"{key}\n")
+        worker_dir = split_dir / f"output.{rank}"
+        worker_dirs.append(worker_dir)
+
+        worker_kwargs = dict(
+            kwargs,
+            output_dir=str(worker_dir),
+            key_file=str(key_file),
+            ngpu=min(ngpu, 1),
+        )
+        device = devices[rank % len(devices)] if ngpu > 0 else None
+        logging.info(f"Worker {rank}: {len(shard)} utterances (GPU: {device})")
+
+        p = ctx.Process(
+            target=_worker, args=(inference, worker_kwargs, device), daemon=False
+        )
+        p.start()
+        processes.append(p)
+
+    for p in processes:
+        p.join()
+    failed = [rank for rank, p in enumerate(processes) if p.exitcode != 0]
+    if len(failed) != 0:
+        raise RuntimeError(f"Inference failed in the workers {failed}")
+
+    merge_datadirs(worker_dirs, shards, output_dir, keys)
+
+
+def _worker(
+    inference: Callable[..., None], kwargs: Dict[str, Any], device: Optional[str]
+):
+    if device is not None:
+        os.environ["CUDA_VISIBLE_DEVICES"] = device
+    inference(**kwargs)
+
+
+@typechecked
+def read_keys_and_lengths(
+    data_path_and_name_and_type: Sequence[Tuple[str, str, str]],
+    key_file: Optional[str] = None,
+) -> Tuple[List[str], List[int]]:
+    """Read the keys and estimate the lengths of the utterances.
+
+    The length is the size of the file if the value of the first data file
+    is a file path, e.g. a wav file, else the length of the value, e.g. a text.
+
+    """
+    path = data_path_and_name_and_type[0][0]
+    values = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            sps = line.rstrip().split(maxsplit=1)
+            values[sps[0]] = sps[1] if len(sps) == 2 else ""
+
+    if key_file is not None:
+        with open(key_file, encoding="utf-8") as f:
+            keys = [line.rstrip().split(maxsplit=1)[0] for line in f]
+    else:
+        keys = list(values)
+
+    lengths = []
+    for key in keys:
+        value = values.get(key, "")
+        if os.path.isfile(value):
+            lengths.append(os.path.getsize(value))
+        else:
+            lengths.append(len(value))
+    return keys, lengths
+
+
+@typechecked
+def split_keys(
+    keys: Sequence[str], lengths: Sequence[int], nshards: int
+) -> List[List[str]]:
+    """Split the keys into shards balanced by the lengths.
+
+    The utterances are given to the shard with the smallest total length
+    in the descending order of their lengths.
+    The keys of each shard keep the order of ``keys``.
+
+    """
+    nshards = max(min(nshards, len(keys)), 1)
+    heap = [(0, i) for i in range(nshards)]
+    indices = [[] for _ in range(nshards)]
+    for idx in sorted(range(len(keys)), key=lambda i: lengths[i], reverse=True):
+        total, shard = heapq.heappop(heap)
+        indices[shard].append(idx)
+        # Count 1 per utterance to balance the numbers of the short ones too
+        heapq.heappush(heap, (total + lengths[idx] + 1, shard))
+    return [[keys[i] for i in sorted(idx)] for idx in indices]
+
+
+@typechecked
+def merge_datadirs(
+    worker_dirs: Sequence[Path],
+    shards: Sequence[Sequence[str]],
+    output_dir: Path,
+    keys: Sequence[str],
+):
+    """Merge the text files of DatadirWriter in the order of the keys.
+
+    A file is merged if all its lines start with a key of the shard.
+
+    """
+    order = {k: i for i, k in enumerate(keys)}
+    merged = {}
+    for worker_dir, shard in zip(worker_dirs, shards):
+        shard_keys = set(shard)
+        for path in sorted(worker_dir.rglob("*")):
+            if not path.is_file():
+                continue
+            lines = _read_keyed_lines(path, shard_keys)
+            if lines is not None:
+                merged.setdefault(path.relative_to(worker_dir), []).extend(lines)
+
+    for relpath, lines in merged.items():
+        # The sort is stable, so the lines of a key keep their order
+        lines.sort(key=lambda x: order[x[0]])
+        (output_dir / relpath).parent.mkdir(parents=True, exist_ok=True)
+        with (output_dir / relpath).open("w", encoding="utf-8") as f:
+            for _, line in lines:
+                f.write(line)
+
+
+def _read_keyed_lines(path: Path, keys: set) -> Optional[List[Tuple[str, str]]]:
+    keyed_lines = []
+    try:
+        with path.open(encoding="utf-8") as f:
+            # Stop at the first line without a key, e.g. in binary files
+            for line in f:
+                sps = line.split(maxsplit=1)
+                if len(sps) == 0 or sps[0] not in keys:
+                    return None
+                if not line.endswith("\n"):
+                    line += "\n"
+                keyed_lines.append((sps[0], line))
+    except UnicodeDecodeError:
+        return None
+    return keyed_lines if len(keyed_lines) != 0 else None
@@ -0,0 +1,366 @@
+import errno
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import struct
+import tempfile
+import weakref
+from contextlib import contextmanager
+from mmap import ACCESS_COPY, mmap
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # e.g. Windows
+    fcntl = None
+
+# Fields of the header of the index
+_SIZE, _ENTRIES, _HITS, _MISSES, _EVICTIONS, _CLOCK = range(6)
+_N_HEADER = 8
+# The data of each array is aligned to this number of bytes
+_ALIGN = 64
+_LENGTH = struct.Struct("<Q")
+
+
+def _digest(key: str) -> int:
+    d = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    # 0 means an empty way and the digest must fit in int64
+    return (int.from_bytes(d, "little") >> 1) or 1
+
+
+def _align(n: int) -> int:
+    return -(-n // _ALIGN) * _ALIGN
+
+
+def _cleanup(path: str, pid: int):
+    # Forked processes inherit the finalizer, but only the creator removes it
+    if os.getpid() == pid:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _pid_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Owned by another user
+        return True
+    return True
+
+
+def remove_stale_cache_dirs(root: Union[Path, str]):
+    """Remove the cache directories in root whose creator process has exited.
+
+    The directories are removed at the exit of the creator normally, but are
+    left e.g. if it is killed by SIGKILL.
+    """
+    for path in Path(root).glob("espnet_cache_*_*"):
+        pid = path.name[len("espnet_cache_") :].split("_")[0]
+        if path.is_dir() and pid.isdigit() and not _pid_exists(int(pid)):
+            logging.warning(f"Removing the stale cache directory: {path}")
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class SharedArrayCache:
+    """Cache of Dict[str, np.ndarray] shared by processes, e.g. DataLoader workers.
+
+    `SizedDict(shared=True)` keeps the values in a `multiprocessing.Manager`
+    process, so every access pickles the arrays through a socket and computing
+    its size walks all the objects. Instead, each entry is written once to its
+    own file in a memory-backed directory (/dev/shm), and a reader maps the file
+    and gets the arrays as copy-on-write views, i.e. without copying or
+    unpickling. The entries are registered in a set-associative table in
+    a memory-mapped file shared by all the processes, where the size (the sum of
+    ndarray.nbytes), the last access time and the hit/miss counters are kept,
+    so that lookups and the size accounting are O(1).
+
+    When the size exceeds `max_size`, the least recently used entry among
+    the set of the new entry and a few randomly sampled sets is evicted
+    (approximated LRU as in Redis). An evicted file is unlinked, but the arrays
+    returned before remain valid until they are released.
+
+    Examples:
+        >>> cache = SharedArrayCache(max_size=10 * 2**30)
+        >>> cache["uttid"] = {"speech": np.zeros(16000, dtype=np.float32)}
+        >>> cache.get("uttid")["speech"].shape
+        (16000,)
+        >>> cache.stats()
+        {'hits': 1, 'misses': 0, 'evictions': 0, 'size': 64000, 'entries': 1}
+    """
+
+    def __init__(
+        self,
+        max_size: Union[int, float],
+        max_entries: int = 2**20,
+        ways: int = 8,
+        n_samples: int = 4,
+        root: Union[Path, str, None] = None,
+    ):
+        """Initialize the cache.
+
+        Args:
+            max_size: The maximum total bytes of the cached arrays.
+            max_entries: The capacity of the index table.
+            ways: The number of entries of a set of the index table.
+            n_samples: The number of sets sampled to choose the evicted entry
+                in addition to the set of the new entry.
+            root: The directory to create the cache directory in. Defaults to
+                /dev/shm if it has max_size of free space, else the temporary
+                directory. The stale cache directories in it are removed.
+
+        Raises:
+            OSError: If the root directory doesn't have max_size of free space.
+        """
+        if root is not None:
+            roots = [root]
+        elif os.path.isdir("/dev/shm"):
+            roots = ["/dev/shm", tempfile.gettempdir()]
+        else:
+            roots = [tempfile.gettempdir()]
+        for root in roots:
+            os.makedirs(root, exist_ok=True)
+            remove_stale_cache_dirs(root)
+            # NOTE: An unlimited cache relies on put() failing gracefully
+            if math.isinf(max_size) or shutil.disk_usage(root).free >= max_size:
+                break
+        else:
+            roots = ", ".join(map(str, roots))
+            raise OSError(
+                errno.ENOSPC, f"No space for the cache of {max_size} bytes in {roots}"
+            )
+
+        self.max_size = max_size
+        self.ways = ways
+        self.n_sets = max(1, -(-max_entries // ways))
+        self.n_samples = n_samples
+        # The PID is used to find the stale directories
+        self.dir = tempfile.mkdtemp(prefix=f"espnet_cache_{os.getpid()}_", dir=root)
+        self._finalizer = weakref.finalize(self, _cleanup, self.dir, os.getpid())
+        self._write_failed = False
+
+        with open(os.path.join(self.dir, "index"), "wb") as f:
+            f.truncate(8 * (_N_HEADER + 3 * self.n_sets * self.ways))
+        self._open()
+        self._last_stats = self.stats()
+
+    def _open(self):
+        index = np.memmap(os.path.join(self.dir, "index"), dtype=np.int64, mode="r+")
+        self._header = index[:_N_HEADER]
+        # digests (0 means an empty way), nbytes and last access times
+        table = index[_N_HEADER:].reshape(3, self.n_sets, self.ways)
+        self._digests, self._nbytes, self._last_access = table
+        self._lock_file = open(os.path.join(self.dir, "lock"), "a+b")
+
+    def __getstate__(self):
+        # For the DataLoader workers started by "spawn"
+        state = self.__dict__.copy()
+        for k in ["_finalizer", "_header", "_digests", "_nbytes", "_last_access"]:
+            del state[k]
+        del state["_lock_file"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._finalizer = None
+        self._open()
+
+    @contextmanager
+    def _lock(self):
+        # POSIX record locks are held per process, so the lock file can be
+        # shared with forked processes
+        if fcntl is not None:
+            fcntl.lockf(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.lockf(self._lock_file, fcntl.LOCK_UN)
+
+    def _path(self, digest: int) -> str:
+        return os.path.join(self.dir, f"{digest:016x}")
+
+    def _find(self, digest: int):
+        s = digest % self.n_sets
+        ways = np.flatnonzero(self._digests[s] == digest)
+        return s, (int(ways[0]) if len(ways) > 0 else None)
+
+    def _touch(self, s: int, w: int):
+        self._header[_CLOCK] += 1
+        self._last_access[s, w] = self._header[_CLOCK]
+
+    @property
+    def size(self) -> int:
+        return int(self._header[_SIZE])
+
+    def __len__(self) -> int:
+        return int(self._header[_ENTRIES])
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(_digest(key))[1] is not None
+
+    def get(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        """Return the cached arrays, or None if not cached.
+
+        The arrays are writable copy-on-write views of the mapped entry,
+        so modifying them doesn't affect the other processes.
+        """
+        digest = _digest(key)
+        with self._lock():
+            s, w = self._find(digest)
+            if w is None:
+                self._header[_MISSES] += 1
+                return None
+            self._header[_HITS] += 1
+            self._touch(s, w)
+
+        try:
+            with open(self._path(digest), "rb") as f:
+                buf = mmap(f.fileno(), 0, access=ACCESS_COPY)
+        except FileNotFoundError:
+            # Evicted by another process in the meantime
+            return None
+        (length,) = _LENGTH.unpack_from(buf)
+        meta = json.loads(buf[_LENGTH.size : _LENGTH.size + length])
+        if meta["key"] != key:
+            # Collision of the digests
+            return None
+        return {
+            name: np.frombuffer(
+                buf, dtype=dtype, count=int(np.prod(shape)), offset=offset
+            ).reshape(shape)
+            for name, dtype, shape, offset in meta["arrays"]
+        }
+
+    def __getitem__(self, key: str) -> Dict[str, np.ndarray]:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Dict[str, np.ndarray]):
+        self.put(key, value)
+
+    def put(self, key: str, value: Dict[str, np.ndarray]) -> bool:
+        """Add the arrays, evicting old entries if needed.
+
+        Returns:
+            False if the arrays are larger than max_size or already cached,
+            or failed to be written, e.g. the file system is full.
+        """
+        nbytes = sum(v.nbytes for v in value.values())
+        digest = _digest(key)
+        if nbytes > self.max_size or self._find(digest)[1] is not None:
+            return False
+
+        # 1. Write the entry to a temporary file, out of the lock
+        value = {k: np.ascontiguousarray(v) for k, v in value.items()}
+        meta = {
+            "key": key,
+            "arrays": [[k, v.dtype.str, list(v.shape), 0] for k, v in value.items()],
+        }
+        # The offsets can't be determined before the length of the metadata
+        # is fixed, so reserve enough digits for them
+        offset = _align(
+            _LENGTH.size + len(json.dumps(meta).encode("utf-8")) + 20 * len(value)
+        )
+        for a, v in zip(meta["arrays"], value.values()):
+            a[3] = offset
+            offset += _align(v.nbytes)
+        meta_bytes = json.dumps(meta).encode("utf-8")
+
+        tmp_path = f"{self._path(digest)}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(_LENGTH.pack(len(meta_bytes)))
+                f.write(meta_bytes)
+                for a, v in zip(meta["arrays"], value.values()):
+                    f.seek(a[3])
+                    f.write(v.data)
+        except OSError as e:
+            if not self._write_failed:
+                # Warn once, e.g. the file system stays full
+                logging.warning(f"Failed to write to the cache in {self.dir}: {e}")
+                self._write_failed = True
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+        # 2. Register it
+        with self._lock():
+            s, w = self._find(digest)
+            if w is not None:
+                # Added by another process in the meantime
+                os.remove(tmp_path)
+                return False
+            self._evict(s, nbytes)
+            w = int(np.flatnonzero(self._digests[s] == 0)[0])
+            os.replace(tmp_path, self._path(digest))
+            self._digests[s, w] = digest
+            self._nbytes[s, w] = nbytes
+            self._touch(s, w)
+            self._header[_SIZE] += nbytes
+            self._header[_ENTRIES] += 1
+        return True
+
+    def _evict(self, s: int, nbytes: int):
+        # Make a free way in the set s and room for nbytes
+        while (self._digests[s] != 0).all() or self.size + nbytes > self.max_size:
+            if (self._digests[s] != 0).all():
+                sets = np.array([s])
+            else:
+                sets = np.array(
+                    [s] + [random.randrange(self.n_sets) for _ in range(self.n_samples)]
+                )
+            occupied = self._digests[sets] != 0
+            if not occupied.any():
+                # The sampled sets are empty: fall back to scanning all the sets
+                sets = np.flatnonzero((self._digests != 0).any(axis=1))
+                occupied = self._digests[sets] != 0
+            last_access = np.where(
+                occupied, self._last_access[sets], np.iinfo(np.int64).max
+            )
+            i, w = np.unravel_index(np.argmin(last_access), last_access.shape)
+            self._remove(int(sets[i]), int(w))
+
+    def _remove(self, s: int, w: int):
+        try:
+            os.remove(self._path(int(self._digests[s, w])))
+        except FileNotFoundError:
+            pass
+        self._header[_SIZE] -= self._nbytes[s, w]
+        self._header[_ENTRIES] -= 1
+        self._header[_EVICTIONS] += 1
+        self._digests[s, w] = 0
+        self._nbytes[s, w] = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return the counters accumulated over all the processes."""
+        return {
+            "hits": int(self._header[_HITS]),
+            "misses": int(self._header[_MISSES]),
+            "evictions": int(self._header[_EVICTIONS]),
+            "size": int(self._header[_SIZE]),
+            "entries": int(self._header[_ENTRIES]),
+        }
+
+    def report_stats(self) -> Dict[str, Optional[float]]:
+        """Return the stats since the last call to register them to the Reporter.
+
+        The hit rate is None if there were no accesses.
+        """
+        stats = self.stats()
+        hits = stats["hits"] - self._last_stats["hits"]
+        misses = stats["misses"] - self._last_stats["misses"]
+        self._last_stats = stats
+        return {
+            "cache_hit_rate": hits / (hits + misses) if hits + misses > 0 else None,
+            "cache_size_mb": stats["size"] / 2**20,
+        }
@@ -0,0 +1,246 @@
+"""Batched scoring of speaker verification trials."""
+
+from os import PathLike
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from typeguard import typechecked
+
+
+class EmbeddingTable:
+    """Speaker embeddings in one matrix with the index from utterance ids.
+
+    All utterances have the same number of embeddings,
+    e.g. the crops of a test utterance, i.e. the matrix is (n_utt, n_crop, dim).
+
+    Examples:
+        >>> table = EmbeddingTable.from_npz("test_embeddings.npz")
+        >>> scores = score_trials(table, ["utt1", "utt1"], ["utt2", "utt3"])
+
+    """
+
+    @typechecked
+    def __init__(
+        self,
+        ids: Sequence[str],
+        embeddings: torch.Tensor,
+        normalize: bool = True,
+    ):
+        if embeddings.dim() == 2:
+            embeddings = embeddings[:, None]
+        if len(ids) != embeddings.size(0):
+            raise ValueError(f"{len(ids)} ids are given for {len(embeddings)} rows")
+        if normalize:
+            embeddings = F.normalize(embeddings, p=2, dim=-1)
+        self.ids = list(ids)
+        self.embeddings = embeddings
+        self.index = {k: i for i, k in enumerate(self.ids)}
+
+    @classmethod
+    def from_dict(
+        cls,
+        embeddings: Dict[str, Union[np.ndarray, torch.Tensor]],
+        normalize: bool = True,
+    ) -> "EmbeddingTable":
+        """Build the table from the embeddings of (dim,) or (n_crop, dim)."""
+        values = [torch.as_tensor(v) for v in embeddings.values()]
+        values = [v[None] if v.dim() == 1 else v for v in values]
+        shapes = set(tuple(v.shape) for v in values)
+        if len(shapes) > 1:
+            raise ValueError(
+                f"All utterances must have the same number of embeddings: {shapes}"
+            )
+        return cls(list(embeddings), torch.stack(values), normalize=normalize)
+
+    @classmethod
+    def from_npz(
+        cls, *paths: Union[str, PathLike], normalize: bool = True
+    ) -> "EmbeddingTable":
+        """Load the npz files written by spk_embed_extract.py, e.g. of each rank."""
+        embeddings = {}
+        for path in paths:
+            with np.load(path) as f:
+                embeddings.update(f)
+        return cls.from_dict(embeddings, normalize=normalize)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows(self, ids: Sequence[str]) -> torch.Tensor:
+        """Get the row indices of the utterances."""
+        return torch.tensor([self.index[k] for k in ids], dtype=torch.long)
+
+
+def pairwise_scores(
+    enroll: torch.Tensor, test: torch.Tensor, score_type: str = "euclidean"
+) -> torch.Tensor:
+    """Score the pairs of utterances.
+
+    Args:
+        enroll: (Batch, n_crop, dim)
+        test: (Batch, n_crop, dim)
+        score_type: "euclidean" for the negative euclidean distance
+            or "cosine" for the cosine similarity, averaged over the pairs of crops.
+
+    Returns:
+        (Batch,)
+    """
+    if score_type == "euclidean":
+        return -torch.cdist(enroll, test).mean((1, 2))
+    elif score_type == "cosine":
+        return torch.bmm(enroll, test.transpose(1, 2)).mean((1, 2))
+    else:
+        raise ValueError(f"Not supported: score_type={score_type}")
+
+
+def cohort_scores(
+    x: torch.Tensor, cohort: torch.Tensor, score_type: str = "euclidean"
+) -> torch.Tensor:
+    """Score the utterances with all cohort embeddings.
+
+    Args:
+        x: (Batch, n_crop, dim)
+        cohort: (n_cohort, dim)
+
+    Returns:
+        (Batch, n_cohort)
+    """
+    flat = x.reshape(-1, x.size(-1))
+    if score_type == "euclidean":
+        scores = -torch.cdist(flat, cohort)
+    elif score_type == "cosine":
+        scores = flat @ cohort.T
+    else:
+        raise ValueError(f"Not supported: score_type={score_type}")
+    return scores.view(x.size(0), x.size(1), -1).mean(1)
+
+
+@torch.no_grad()
+@typechecked
+def score_trials(
+    table: EmbeddingTable,
+    enroll_ids: Sequence[str],
+    test_ids: Sequence[str],
+    score_type: str = "euclidean",
+    chunk_size: int = 65536,
+    device: Union[str, torch.device, None] = None,
+) -> torch.Tensor:
+    """Score the trials by the batched matrix products in chunks.
+
+    Args:
+        table: The embeddings of the enrollment and the test utterances.
+        enroll_ids: The enrollment utterance of each trial.
+        test_ids: The test utterance of each trial.
+        score_type: "euclidean" or "cosine". See pairwise_scores().
+        chunk_size: The number of trials scored at once.
+        device: The device to compute. The device of the table if None.
+
+    Returns:
+        The float32 scores of the trials on CPU: (n_trials,)
+    """
+    if len(enroll_ids) != len(test_ids):
+        raise ValueError(f"{len(enroll_ids)} != {len(test_ids)}")
+    embeddings = table.embeddings.to(device)
+    enroll_rows = table.rows(enroll_ids).to(embeddings.device)
+    test_rows = table.rows(test_ids).to(embeddings.device)
+
+    scores = torch.empty(len(enroll_ids), dtype=torch.float32)
+    for i in range(0, len(enroll_ids), chunk_size):
+        scores[i : i + chunk_size] = pairwise_scores(
+            embeddings[enroll_rows[i : i + chunk_size]],
+            embeddings[test_rows[i : i + chunk_size]],
+            score_type,
+        ).cpu()
+    return scores
+
+
+@torch.no_grad()
+@typechecked
+def cohort_stats(
+    table: EmbeddingTable,
+    cohort: torch.Tensor,
+    topk: int,
+    ids: Optional[Sequence[str]] = None,
+    score_type: str = "euclidean",
+    chunk_size: int = 1024,
+    device: Union[str, torch.device, None] = None,
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Compute the mean and the std of the top-k cohort scores of the utterances.
+
+    Args:
+        table: The embeddings of the utterances.
+        cohort: The cohort embeddings: (n_cohort, dim)
+        topk: The number of the cohort scores used for each utterance.
+        ids: The utterances to compute. All utterances of the table if None.
+        chunk_size: The number of utterances scored at once.
+
+    Returns:
+        The mean and the (unbiased) std for the rows of the table: (n_utt,)
+            The values of the utterances not in ids are NaN.
+    """
+    embeddings = table.embeddings.to(device)
+    cohort = cohort.to(embeddings.device, embeddings.dtype)
+    topk = min(topk, cohort.size(0))
+    if ids is None:
+        rows = torch.arange(len(table))
+    else:
+        rows = torch.unique(table.rows(ids))
+
+    mean = torch.full((len(table),), float("nan"))
+    std = torch.full((len(table),), float("nan"))
+    for i in range(0, len(rows), chunk_size):
+        _rows = rows[i : i + chunk_size]
+        scores = cohort_scores(
+            embeddings[_rows.to(embeddings.device)], cohort, score_type
+        )
+        scores = scores.topk(topk, dim=1)[0]
+        mean[_rows] = scores.mean(1).float().cpu()
+        std[_rows] = scores.std(1).float().cpu()
+    return mean, std
+
+
+@torch.no_grad()
+@typechecked
+def as_norm(
+    scores: torch.Tensor,
+    table: EmbeddingTable,
+    enroll_ids: Sequence[str],
+    test_ids: Sequence[str],
+    cohort: torch.Tensor,
+    topk: int,
+    score_type: str = "euclidean",
+    chunk_size: int = 1024,
+    device: Union[str, torch.device, None] = None,
+) -> torch.Tensor:
+    """Adaptive symmetric score normalization (AS-norm).
+
+    The statistics of the cohort scores are computed once for each utterance
+    instead of each trial.
+
+    Args:
+        scores: The raw scores of the trials: (n_trials,)
+        cohort: The cohort embeddings, e.g. the normalized embeddings
+            averaged for each speaker: (n_cohort, dim)
+        topk: The adaptive cohort size.
+
+    Returns:
+        The normalized scores: (n_trials,)
+    """
+    mean, std = cohort_stats(
+        table,
+        cohort,
+        topk,
+        ids=list(enroll_ids) + list(test_ids),
+        score_type=score_type,
+        chunk_size=chunk_size,
+        device=device,
+    )
+    enroll_rows = table.rows(enroll_ids)
+    test_rows = table.rows(test_ids)
+    scores = scores.float().cpu()
+    return (
+        (scores - mean[enroll_rows]) / std[enroll_rows]
+        + (scores - mean[test_rows]) / std[test_rows]
+    ) / 2
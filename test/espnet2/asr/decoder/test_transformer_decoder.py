@@ -294,3 +294,100 @@ def test_TransformerDecoder_partially_AR(decoder_class):
             tgt_lengths,
             enc,
         )
+
+
+@pytest.mark.parametrize("normalize_before", [True, False])
+@pytest.mark.parametrize("concat_after", [True, False])
+def test_TransformerDecoder_batch_score_kv_cache(normalize_before, concat_after):
+    vocab_size, encoder_output_size = 6, 8
+    decoder = TransformerDecoder(
+        vocab_size=vocab_size,
+        encoder_output_size=encoder_output_size,
+        normalize_before=normalize_before,
+        concat_after=concat_after,
+        linear_units=10,
+    )
+    decoder.eval()
+    assert decoder.use_kv_cache()
+
+    n_batch = 3
+    enc = torch.randn(10, encoder_output_size).expand(n_batch, -1, -1)
+    ys = torch.randint(vocab_size, (n_batch, 5))
+    states = [None] * n_batch
+    with torch.no_grad():
+        for i in range(1, ys.size(1) + 1):
+            logp, states = decoder.batch_score(ys[:, :i], states, enc)
+            ys_mask = subsequent_mask(i).unsqueeze(0)
+            expected, _ = decoder.forward_one_step(ys[:, :i], ys_mask, enc)
+            torch.testing.assert_close(logp, expected)
+            assert states[0][0][0][0].shape[1] == i
+            # the source-attention cache is computed once and shared
+            assert all(s[1][0] is states[0][1][0] for s in states)
+            assert [s[1][1] for s in states] == [0] * n_batch
+
+        # the single hypothesis scoring follows the same state format
+        logp, state = decoder.score(ys[0], None, enc[0])
+        torch.testing.assert_close(logp, expected[0])
+        assert state[0][0][0].shape[1] == ys.size(1)
+
+
+@pytest.mark.parametrize("utt_ids", [[0, 0, 1, 1], [1, 0, 1, 0]])
+def test_TransformerDecoder_batch_score_kv_cache_utt_ids(utt_ids):
+    vocab_size, encoder_output_size = 6, 8
+    decoder = TransformerDecoder(
+        vocab_size=vocab_size, encoder_output_size=encoder_output_size
+    )
+    decoder.eval()
+
+    enc = torch.randn(2, 10, encoder_output_size)
+    xlens = torch.tensor([10, 6])
+    utt_ids = torch.tensor(utt_ids)
+    xs, xlens = enc[utt_ids], xlens[utt_ids]
+    ys = torch.randint(vocab_size, (len(utt_ids), 4))
+    states = [None] * len(utt_ids)
+    with torch.no_grad():
+        for i in range(1, ys.size(1) + 1):
+            logp, states = decoder.batch_score(
+                ys[:, :i], states, xs, xlens=xlens, utt_ids=utt_ids
+            )
+            expected, _ = decoder.batch_score(
+                ys[:, :i], [None] * len(utt_ids), xs, xlens=xlens
+            )
+            torch.testing.assert_close(logp, expected)
+            # the source-attention cache has a row per utterance
+            assert states[0][1][0][0][0].size(0) == 2
+
+
+def test_TransformerDecoder_batch_score_kv_cache_ylens():
+    vocab_size, encoder_output_size = 6, 8
+    decoder = TransformerDecoder(
+        vocab_size=vocab_size, encoder_output_size=encoder_output_size
+    )
+    decoder.eval()
+
+    xs = torch.randn(3, 10, encoder_output_size)
+    xlens = torch.tensor([10, 6, 8])
+    ys = torch.randint(vocab_size, (3, 5))
+    ylens = torch.tensor([5, 1, 3])
+    with torch.no_grad():
+        # the state of each prefix is built separately
+        states, expected = [], []
+        for b, ylen in enumerate(ylens.tolist()):
+            state = [None]
+            for i in range(1, ylen + 1):
+                logp, state = decoder.batch_score(
+                    ys[b : b + 1, :i], state, xs[b : b + 1], xlens=xlens[b : b + 1]
+                )
+                if i == ylen - 1:
+                    states.append(state[0])
+            if ylen == 1:
+                states.append(None)
+            expected.append(logp)
+        # the prefixes of different lengths are scored at once
+        ys_pad = ys.masked_fill(torch.arange(5) >= ylens.unsqueeze(1), 0)
+        logp, new_states = decoder.batch_score(
+            ys_pad, states, xs, xlens=xlens, ylens=ylens
+        )
+    torch.testing.assert_close(logp, torch.cat(expected))
+    # the self-attention cache of each prefix keeps its own length
+    assert [s[0][0][0].size(1) for s in new_states] == ylens.tolist()
@@ -50,3 +50,56 @@ def test_Encoder_output_size():
 def test_Encoder_invalid_type():
     with pytest.raises(ValueError):
         ContextualBlockTransformerEncoder(20, input_layer="fff")
+
+
+@pytest.mark.parametrize("input_layer", ["linear", "conv2d"])
+def test_Encoder_batch_forward_infer(input_layer):
+    encoder = ContextualBlockTransformerEncoder(
+        20,
+        output_size=16,
+        attention_heads=2,
+        linear_units=8,
+        num_blocks=2,
+        input_layer=input_layer,
+        block_size=6,
+        hop_size=2,
+        look_ahead=1,
+    )
+    encoder.eval()
+    # the streams have different numbers and lengths of chunks
+    chunks = [
+        [torch.randn(1, n, 20) for n in lengths]
+        for lengths in [[30, 17, 25], [60], [8, 40, 40, 12], [33, 50]]
+    ]
+    with torch.no_grad():
+        expected = []
+        for stream in chunks:
+            states, outputs = None, []
+            for i, x in enumerate(stream):
+                y, _, states = encoder(
+                    x,
+                    torch.tensor([x.size(1)]),
+                    states,
+                    is_final=i == len(stream) - 1,
+                    infer_mode=True,
+                )
+                outputs.append(y)
+            expected.append(outputs)
+
+        actual = [[] for _ in chunks]
+        states = [None] * len(chunks)
+        for step in range(max(len(stream) for stream in chunks)):
+            ids = [i for i, stream in enumerate(chunks) if step < len(stream)]
+            rets = encoder.batch_forward_infer(
+                [chunks[i][step] for i in ids],
+                [states[i] for i in ids],
+                [step == len(chunks[i]) - 1 for i in ids],
+            )
+            for i, (y, y_lens, next_states) in zip(ids, rets):
+                assert y_lens.tolist() == [y.size(1)]
+                actual[i].append(y)
+                states[i] = next_states
+
+    for expected_outputs, actual_outputs in zip(expected, actual):
+        for e, a in zip(expected_outputs, actual_outputs):
+            torch.testing.assert_close(a, e, atol=1e-5, rtol=1e-5)
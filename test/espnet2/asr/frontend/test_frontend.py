@@ -61,3 +61,26 @@ def test_frontend_backward_multi_channel(train, use_wpe, use_beamformer):
     x_lengths = torch.LongTensor([1024, 1000])
     y, y_lengths = frontend(x, x_lengths)
     y.sum().backward()
+
+
+@pytest.mark.parametrize("chunk_length", [1, 100, 333, 3000])
+def test_frontend_forward_streaming(chunk_length):
+    frontend = DefaultFrontend(fs=16000, n_fft=256, hop_length=128)
+    frontend.eval()
+    x = torch.randn(2, 3000)
+    states = None
+    outputs = []
+    for i in range(0, x.size(1), chunk_length):
+        y, y_lengths, states = frontend.forward_streaming(
+            x[:, i : i + chunk_length], states, is_final=i + chunk_length >= x.size(1)
+        )
+        assert y_lengths.tolist() == [y.size(1)] * 2
+        outputs.append(y)
+    y, _ = frontend(x, torch.LongTensor([3000, 3000]))
+    torch.testing.assert_close(torch.cat(outputs, dim=1), y, atol=1e-4, rtol=1e-4)
+
+
+def test_frontend_forward_streaming_without_stft():
+    frontend = DefaultFrontend(fs=16000, apply_stft=False)
+    with pytest.raises(NotImplementedError):
+        frontend.forward_streaming(torch.randn(1, 1000))
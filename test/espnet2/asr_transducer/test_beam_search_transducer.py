@@ -30,6 +30,10 @@ from espnet2.lm.seq_rnn_lm import SequentialRNNLM
         (MEGADecoder, {"chunk_size": 2}, {"search_type": "default"}),
         (RWKVDecoder, {"linear_size": 4}, {"search_type": "default", "lm": None}),
         (RWKVDecoder, {"linear_size": 4}, {"search_type": "default"}),
+        (RNNDecoder, {"hidden_size": 4}, {"search_type": "greedy"}),
+        (RNNDecoder, {"hidden_size": 4}, {"search_type": "greedy", "lm": None}),
+        (StatelessDecoder, {}, {"search_type": "greedy", "max_sym_exp": 1}),
+        (MEGADecoder, {}, {"search_type": "greedy", "lm": None}),
         (RNNDecoder, {"hidden_size": 4}, {"search_type": "alsd", "u_max": 10}),
         (
             RNNDecoder,
@@ -123,6 +127,7 @@ def test_transducer_beam_search(decoder_class, decoder_opts, search_opts):
     [
         {"beam_size": 5},
         {"beam_size": 2, "search_type": "tsd", "max_sym_exp": 1},
+        {"beam_size": 1, "search_type": "greedy", "max_sym_exp": 0},
         {"beam_size": 2, "search_type": "alsd", "u_max": -2},
         {"beam_size": 2, "search_type": "maes", "expansion_beta": 2.3},
     ],
@@ -142,6 +147,81 @@ def test_integer_parameters_limits(search_opts):
         )
 
 
+@pytest.mark.execution_timeout(5.0)
+@pytest.mark.parametrize("decoder_class", [RNNDecoder, StatelessDecoder])
+@pytest.mark.parametrize(
+    "search_opts",
+    [
+        {"search_type": "greedy", "beam_size": 1},
+        {"search_type": "alsd", "u_max": 10},
+        {"search_type": "maes", "nstep": 2},
+        {"search_type": "maes", "nstep": 3, "nbest": 2},
+        {"search_type": "default"},
+    ],
+)
+@pytest.mark.parametrize("use_lm", [False, True])
+def test_transducer_batch_decode(decoder_class, search_opts, use_lm):
+    vocab_size = 6
+    encoder_size = 4
+
+    if decoder_class == RNNDecoder:
+        decoder = decoder_class(vocab_size, embed_size=4, hidden_size=4)
+    else:
+        decoder = decoder_class(vocab_size, embed_size=4)
+
+    joint_net = JointNetwork(vocab_size, encoder_size, 4, joint_space_size=8)
+
+    if use_lm:
+        lm = SequentialRNNLM(vocab_size, unit=8, nlayers=1, rnn_type="lstm")
+    else:
+        lm = None
+
+    beam = BeamSearchTransducer(
+        decoder,
+        joint_net,
+        beam_size=search_opts.pop("beam_size", 2),
+        lm=lm,
+        **search_opts,
+    )
+
+    enc_out = torch.randn(3, 20, encoder_size) * 3
+    enc_out_lens = torch.tensor([20, 7, 12])
+
+    with torch.no_grad():
+        batch_nbest_hyps = beam.batch_decode(enc_out, enc_out_lens)
+
+        assert len(batch_nbest_hyps) == enc_out.size(0)
+
+        for enc_out_b, enc_out_len, nbest_hyps in zip(
+            enc_out, enc_out_lens, batch_nbest_hyps
+        ):
+            single_nbest_hyps = beam(enc_out_b[:enc_out_len])
+
+            assert [h.yseq for h in nbest_hyps] == [h.yseq for h in single_nbest_hyps]
+            np.testing.assert_allclose(
+                [float(h.score) for h in nbest_hyps],
+                [float(h.score) for h in single_nbest_hyps],
+                rtol=1e-5,
+            )
+
+
+def test_greedy_search_streaming():
+    decoder = StatelessDecoder(4, embed_size=4)
+    joint_net = JointNetwork(4, 4, 4, joint_space_size=2)
+    beam = BeamSearchTransducer(decoder, joint_net, 1, search_type="greedy")
+
+    enc_out = torch.randn(10, 4)
+
+    with torch.no_grad():
+        hyps = beam(enc_out)
+
+        _ = beam(enc_out[:4], is_final=False)
+        chunk_hyps = beam(enc_out[4:])
+
+    assert hyps[0].yseq == chunk_hyps[0].yseq
+    assert hyps[0].score == pytest.approx(chunk_hyps[0].score)
+
+
 def test_recombine_hyps():
     decoder = StatelessDecoder(4, embed_size=4)
     joint_net = JointNetwork(4, 4, 4, joint_space_size=2)
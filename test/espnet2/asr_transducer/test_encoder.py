@@ -249,6 +249,41 @@ def test_wrong_block_arguments(body_conf):
         _ = Encoder(8, body_conf)
 
 
+@pytest.mark.parametrize(
+    "input_conf",
+    [
+        {"subsampling_factor": 2},
+        {"subsampling_factor": 4},
+        {"subsampling_factor": 6},
+        {"vgg_like": True},
+        {"vgg_like": True, "subsampling_factor": 6},
+    ],
+)
+def test_encoder_output_lengths(input_conf):
+    input_size = 20
+
+    body_conf = [
+        {
+            "block_type": "conformer",
+            "hidden_size": 4,
+            "linear_size": 2,
+            "conv_mod_kernel_size": 3,
+        }
+    ]
+
+    encoder = Encoder(input_size, body_conf, input_conf=input_conf).eval()
+
+    sequence = torch.randn(3, 40, input_size)
+    sequence_len = torch.tensor([40, 23, 12], dtype=torch.long)
+
+    _, enc_out_len = encoder(sequence, sequence_len)
+
+    for i, length in enumerate(sequence_len):
+        single_enc_out, _ = encoder(sequence[i : (i + 1), :length], length.view(1))
+
+        assert enc_out_len[i] == single_enc_out.size(1)
+
+
 @pytest.mark.parametrize(
     "input_conf, inputs",
     [
@@ -1,13 +1,18 @@
+import asyncio
 import string
 from argparse import ArgumentParser
 from pathlib import Path
 
 import numpy as np
 import pytest
+import torch
 import yaml
 
 from espnet2.bin.asr_inference import Speech2Text, get_parser, main
-from espnet2.bin.asr_inference_streaming import Speech2TextStreaming
+from espnet2.bin.asr_inference_streaming import (
+    Speech2TextStreaming,
+    StreamingSessionManager,
+)
 from espnet2.bin.whisper_export_vocabulary import export_vocabulary
 from espnet2.tasks.asr import ASRTask
 from espnet2.tasks.enh_s2t import EnhS2TTask
@@ -204,6 +209,211 @@ def test_Speech2Text_streaming(asr_config_file_streaming, lm_config_file):
             assert isinstance(hyp, Hypothesis)
 
 
+@pytest.fixture()
+def speech2text_streaming(asr_config_file_streaming, lm_config_file):
+    with open(asr_config_file_streaming, "r", encoding="utf-8") as f:
+        asr_train_config = yaml.full_load(f)
+    asr_train_config["frontend"] = "default"
+    asr_train_config["frontend_conf"] = {
+        "n_fft": 256,
+        "win_length": 256,
+        "hop_length": 128,
+    }
+    asr_train_config["encoder_conf"] = {
+        "look_ahead": 4,
+        "hop_size": 4,
+        "block_size": 10,
+    }
+    with open(asr_config_file_streaming, "w", encoding="utf-8") as f:
+        yaml.dump(asr_train_config, f)
+    return Speech2TextStreaming(
+        asr_train_config=asr_config_file_streaming,
+        lm_train_config=lm_config_file,
+        beam_size=2,
+    )
+
+
+def _streams(chunk_lengths=(300, 1000, 2048)):
+    rng = np.random.RandomState(0)
+    streams = []
+    for i, chunk_length in enumerate(chunk_lengths):
+        speech = rng.randn(6000 + 1000 * i).astype(np.float32)
+        streams.append(
+            [speech[j : j + chunk_length] for j in range(0, len(speech), chunk_length)]
+        )
+    return streams
+
+
+def _token_ints(results):
+    return [(token_int, float(hyp.score)) for _, _, token_int, hyp in results]
+
+
+def test_Speech2TextStreaming_batch_apply_frontend(speech2text_streaming):
+    # The chunks of different lengths are padded into a batch
+    speechs = [torch.randn(n) for n in [100, 1000, 1000, 1300, 1000, 1500]]
+    prev_states = [
+        None,
+        None,
+        {"waveform_buffer": torch.randn(384)},
+        None,
+        None,
+        {"waveform_buffer": torch.randn(384)},
+    ]
+    is_final = [False, False, False, False, True, True]
+    outputs = speech2text_streaming.batch_apply_frontend(speechs, prev_states, is_final)
+    for speech, states, final, (feats, feats_lengths, next_states) in zip(
+        speechs, prev_states, is_final, outputs
+    ):
+        desired = speech2text_streaming.apply_frontend(speech, states, final)
+        if desired[0] is None:
+            assert feats is None
+        else:
+            torch.testing.assert_close(feats, desired[0])
+            assert feats_lengths.tolist() == [feats.size(1)]
+        if desired[2] is None:
+            assert next_states is None
+        else:
+            torch.testing.assert_close(
+                next_states["waveform_buffer"], desired[2]["waveform_buffer"]
+            )
+
+
+@pytest.mark.execution_timeout(20)
+@pytest.mark.parametrize("chunk_length", [100, 333, 2048])
+def test_Speech2TextStreaming_incremental_frontend(speech2text_streaming, chunk_length):
+    speech2text_streaming.incremental_frontend = True
+    # UtteranceMVN normalizes each chunk, so compare the features without it
+    speech2text_streaming.asr_model.normalize = None
+    speech = torch.randn(5000)
+    chunks = torch.split(speech, chunk_length)
+    states = None
+    feats = []
+    for i, chunk in enumerate(chunks):
+        _feats, _, states = speech2text_streaming.apply_frontend(
+            chunk, states, is_final=i == len(chunks) - 1
+        )
+        if _feats is not None:
+            feats.append(_feats)
+    assert states is None
+
+    desired, _ = speech2text_streaming.asr_model._extract_feats(
+        speech[None], torch.tensor([len(speech)])
+    )
+    torch.testing.assert_close(torch.cat(feats, dim=1), desired, atol=1e-4, rtol=1e-4)
+
+    for i, chunk in enumerate(chunks):
+        results = speech2text_streaming(chunk.numpy(), is_final=i == len(chunks) - 1)
+    for text, token, token_int, hyp in results:
+        assert isinstance(text, str)
+        assert isinstance(hyp, Hypothesis)
+
+
+@pytest.mark.execution_timeout(30)
+def test_StreamingSessionManager(speech2text_streaming):
+    streams = _streams()
+    desired = []
+    for chunks in streams:
+        desired.append(
+            [
+                _token_ints(speech2text_streaming(c, is_final=i == len(chunks) - 1))
+                for i, c in enumerate(chunks)
+            ]
+        )
+
+    manager = StreamingSessionManager(speech2text_streaming, max_batch_size=2)
+    session_ids = [manager.open() for _ in streams]
+    outputs = [[] for _ in streams]
+    for i in range(max(len(chunks) for chunks in streams)):
+        for session_id, chunks in zip(session_ids, streams):
+            if i < len(chunks):
+                manager.push(session_id, chunks[i], is_final=i == len(chunks) - 1)
+        while manager.has_pending():
+            # At most 2 sessions are processed at once
+            rets = manager.step()
+            assert 0 < len(rets) <= 2
+            for k, results in rets.items():
+                outputs[session_ids.index(k)].append(_token_ints(results))
+    assert outputs == desired
+
+    stats = manager.stats()
+    for session_id, chunks in zip(session_ids, streams):
+        assert manager.sessions[session_id].finished
+        assert stats[session_id]["num_chunks"] == len(chunks)
+        assert stats[session_id]["latency_max"] >= stats[session_id]["latency_mean"]
+        with pytest.raises(RuntimeError):
+            manager.push(session_id, chunks[0])
+        manager.close(session_id)
+    assert len(manager.sessions) == 0
+
+
+@pytest.mark.execution_timeout(60)
+def test_StreamingSessionManager_batch(speech2text_streaming):
+    # Long chunks so that the encoder blocks and the search steps of the sessions
+    # are processed as a batch
+    streams = [
+        [c for c in torch.randn(n).split(chunk_length)]
+        for n, chunk_length in [(24000, 4000), (20000, 3000), (30000, 5000)]
+    ]
+    desired = []
+    for chunks in streams:
+        desired.append(
+            [
+                _token_ints(speech2text_streaming(c, is_final=i == len(chunks) - 1))
+                for i, c in enumerate(chunks)
+            ]
+        )
+
+    manager = StreamingSessionManager(speech2text_streaming)
+    session_ids = [manager.open() for _ in streams]
+    outputs = [[] for _ in streams]
+    for i in range(max(len(chunks) for chunks in streams)):
+        for session_id, chunks in zip(session_ids, streams):
+            if i < len(chunks):
+                manager.push(session_id, chunks[i], is_final=i == len(chunks) - 1)
+        for k, results in manager.step().items():
+            outputs[session_ids.index(k)].append(_token_ints(results))
+    for output, desired_output in zip(outputs, desired):
+        assert len(output) == len(desired_output)
+        for results, desired_results in zip(output, desired_output):
+            assert [r[0] for r in results] == [r[0] for r in desired_results]
+            np.testing.assert_allclose(
+                [r[1] for r in results], [r[1] for r in desired_results], rtol=1e-4
+            )
+
+
+@pytest.mark.execution_timeout(30)
+def test_StreamingSessionManager_serve(speech2text_streaming):
+    streams = _streams()
+    desired = [
+        _token_ints(speech2text_streaming(np.concatenate(chunks))) for chunks in streams
+    ]
+    manager = StreamingSessionManager(speech2text_streaming)
+
+    async def stream(chunks):
+        session_id = manager.open()
+        for chunk in chunks[:-1]:
+            await manager.feed(session_id, chunk)
+            await asyncio.sleep(0)
+        results = await manager.feed(session_id, chunks[-1], is_final=True)
+        assert manager.close(session_id).latency_stats()["num_chunks"] == len(chunks)
+        return results
+
+    async def main():
+        server = asyncio.create_task(manager.serve())
+        results = await asyncio.gather(*[stream(chunks) for chunks in streams])
+        manager.shutdown()
+        await server
+        return results
+
+    results = asyncio.run(main())
+    assert len(results) == len(streams)
+    for r in results:
+        for text, token, token_int, hyp in r:
+            assert isinstance(hyp, Hypothesis)
+    # Speech2TextStreaming itself is not affected by the manager
+    assert _token_ints(speech2text_streaming(np.concatenate(streams[0]))) == desired[0]
+
+
 @pytest.fixture()
 def enh_asr_config_file(tmp_path: Path, token_list):
     # Write default configuration file
@@ -468,6 +678,37 @@ def test_Speech2Text_interctc(asr_config_file, lm_config_file, encoder_class):
         assert isinstance(tokens[0], str)
 
 
+@pytest.mark.execution_timeout(20)
+@pytest.mark.parametrize("decoder_class", ["rnn", "transformer"])
+@pytest.mark.parametrize("ctc_weight", [0.0, 0.3])
+def test_Speech2Text_batch(asr_config_file, lm_config_file, decoder_class, ctc_weight):
+    file = open(asr_config_file, "r", encoding="utf-8")
+    asr_train_config = file.read()
+    asr_train_config = yaml.full_load(asr_train_config)
+    asr_train_config["decoder"] = decoder_class
+    asr_train_config["decoder_conf"] = {}
+    with open(asr_config_file, "w", encoding="utf-8") as files:
+        yaml.dump(asr_train_config, files)
+
+    speech2text = Speech2Text(
+        asr_train_config=asr_config_file,
+        lm_train_config=lm_config_file,
+        beam_size=2,
+        batch_size=3,
+        nbest=2,
+        ctc_weight=ctc_weight,
+    )
+    speech = np.random.randn(3, 1600)
+    speech_lengths = np.array([1600, 1200, 1000])
+    batch_results = speech2text(speech, speech_lengths)
+    assert len(batch_results) == 3
+    for results in batch_results:
+        assert 0 < len(results) <= 2
+        for text, token, token_int, hyp in results:
+            assert isinstance(text, str)
+            assert isinstance(hyp, Hypothesis)
+
+
 @pytest.mark.execution_timeout(10)
 def test_Speech2Text_whisper(
     asr_config_file,
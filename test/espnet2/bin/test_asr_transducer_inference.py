@@ -173,6 +173,42 @@ def test_Speech2Text(use_lm, token_type, asr_config_file, lm_config_file):
         assert isinstance(hyp, Hypothesis)
 
 
+@pytest.mark.execution_timeout(10)
+@pytest.mark.parametrize(
+    "use_lm, beam_search_config",
+    [
+        (False, {"search_type": "greedy"}),
+        (True, {"search_type": "maes"}),
+        (False, {"search_type": "alsd"}),
+        (False, {"search_type": "default"}),
+    ],
+)
+def test_Speech2Text_batch_decode(
+    use_lm, beam_search_config, asr_config_file, lm_config_file
+):
+    speech2text = Speech2Text(
+        asr_train_config=asr_config_file,
+        lm_train_config=lm_config_file if use_lm else None,
+        beam_size=2,
+        beam_search_config=beam_search_config,
+        nbest=2,
+    )
+    speech = np.random.randn(3, 10000)
+    speech_lengths = np.array([10000, 4000, 8000])
+
+    batch_hyps = speech2text(speech, speech_lengths)
+
+    assert len(batch_hyps) == len(speech)
+    for hyps in batch_hyps:
+        assert 0 < len(hyps) <= 2
+
+        for text, token, token_int, hyp in speech2text.hypotheses_to_results(hyps):
+            assert text is None or isinstance(text, str)
+            assert isinstance(token, List)
+            assert isinstance(token_int, List)
+            assert isinstance(hyp, Hypothesis)
+
+
 @pytest.mark.execution_timeout(10)
 @pytest.mark.parametrize(
     "use_lm, token_type, beam_search_config, decoding_window, left_context",
@@ -2,6 +2,7 @@ import string
 from argparse import ArgumentParser
 from pathlib import Path
 
+import numpy as np
 import pytest
 import torch
 import yaml
@@ -66,6 +67,48 @@ def test_SeparateSpeech(
     separate_speech(wav, fs=8000)
 
 
+@pytest.mark.execution_timeout(10)
+@pytest.mark.parametrize("batch_size", [1, 2])
+@pytest.mark.parametrize("segment_batch_size", [3, 100])
+@pytest.mark.parametrize(
+    "input_size, segment_size, hop_size, normalize_segment_scale",
+    [(35000, 2.4, 1.6, False), (35000, 2.4, 1.2, True), (30000, 1.0, 0.3, False)],
+)
+def test_SeparateSpeech_segment_batch_size(
+    monkeypatch,
+    config_file,
+    batch_size,
+    segment_batch_size,
+    input_size,
+    segment_size,
+    hop_size,
+    normalize_segment_scale,
+):
+    kwargs = dict(
+        train_config=config_file,
+        segment_size=segment_size,
+        hop_size=hop_size,
+        normalize_segment_scale=normalize_segment_scale,
+    )
+    wav = torch.rand(batch_size, input_size)
+    separate_speech = SeparateSpeech(**kwargs)
+    if hop_size < segment_size / 2:
+        # The permutations can differ as the overlapped parts are not the same,
+        # so only the stitching is compared
+        monkeypatch.setattr(
+            separate_speech,
+            "cal_permumation",
+            lambda ref, enh, criterion: torch.arange(len(ref)).expand(ref.size(1), -1),
+        )
+    desired = separate_speech(wav, fs=8000)
+    # Separate the segments with the same parameters in batches
+    separate_speech.segment_batch_size = segment_batch_size
+    waves = separate_speech(wav, fs=8000)
+    assert len(waves) == len(desired)
+    for w, d in zip(waves, desired):
+        np.testing.assert_allclose(w, d, atol=1e-5)
+
+
 @pytest.fixture()
 def enh_inference_config(tmp_path: Path):
     # Write default configuration file
@@ -0,0 +1,49 @@
+from argparse import ArgumentParser
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from espnet2.bin.pack_shards import get_parser, main
+from espnet2.fileio.packed_shard import load_shard_manifest
+from espnet2.fileio.sound_scp import SoundScpWriter
+
+
+def test_get_parser():
+    assert isinstance(get_parser(), ArgumentParser)
+
+
+def test_main():
+    with pytest.raises(SystemExit):
+        main()
+
+
+def test_pack_shards(tmp_path: Path):
+    w = SoundScpWriter(tmp_path / "data", tmp_path / "wav.scp")
+    for i in range(5):
+        w[f"utt{i}"] = 16000, np.random.randint(-100, 100, (800,), dtype=np.int16)
+    w.close()
+    with (tmp_path / "text").open("w") as f:
+        for i in range(5):
+            f.write(f"utt{i} hello {i}\n")
+    with (tmp_path / "speech_shape").open("w") as f:
+        for i in range(3):
+            f.write(f"utt{i} 800\n")
+
+    main(
+        cmd=[
+            "--data_path_and_name_and_type",
+            f"{tmp_path}/wav.scp,speech,sound",
+            "--data_path_and_name_and_type",
+            f"{tmp_path}/text,text,text",
+            "--key_file",
+            str(tmp_path / "speech_shape"),
+            "--output_dir",
+            str(tmp_path / "shards"),
+            "--max_utts",
+            "2",
+        ]
+    )
+    manifest = load_shard_manifest(tmp_path / "shards")
+    assert manifest["num_utts"] == 3
+    assert len(manifest["shards"]) == 2
@@ -3,8 +3,9 @@ from argparse import ArgumentParser
 from pathlib import Path
 
 import pytest
+import torch
 
-from espnet2.bin.tts_inference import Text2Speech, get_parser, main
+from espnet2.bin.tts_inference import Text2Speech, _synthesize, get_parser, main
 from espnet2.tasks.tts import TTSTask
 
 
@@ -57,3 +58,81 @@ def test_Text2Speech(config_file):
     text2speech = Text2Speech(train_config=config_file)
     text = "aiueo"
     text2speech(text)
+
+
+@pytest.fixture()
+def fastspeech_config_file(tmp_path: Path, token_list):
+    TTSTask.main(
+        cmd=[
+            "--dry_run",
+            "true",
+            "--output_dir",
+            str(tmp_path),
+            "--token_list",
+            str(token_list),
+            "--token_type",
+            "char",
+            "--cleaner",
+            "none",
+            "--g2p",
+            "none",
+            "--normalize",
+            "none",
+            "--tts",
+            "fastspeech",
+            "--tts_conf",
+            "{adim: 8, aheads: 2, elayers: 1, eunits: 8, dlayers: 1, dunits: 8, "
+            "postnet_layers: 2, postnet_chans: 4, duration_predictor_layers: 2, "
+            "duration_predictor_chans: 4}",
+        ]
+    )
+    return tmp_path / "config.yaml"
+
+
+@pytest.mark.execution_timeout(10)
+def test_Text2Speech_batch_inference(fastspeech_config_file):
+    text2speech = Text2Speech(train_config=fastspeech_config_file)
+    assert text2speech.use_batch_inference
+    texts = ["aiueo", "abc", "abcdefgh"]
+    batch_outputs = text2speech.batch_inference(texts)
+    assert len(batch_outputs) == len(texts)
+    for text, batch_output in zip(texts, batch_outputs):
+        output = text2speech(text)
+        for key in ["feat_gen", "duration"]:
+            assert batch_output[key].shape == output[key].shape
+            assert torch.allclose(batch_output[key], output[key], atol=1e-5)
+        # Griffin-Lim starts from random phases, so compare the lengths only
+        assert batch_output["wav"].shape == output["wav"].shape
+
+
+@pytest.mark.execution_timeout(10)
+def test_synthesize_bucket_order(fastspeech_config_file):
+    text2speech = Text2Speech(train_config=fastspeech_config_file)
+    texts = ["ab", "abcdefgh", "abcd", "a", "abcdef"]
+    loader = [
+        (
+            [f"utt{i}"],
+            dict(
+                text=text2speech.preprocess_fn("<dummy>", dict(text=text))["text"][
+                    None
+                ],
+            ),
+        )
+        for i, text in enumerate(texts)
+    ]
+    buckets = list(_synthesize(text2speech, loader, batch_size=2, bucket_size=3))
+    assert [order for order, _ in buckets] == [
+        ["utt0", "utt1", "utt2"],
+        ["utt3", "utt4"],
+    ]
+    # the batches are sorted by the text lengths in each bucket
+    assert [keys for keys, _, _, _ in buckets[0][1]] == [["utt1", "utt2"], ["utt0"]]
+    assert [keys for keys, _, _, _ in buckets[1][1]] == [["utt4", "utt3"]]
+
+
+@pytest.mark.execution_timeout(10)
+def test_Text2Speech_batch_inference_not_supported(config_file):
+    text2speech = Text2Speech(train_config=config_file)
+    assert not text2speech.use_batch_inference
+    with pytest.raises(NotImplementedError):
+        text2speech.batch_inference(["aiueo", "abc"])
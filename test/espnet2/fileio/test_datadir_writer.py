@@ -28,3 +28,13 @@ def test_DatadirWriter(tmp_path: Path):
         f["aa2"]["ccccc"] = "aaa"
         # Duplicated warning
         f["aa2"]["ccccc"] = "def"
+
+
+def test_DatadirWriter_append(tmp_path: Path):
+    with DatadirWriter(tmp_path) as f:
+        f["aa"]["bb"] = "aa"
+        f.flush()
+        assert (tmp_path / "aa").read_text() == "bb aa\n"
+    with DatadirWriter(tmp_path, append=True) as f:
+        f["aa"]["cc"] = "dd"
+    assert (tmp_path / "aa").read_text() == "bb aa\ncc dd\n"
@@ -51,3 +51,19 @@ def test_NpyScpWriter(tmp_path: Path):
 
     assert writer.get_path("abc") == str(tmp_path / "abc.npy")
     assert writer.get_path("def") == str(tmp_path / "def.npy")
+
+
+def test_NpyScpWriter_update(tmp_path: Path):
+    array1 = np.random.randn(1)
+    array2 = np.random.randn(1, 1, 10)
+    with NpyScpWriter(tmp_path, tmp_path / "feats.scp") as writer:
+        writer["abc"] = array1
+    with NpyScpWriter(tmp_path, tmp_path / "feats.scp", append=True) as writer:
+        writer.update({"def": array2, "sub/ghi": array1})
+    target = NpyScpReader(tmp_path / "feats.scp")
+    desired = {"abc": array1, "def": array2, "sub/ghi": array1}
+
+    assert tuple(target) == tuple(desired)
+    for k in desired:
+        np.testing.assert_array_equal(target[k], desired[k])
+    assert writer.get_path("sub/ghi") == str(tmp_path / "sub" / "ghi.npy")
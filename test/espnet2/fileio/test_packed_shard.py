@@ -0,0 +1,59 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+import soundfile
+
+from espnet2.fileio.packed_shard import (
+    PackedShardWriter,
+    iter_packed_shard,
+    load_shard_manifest,
+)
+
+
+def test_PackedShardWriter(tmp_path: Path):
+    wav = np.random.randint(-100, 100, (1600,), dtype=np.int16)
+    soundfile.write(tmp_path / "a.flac", wav, 16000)
+
+    with PackedShardWriter(tmp_path / "shards", max_utts=2) as writer:
+        writer["a.1"] = {"speech": tmp_path / "a.flac", "text": "hello world"}
+        writer["b"] = {"speech": np.ones(10), "text": "foo"}
+        writer["c"] = {"speech": np.zeros((3, 2)), "text": ""}
+
+    manifest = load_shard_manifest(tmp_path / "shards")
+    assert manifest["names"] == ["speech", "text"]
+    assert manifest["num_utts"] == 3
+    assert [s["num_utts"] for s in manifest["shards"]] == [2, 1]
+
+    samples = [
+        sample for s in manifest["shards"] for sample in iter_packed_shard(s["path"])
+    ]
+    assert [uid for uid, _ in samples] == ["a.1", "b", "c"]
+    np.testing.assert_allclose(samples[0][1]["speech"], wav / 2**15)
+    assert samples[0][1]["text"] == "hello world"
+    np.testing.assert_array_equal(samples[1][1]["speech"], np.ones(10))
+    assert samples[2][1]["speech"].shape == (3, 2)
+    assert samples[2][1]["text"] == ""
+
+
+def test_PackedShardWriter_max_bytes(tmp_path: Path):
+    with PackedShardWriter(tmp_path, max_bytes=100) as writer:
+        for i in range(3):
+            writer[str(i)] = {"x": np.zeros(100)}
+    with (tmp_path / "shards.json").open() as f:
+        assert len(json.load(f)["shards"]) == 3
+
+
+def test_PackedShardWriter_mismatched_names(tmp_path: Path):
+    with PackedShardWriter(tmp_path) as writer:
+        writer["a"] = {"x": np.zeros(1)}
+        with pytest.raises(RuntimeError):
+            writer["b"] = {"y": np.zeros(1)}
+
+
+def test_iter_packed_shard_names(tmp_path: Path):
+    with PackedShardWriter(tmp_path) as writer:
+        writer["a"] = {"x": np.zeros(1), "y": "foo"}
+    for _, data in iter_packed_shard(tmp_path / "shard.000000.tar", names=["y"]):
+        assert data == {"y": "foo"}
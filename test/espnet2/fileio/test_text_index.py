@@ -0,0 +1,130 @@
+import pickle
+from pathlib import Path
+
+import pytest
+
+from espnet2.fileio import text_index
+from espnet2.fileio.read_text import (
+    load_num_sequence_text,
+    read_2columns_text,
+    read_multi_columns_text,
+)
+from espnet2.fileio.text_index import (
+    IndexedTextReader,
+    build_text_index,
+    cache_index_path,
+    default_index_path,
+)
+
+
+@pytest.fixture
+def scp(tmp_path: Path):
+    p = tmp_path / "dummy.scp"
+    with p.open("w", encoding="utf-8") as f:
+        f.write("def /some/path/b.wav\n")
+        f.write("abc /some/path/a.wav  /some/path/a2.wav \n")
+        f.write("ghi\n")
+        f.write("あいう /some/path/c.wav\n")
+    return p
+
+
+def test_IndexedTextReader(scp: Path):
+    reader = IndexedTextReader(scp)
+    assert reader == read_2columns_text(scp)
+    assert list(reader) == ["def", "abc", "ghi", "あいう"]
+    assert len(reader) == 4
+    assert "abc" in reader
+    assert "xyz" not in reader
+    assert 0 not in reader
+    assert reader.key_at(1) == "abc"
+    with pytest.raises(KeyError):
+        reader["xyz"]
+
+
+def test_IndexedTextReader_rebuild_stale_index(scp: Path):
+    index_path = build_text_index(scp)
+    assert index_path.exists()
+    with scp.open("a", encoding="utf-8") as f:
+        f.write("jkl /some/path/d.wav\n")
+    reader = IndexedTextReader(scp)
+    assert reader["jkl"] == "/some/path/d.wav"
+
+
+def test_IndexedTextReader_duplicated(tmp_path: Path):
+    p = tmp_path / "dummy.scp"
+    with p.open("w") as f:
+        f.write("abc /some/path/a.wav\n")
+        f.write("abc /some/path/b.wav\n")
+    with pytest.raises(RuntimeError):
+        IndexedTextReader(p)
+
+
+def test_IndexedTextReader_empty(tmp_path: Path):
+    p = tmp_path / "dummy.scp"
+    p.touch()
+    reader = IndexedTextReader(p)
+    assert len(reader) == 0
+    assert "abc" not in reader
+
+
+def test_IndexedTextReader_pickle(scp: Path):
+    reader = read_multi_columns_text(scp, compact_index=True)[0]
+    reader2 = pickle.loads(pickle.dumps(reader))
+    assert reader2 == read_multi_columns_text(scp)[0]
+
+
+@pytest.fixture
+def read_only_dirs(monkeypatch, tmp_path: Path):
+    """Make writing the index fail in the given directories like read-only ones."""
+    monkeypatch.setenv("ESPNET_TEXT_INDEX_DIR", str(tmp_path / "cache"))
+    read_only = []
+    write_index = text_index._write_index
+
+    def _write_index(index_path, index):
+        if index_path.parent in read_only:
+            raise PermissionError(f"Read-only: {index_path}")
+        write_index(index_path, index)
+
+    monkeypatch.setattr(text_index, "_write_index", _write_index)
+    return read_only
+
+
+def test_IndexedTextReader_read_only_data_dir(scp: Path, read_only_dirs):
+    read_only_dirs.append(scp.parent)
+    reader = IndexedTextReader(scp)
+    assert reader.index_path == cache_index_path(scp)
+    assert reader.index_path.parent == scp.parent / "cache"
+    assert not default_index_path(scp).exists()
+    assert reader == read_2columns_text(scp)
+
+    # The index in the cache directory is reused
+    read_only_dirs.append(scp.parent / "cache")
+    assert IndexedTextReader(scp).index_path == cache_index_path(scp)
+
+
+def test_IndexedTextReader_in_memory_index(scp: Path, read_only_dirs):
+    read_only_dirs.extend([scp.parent, scp.parent / "cache"])
+    reader = IndexedTextReader(scp)
+    assert reader.index_path is None
+    assert reader == read_2columns_text(scp)
+    reader2 = pickle.loads(pickle.dumps(reader))
+    assert reader2 == read_2columns_text(scp)
+
+
+@pytest.mark.parametrize("return_unsplit", [True, False])
+def test_read_multi_columns_text_compact_index(scp: Path, return_unsplit):
+    d, d2 = read_multi_columns_text(scp, return_unsplit=return_unsplit)
+    c, c2 = read_multi_columns_text(
+        scp, return_unsplit=return_unsplit, compact_index=True
+    )
+    assert c == d
+    assert c2 == d2
+
+
+def test_load_num_sequence_text_compact_index(tmp_path: Path):
+    p = tmp_path / "shape"
+    with p.open("w") as f:
+        f.write("abc 10,80\n")
+        f.write("def 3,80\n")
+    d = load_num_sequence_text(p, loader_type="csv_int", compact_index=True)
+    assert d == load_num_sequence_text(p, loader_type="csv_int")
@@ -350,6 +350,66 @@ def test_vits_is_trainable_and_decodable(gen_dict, dis_dict, loss_dict):
         assert output_dict["wav"].size(0) == inputs["feats"].size(0) * upsample_factor
 
 
+@pytest.mark.execution_timeout(10)
+@pytest.mark.skipif(
+    "1.6" in torch.__version__,
+    reason="Group conv in pytorch 1.6 has an issue. "
+    "See https://github.com/pytorch/pytorch/issues/42446.",
+)
+@pytest.mark.parametrize(
+    "spks, spk_embed_dim, langs", [(-1, -1, -1), (10, -1, -1), (4, 5, 3)]
+)
+def test_vits_batch_inference(spks, spk_embed_dim, langs):
+    idim = 10
+    odim = 5
+    gen_args = make_vits_generator_args()
+    gen_args["generator_params"]["spks"] = spks
+    gen_args["generator_params"]["langs"] = langs
+    gen_args["generator_params"]["spk_embed_dim"] = spk_embed_dim
+    gen_args["generator_params"]["global_channels"] = 8
+    model = VITS(
+        idim=idim,
+        odim=odim,
+        **gen_args,
+        **make_vits_discriminator_args(),
+        **make_vits_loss_args(),
+    )
+    model.eval()
+    upsample_factor = model.generator.upsample_factor
+    text_lengths = torch.tensor([8, 5, 3], dtype=torch.long)
+    inputs = dict(
+        text=torch.randint(1, idim, (3, 8)),
+        text_lengths=text_lengths,
+    )
+    if spks > 0:
+        inputs["sids"] = torch.randint(0, spks, (3, 1))
+    if langs > 0:
+        inputs["lids"] = torch.randint(0, langs, (3, 1))
+    if spk_embed_dim > 0:
+        inputs["spembs"] = torch.randn(3, spk_embed_dim)
+
+    with torch.no_grad():
+        output_dict = model.batch_inference(**inputs, noise_scale_dur=0.0)
+        assert output_dict["duration_lengths"].tolist() == text_lengths.tolist()
+        assert torch.equal(
+            output_dict["wav_lengths"], output_dict["feats_lengths"] * upsample_factor
+        )
+        assert output_dict["wav"].size(1) == output_dict["wav_lengths"].max()
+        for i, text_length in enumerate(text_lengths):
+            # durations of each item must match those of the single inference
+            single_inputs = dict(text=inputs["text"][i, :text_length])
+            for k in ["sids", "lids", "spembs"]:
+                if k in inputs:
+                    single_inputs[k] = inputs[k][i]
+            single_dict = model.inference(**single_inputs, noise_scale_dur=0.0)
+            assert torch.equal(
+                output_dict["duration"][i, :text_length], single_dict["duration"]
+            )
+            wav_length = output_dict["wav_lengths"][i]
+            assert single_dict["wav"].size(0) == wav_length
+            assert output_dict["wav"][i, wav_length:].eq(0).all()
+
+
 @pytest.mark.execution_timeout(10)
 @pytest.mark.skipif(
     "1.6" in torch.__version__,
@@ -116,3 +116,70 @@ def test_ChunkIterFactory_utt2category():
             elif k == "utt2category":
                 val = v[0].item()
                 assert all([vv.item() == val for vv in v])
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+@pytest.mark.parametrize("discard_short_samples", [False, True])
+def test_ChunkIterFactory_resume(shuffle, discard_short_samples):
+    dataset = Dataset3(with_category=True)
+    collatefn = CommonCollateFn()
+    batches = [["a"], ["b"], ["c"], ["d"], ["e"], ["f"]]
+    iter_factory = ChunkIterFactory(
+        dataset=dataset,
+        batches=batches,
+        batch_size=2,
+        chunk_length="2,3",
+        num_cache_chunks=2,
+        shuffle=shuffle,
+        collate_fn=collatefn,
+        discard_short_samples=discard_short_samples,
+    )
+
+    iterator = iter_factory.build_iter(1, keep_state=True)
+    states = [iterator.state_dict()]
+    seq = []
+    for ids, batch in iterator:
+        seq.append((ids, {k: v.tolist() for k, v in batch.items()}))
+        states.append(iterator.state_dict())
+    assert len(seq) > 2
+
+    for i, state in enumerate(states):
+        seq2 = [
+            (ids, {k: v.tolist() for k, v in batch.items()})
+            for ids, batch in iter_factory.build_iter(1, state=state)
+        ]
+        assert seq2 == seq[i:]
+
+
+def test_ChunkIterFactory_state_dict_prefetched():
+    dataset = Dataset3(with_category=True)
+    iter_factory = ChunkIterFactory(
+        dataset=dataset,
+        batches=[["a"], ["b"], ["c"], ["d"], ["e"], ["f"]],
+        batch_size=2,
+        chunk_length=3,
+        collate_fn=CommonCollateFn(),
+    )
+    iterator = iter_factory.build_iter(1, keep_state=True)
+    next(iterator)
+    state = iterator.state_dict()
+    next(iterator)
+    assert iterator.state_dict(1) == state
+    with pytest.raises(RuntimeError):
+        iterator.state_dict(0)
+
+
+def test_ChunkIterFactory_state_dict_not_kept():
+    dataset = Dataset3(with_category=True)
+    iter_factory = ChunkIterFactory(
+        dataset=dataset,
+        batches=[["a"], ["b"], ["c"], ["d"], ["e"], ["f"]],
+        batch_size=2,
+        chunk_length=3,
+        collate_fn=CommonCollateFn(),
+    )
+    iterator = iter_factory.build_iter(1)
+    next(iterator)
+    assert len(iterator._snapshots) == 0
+    with pytest.raises(RuntimeError):
+        iterator.state_dict()
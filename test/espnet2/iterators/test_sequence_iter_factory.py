@@ -67,3 +67,22 @@ def test_SequenceIterFactory_deterministic(collate, num_iters_per_epoch):
     for i in range(1, 10):
         for v, v2 in zip(iter_factory.build_iter(i), iter_factory.build_iter(i)):
             assert (v == v2).all()
+
+
+@pytest.mark.parametrize("num_iters_per_epoch", [None, 3, 9])
+@pytest.mark.parametrize("start_iter", [0, 1, 2])
+def test_SequenceIterFactory_start_iter(num_iters_per_epoch, start_iter):
+    dataset = Dataset()
+    batches = [[0, 1], [2, 3], [4, 5], [6, 7], [8, 9]]
+    iter_factory = SequenceIterFactory(
+        dataset=dataset,
+        batches=batches,
+        num_iters_per_epoch=num_iters_per_epoch,
+        shuffle=True,
+        collate_fn=collate_func,
+    )
+
+    for i in range(1, 4):
+        seq = [v.tolist() for v in iter_factory.build_iter(i)]
+        seq2 = [v.tolist() for v in iter_factory.build_iter(i, start_iter=start_iter)]
+        assert seq2 == seq[start_iter:]
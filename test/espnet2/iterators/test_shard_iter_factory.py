@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from espnet2.fileio.packed_shard import PackedShardWriter
+from espnet2.iterators.shard_iter_factory import ShardIterFactory
+from espnet2.train.collate_fn import CommonCollateFn
+from espnet2.train.iterable_dataset import ShardedIterableESPnetDataset
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    with PackedShardWriter(tmp_path, max_utts=2) as w:
+        for i in range(5):
+            w[f"utt{i}"] = {"data": np.full(i + 1, i, dtype=np.float32)}
+    return ShardedIterableESPnetDataset([(str(tmp_path), "data", "shard")])
+
+
+def collate_fn(data):
+    return CommonCollateFn(float_pad_value=0.0, int_pad_value=-1)(data)
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_ShardIterFactory(dataset, shuffle):
+    iter_factory = ShardIterFactory(
+        dataset, batch_size=2, shuffle=shuffle, collate_fn=collate_fn
+    )
+    keys = []
+    for ids, batch in iter_factory.build_iter(1):
+        assert batch["data"].shape[0] == len(ids)
+        keys += ids
+    assert sorted(keys) == [f"utt{i}" for i in range(5)]
+
+
+def test_ShardIterFactory_num_iters_per_epoch(dataset):
+    iter_factory = ShardIterFactory(
+        dataset, batch_size=2, num_iters_per_epoch=2, collate_fn=collate_fn
+    )
+    keys = [ids for epoch in range(1, 4) for ids, _ in iter_factory.build_iter(epoch)]
+    assert keys == [
+        ["utt0", "utt1"],
+        ["utt2", "utt3"],
+        ["utt4"],
+        ["utt0", "utt1"],
+        ["utt2", "utt3"],
+        ["utt4"],
+    ]
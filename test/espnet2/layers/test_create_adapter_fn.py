@@ -71,7 +71,7 @@ def test_create_houlsby_adapter_bottleneck(
         (
             init_S3prl_model(
                 frontend_conf={
-                    "upstream": "***REMOVED***wav2vec2_custom",
+                    "upstream": "hf_wav2vec2_custom",
                     "path_or_url": "facebook/mms-300m",
                 }
             ),
@@ -80,7 +80,7 @@ def test_create_houlsby_adapter_bottleneck(
         )
     ],
 )
-def test_create_houlsby_adapter_***REMOVED***wav2vec2_custom_bottleneck(
+def test_create_houlsby_adapter_hf_wav2vec2_custom_bottleneck(
     model,
     bottleneck,
     target_layers,
@@ -225,10 +225,10 @@ if __name__ == "__main__":
     print("create_houlsby_adapter_bottleneck test passed")
     print("-----------------------------------------------------------")
     s3prl_model = init_S3prl_model(
-        {"upstream": "***REMOVED***wav2vec2_custom", "path_or_url": "facebook/mms-300m"}
+        {"upstream": "hf_wav2vec2_custom", "path_or_url": "facebook/mms-300m"}
     )
-    test_create_houlsby_adapter_***REMOVED***wav2vec2_custom_bottleneck(s3prl_model, 64, [])
-    print("create_houlsby_adapter_***REMOVED***wav2vec2_custom_bottleneck test passed")
+    test_create_houlsby_adapter_hf_wav2vec2_custom_bottleneck(s3prl_model, 64, [])
+    print("create_houlsby_adapter_hf_wav2vec2_custom_bottleneck test passed")
     print("-----------------------------------------------------------")
     s3prl_model = init_S3prl_model()
     test_create_houlsby_adapter_target_layers(s3prl_model, 64, [1, 2])
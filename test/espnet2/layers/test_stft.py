@@ -1,3 +1,4 @@
+import pytest
 import torch
 
 from espnet2.layers.stft import Stft
@@ -53,3 +54,43 @@ def test_librosa_stft():
     y_librosa, _ = layer(x)
     assert torch.allclose(y_torch, y_librosa, atol=7e-6)
     torch._C.has_mkl = True
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        dict(n_fft=512, hop_length=128),
+        dict(n_fft=512, win_length=400, hop_length=160, normalized=True),
+        dict(n_fft=256, hop_length=128, center=False),
+        dict(n_fft=32, hop_length=8, onesided=False, window=None),
+    ],
+)
+@pytest.mark.parametrize("chunk_length", [1, 100, 333, 5000])
+def test_forward_streaming(kwargs, chunk_length):
+    layer = Stft(**kwargs)
+    x = torch.randn(2, 3000)
+    states = None
+    outputs = []
+    for i in range(0, x.size(1), chunk_length):
+        y, states = layer.forward_streaming(
+            x[:, i : i + chunk_length], states, is_final=i + chunk_length >= x.size(1)
+        )
+        outputs.append(y)
+    y, _ = layer(x)
+    torch.testing.assert_close(torch.cat(outputs, dim=1), y, atol=1e-4, rtol=1e-4)
+
+
+def test_forward_streaming_bounded_buffer():
+    layer = Stft(n_fft=512, hop_length=128)
+    states = None
+    for _ in range(100):
+        _, states = layer.forward_streaming(torch.randn(1, 160), states)
+    assert states["buffer"].size(1) < 4 * 512
+
+
+def test_forward_streaming_short_input():
+    layer = Stft(n_fft=512, hop_length=128)
+    y, states = layer.forward_streaming(torch.randn(1, 100), is_final=False)
+    assert y.size(1) == 0
+    y, _ = layer.forward_streaming(torch.randn(1, 100), states, is_final=True)
+    assert y.size(1) > 0
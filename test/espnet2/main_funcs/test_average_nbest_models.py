@@ -1,3 +1,5 @@
+import functools
+
 import pytest
 import torch
 
@@ -65,3 +67,56 @@ def test_average_nbest_models_0epoch_reporter(output_dir, nbest):
             best_model_criterion=[("valid", "acc", "max")],
             nbest=nbest,
         )
+
+
+def test_average_nbest_models_values(tmp_path, monkeypatch):
+    reporter = Reporter()
+    for epoch, (acc, loss) in enumerate(
+        [(0.4, 3.0), (0.5, 1.0), (0.6, 2.0), (0.3, 4.0)], 1
+    ):
+        reporter.set_epoch(epoch)
+        with reporter.observe("valid") as sub:
+            sub.register({"acc": acc, "loss": loss})
+            sub.next()
+        torch.save(
+            {
+                "w": torch.full((2,), float(epoch)),
+                "num_batches_tracked": torch.tensor(epoch),
+            },
+            tmp_path / f"{epoch}epoch.pth",
+        )
+
+    num_loads = []
+    load = torch.load
+
+    @functools.wraps(load)
+    def counting_load(f, *args, **kwargs):
+        num_loads.append(str(f))
+        return load(f, *args, **kwargs)
+
+    monkeypatch.setattr(torch, "load", counting_load)
+    average_nbest_models(
+        reporter=reporter,
+        output_dir=tmp_path,
+        best_model_criterion=[("valid", "acc", "max"), ("valid", "loss", "min")],
+        nbest=[1, 2, 3],
+    )
+    monkeypatch.setattr(torch, "load", load)
+    # Each file is loaded once for all criteria and n-best
+    assert sorted(num_loads) == [str(tmp_path / f"{e}epoch.pth") for e in [1, 2, 3]]
+
+    for cr, n, epochs in [
+        ("acc", 2, [3, 2]),
+        ("acc", 3, [3, 2, 1]),
+        ("loss", 2, [2, 3]),
+        ("loss", 3, [2, 3, 1]),
+    ]:
+        states = torch.load(tmp_path / f"valid.{cr}.ave_{n}best.pth")
+        torch.testing.assert_close(states["w"], torch.full((2,), sum(epochs) / n))
+        assert states["num_batches_tracked"].item() == sum(epochs)
+    assert (tmp_path / "valid.acc.ave_1best.pth").resolve() == (
+        tmp_path / "3epoch.pth"
+    ).resolve()
+    assert (tmp_path / "valid.loss.ave.pth").resolve() == (
+        tmp_path / "valid.loss.ave_3best.pth"
+    ).resolve()
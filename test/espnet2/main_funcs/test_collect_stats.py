@@ -0,0 +1,213 @@
+import numpy as np
+import pytest
+import torch
+
+from espnet2.fileio.npy_scp import NpyScpReader
+from espnet2.iterators.sequence_iter_factory import SequenceIterFactory
+from espnet2.main_funcs.collect_stats import StatsAccumulator, collect_stats
+from espnet2.train.abs_espnet_model import AbsESPnetModel
+from espnet2.train.collate_fn import CommonCollateFn
+
+
+class Dummy(AbsESPnetModel):
+    def forward(self, x, x_lengths):
+        pass
+
+    def collect_feats(self, x, x_lengths):
+        return {"feats": x * 100 + 1000, "feats_lengths": x_lengths}
+
+
+class Killed(Exception):
+    pass
+
+
+def _batches(num_batches=7):
+    g = torch.Generator().manual_seed(0)
+    batches = []
+    for i in range(num_batches):
+        lengths = torch.randint(1, 10, (3,), generator=g)
+        x = torch.randn(3, int(lengths.max()), 2, generator=g)
+        keys = [f"utt{i}_{j}" for j in range(3)]
+        batches.append((keys, {"x": x, "x_lengths": lengths}))
+    return batches
+
+
+def _iterator(batches, kill_at=None):
+    for i, batch in enumerate(batches, 1):
+        if i == kill_at:
+            raise Killed()
+        yield batch
+
+
+class Dataset(torch.utils.data.Dataset):
+    def __init__(self, batches):
+        self.data = {
+            key: x[:lg].numpy()
+            for keys, batch in batches
+            for key, x, lg in zip(keys, batch["x"], batch["x_lengths"])
+        }
+        self.loaded = []
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key):
+        self.loaded.append(key)
+        return key, {"x": self.data[key]}
+
+
+def _read_outputs(output_dir):
+    retval = {}
+    for mode in ["train", "valid"]:
+        with np.load(output_dir / mode / "feats_stats.npz") as f:
+            retval[mode, "stats"] = dict(f)
+        retval[mode, "shape"] = (output_dir / mode / "x_shape").read_text()
+        scp = output_dir / mode / "collect_feats" / "feats.scp"
+        if scp.exists():
+            retval[mode, "feats"] = dict(NpyScpReader(scp))
+    return retval
+
+
+def _run(output_dir, batches, kill_at=None, **kwargs):
+    collect_stats(
+        model=Dummy(),
+        train_iter=_iterator(batches, kill_at),
+        valid_iter=_iterator(batches[:3]),
+        output_dir=output_dir,
+        ngpu=0,
+        log_interval=None,
+        write_collected_feats=True,
+        **kwargs,
+    )
+
+
+def test_StatsAccumulator_merge():
+    x = np.random.randn(100, 3) * 10 + 1000
+    acc = StatsAccumulator()
+    for i in range(0, 100, 30):
+        acc.merge(StatsAccumulator.from_batch(torch.from_numpy(x[i : i + 30])))
+    assert acc.count == 100
+    np.testing.assert_allclose(acc.mean, x.mean(0))
+    np.testing.assert_allclose(acc.m2 / acc.count, x.var(0))
+    np.testing.assert_allclose(acc.sum, x.sum(0))
+    np.testing.assert_allclose(acc.sum_square, (x**2).sum(0))
+
+
+def test_StatsAccumulator_from_batch_with_lengths():
+    x = torch.randn(2, 5, 3)
+    lengths = torch.tensor([5, 2])
+    acc = StatsAccumulator.from_batch(x, lengths)
+    desired = torch.cat([x[0], x[1, :2]]).numpy()
+    assert acc.count == 7
+    np.testing.assert_allclose(acc.mean, desired.mean(0), rtol=1e-6)
+    np.testing.assert_allclose(
+        acc.m2, ((desired - desired.mean(0)) ** 2).sum(0), rtol=1e-5
+    )
+    assert acc.sum.dtype == np.float32
+
+
+def test_StatsAccumulator_state_dict():
+    acc = StatsAccumulator.from_batch(torch.randn(4, 3))
+    acc2 = StatsAccumulator()
+    acc2.load_state_dict(acc.state_dict())
+    assert acc2.count == acc.count
+    np.testing.assert_array_equal(acc2.sum_square, acc.sum_square)
+
+
+def test_collect_stats(tmp_path):
+    batches = _batches()
+    _run(tmp_path, batches)
+    outputs = _read_outputs(tmp_path)
+
+    x = torch.cat(
+        [b["x"][i, :lg] for _, b in batches for i, lg in enumerate(b["x_lengths"])]
+    )
+    feats = (x * 100 + 1000).double().numpy()
+    stats = outputs["train", "stats"]
+    assert stats["count"] == len(feats)
+    np.testing.assert_allclose(stats["sum"], feats.sum(0), rtol=1e-6)
+    np.testing.assert_allclose(stats["sum_square"], (feats**2).sum(0), rtol=1e-6)
+
+    keys, batch = batches[0]
+    assert outputs["train", "shape"].startswith(
+        f"{keys[0]} {int(batch['x_lengths'][0])},2\n"
+    )
+    np.testing.assert_array_equal(
+        outputs["train", "feats"][keys[1]],
+        (batch["x"][1, : batch["x_lengths"][1]] * 100 + 1000).numpy(),
+    )
+    assert (tmp_path / "train" / "stats_keys").read_text() == "feats\nfeats_lengths\n"
+    assert (tmp_path / "train" / "batch_keys").read_text() == "x\n"
+
+
+def test_collect_stats_num_workers(tmp_path):
+    batches = _batches()
+    _run(tmp_path / "1", batches)
+    _run(tmp_path / "3", batches, num_workers=3)
+    desired = _read_outputs(tmp_path / "1")
+    outputs = _read_outputs(tmp_path / "3")
+    for k in desired:
+        if k[1] == "shape":
+            assert outputs[k] == desired[k]
+        else:
+            for kk in desired[k]:
+                np.testing.assert_array_equal(outputs[k][kk], desired[k][kk])
+
+
+@pytest.mark.parametrize("kill_at", [2, 5, 7])
+def test_collect_stats_resume(tmp_path, kill_at):
+    batches = _batches()
+    _run(tmp_path / "full", batches)
+
+    with pytest.raises(Killed):
+        _run(tmp_path / "out", batches, kill_at=kill_at, checkpoint_interval=2)
+    # No checkpoint is saved before the 2nd mini-batch
+    assert (tmp_path / "out" / "collect_stats_checkpoint.pth").exists() == (kill_at > 2)
+    _run(tmp_path / "out", batches, checkpoint_interval=2, resume=True)
+    assert not (tmp_path / "out" / "collect_stats_checkpoint.pth").exists()
+
+    desired = _read_outputs(tmp_path / "full")
+    outputs = _read_outputs(tmp_path / "out")
+    for k in desired:
+        if k[1] == "shape":
+            assert outputs[k] == desired[k]
+        else:
+            assert list(outputs[k]) == list(desired[k])
+            for kk in desired[k]:
+                np.testing.assert_allclose(outputs[k][kk], desired[k][kk])
+
+
+def test_collect_stats_resume_iter_factory(tmp_path):
+    batches = _batches()
+    _run(tmp_path / "full", batches)
+
+    with pytest.raises(Killed):
+        _run(tmp_path / "out", batches, kill_at=6, checkpoint_interval=2)
+    dataset = Dataset(batches)
+    collect_stats(
+        model=Dummy(),
+        train_iter=SequenceIterFactory(
+            dataset=dataset,
+            batches=[keys for keys, _ in batches],
+            collate_fn=CommonCollateFn(),
+        ),
+        valid_iter=_iterator(batches[:3]),
+        output_dir=tmp_path / "out",
+        ngpu=0,
+        log_interval=None,
+        write_collected_feats=True,
+        checkpoint_interval=2,
+        resume=True,
+    )
+    # The mini-batches before the checkpoint are not loaded again
+    assert dataset.loaded == [key for keys, _ in batches[4:] for key in keys]
+
+    desired = _read_outputs(tmp_path / "full")
+    outputs = _read_outputs(tmp_path / "out")
+    for k in desired:
+        if k[1] == "shape":
+            assert outputs[k] == desired[k]
+        else:
+            assert list(outputs[k]) == list(desired[k])
+            for kk in desired[k]:
+                np.testing.assert_allclose(outputs[k][kk], desired[k][kk])
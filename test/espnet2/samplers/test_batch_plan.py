@@ -0,0 +1,148 @@
+import numpy as np
+import pytest
+import torch
+import torch.multiprocessing as mp
+
+from espnet2.samplers.batch_plan import (
+    batch_plan_digest,
+    cached_batch_plan,
+    decide_batch_sizes,
+    load_batch_plan,
+    load_shape_file,
+    load_shape_files,
+    save_batch_plan,
+)
+from espnet2.samplers.length_batch_sampler import LengthBatchSampler
+from espnet2.samplers.num_elements_batch_sampler import NumElementsBatchSampler
+
+
+def naive_batch_sizes(costs, batch_bins, min_batch_size, drop_last, padding):
+    # The loop version of decide_batch_sizes
+    batch_sizes = []
+    current = []
+    for c in costs:
+        current.append(c)
+        bins = len(current) * c if padding else sum(current)
+        if bins > batch_bins and len(current) >= min_batch_size:
+            batch_sizes.append(len(current))
+            current = []
+    if len(current) != 0 and (not drop_last or len(batch_sizes) == 0):
+        batch_sizes.append(len(current))
+    if len(batch_sizes) > 1 and batch_sizes[-1] < min_batch_size:
+        for i in range(batch_sizes.pop(-1)):
+            batch_sizes[-(i % len(batch_sizes)) - 1] += 1
+    return batch_sizes
+
+
+@pytest.mark.parametrize("min_batch_size", [1, 4])
+@pytest.mark.parametrize("drop_last", [True, False])
+@pytest.mark.parametrize("padding", [True, False])
+@pytest.mark.parametrize("batch_bins", [10, 300, 100000])
+def test_decide_batch_sizes(min_batch_size, drop_last, padding, batch_bins):
+    rng = np.random.RandomState(0)
+    costs = np.sort(rng.randint(1, 50, 500))
+    # Not monotonic, e.g. the sum over several shape files
+    costs += rng.randint(0, 10, 500)
+    assert decide_batch_sizes(
+        costs, batch_bins, min_batch_size, drop_last, padding
+    ) == naive_batch_sizes(costs, batch_bins, min_batch_size, drop_last, padding)
+
+
+@pytest.fixture()
+def shape_files(tmp_path):
+    p1 = tmp_path / "shape1.txt"
+    with p1.open("w") as f:
+        f.write("a 1000,80\n")
+        f.write("b 400,80\n")
+        f.write("c 800,80\n")
+
+    p2 = tmp_path / "shape2.txt"
+    with p2.open("w") as f:
+        f.write("c 39\n")
+        f.write("a 30,30\n")
+        f.write("b 50,30\n")
+    return str(p1), str(p2)
+
+
+def test_load_shape_file(shape_files):
+    keys, shapes, ndims = load_shape_file(shape_files[1])
+    assert keys == ["c", "a", "b"]
+    np.testing.assert_array_equal(shapes, [[39, 1], [30, 30], [50, 30]])
+    np.testing.assert_array_equal(ndims, [1, 2, 2])
+
+
+def test_load_shape_files(shape_files):
+    keys, shapes, _ = load_shape_files(shape_files)
+    assert keys == ["a", "b", "c"]
+    np.testing.assert_array_equal(shapes[1][:, 0], [30, 50, 39])
+
+
+def test_save_load_batch_plan(tmp_path):
+    batch_list = [("a", "b"), ("c",)]
+    save_batch_plan(tmp_path, "digest", batch_list)
+    assert load_batch_plan(tmp_path, "digest") == batch_list
+    assert load_batch_plan(tmp_path, "other") is None
+
+
+def test_cached_batch_plan(tmp_path, shape_files):
+    batch_list = [("a", "b"), ("c",)]
+    assert cached_batch_plan(tmp_path, shape_files, lambda: batch_list, x=1) == (
+        batch_list
+    )
+
+    def fail():
+        raise AssertionError("Must be loaded from the cache")
+
+    assert cached_batch_plan(tmp_path, shape_files, fail, x=1) == batch_list
+    assert batch_plan_digest(shape_files, x=1) != batch_plan_digest(shape_files, x=2)
+    assert batch_plan_digest(shape_files[:1], x=1) != batch_plan_digest(
+        shape_files, x=1
+    )
+
+
+@pytest.mark.parametrize("sampler_class", [LengthBatchSampler, NumElementsBatchSampler])
+def test_sampler_cache_dir(tmp_path, sampler_class):
+    p = tmp_path / "shape.txt"
+    with p.open("w") as f:
+        for i in range(100):
+            f.write(f"utt{i} {(i * 37) % 101 + 1},2\n")
+    sampler = sampler_class(100, shape_files=[str(p)])
+    cached = sampler_class(100, shape_files=[str(p)], cache_dir=str(tmp_path / "c"))
+    assert list(sampler) == list(cached)
+    assert len(list((tmp_path / "c").glob("*.npz"))) == 1
+    loaded = sampler_class(100, shape_files=[str(p)], cache_dir=str(tmp_path / "c"))
+    assert list(sampler) == list(loaded)
+
+
+def _cached_batch_plan_rank(rank, init_method, cache_dir, shape_files, result_path):
+    torch.distributed.init_process_group(
+        "gloo", init_method=init_method, rank=rank, world_size=2
+    )
+    built = []
+
+    def build():
+        built.append(rank)
+        return [("a", "b"), ("c",)]
+
+    batch_list = cached_batch_plan(cache_dir, shape_files, build, x=1)
+    torch.save(dict(batch_list=batch_list, built=built), f"{result_path}.{rank}")
+    torch.distributed.destroy_process_group()
+
+
+def test_cached_batch_plan_distributed(tmp_path, shape_files):
+    result_path = tmp_path / "result"
+    mp.spawn(
+        _cached_batch_plan_rank,
+        args=(
+            f"file://{tmp_path / 'init'}",
+            str(tmp_path / "cache"),
+            shape_files,
+            result_path,
+        ),
+        nprocs=2,
+    )
+    results = [torch.load(f"{result_path}.{rank}") for rank in range(2)]
+    # Only rank 0 builds the plan and the other rank loads it
+    assert [r["built"] for r in results] == [[0], []]
+    assert [r["batch_list"] for r in results] == [[("a", "b"), ("c",)]] * 2
+    assert len(list((tmp_path / "cache").glob("*.npz"))) == 1
@@ -0,0 +1,70 @@
+import pytest
+import torch
+
+from espnet2.speechlm.core_lm.abs_core_lm import SpeechLMInferenceOptions
+from espnet2.speechlm.core_lm.ar_multiscale import MultiScaleLM
+from espnet2.speechlm.engine import SpeechLMGenerationEngine
+
+
+def build_corelm_and_opts(vocab_size=20, nq=3):
+    torch.manual_seed(0)
+    corelm = MultiScaleLM(
+        vocab_size=vocab_size,
+        nq=nq,
+        g_att_unit=16,
+        g_head=2,
+        g_layer=2,
+        l_att_unit=16,
+        l_head=2,
+        l_layer=2,
+        n_ctx=128,
+    ).eval()
+    opts = SpeechLMInferenceOptions(
+        search_algo="greedy_search",
+        nbest=1,
+        maxlenratio=3.0,
+        minlenratio=0.5,
+        eos=5,
+        start=1,
+        masks=torch.zeros(nq, vocab_size, dtype=torch.bool),
+        nq=nq,
+    )
+    opts.masks[:, :6] = True  # special tokens, including eos
+    return corelm, opts
+
+
+@pytest.mark.parametrize("n_slots", [1, 2, 4])
+def test_engine_same_as_sequential_inference(n_slots):
+    corelm, opts = build_corelm_and_opts()
+    prefixes = [torch.randint(6, 20, (1, length, 3)) for length in [3, 9, 5, 7, 4]]
+    # make eos likely, so that the requests finish at different steps
+    corelm.lm_head = torch.nn.Linear(16, 20)
+    with torch.no_grad():
+        corelm.lm_head.bias[opts.eos] += 1.0
+
+    engine = SpeechLMGenerationEngine(corelm, opts, n_slots=n_slots, max_len=64)
+    results = engine.generate(prefixes)
+    assert not engine.has_work
+
+    n_finished = 0
+    for prefix, result in zip(prefixes, results):
+        suffix = torch.zeros(1, 1, 3, dtype=torch.long)
+        tokens, scores = corelm.inference(prefix, opts, suffix=suffix)
+        assert result.finished == (len(tokens) == 1)
+        if result.finished:
+            n_finished += 1
+            torch.testing.assert_close(result.tokens, tokens[0])
+            torch.testing.assert_close(result.scores, scores[0])
+            assert result.tokens.size(0) >= int(prefix.size(1) * opts.minlenratio)
+    assert n_finished > 0
+
+
+def test_engine_rejects_too_long_requests():
+    corelm, opts = build_corelm_and_opts()
+    engine = SpeechLMGenerationEngine(corelm, opts, n_slots=2, max_len=16)
+    with pytest.raises(ValueError):
+        engine.submit(torch.randint(6, 20, (10, 3)))
+    request_id = engine.submit(torch.randint(6, 20, (10, 3)), maxlen=5)
+    assert engine.has_work
+    results = list(engine.run())
+    assert [r.request_id for r in results] == [request_id]
@@ -0,0 +1,58 @@
+import pytest
+import torch
+
+from espnet2.speechlm.module.kv_cache import KVCache
+from espnet2.speechlm.module.transformer import TransformerDecoder
+from espnet2.speechlm.net_utils import install_kv_cache_hook
+
+
+@pytest.mark.parametrize("max_len", [None, 20])
+def test_KVCache_same_as_hook_cache(max_len):
+    torch.manual_seed(0)
+    decoder = TransformerDecoder(n_ctx=32, n_state=8, n_head=2, n_layer=2)
+    decoder.eval()
+    prefix = torch.randn(2, 5, 8)
+    tokens = torch.randn(2, 15, 8)
+
+    chunks = [prefix] + list(tokens.split(1, dim=1))
+    with torch.no_grad():
+        hook_cache, hooks = install_kv_cache_hook(decoder, {})
+        expected = [decoder(x, kv_cache=hook_cache) for x in chunks]
+        for hook in hooks:
+            hook.remove()
+
+        cache = KVCache(max_len=max_len, min_capacity=4)
+        actual = [decoder(x, kv_cache=cache) for x in chunks]
+    for e, a in zip(expected, actual):
+        torch.testing.assert_close(a, e)
+
+    assert cache.seq_len == prefix.size(1) + tokens.size(1)
+    for module, value in hook_cache.items():
+        torch.testing.assert_close(cache.get(module), value)
+
+
+def test_KVCache_growth_and_select():
+    module = torch.nn.Linear(1, 1)
+    cache = KVCache(min_capacity=2)
+    x = torch.arange(12, dtype=torch.float).view(3, 2, 2)
+    cache.append(module, x)
+    cache.append(module, x[:, :1])
+    assert cache.buffers[module].size(1) == 4
+    out = cache.append(module, x)
+    assert cache.buffers[module].size(1) == 8
+    torch.testing.assert_close(out, torch.cat([x, x[:, :1], x], dim=1))
+
+    cache.select(torch.tensor([2, 0]))
+    torch.testing.assert_close(cache.get(module), out[[2, 0]])
+
+    cache.reset()
+    assert cache.seq_len == 0
+    torch.testing.assert_close(cache.append(module, x[:2]), x[:2])
+
+
+def test_KVCache_overflow():
+    module = torch.nn.Linear(1, 1)
+    cache = KVCache(max_len=3)
+    cache.append(module, torch.zeros(1, 3, 2))
+    with pytest.raises(ValueError):
+        cache.append(module, torch.zeros(1, 1, 2))
@@ -1,7 +1,9 @@
 import configargparse
+import numpy as np
 import pytest
 import torch
 
+from espnet2.fileio.packed_shard import PackedShardWriter
 from espnet2.tasks.abs_task import AbsTask
 from espnet2.torch_utils.device_funcs import force_gatherable
 from espnet2.train.abs_espnet_model import AbsESPnetModel
@@ -132,3 +134,29 @@ def test_main(tmp_path):
             "1",
         ]
     )
+
+
+@pytest.mark.execution_timeout(50)
+def test_main_shard_iterator(tmp_path):
+    with PackedShardWriter(tmp_path / "shards", max_utts=2) as writer:
+        for i in range(3):
+            writer[f"utt{i}"] = {"x": np.random.randn(10, 1).astype(np.float32)}
+
+    TestTask.main(
+        cmd=[
+            "--output_dir",
+            str(tmp_path / "out"),
+            "--iterator_type",
+            "shard",
+            "--train_data_path_and_name_and_type",
+            f"{tmp_path / 'shards'},x,shard",
+            "--valid_data_path_and_name_and_type",
+            f"{tmp_path / 'shards'},x,shard",
+            "--batch_size",
+            "2",
+            "--shuffle_buffer_size",
+            "2",
+            "--max_epoch",
+            "1",
+        ]
+    )
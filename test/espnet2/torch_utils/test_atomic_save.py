@@ -0,0 +1,24 @@
+import pytest
+import torch
+
+from espnet2.torch_utils.atomic_save import atomic_save
+
+
+def test_atomic_save(tmp_path):
+    atomic_save({"a": torch.ones(2)}, tmp_path / "a.pth")
+    assert torch.load(tmp_path / "a.pth")["a"].tolist() == [1.0, 1.0]
+    assert not (tmp_path / "a.pth.tmp").exists()
+
+
+def test_atomic_save_keeps_old_file(tmp_path, monkeypatch):
+    atomic_save({"a": 1}, str(tmp_path / "a.pth"))
+
+    def broken_save(obj, f):
+        open(f, "wb").close()
+        raise RuntimeError("killed")
+
+    monkeypatch.setattr(torch, "save", broken_save)
+    with pytest.raises(RuntimeError):
+        atomic_save({"a": 2}, tmp_path / "a.pth")
+    monkeypatch.undo()
+    assert torch.load(tmp_path / "a.pth") == {"a": 1}
@@ -0,0 +1,46 @@
+import math
+
+import pytest
+import torch
+
+from espnet2.torch_utils.clip_grad_norm import clip_grad_norm
+
+
+def _params(dtypes=(torch.float32,)):
+    torch.manual_seed(0)
+    params = []
+    for i, dtype in enumerate(dtypes * 3):
+        p = torch.nn.Parameter(torch.randn(i + 2, 3, dtype=dtype))
+        p.grad = torch.randn_like(p)
+        params.append(p)
+    # Without gradient
+    params.append(torch.nn.Parameter(torch.randn(3)))
+    return params
+
+
+@pytest.mark.parametrize("norm_type", [1.0, 2.0, math.inf])
+@pytest.mark.parametrize("max_norm", [0.5, 1e4])
+@pytest.mark.parametrize("dtypes", [(torch.float32,), (torch.float32, torch.float64)])
+def test_clip_grad_norm(norm_type, max_norm, dtypes):
+    params = _params(dtypes)
+    desired_params = _params(dtypes)
+    norm = clip_grad_norm(params, max_norm, norm_type)
+    desired = torch.nn.utils.clip_grad_norm_(desired_params, max_norm, norm_type)
+    torch.testing.assert_close(norm, desired)
+    for p, p2 in zip(params[:-1], desired_params[:-1]):
+        torch.testing.assert_close(p.grad, p2.grad)
+
+
+@pytest.mark.parametrize("max_norm", [-1.0, 0.0, math.inf])
+def test_clip_grad_norm_no_clip(max_norm):
+    params = _params()
+    grads = [p.grad.clone() for p in params[:-1]]
+    norm = clip_grad_norm(params, max_norm)
+    desired = torch.linalg.vector_norm(torch.cat([g.flatten() for g in grads]))
+    torch.testing.assert_close(norm, desired)
+    for p, g in zip(params[:-1], grads):
+        assert torch.equal(p.grad, g)
+
+
+def test_clip_grad_norm_no_grad():
+    assert clip_grad_norm([torch.nn.Parameter(torch.randn(3))], 1.0) == 0.0
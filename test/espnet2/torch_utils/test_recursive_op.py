@@ -0,0 +1,70 @@
+import pytest
+import torch
+import torch.multiprocessing as mp
+
+from espnet2.torch_utils.recursive_op import (
+    coalesced_all_reduce,
+    recursive_average,
+    recursive_average_coalesced,
+    recursive_sum,
+)
+
+
+def _stats(rank):
+    g = torch.Generator().manual_seed(rank)
+    stats = {
+        "loss": torch.rand(3, generator=g),
+        "nested": [torch.rand(3, generator=g, dtype=torch.float64), None],
+        # nan in rank0 only
+        "nan": torch.full((3,), float("nan")) if rank == 0 else torch.ones(3),
+        "allnan": torch.full((3,), float("nan")),
+    }
+    weight = torch.tensor([1, 2, rank + 3])
+    return stats, weight
+
+
+def _check_coalesced(rank, world_size, init_method):
+    torch.distributed.init_process_group(
+        "gloo", init_method=init_method, rank=rank, world_size=world_size
+    )
+    stats, weight = _stats(rank)
+
+    # The reference implementation by all_gather() and all_reduce()
+    desired = recursive_sum(stats, weight, distributed=True)
+    desired_weight = weight.sum()
+    torch.distributed.all_reduce(desired_weight)
+
+    obj, w, (flag,) = recursive_average_coalesced(
+        stats, weight, True, [torch.tensor(rank)]
+    )
+    assert w == desired_weight and w.dtype == desired_weight.dtype
+    assert flag == sum(range(world_size))
+    for k in ["loss", "nan"]:
+        torch.testing.assert_close(obj[k], desired[k] / desired_weight)
+    assert obj["nested"][0].dtype == torch.float64
+    torch.testing.assert_close(obj["nested"][0], desired["nested"][0] / w)
+    assert obj["nested"][1] is None
+    assert torch.isnan(obj["allnan"])
+
+    assert coalesced_all_reduce([]) == []
+    torch.distributed.destroy_process_group()
+
+
+def test_recursive_average_coalesced_distributed(tmp_path):
+    mp.spawn(_check_coalesced, args=(2, f"file://{tmp_path}/init"), nprocs=2)
+
+
+def test_recursive_average_coalesced():
+    stats, weight = _stats(0)
+    obj, w, extras = recursive_average_coalesced(stats, weight)
+    assert w == 6
+    assert extras == []
+    torch.testing.assert_close(obj["loss"], (stats["loss"] * weight).sum() / 6)
+
+    obj2, w2 = recursive_average(stats, weight)
+    torch.testing.assert_close(obj2["loss"], obj["loss"])
+
+
+def test_recursive_average_coalesced_invalid_type():
+    with pytest.raises(ValueError):
+        recursive_average_coalesced({"a": 1.0}, torch.ones(1), False)
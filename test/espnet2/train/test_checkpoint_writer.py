@@ -0,0 +1,74 @@
+import pytest
+import torch
+
+from espnet2.train.checkpoint_writer import CheckpointWriter
+
+
+def _model():
+    model = torch.nn.Sequential(torch.nn.Linear(3, 3), torch.nn.Linear(3, 3))
+    # Tied weights
+    model[1].weight = model[0].weight
+    return model
+
+
+@pytest.mark.parametrize("asynchronous", [True, False])
+def test_save(tmp_path, asynchronous):
+    model = _model()
+    optimizer = torch.optim.Adam(model.parameters())
+    model(torch.randn(2, 3)).sum().backward()
+    optimizer.step()
+
+    writer = CheckpointWriter(asynchronous=asynchronous)
+    model_state = model.state_dict()
+    expected = {k: v.clone() for k, v in model_state.items()}
+    writer.save(
+        {
+            tmp_path
+            / "checkpoint.pth": {
+                "model": model_state,
+                "optimizers": [optimizer.state_dict()],
+                "epoch": 1,
+            },
+            tmp_path / "1epoch.pth": model_state,
+        }
+    )
+    # The snapshot isn't changed by the following updates
+    with torch.no_grad():
+        for p in model.parameters():
+            p.add_(1.0)
+    writer.wait()
+
+    model_state2 = torch.load(tmp_path / "1epoch.pth")
+    checkpoint = torch.load(tmp_path / "checkpoint.pth")
+    assert checkpoint["epoch"] == 1
+    for k, v in expected.items():
+        torch.testing.assert_close(model_state2[k], v)
+        torch.testing.assert_close(checkpoint["model"][k], v)
+    # The storage of the tied weights is kept shared
+    assert model_state2["0.weight"].data_ptr() == model_state2["1.weight"].data_ptr()
+    # The metadata of the state_dict is kept
+    _model().load_state_dict(model_state2)
+    torch.optim.Adam(model.parameters()).load_state_dict(checkpoint["optimizers"][0])
+    assert not (tmp_path / "1epoch.pth.tmp").exists()
+
+
+def test_submit_after_save(tmp_path):
+    writer = CheckpointWriter()
+    results = []
+    for i in range(3):
+        writer.save({tmp_path / f"{i}.pth": torch.full((1000,), i)})
+        writer.submit(lambda i=i: results.append(torch.load(tmp_path / f"{i}.pth")))
+    writer.wait()
+    assert [r[0].item() for r in results] == [0, 1, 2]
+    assert writer.last_stats["write_time"] >= 0
+
+
+def test_error(tmp_path):
+    writer = CheckpointWriter()
+    writer.save({tmp_path / "not_found" / "a.pth": torch.zeros(1)})
+    with pytest.raises(RuntimeError):
+        writer.wait()
+    # The writer can be used again after the error
+    writer.save({tmp_path / "a.pth": torch.zeros(1)})
+    writer.wait()
+    assert (tmp_path / "a.pth").exists()
@@ -1,3 +1,6 @@
+import os
+import shutil
+
 import h5py
 import kaldiio
 import numpy as np
@@ -5,6 +8,7 @@ import pytest
 
 from espnet2.fileio.npy_scp import NpyScpWriter
 from espnet2.fileio.sound_scp import SoundScpWriter
+from espnet2.fileio.text_index import IndexedTextReader, get_indexed_reader
 from espnet2.train.dataset import ESPnetDataset
 
 
@@ -289,3 +293,110 @@ def test_ESPnetDataset_csv_int(csv_int):
 
     _, data = dataset["b"]
     assert tuple(data["data8"]) == (2, 3, 4)
+
+
+@pytest.mark.parametrize(
+    "fixture, loader_type",
+    [
+        ("sound_scp", "sound"),
+        ("sound_scp", "multi_columns_sound"),
+        ("feats_scp", "kaldi_ark"),
+        ("npy_scp", "npy"),
+        ("text", "text"),
+        ("text_float", "text_float"),
+        ("text_int", "text_int"),
+        ("csv_float", "csv_float"),
+        ("csv_int", "csv_int"),
+    ],
+)
+def test_ESPnetDataset_compact_index(request, fixture, loader_type):
+    path = request.getfixturevalue(fixture)
+    desired = ESPnetDataset(
+        path_name_type_list=[(path, "data", loader_type)],
+        preprocess=preprocess,
+    )
+    dataset = ESPnetDataset(
+        path_name_type_list=[(path, "data", loader_type)],
+        preprocess=preprocess,
+        compact_index=True,
+    )
+    assert list(dataset) == list(desired)
+    for key in ["a", "b"]:
+        np.testing.assert_array_equal(dataset[key][1]["data"], desired[key][1]["data"])
+
+
+@pytest.mark.parametrize("loader_type", ["rand_float", "rand_int_0_10"])
+def test_ESPnetDataset_compact_index_rand(shape_file, loader_type):
+    dataset = ESPnetDataset(
+        path_name_type_list=[(shape_file, "data", loader_type)],
+        compact_index=True,
+    )
+    assert dataset["a"][1]["data"].shape == (100, 80)
+    assert dataset["b"][1]["data"].shape == (150, 80)
+
+
+@pytest.mark.parametrize("compact_index", [False, True])
+def test_ESPnetDataset_integer_uid_and_getitems(text_int, compact_index):
+    dataset = ESPnetDataset(
+        path_name_type_list=[(text_int, "data1", "text_int")],
+        compact_index=compact_index,
+    )
+    assert dataset[0][0] == "a"
+    assert dataset[1][0] == "b"
+
+    batch = dataset.getitems(["b", 0])
+    assert [uid for uid, _ in batch] == ["b", "a"]
+    assert tuple(batch[0][1]["data1"]) == (2, 3, 4)
+    assert tuple(batch[1][1]["data1"]) == (0, 1, 2)
+    assert dataset.__getitems__(["a"])[0][0] == "a"
+
+
+@pytest.mark.parametrize("compact_index", [False, True])
+@pytest.mark.parametrize(
+    "fixture_name, loader_type",
+    [
+        ("sound_scp", "sound"),
+        ("feats_scp", "kaldi_ark"),
+        ("npy_scp", "npy"),
+        ("shape_file", "rand_float"),
+        ("text_int", "text_int"),
+    ],
+)
+def test_ESPnetDataset_get_indexed_reader(
+    request, fixture_name, loader_type, compact_index
+):
+    dataset = ESPnetDataset(
+        path_name_type_list=[
+            (request.getfixturevalue(fixture_name), "data1", loader_type)
+        ],
+        compact_index=compact_index,
+    )
+    reader = get_indexed_reader(dataset.loader_dict["data1"])
+    if compact_index:
+        assert isinstance(reader, IndexedTextReader)
+    else:
+        assert reader is None
+    assert dataset[1][0] == "b"
+
+
+def test_ESPnetDataset_cache_no_space(npy_scp, tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        shutil, "disk_usage", lambda path: shutil._ntuple_diskusage(100, 0, 100)
+    )
+    dataset = ESPnetDataset(
+        path_name_type_list=[(npy_scp, "data3", "npy")],
+        max_cache_size="1MB",
+        cache_dir=str(tmp_path),
+    )
+    # The cache is disabled instead of failing
+    assert dataset.cache is None
+    assert dataset["a"][1]["data3"].shape == (100, 80)
+
+
+def test_ESPnetDataset_cache_dir(npy_scp, tmp_path):
+    dataset = ESPnetDataset(
+        path_name_type_list=[(npy_scp, "data3", "npy")],
+        max_cache_size="1MB",
+        cache_dir=str(tmp_path / "cache"),
+    )
+    assert os.path.dirname(dataset.cache.dir) == str(tmp_path / "cache")
@@ -8,6 +8,7 @@ import pytest
 from espnet2.tasks.abs_task import AbsTask
 from espnet2.train.distributed_utils import (
     DistributedOption,
+    LookaheadIterable,
     free_port,
     resolve_distributed_mode,
 )
@@ -411,3 +412,10 @@ def test_resolve_distributed_mode_slurm3():
 
     fn.result()
     fn2.result()
+
+
+@pytest.mark.parametrize("n", [0, 1, 3])
+def test_lookahead_iterable(n):
+    it = LookaheadIterable(range(n))
+    for _ in range(2):
+        assert [(x, it.is_last) for x in it] == [(i, i == n - 1) for i in range(n)]
@@ -2,10 +2,15 @@ import h5py
 import kaldiio
 import numpy as np
 import pytest
+import torch
 
 from espnet2.fileio.npy_scp import NpyScpWriter
+from espnet2.fileio.packed_shard import PackedShardWriter
 from espnet2.fileio.sound_scp import SoundScpWriter
-from espnet2.train.iterable_dataset import IterableESPnetDataset
+from espnet2.train.iterable_dataset import (
+    IterableESPnetDataset,
+    ShardedIterableESPnetDataset,
+)
 
 
 def preprocess(id: str, data):
@@ -290,3 +295,84 @@ def test_ESPnetDataset_csv_int(csv_int):
             assert tuple(data["data8"]) == (0, 1, 2)
         if key == "b":
             assert tuple(data["data8"]) == (2, 3, 4)
+
+
+@pytest.fixture
+def shards(tmp_path):
+    with PackedShardWriter(tmp_path / "shards", max_utts=3) as w:
+        for i in range(10):
+            w[f"utt{i}"] = {
+                "data1": np.full((i + 1, 2), i, dtype=np.float64),
+                "data2": np.array([i]),
+            }
+    return str(tmp_path / "shards")
+
+
+def test_ShardedIterableESPnetDataset(shards):
+    dataset = ShardedIterableESPnetDataset(
+        path_name_type_list=[(shards, "data1", "shard"), (shards, "data2", "shard")],
+    )
+    print(dataset)
+    assert dataset.has_name("data1")
+    assert dataset.names() == ("data1", "data2")
+
+    samples = list(dataset)
+    assert [uid for uid, _ in samples] == [f"utt{i}" for i in range(10)]
+    for i, (_, data) in enumerate(samples):
+        assert data["data1"].shape == (i + 1, 2)
+        assert data["data1"].dtype == np.float32
+        assert data["data2"].dtype == np.int64
+
+
+def test_ShardedIterableESPnetDataset_select_names(shards):
+    dataset = ShardedIterableESPnetDataset(
+        path_name_type_list=[(shards, "data2", "shard")],
+    )
+    for _, data in dataset:
+        assert list(data) == ["data2"]
+
+
+def test_ShardedIterableESPnetDataset_shuffle(shards):
+    dataset = ShardedIterableESPnetDataset(
+        path_name_type_list=[(shards, "data2", "shard")],
+        shuffle=True,
+        shuffle_buffer_size=4,
+    )
+    dataset.set_epoch(1)
+    uids1 = [uid for uid, _ in dataset]
+    assert uids1 == [uid for uid, _ in dataset]
+    dataset.set_epoch(2)
+    uids2 = [uid for uid, _ in dataset]
+    assert uids1 != uids2
+    assert sorted(uids1) == sorted(uids2) == sorted(f"utt{i}" for i in range(10))
+
+
+def test_ShardedIterableESPnetDataset_split_ranks(shards):
+    uids = []
+    for rank in range(2):
+        dataset = ShardedIterableESPnetDataset(
+            path_name_type_list=[(shards, "data2", "shard")],
+            shuffle=True,
+            rank=rank,
+            world_size=2,
+        )
+        uids.append({uid for uid, _ in dataset})
+    assert len(uids[0] & uids[1]) == 0
+    assert len(uids[0] | uids[1]) == 10
+
+
+def test_ShardedIterableESPnetDataset_workers(shards):
+    dataset = ShardedIterableESPnetDataset(
+        path_name_type_list=[(shards, "data2", "shard")],
+    )
+    loader = torch.utils.data.DataLoader(
+        dataset, batch_size=None, num_workers=2, collate_fn=lambda x: x
+    )
+    assert sorted(uid for uid, _ in loader) == sorted(f"utt{i}" for i in range(10))
+
+
+def test_ShardedIterableESPnetDataset_invalid(shards):
+    with pytest.raises(RuntimeError):
+        ShardedIterableESPnetDataset(path_name_type_list=[(shards, "data3", "shard")])
+    with pytest.raises(RuntimeError):
+        ShardedIterableESPnetDataset(path_name_type_list=[(shards, "data1", "npy")])
@@ -456,3 +456,93 @@ def test_measure_iter_time():
     with reporter.observe("train", 2) as sub:
         for _ in sub.measure_iter_time(range(3), "foo"):
             sub.next()
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_deferred_same_as_default(weighted):
+    reporter = Reporter()
+    reporter.set_epoch(1)
+    messages = {}
+    for deferred in [False, True]:
+        torch.manual_seed(0)
+        with reporter.observe(f"train{deferred}", deferred=deferred) as sub:
+            for i in range(5):
+                weight = torch.tensor(i + 1) if weighted else None
+                loss = torch.rand(())
+                sub.register({"loss": loss, "float": 0.5 * i}, weight)
+                loss.add_(1.0)
+                if i >= 2:
+                    # Registered from the middle
+                    sub.register({"acc": torch.rand(1, dtype=torch.float64)})
+                if i != 3:
+                    sub.register({"iter_time": 0.1})
+                sub.next()
+                if i % 2 == 1:
+                    messages.setdefault(deferred, []).append(sub.log_message(-2))
+            # The values after the last log_message() are flushed at the end
+            assert (len(sub._pending) > 0) == deferred
+    assert messages[False] == [
+        m.replace("trainTrue", "trainFalse") for m in messages[True]
+    ]
+    for k in ["loss", "float", "acc", "iter_time"]:
+        assert reporter.get_value("trainFalse", k) == reporter.get_value("trainTrue", k)
+
+
+def test_deferred_max_pending():
+    reporter = Reporter()
+    with reporter.observe("train", 1, deferred=True) as sub:
+        sub.max_pending = 3
+        for i in range(4):
+            sub.register({"loss": torch.tensor(float(i))})
+            sub.next()
+        assert len(sub._pending) == 1
+        assert isinstance(sub.stats["loss"][0], Average)
+    assert reporter.get_value("train", "loss") == 1.5
+
+
+def test_deferred_invalid_shape():
+    reporter = Reporter()
+    with reporter.observe("train", 1, deferred=True) as sub:
+        with pytest.raises(ValueError):
+            sub.register({"loss": torch.ones(2)})
+
+
+@pytest.mark.parametrize("deferred", [False, True])
+def test_sub_reporter_state_dict(deferred):
+    reporter = Reporter()
+    with reporter.observe("train", 1, deferred=deferred) as sub:
+        for i in range(6):
+            stats = {"loss": torch.tensor(float(i)), "acc": i / 10}
+            if i == 4:
+                stats["aux"] = 0.5
+            sub.register(stats, weight=torch.tensor(i + 1))
+            sub.register({"lr": 0.1 * i})
+            sub.next()
+            if i == 2:
+                state = sub.state_dict()
+
+    reporter2 = Reporter()
+    with reporter2.observe("train", 1, deferred=deferred) as sub:
+        sub.load_state_dict(state)
+        assert sub.get_total_count() == 3
+        for i in range(3, 6):
+            stats = {"loss": torch.tensor(float(i)), "acc": i / 10}
+            if i == 4:
+                stats["aux"] = 0.5
+            sub.register(stats, weight=torch.tensor(i + 1))
+            sub.register({"lr": 0.1 * i})
+            sub.next()
+
+    for k in ["loss", "acc", "aux", "lr", "total_count"]:
+        assert reporter2.get_value("train", k) == pytest.approx(
+            reporter.get_value("train", k)
+        )
+
+
+def test_sub_reporter_state_dict_before_next():
+    reporter = Reporter()
+    with reporter.observe("train", 1) as sub:
+        sub.register({"loss": 0.1})
+        with pytest.raises(RuntimeError):
+            sub.state_dict()
+        sub.next()
@@ -0,0 +1,327 @@
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+import torch.multiprocessing as mp
+from torch.distributed.algorithms.ddp_comm_hooks.default_hooks import allreduce_hook
+
+import espnet2.train.checkpoint_writer
+from espnet2.iterators.chunk_iter_factory import ChunkIterFactory
+from espnet2.iterators.sequence_iter_factory import SequenceIterFactory
+from espnet2.tasks.abs_task import AbsTask
+from espnet2.torch_utils.device_funcs import force_gatherable
+from espnet2.train.abs_espnet_model import AbsESPnetModel
+from espnet2.train.collate_fn import CommonCollateFn
+from espnet2.train.distributed_utils import DistributedOption
+from espnet2.train.reporter import Reporter
+from espnet2.train.trainer import Trainer, TrainerOptions
+from espnet2.utils.build_dataclass import build_dataclass
+
+
+class Model(AbsESPnetModel):
+    def __init__(self):
+        super().__init__()
+        self.linear = torch.nn.Linear(2, 1)
+
+    def forward(self, x, x_lengths=None, utt_id=None):
+        h = x
+        if self.training:
+            # Depends on the random state
+            h = h * torch.rand_like(h)
+        loss = self.linear(h).pow(2).mean()
+        stats = dict(loss=loss.detach(), x=x.sum())
+        return force_gatherable((loss, stats, torch.tensor(len(x))), loss.device)
+
+    def collect_feats(self, x):
+        return {}
+
+
+def _batches(rank, num_batches):
+    g = torch.Generator().manual_seed(rank)
+    return [
+        ([f"{rank}_{i}"] * (i + 1), {"x": torch.randn(i + 1, 2, generator=g)})
+        for i in range(num_batches)
+    ]
+
+
+def _counting_allreduce_hook(state, bucket):
+    # Count the reductions once per backward, not per gradient bucket
+    if bucket.index() == 0:
+        state["num_reductions"] += 1
+    return allreduce_hook(None, bucket)
+
+
+def _train(
+    rank, init_method, num_batches, iterable, reduce_stats, result_path, accum_grad
+):
+    torch.distributed.init_process_group(
+        "gloo", init_method=init_method, rank=rank, world_size=2
+    )
+    torch.manual_seed(0)
+    model = torch.nn.parallel.DistributedDataParallel(Model())
+    counts = dict(num_reductions=0, num_steps=0)
+    model.register_comm_hook(counts, _counting_allreduce_hook)
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+
+    def _count_step(optimizer, args, kwargs):
+        counts["num_steps"] += 1
+
+    optimizer.register_step_post_hook(_count_step)
+    args = AbsTask.get_parser().parse_args([])
+    args.log_interval = 2
+    args.reduce_stats_at_log_interval = reduce_stats
+    args.accum_grad = accum_grad
+    options = build_dataclass(TrainerOptions, args)
+
+    iterator = _batches(rank, num_batches[rank])
+    if iterable:
+        # The length is unknown
+        iterator = iter(iterator)
+    reporter = Reporter()
+    with reporter.observe("train", 1) as sub_reporter:
+        Trainer.train_one_epoch(
+            model=model,
+            iterator=iterator,
+            optimizers=[optimizer],
+            schedulers=[None],
+            scaler=None,
+            reporter=sub_reporter,
+            summary_writer=None,
+            options=options,
+            distributed_option=DistributedOption(distributed=True),
+        )
+    stats = reporter.stats[1]["train"]
+    torch.save(
+        {
+            "total_count": stats["total_count"],
+            "loss": stats.get("loss"),
+            "x": stats.get("x"),
+            "params": [p.detach() for p in model.parameters()],
+            **counts,
+        },
+        f"{result_path}.{rank}",
+    )
+    torch.distributed.barrier()
+
+
+def _run(tmp_path, num_batches, iterable, reduce_stats, accum_grad=1):
+    result_path = tmp_path / f"{iterable}_{reduce_stats}_{accum_grad}"
+    mp.spawn(
+        _train,
+        args=(
+            f"file://{result_path}.init",
+            num_batches,
+            iterable,
+            reduce_stats,
+            result_path,
+            accum_grad,
+        ),
+        nprocs=2,
+    )
+    return [torch.load(f"{result_path}.{rank}") for rank in range(2)]
+
+
+@pytest.mark.parametrize("num_batches", [(3, 5), (0, 2)])
+@pytest.mark.parametrize("iterable", [False, True])
+def test_train_one_epoch_uneven_ranks(tmp_path, num_batches, iterable):
+    results = _run(tmp_path, num_batches, iterable, False)
+    for rank, result in enumerate(results):
+        if iterable and min(num_batches) == 0 and num_batches[rank] > 0:
+            # iter_time of the first batch is registered before stopping
+            assert result["total_count"] == 1
+        else:
+            assert result["total_count"] == min(num_batches)
+
+    if min(num_batches) > 0:
+        # The weighted average over the batches of both ranks
+        batches = [b for r in range(2) for _, b in _batches(r, min(num_batches))]
+        x = sum(b["x"].sum().item() * len(b["x"]) for b in batches)
+        x /= sum(len(b["x"]) for b in batches)
+        for result in results:
+            assert result["x"] == pytest.approx(x)
+
+        interval_results = _run(tmp_path, num_batches, iterable, True)
+        for result, result2 in zip(results, interval_results):
+            assert result2["total_count"] == result["total_count"]
+            assert result2["loss"] == pytest.approx(result["loss"])
+            assert result2["x"] == pytest.approx(result["x"])
+            for p, p2 in zip(result["params"], result2["params"]):
+                torch.testing.assert_close(p, p2)
+
+
+@pytest.mark.parametrize("accum_grad", [1, 2, 4])
+def test_train_one_epoch_accum_grad(tmp_path, accum_grad):
+    # The gradients are all-reduced only at the last micro-batch
+    results = _run(tmp_path, (4, 4), False, False, accum_grad=accum_grad)
+    for result in results:
+        assert result["num_steps"] == 4 // accum_grad
+        assert result["num_reductions"] == result["num_steps"]
+
+    torch.manual_seed(0)
+    init_params = list(Model().parameters())
+    for p, p2, p_init in zip(*[r["params"] for r in results], init_params):
+        torch.testing.assert_close(p, p2)
+        assert not torch.equal(p, p_init)
+
+
+class Dataset:
+    def __init__(self, num_samples):
+        rs = np.random.RandomState(0)
+        self.data = {
+            f"utt{i}": rs.randn(rs.randint(3, 8), 2).astype(np.float32)
+            for i in range(num_samples)
+        }
+
+    def __getitem__(self, uid):
+        return uid, {"x": self.data[uid]}
+
+
+class Preempted(Exception):
+    pass
+
+
+class PreemptedTrainer(Trainer):
+    """Stop the training after saving the checkpoint like a preemption."""
+
+    stop_at = None
+
+    @classmethod
+    def save_train_progress(cls, checkpoint, iiter, iterator, **kwargs):
+        super().save_train_progress(checkpoint, iiter, iterator, **kwargs)
+        num_iters = kwargs["start_iter"] + iiter
+        if (kwargs["reporter"].get_epoch(), num_iters) == cls.stop_at:
+            raise Preempted
+
+
+def _build_iter_factory(chunk: bool):
+    dataset = Dataset(12)
+    if chunk:
+        return ChunkIterFactory(
+            dataset=dataset,
+            batch_size=2,
+            batches=[[k] for k in dataset.data],
+            chunk_length="2,3",
+            num_cache_chunks=4,
+            shuffle=True,
+            collate_fn=CommonCollateFn(),
+        )
+    else:
+        keys = list(dataset.data)
+        return SequenceIterFactory(
+            dataset=dataset,
+            batches=[keys[i : i + 2] for i in range(0, len(keys), 2)],
+            shuffle=True,
+            collate_fn=CommonCollateFn(),
+        )
+
+
+def _run_trainer(trainer, output_dir, chunk, async_checkpoint=False, **kwargs):
+    output_dir.mkdir(parents=True, exist_ok=True)
+    args = AbsTask.get_parser().parse_args([])
+    args.async_checkpoint = async_checkpoint
+    args.nbest_averaging_interval = 1
+    args.output_dir = output_dir
+    args.max_epoch = 2
+    args.checkpoint_interval = 2
+    args.use_tensorboard = False
+    args.use_matplotlib = False
+    args.resume = True
+    for k, v in kwargs.items():
+        setattr(args, k, v)
+    options = build_dataclass(TrainerOptions, args)
+
+    torch.manual_seed(0)
+    model = Model()
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+    trainer.run(
+        model=model,
+        optimizers=[optimizer],
+        schedulers=[None],
+        train_iter_factory=_build_iter_factory(chunk),
+        valid_iter_factory=_build_iter_factory(chunk),
+        plot_attention_iter_factory=None,
+        trainer_options=options,
+        distributed_option=DistributedOption(),
+    )
+    return model
+
+
+@pytest.mark.parametrize("chunk", [False, True])
+def test_run_resume_middle_of_epoch(tmp_path, chunk):
+    model = _run_trainer(Trainer, tmp_path / "full", chunk)
+
+    PreemptedTrainer.stop_at = (2, 4)
+    with pytest.raises(Preempted):
+        _run_trainer(PreemptedTrainer, tmp_path / "resumed", chunk)
+    states = torch.load(tmp_path / "resumed" / "checkpoint.pth")
+    assert states["reporter"]["epoch"] == 1
+    assert states["train_progress"]["epoch"] == 2
+    assert states["train_progress"]["num_iters"] == 4
+
+    PreemptedTrainer.stop_at = None
+    model2 = _run_trainer(PreemptedTrainer, tmp_path / "resumed", chunk)
+    for p, p2 in zip(model.parameters(), model2.parameters()):
+        torch.testing.assert_close(p, p2)
+
+    reporter, reporter2 = Reporter(), Reporter()
+    reporter.load_state_dict(
+        torch.load(tmp_path / "full" / "checkpoint.pth")["reporter"]
+    )
+    reporter2.load_state_dict(
+        torch.load(tmp_path / "resumed" / "checkpoint.pth")["reporter"]
+    )
+    assert reporter2.get_epoch() == 2
+    for key in ["train", "valid"]:
+        for key2 in ["loss", "x", "total_count"]:
+            assert reporter2.get_value(key, key2) == pytest.approx(
+                reporter.get_value(key, key2)
+            )
+
+
+def test_run_async_checkpoint(tmp_path):
+    _run_trainer(Trainer, tmp_path / "sync", False)
+    _run_trainer(Trainer, tmp_path / "async", False, async_checkpoint=True)
+    names = sorted(p.name for p in (tmp_path / "sync").glob("*.pth"))
+    assert names == sorted(p.name for p in (tmp_path / "async").glob("*.pth"))
+    assert "valid.loss.ave_1best.till2epoch.pth" in names
+    for name in names:
+        if name == "checkpoint.pth":
+            continue
+        states = torch.load(tmp_path / "sync" / name)
+        states2 = torch.load(tmp_path / "async" / name)
+        for k in states:
+            torch.testing.assert_close(states[k], states2[k])
+
+
+def test_run_async_checkpoint_file_order(tmp_path, monkeypatch):
+    atomic_save = espnet2.train.checkpoint_writer.atomic_save
+
+    def slow_atomic_save(obj, path):
+        time.sleep(0.05)
+        atomic_save(obj, path)
+
+    symlink_to = Path.symlink_to
+
+    def checked_symlink_to(self, target):
+        # The links never dangle
+        assert (self.parent / target).exists(), target
+        symlink_to(self, target)
+
+    monkeypatch.setattr(
+        espnet2.train.checkpoint_writer, "atomic_save", slow_atomic_save
+    )
+    monkeypatch.setattr(Path, "symlink_to", checked_symlink_to)
+    # The averaging of each epoch is queued before the files are removed
+    _run_trainer(
+        Trainer,
+        tmp_path,
+        False,
+        async_checkpoint=True,
+        max_epoch=4,
+        keep_nbest_models=[1],
+    )
+    assert (tmp_path / "valid.loss.ave_1best.till4epoch.pth").exists()
+    assert (tmp_path / "latest.pth").resolve() == tmp_path / "4epoch.pth"
+    assert len(list(tmp_path.glob("[0-9]epoch.pth"))) <= 2
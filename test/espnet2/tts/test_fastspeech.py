@@ -94,3 +94,40 @@ def test_fastspeech(
         # teacher forcing
         inputs.update(durations=torch.tensor([2, 2, 1], dtype=torch.long))
         model.inference(**inputs, use_teacher_forcing=True)
+
+
+@pytest.mark.parametrize("reduction_factor", [1, 3])
+@pytest.mark.parametrize("duration_bias", [-10.0, 1.0])
+@pytest.mark.parametrize("alpha", [1.0, 1.5])
+def test_fastspeech_batch_inference(reduction_factor, duration_bias, alpha):
+    model = FastSpeech(
+        idim=10,
+        odim=5,
+        adim=4,
+        aheads=2,
+        elayers=1,
+        eunits=4,
+        dlayers=1,
+        dunits=4,
+        postnet_layers=2,
+        postnet_chans=4,
+        postnet_filts=5,
+        reduction_factor=reduction_factor,
+        spk_embed_dim=2,
+    )
+    model.eval()
+    # NOTE: the bias of -10 makes all the predicted durations 0
+    model.duration_predictor.linear.bias.data.fill_(duration_bias)
+
+    text = torch.randint(1, 9, (3, 6))
+    text_lengths = torch.tensor([6, 2, 4], dtype=torch.long)
+    spembs = torch.randn(3, 2)
+    with torch.no_grad():
+        outputs = model.batch_inference(text, text_lengths, spembs=spembs, alpha=alpha)
+        for i, length in enumerate(text_lengths):
+            desired = model.inference(text[i, :length], spembs=spembs[i], alpha=alpha)
+            feat_gen = outputs["feat_gen"][i, : outputs["feat_gen_lengths"][i]]
+            torch.testing.assert_close(feat_gen, desired["feat_gen"])
+            duration = outputs["duration"][i, : outputs["duration_lengths"][i]]
+            torch.testing.assert_close(duration, desired["duration"])
+            assert (outputs["feat_gen"][i, outputs["feat_gen_lengths"][i] :] == 0).all()
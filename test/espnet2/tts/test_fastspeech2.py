@@ -115,3 +115,53 @@ def test_fastspeech2(
         inputs.update(pitch=torch.tensor([2, 2, 0], dtype=torch.float).unsqueeze(-1))
         inputs.update(energy=torch.tensor([2, 2, 0], dtype=torch.float).unsqueeze(-1))
         model.inference(**inputs, use_teacher_forcing=True)
+
+
+@pytest.mark.parametrize("reduction_factor", [1, 3])
+@pytest.mark.parametrize("spks, langs", [(-1, -1), (5, 2)])
+def test_fastspeech2_batch_inference(reduction_factor, spks, langs):
+    model = FastSpeech2(
+        idim=10,
+        odim=5,
+        adim=4,
+        aheads=2,
+        elayers=1,
+        eunits=4,
+        dlayers=1,
+        dunits=4,
+        postnet_layers=2,
+        postnet_chans=4,
+        postnet_filts=5,
+        reduction_factor=reduction_factor,
+        duration_predictor_layers=2,
+        duration_predictor_chans=4,
+        energy_predictor_layers=2,
+        energy_predictor_chans=4,
+        energy_embed_kernel_size=9,
+        pitch_predictor_layers=2,
+        pitch_predictor_chans=4,
+        pitch_embed_kernel_size=9,
+        spks=spks,
+        langs=langs,
+    )
+    model.eval()
+    model.duration_predictor.linear.bias.data.fill_(1.0)
+
+    text = torch.randint(1, 9, (3, 6))
+    text_lengths = torch.tensor([6, 2, 4], dtype=torch.long)
+    inputs = {}
+    if spks > 0:
+        inputs.update(sids=torch.randint(0, spks, (3, 1)))
+    if langs > 0:
+        inputs.update(lids=torch.randint(0, langs, (3, 1)))
+    with torch.no_grad():
+        outputs = model.batch_inference(text, text_lengths, **inputs)
+        for i, length in enumerate(text_lengths):
+            desired = model.inference(
+                text[i, :length], **{k: v[i] for k, v in inputs.items()}
+            )
+            feat_gen = outputs["feat_gen"][i, : outputs["feat_gen_lengths"][i]]
+            torch.testing.assert_close(feat_gen, desired["feat_gen"])
+            for key in ["duration", "pitch", "energy"]:
+                value = outputs[key][i, : outputs["duration_lengths"][i]]
+                torch.testing.assert_close(value, desired[key])
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 
 from espnet2.utils.eer import ComputeErrorRates, ComputeMinDcf, tuneThresholdfromScore
@@ -16,3 +17,25 @@ def test_eer_computation(scores, labels, eer):
     p_trg, c_miss, c_fa = 0.05, 1, 1
     mindcf, _ = ComputeMinDcf(fnrs, fprs, thresholds, p_trg, c_miss, c_fa)
     assert eer_est == eer, (eer_est, eer)
+
+
+def test_error_rates_and_mindcf_match_loop():
+    rng = np.random.RandomState(0)
+    scores = rng.randint(0, 20, 200).astype(float).tolist()
+    labels = rng.randint(0, 2, 200).tolist()
+    fnrs, fprs, thresholds = ComputeErrorRates(scores, labels)
+
+    order = sorted(range(len(scores)), key=lambda i: scores[i])
+    fn, fp = 0, 0
+    for i, j in enumerate(order):
+        fn += labels[j]
+        fp += 1 - labels[j]
+        assert thresholds[i] == scores[j]
+        assert fnrs[i] == fn / sum(labels)
+        assert fprs[i] == 1 - fp / (len(labels) - sum(labels))
+
+    c_det = [0.05 * x + 0.95 * y for x, y in zip(fnrs, fprs)]
+    i = c_det.index(min(c_det))
+    mindcf, threshold = ComputeMinDcf(fnrs, fprs, thresholds, 0.05, 1, 1)
+    assert mindcf == pytest.approx(c_det[i] / 0.05)
+    assert threshold == thresholds[i]
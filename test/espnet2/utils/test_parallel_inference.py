@@ -0,0 +1,141 @@
+from argparse import ArgumentParser
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from espnet2.fileio.datadir_writer import DatadirWriter
+from espnet2.utils.parallel_inference import (
+    add_parallel_inference_arguments,
+    merge_datadirs,
+    read_keys_and_lengths,
+    run_inference,
+    split_keys,
+)
+
+
+def _inference(data_path_and_name_and_type, key_file, output_dir, ngpu, fail):
+    if fail:
+        raise RuntimeError("fail")
+    with open(key_file) as f:
+        keys = [line.strip() for line in f]
+    with DatadirWriter(output_dir) as writer:
+        for key in keys:
+            writer["1best_recog"]["text"][key] = key.upper()
+            writer["1best_recog"]["score"][key] = str(len(key))
+    np.save(Path(output_dir) / "array.npy", np.zeros(3))
+
+
+@pytest.fixture()
+def text_file(tmp_path: Path):
+    keys = [f"utt{i}" for i in range(10)]
+    with (tmp_path / "text").open("w") as f:
+        for i, key in enumerate(keys):
+            f.write(f"{key} {'a' * (i + 1)}\n")
+    return str(tmp_path / "text"), keys
+
+
+def test_add_parallel_inference_arguments():
+    parser = ArgumentParser()
+    add_parallel_inference_arguments(parser)
+    assert parser.parse_args([]).num_procs == 1
+    assert parser.parse_args(["--num_procs", "3"]).num_procs == 3
+
+
+def test_read_keys_and_lengths(text_file, tmp_path: Path):
+    path, keys = text_file
+    assert read_keys_and_lengths([(path, "text", "text")]) == (
+        keys,
+        list(range(1, 11)),
+    )
+
+    with (tmp_path / "keys").open("w") as f:
+        f.write("utt3\nutt1\n")
+    assert read_keys_and_lengths([(path, "text", "text")], str(tmp_path / "keys")) == (
+        ["utt3", "utt1"],
+        [4, 2],
+    )
+
+
+def test_read_keys_and_lengths_file_size(tmp_path: Path):
+    for i in range(2):
+        (tmp_path / f"{i}.wav").write_bytes(b"0" * (i + 5))
+    with (tmp_path / "wav.scp").open("w") as f:
+        for i in range(2):
+            f.write(f"utt{i} {tmp_path / f'{i}.wav'}\n")
+    assert read_keys_and_lengths([(str(tmp_path / "wav.scp"), "speech", "sound")]) == (
+        ["utt0", "utt1"],
+        [5, 6],
+    )
+
+
+@pytest.mark.parametrize("nshards", [1, 2, 3, 20])
+def test_split_keys(nshards):
+    keys = [f"utt{i}" for i in range(10)]
+    lengths = [100, 1, 1, 1, 1, 50, 50, 1, 1, 1]
+    shards = split_keys(keys, lengths, nshards)
+
+    assert len(shards) == min(nshards, len(keys))
+    assert sorted(sum(shards, [])) == sorted(keys)
+    for shard in shards:
+        assert shard == sorted(shard, key=keys.index)
+    if nshards == 2:
+        # The longest utterance is balanced by the two next longest ones
+        assert "utt0" in shards[0]
+        assert {"utt5", "utt6"} <= set(shards[1])
+
+
+def test_merge_datadirs(tmp_path: Path):
+    keys = ["b", "a", "c"]
+    shards = [["b", "c"], ["a"]]
+    worker_dirs = [tmp_path / "output.0", tmp_path / "output.1"]
+    for worker_dir, shard in zip(worker_dirs, shards):
+        (worker_dir / "sub").mkdir(parents=True)
+        with (worker_dir / "sub" / "text").open("w") as f:
+            for key in shard:
+                f.write(f"{key} x\n")
+        (worker_dir / "array.bin").write_bytes(bytes(range(256)))
+        (worker_dir / "log").write_text("not a keyed file\n")
+
+    merge_datadirs(worker_dirs, shards, tmp_path / "merged", keys)
+    assert (tmp_path / "merged" / "sub" / "text").read_text() == "b x\na x\nc x\n"
+    assert not (tmp_path / "merged" / "array.bin").exists()
+    assert not (tmp_path / "merged" / "log").exists()
+
+
+@pytest.mark.execution_timeout(60)
+@pytest.mark.parametrize("num_procs", [1, 3])
+def test_run_inference(text_file, tmp_path: Path, num_procs):
+    path, keys = text_file
+    run_inference(
+        _inference,
+        dict(
+            data_path_and_name_and_type=[(path, "text", "text")],
+            key_file=None if num_procs > 1 else path,
+            output_dir=str(tmp_path / "out"),
+            ngpu=0,
+            fail=False,
+            num_procs=num_procs,
+        ),
+    )
+    with (tmp_path / "out" / "1best_recog" / "text").open() as f:
+        assert [line.split()[0] for line in f] == keys
+    if num_procs > 1:
+        assert len(list((tmp_path / "out" / "split3").glob("output.*"))) == 3
+
+
+@pytest.mark.execution_timeout(60)
+def test_run_inference_fail(text_file, tmp_path: Path):
+    path, _ = text_file
+    with pytest.raises(RuntimeError):
+        run_inference(
+            _inference,
+            dict(
+                data_path_and_name_and_type=[(path, "text", "text")],
+                key_file=None,
+                output_dir=str(tmp_path / "out"),
+                ngpu=0,
+                fail=True,
+                num_procs=2,
+            ),
+        )
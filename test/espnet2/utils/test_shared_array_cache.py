@@ -0,0 +1,193 @@
+import errno
+import multiprocessing
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+from espnet2.utils import shared_array_cache
+from espnet2.utils.shared_array_cache import SharedArrayCache
+
+
+@pytest.fixture()
+def cache(tmp_path):
+    # A single set, so that the eviction is the exact LRU
+    return SharedArrayCache(max_size=1000, max_entries=16, ways=16, root=tmp_path)
+
+
+def test_SharedArrayCache_put_get(cache):
+    x = np.random.randn(3, 4).astype(np.float32)
+    y = np.arange(5, dtype=np.int64)
+    cache["a"] = {"x": x, "y": y}
+    value = cache.get("a")
+    np.testing.assert_array_equal(value["x"], x)
+    np.testing.assert_array_equal(value["y"], y)
+    assert value["x"].dtype == np.float32
+    assert "a" in cache
+    assert len(cache) == 1
+    assert cache.size == x.nbytes + y.nbytes
+
+
+def test_SharedArrayCache_copy_on_write(cache):
+    cache["a"] = {"x": np.zeros(4)}
+    value = cache.get("a")
+    value["x"][0] = 1.0
+    assert cache.get("a")["x"][0] == 0.0
+
+
+def test_SharedArrayCache_miss(cache):
+    assert cache.get("a") is None
+    with pytest.raises(KeyError):
+        cache["a"]
+    assert cache.stats()["misses"] == 2
+
+
+def test_SharedArrayCache_too_large(cache):
+    assert not cache.put("a", {"x": np.zeros(1000)})
+    assert "a" not in cache
+
+
+def test_SharedArrayCache_evict_lru(cache):
+    # 3 entries of 400 bytes can't be cached at once
+    cache["a"] = {"x": np.zeros(50)}
+    cache["b"] = {"x": np.ones(50)}
+    cache.get("a")
+    cache["c"] = {"x": np.ones(50)}
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.size == 800
+    assert cache.stats()["evictions"] == 1
+
+
+def test_SharedArrayCache_evict_full_set(tmp_path):
+    cache = SharedArrayCache(max_size=10000, max_entries=2, ways=2, root=tmp_path)
+    for i in range(5):
+        cache[str(i)] = {"x": np.full(2, i)}
+    assert len(cache) == 2
+    assert "3" in cache and "4" in cache
+
+
+def test_SharedArrayCache_evicted_view_is_valid(cache):
+    cache["a"] = {"x": np.arange(50.0)}
+    value = cache.get("a")
+    cache["b"] = {"x": np.zeros(50)}
+    cache["c"] = {"x": np.zeros(50)}
+    assert "a" not in cache
+    np.testing.assert_array_equal(value["x"], np.arange(50.0))
+
+
+def test_SharedArrayCache_report_stats(cache):
+    assert cache.report_stats()["cache_hit_rate"] is None
+    cache["a"] = {"x": np.zeros(4)}
+    cache.get("a")
+    cache.get("b")
+    stats = cache.report_stats()
+    assert stats["cache_hit_rate"] == 0.5
+    assert stats["cache_size_mb"] == 32 / 2**20
+    cache.get("a")
+    assert cache.report_stats()["cache_hit_rate"] == 1.0
+
+
+def _put(cache):
+    cache["a"] = {"x": np.full(4, 10.0)}
+    assert cache.get("b")["x"][0] == 1.0
+
+
+@pytest.mark.parametrize("method", ["fork", "spawn"])
+@pytest.mark.execution_timeout(30)
+def test_SharedArrayCache_shared(cache, method):
+    cache["b"] = {"x": np.ones(4)}
+    p = multiprocessing.get_context(method).Process(target=_put, args=(cache,))
+    p.start()
+    p.join()
+    assert p.exitcode == 0
+    assert cache.get("a")["x"][0] == 10.0
+    assert cache.stats()["hits"] == 2
+    # The directory is removed only by the process which created it
+    assert os.path.exists(cache.dir)
+
+
+def test_SharedArrayCache_pickle(cache):
+    cache["a"] = {"x": np.ones(4)}
+    cache2 = pickle.loads(pickle.dumps(cache))
+    np.testing.assert_array_equal(cache2["a"]["x"], np.ones(4))
+
+
+def test_SharedArrayCache_cleanup(tmp_path):
+    cache = SharedArrayCache(max_size=1000, root=tmp_path)
+    path = cache.dir
+    del cache
+    assert not os.path.exists(path)
+
+
+def test_SharedArrayCache_put_no_space(cache, monkeypatch):
+    class FullFile:
+        def __init__(self, path, mode):
+            self.f = open(path, mode)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            self.f.close()
+
+        def seek(self, offset):
+            pass
+
+        def write(self, data):
+            raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(shared_array_cache, "open", FullFile, raising=False)
+    assert not cache.put("a", {"x": np.ones(4)})
+    assert "a" not in cache
+    assert cache.size == 0
+    # The temporary file is removed
+    assert sorted(os.listdir(cache.dir)) == ["index", "lock"]
+
+
+def _disk_usage(free):
+    def disk_usage(path):
+        return shutil._ntuple_diskusage(free, 0, free)
+
+    return disk_usage
+
+
+def test_SharedArrayCache_no_space_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(shutil, "disk_usage", _disk_usage(100))
+    with pytest.raises(OSError):
+        SharedArrayCache(max_size=1000, root=tmp_path)
+    # An unlimited cache can be created
+    SharedArrayCache(max_size=np.inf, root=tmp_path)
+
+
+def test_SharedArrayCache_fallback_to_tempdir(monkeypatch):
+    disk_usage = shutil.disk_usage
+
+    def small_shm(path):
+        if str(path) == "/dev/shm":
+            return shutil._ntuple_diskusage(100, 0, 100)
+        return disk_usage(path)
+
+    monkeypatch.setattr(shutil, "disk_usage", small_shm)
+    cache = SharedArrayCache(max_size=1000)
+    assert os.path.dirname(cache.dir) == tempfile.gettempdir()
+
+
+def test_remove_stale_cache_dirs(tmp_path):
+    # The PID of an exited process
+    p = subprocess.Popen([sys.executable, "-c", "pass"])
+    p.wait()
+    stale = tmp_path / f"espnet_cache_{p.pid}_abc"
+    stale.mkdir()
+    live = tmp_path / f"espnet_cache_{os.getpid()}_abc"
+    live.mkdir()
+    cache = SharedArrayCache(max_size=1000, root=tmp_path)
+    assert not stale.exists()
+    assert live.exists()
+    assert os.path.exists(cache.dir)
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+import torch
+
+from espnet2.utils.trial_scoring import (
+    EmbeddingTable,
+    as_norm,
+    cohort_stats,
+    score_trials,
+)
+
+
+def _table(n_utt=10, n_crop=3, dim=8):
+    g = torch.Generator().manual_seed(0)
+    embeddings = torch.randn(n_utt, n_crop, dim, generator=g)
+    return EmbeddingTable([f"utt{i}" for i in range(n_utt)], embeddings)
+
+
+def _trials(table, n_trials=30):
+    g = torch.Generator().manual_seed(1)
+    enrolls = torch.randint(len(table), (n_trials,), generator=g).tolist()
+    tests = torch.randint(len(table), (n_trials,), generator=g).tolist()
+    return [table.ids[i] for i in enrolls], [table.ids[i] for i in tests]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 65536])
+def test_score_trials_euclidean(chunk_size):
+    table = _table()
+    enrolls, tests = _trials(table)
+    scores = score_trials(table, enrolls, tests, chunk_size=chunk_size)
+    for e, t, s in zip(enrolls, tests, scores):
+        desired = -torch.cdist(
+            table.embeddings[table.index[e]], table.embeddings[table.index[t]]
+        ).mean()
+        assert s == pytest.approx(desired.item(), abs=1e-6)
+    assert scores.dtype == torch.float32
+
+
+def test_score_trials_cosine():
+    table = _table()
+    enrolls, tests = _trials(table)
+    scores = score_trials(table, enrolls, tests, score_type="cosine", chunk_size=4)
+    for e, t, s in zip(enrolls, tests, scores):
+        e = table.embeddings[table.index[e]]
+        t = table.embeddings[table.index[t]]
+        assert s == pytest.approx((e @ t.T).mean().item(), abs=1e-6)
+
+
+def test_score_trials_mismatch():
+    table = _table()
+    with pytest.raises(ValueError):
+        score_trials(table, ["utt0", "utt1"], ["utt2"])
+
+
+def test_EmbeddingTable_from_dict_2d_and_normalize():
+    table = EmbeddingTable.from_dict({"a": np.ones(4), "b": np.arange(4.0)})
+    assert table.embeddings.shape == (2, 1, 4)
+    np.testing.assert_allclose(table.embeddings.norm(dim=-1), 1.0, rtol=1e-6)
+    assert table.rows(["b", "a"]).tolist() == [1, 0]
+
+
+def test_EmbeddingTable_from_dict_shape_mismatch():
+    with pytest.raises(ValueError):
+        EmbeddingTable.from_dict({"a": np.ones((2, 4)), "b": np.ones((3, 4))})
+
+
+def test_EmbeddingTable_from_npz(tmp_path):
+    np.savez(tmp_path / "a.npz", utt0=np.ones(4), utt1=np.zeros(4) + 2)
+    np.savez(tmp_path / "b.npz", utt2=np.arange(4.0))
+    table = EmbeddingTable.from_npz(
+        tmp_path / "a.npz", tmp_path / "b.npz", normalize=False
+    )
+    assert table.ids == ["utt0", "utt1", "utt2"]
+    np.testing.assert_array_equal(table.embeddings[2, 0], np.arange(4.0))
+
+
+def test_as_norm():
+    table = _table()
+    enrolls, tests = _trials(table)
+    cohort = torch.nn.functional.normalize(torch.randn(20, 8), dim=-1)
+    scores = score_trials(table, enrolls, tests)
+    normed = as_norm(scores, table, enrolls, tests, cohort, topk=5)
+
+    def stats(utt):
+        x = table.embeddings[table.index[utt]]
+        s = (-torch.cdist(x, cohort)).mean(0).topk(5)[0]
+        return s.mean(), s.std()
+
+    for e, t, s, n in zip(enrolls, tests, scores, normed):
+        (em, es), (tm, ts) = stats(e), stats(t)
+        desired = ((s - em) / es + (s - tm) / ts) / 2
+        assert n == pytest.approx(desired.item(), rel=1e-4)
+
+
+def test_cohort_stats_subset():
+    table = _table()
+    cohort = torch.randn(4, 8)
+    mean, std = cohort_stats(table, cohort, topk=10, ids=["utt3"])
+    assert not mean[3].isnan() and not std[3].isnan()
+    assert mean.isnan().sum() == len(table) - 1
@@ -186,3 +186,240 @@ def test_batch_beam_search_equal(
         numpy.testing.assert_allclose(
             expected.score.cpu(), actual.score.cpu(), rtol=1e-6
         )
+
+
+@pytest.mark.parametrize("ctc_weight", [0.0, 0.5, 1.0])
+@pytest.mark.parametrize("maxlenratio", [0.0, 0.5])
+def test_batch_beam_search_multi_utt_equal(ctc_weight, maxlenratio):
+    from espnet2.asr.ctc import CTC
+    from espnet2.asr.decoder.transformer_decoder import TransformerDecoder
+    from espnet.nets.batch_beam_search_multi_utt import BatchBeamSearchMultiUtt
+    from espnet.nets.scorers.ctc import CTCPrefixScorer
+
+    torch.manual_seed(0)
+    vocab_size, adim = 7, 8
+    decoder = TransformerDecoder(
+        vocab_size, adim, attention_heads=2, linear_units=4, num_blocks=2
+    )
+    ctc = CTC(vocab_size, adim)
+    decoder.eval()
+    ctc.eval()
+    scorers = dict(
+        decoder=decoder,
+        ctc=CTCPrefixScorer(ctc, vocab_size - 1),
+        length_bonus=LengthBonus(vocab_size),
+    )
+    weights = dict(decoder=1.0 - ctc_weight, ctc=ctc_weight, length_bonus=0.1)
+    kwargs = dict(
+        beam_size=3,
+        vocab_size=vocab_size,
+        weights=weights,
+        scorers=scorers,
+        sos=vocab_size - 1,
+        eos=vocab_size - 1,
+        pre_beam_score_key=None if ctc_weight == 1.0 else "full",
+    )
+    beam = BatchBeamSearch(**kwargs)
+    multi_beam = BatchBeamSearchMultiUtt(**kwargs)
+    assert multi_beam.unbatchable_scorers() == []
+
+    xlens = torch.tensor([12, 20, 7])
+    xs = torch.randn(len(xlens), xlens.max(), adim)
+    with torch.no_grad():
+        batch_nbest = multi_beam(x=xs, xlens=xlens, maxlenratio=maxlenratio)
+        for b, nbest in enumerate(batch_nbest):
+            expected_nbest = beam(x=xs[b, : xlens[b]], maxlenratio=maxlenratio)
+            assert len(nbest) == len(expected_nbest)
+            for expected, actual in zip(expected_nbest, nbest):
+                assert expected.yseq.tolist() == actual.yseq.tolist()
+                numpy.testing.assert_allclose(
+                    float(expected.score), float(actual.score), rtol=1e-5
+                )
+
+
+class _FinalBonus(LengthBonus):
+    def final_score(self, state):
+        return 1.0
+
+
+def test_batch_beam_search_multi_utt_final_score():
+    from espnet2.asr.decoder.transformer_decoder import TransformerDecoder
+    from espnet.nets.batch_beam_search_multi_utt import BatchBeamSearchMultiUtt
+
+    torch.manual_seed(0)
+    vocab_size, adim = 7, 8
+    decoder = TransformerDecoder(
+        vocab_size, adim, attention_heads=2, linear_units=4, num_blocks=2
+    )
+    decoder.eval()
+    kwargs = dict(
+        beam_size=3,
+        vocab_size=vocab_size,
+        weights=dict(decoder=1.0, final_bonus=0.5),
+        scorers=dict(decoder=decoder, final_bonus=_FinalBonus(vocab_size)),
+        sos=vocab_size - 1,
+        eos=vocab_size - 1,
+        pre_beam_score_key="full",
+    )
+    beam = BeamSearch(**kwargs)
+    multi_beam = BatchBeamSearchMultiUtt(**kwargs)
+
+    xlens = torch.tensor([12, 20, 7])
+    xs = torch.randn(len(xlens), xlens.max(), adim)
+    with torch.no_grad():
+        batch_nbest = multi_beam(x=xs, xlens=xlens, maxlenratio=0.5)
+        for b, nbest in enumerate(batch_nbest):
+            expected_nbest = beam(x=xs[b, : xlens[b]], maxlenratio=0.5)
+            assert len(nbest) == len(expected_nbest)
+            for expected, actual in zip(expected_nbest, nbest):
+                assert expected.yseq.tolist() == actual.yseq.tolist()
+                numpy.testing.assert_allclose(
+                    float(expected.score), float(actual.score), rtol=1e-5
+                )
+                numpy.testing.assert_allclose(
+                    float(expected.scores["final_bonus"]),
+                    float(actual.scores["final_bonus"]),
+                    rtol=1e-5,
+                )
+
+
+def test_batch_beam_search_multi_utt_source_kv_once_per_utt():
+    from espnet2.asr.decoder.transformer_decoder import TransformerDecoder
+    from espnet.nets.batch_beam_search_multi_utt import BatchBeamSearchMultiUtt
+
+    torch.manual_seed(0)
+    vocab_size, adim = 7, 8
+    decoder = TransformerDecoder(
+        vocab_size, adim, attention_heads=2, linear_units=4, num_blocks=2
+    )
+    decoder.eval()
+    n_projected = []
+    for layer in decoder.decoders:
+        forward_kv = layer.src_attn.forward_kv
+
+        def counted_forward_kv(key, value, forward_kv=forward_kv):
+            n_projected.append(key.size(0))
+            return forward_kv(key, value)
+
+        layer.src_attn.forward_kv = counted_forward_kv
+
+    multi_beam = BatchBeamSearchMultiUtt(
+        beam_size=3,
+        vocab_size=vocab_size,
+        weights=dict(decoder=1.0, length_bonus=0.1),
+        scorers=dict(decoder=decoder, length_bonus=LengthBonus(vocab_size)),
+        sos=vocab_size - 1,
+        eos=vocab_size - 1,
+        pre_beam_score_key="full",
+    )
+    xlens = torch.tensor([12, 20, 7])
+    xs = torch.randn(len(xlens), xlens.max(), adim)
+    with torch.no_grad():
+        multi_beam(x=xs, xlens=xlens, maxlenratio=0.5)
+    # the keys/values are projected once for each utterance in each layer
+    assert n_projected == [len(xlens)] * len(decoder.decoders)
+
+
+def test_batch_beam_search_online_batch_forward_equal():
+    from espnet2.asr.ctc import CTC
+    from espnet2.asr.decoder.transformer_decoder import TransformerDecoder
+    from espnet.nets.batch_beam_search_online import BatchBeamSearchOnline
+    from espnet.nets.scorers.ctc import CTCPrefixScorer
+
+    torch.manual_seed(0)
+    vocab_size, adim = 12, 16
+    decoder = TransformerDecoder(vocab_size, adim, linear_units=8, num_blocks=2)
+    ctc = CTC(vocab_size, adim)
+    decoder.eval()
+    ctc.eval()
+    beam = BatchBeamSearchOnline(
+        beam_size=3,
+        vocab_size=vocab_size,
+        weights=dict(decoder=0.7, ctc=0.3, length_bonus=0.5),
+        scorers=dict(
+            decoder=decoder,
+            ctc=CTCPrefixScorer(ctc, vocab_size - 1),
+            length_bonus=LengthBonus(vocab_size),
+        ),
+        sos=vocab_size - 1,
+        eos=vocab_size - 1,
+        pre_beam_score_key="full",
+        block_size=8,
+        hop_size=4,
+        look_ahead=2,
+        disable_repetition_detection=True,
+    )
+    # the streams have different numbers and lengths of chunks
+    chunks = [
+        [torch.randn(n, adim) for n in lengths]
+        for lengths in [[10, 7, 9], [20], [4, 4, 12, 6], [9, 15]]
+    ]
+    with torch.no_grad():
+        expected = []
+        for stream in chunks:
+            beam.reset()
+            expected.append(
+                [beam(x, is_final=i == len(stream) - 1) for i, x in enumerate(stream)]
+            )
+
+        beam.reset()
+        actual = [[] for _ in chunks]
+        search_states = [None] * len(chunks)
+        for step in range(max(len(stream) for stream in chunks)):
+            ids = [i for i, stream in enumerate(chunks) if step < len(stream)]
+            nbests, states = beam.batch_forward(
+                [chunks[i][step] for i in ids],
+                [search_states[i] for i in ids],
+                is_final=[step == len(chunks[i]) - 1 for i in ids],
+            )
+            for i, nbest, state in zip(ids, nbests, states):
+                actual[i].append(nbest)
+                search_states[i] = state
+
+    for expected_stream, actual_stream in zip(expected, actual):
+        for expected_nbest, nbest in zip(expected_stream, actual_stream):
+            assert [h.yseq.tolist() for h in expected_nbest] == [
+                h.yseq.tolist() for h in nbest
+            ]
+            numpy.testing.assert_allclose(
+                [float(h.score) for h in expected_nbest],
+                [float(h.score) for h in nbest],
+                rtol=1e-5,
+            )
+
+
+@pytest.mark.parametrize("use_pre_beam", [False, True])
+def test_batch_select_state(use_pre_beam):
+    from espnet2.asr.ctc import CTC
+    from espnet.nets.scorers.ctc import CTCPrefixScorer
+
+    torch.manual_seed(0)
+    vocab_size, adim, n_hyps = 7, 8, 3
+    scorer = CTCPrefixScorer(CTC(vocab_size, adim), vocab_size - 1)
+    x = torch.randn(10, adim)
+    with torch.no_grad():
+        scorer.batch_init_state(x)
+        ys = torch.tensor(
+            [[vocab_size - 1, 1], [vocab_size - 1, 2], [vocab_size - 1, 3]]
+        )
+        part_ids = (
+            torch.tensor([[1, 2, 4], [0, 3, 5], [2, 4, 5]]) if use_pre_beam else None
+        )
+        _, states = scorer.batch_score_partial(ys, part_ids, [None] * n_hyps, x)
+
+    ids = torch.tensor([2, 0, 2, 1])
+    new_ids = torch.tensor([4, 3, 5, 0])
+    actual = scorer.batch_select_state(states, ids, new_ids)
+    assert len(actual) == len(ids)
+    for i, j, a in zip(ids.tolist(), new_ids.tolist(), actual):
+        expected = scorer.select_state(states, i, j)
+        for e_, a_ in zip(expected, a):
+            if isinstance(e_, torch.Tensor):
+                assert torch.equal(e_, a_)
+            else:
+                assert e_ == a_
+
+    # scorers without tensor states fall back to `select_state`
+    length_bonus = LengthBonus(vocab_size)
+    assert length_bonus.batch_select_state([5, 6, 7], ids[:2]) == [7, 5]
+    assert length_bonus.batch_select_state(None, ids[:2]) == [None, None]
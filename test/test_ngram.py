@@ -2,6 +2,7 @@ import os
 from math import isclose
 
 import pytest
+import torch
 
 kenlm = pytest.importorskip("kenlm")
 
@@ -15,3 +16,94 @@ def test_ngram_build(test_sens):
     lm = kenlm.LanguageModel(os.path.join(root, "test.arpa"))
     assert isclose(lm.score(test_sens[0]), -1.04, rel_tol=0.01)
     assert isclose(lm.score(test_sens[1]), -1.18, rel_tol=0.01)
+
+
+token_list = [
+    "<blank>",
+    "<unk>",
+    "I",
+    "like",
+    "apple",
+    "you",
+    "love",
+    "coffee",
+    "<eos>",
+]
+
+
+def _reference_scores(lm, prefix):
+    # Score all tokens by kenlm in the context of prefix
+    state, out_state = kenlm.State(), kenlm.State()
+    lm.NullContextWrite(state)
+    for w in ["<s>"] + prefix:
+        lm.BaseScore(state, w, out_state)
+        state, out_state = out_state, state
+    words = [w if w != "<eos>" else "</s>" for w in token_list]
+    return torch.tensor([lm.BaseScore(state, w, out_state) for w in words])
+
+
+def _prefixes():
+    # <eos> is used as <sos>
+    return torch.tensor([[8, 2, 3], [8, 5, 6], [8, 2, 3]]), [
+        ["I", "like"],
+        ["you", "love"],
+        ["I", "like"],
+    ]
+
+
+def _run_scorer(scorer, ys, batch_fn):
+    state = scorer.init_state(None)
+    states = [state] * len(ys)
+    for i in range(1, ys.shape[1] + 1):
+        scores, states = batch_fn(ys[:, :i], states)
+    return scores, states
+
+
+def test_ngram_full_scorer_batch_score():
+    from espnet.nets.scorers.ngram import NgramFullScorer
+
+    lm = kenlm.LanguageModel(os.path.join(root, "test.arpa"))
+    scorer = NgramFullScorer(os.path.join(root, "test.arpa"), token_list)
+    ys, prefixes = _prefixes()
+    xs = torch.zeros(len(ys), 1, 1)
+    scores, states = _run_scorer(scorer, ys, lambda y, s: scorer.batch_score(y, s, xs))
+    assert scores.shape == (len(ys), len(token_list))
+    for i, prefix in enumerate(prefixes):
+        torch.testing.assert_close(scores[i], _reference_scores(lm, prefix))
+        state = scorer.init_state(None)
+        for t in range(1, ys.shape[1] + 1):
+            score, state = scorer.score(ys[i, :t], state, xs[i])
+        torch.testing.assert_close(score, scores[i])
+    # The same contexts share the cached scores
+    assert len(scorer.cache) == 2 * 2 + 1
+
+
+def test_ngram_part_scorer_batch_score_partial():
+    from espnet.nets.scorers.ngram import NgramPartScorer
+
+    lm = kenlm.LanguageModel(os.path.join(root, "test.arpa"))
+    scorer = NgramPartScorer(os.path.join(root, "test.arpa"), token_list)
+    ys, prefixes = _prefixes()
+    xs = torch.zeros(len(ys), 1, 1)
+    ids = torch.tensor([[4, 8], [7, 2], [1, 8]])
+    scores, states = _run_scorer(
+        scorer, ys, lambda y, s: scorer.batch_score_partial(y, ids, s, xs)
+    )
+    for i, prefix in enumerate(prefixes):
+        desired = torch.full((len(token_list),), scorer.logzero)
+        desired[ids[i]] = _reference_scores(lm, prefix)[ids[i]]
+        torch.testing.assert_close(scores[i], desired)
+    selected = scorer.batch_select_state(states, torch.tensor([2, 0]))
+    assert selected == [states[2], states[0]]
+    assert scorer.select_state(states, 1) == states[1]
+
+
+def test_ngram_scorer_cache_size():
+    from espnet.nets.scorers.ngram import NgramFullScorer
+
+    scorer = NgramFullScorer(os.path.join(root, "test.arpa"), token_list, cache_size=1)
+    ys, _ = _prefixes()
+    xs = torch.zeros(len(ys), 1, 1)
+    scores, _ = _run_scorer(scorer, ys, lambda y, s: scorer.batch_score(y, s, xs))
+    assert len(scorer.cache) == 1
+    assert not scores.isnan().any()